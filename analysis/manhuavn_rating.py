@@ -2,6 +2,8 @@ from analysis.base_rating import BaseRatingCalculator
 import numpy as np
 import logging
 
+from utils import metrics
+
 logger = logging.getLogger(__name__)
 
 class ManhuavnRatingCalculator(BaseRatingCalculator):
@@ -36,6 +38,7 @@ class ManhuavnRatingCalculator(BaseRatingCalculator):
             logger.error(f"Lỗi khi trích xuất số từ '{text_value}': {e}")
             return 0
     
+    @metrics.timed(metrics.STAGE_RATING, "Manhuavn")
     def calculate(self, comic):
         """
         Tính điểm đánh giá dựa trên dữ liệu từ Manhuavn
@@ -1,10 +1,13 @@
 import numpy as np
 import logging
 
+from utils import metrics
+
 logger = logging.getLogger(__name__)
 
 class NetTruyenRatingCalculator:
     @staticmethod
+    @metrics.timed(metrics.STAGE_RATING, "NetTruyen")
     def calculate(comic_data):
         """
         Tính điểm đánh giá cơ bản cho truyện từ NetTruyen
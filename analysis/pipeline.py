@@ -0,0 +1,121 @@
+"""
+Quy trình phân tích một truyện không phụ thuộc giao diện
+
+Crawl comment → phân tích sentiment → lưu comment → tính điểm cơ bản, điểm sentiment và
+điểm tổng hợp. Dùng chung cho tab phân tích và chế độ dòng lệnh (cli.py).
+"""
+import time
+import logging
+
+from analysis.rating_factory import RatingFactory
+
+logger = logging.getLogger(__name__)
+
+# Trọng số của điểm tổng hợp
+BASE_WEIGHT = 0.6
+SENTIMENT_WEIGHT = 0.4
+# Điểm sentiment khi không có comment
+NEUTRAL_SENTIMENT_RATING = 5.0
+
+
+def calculate_sentiment_rating(positive, negative, neutral):
+    """Tính điểm sentiment dựa trên số lượng các loại comment"""
+    total = positive + negative + neutral
+    if total == 0:
+        return NEUTRAL_SENTIMENT_RATING
+
+    positive_ratio = positive / total
+    negative_ratio = negative / total
+    neutral_ratio = neutral / total
+
+    sentiment_rating = (positive_ratio * 8) - (negative_ratio * 5) + (neutral_ratio * 6)
+    return max(0, min(10, sentiment_rating * 2))
+
+
+def comprehensive_rating(base_rating, sentiment_rating):
+    """Điểm tổng hợp từ điểm cơ bản và điểm sentiment"""
+    return base_rating * BASE_WEIGHT + sentiment_rating * SENTIMENT_WEIGHT
+
+
+def analyze_comments(sentiment_analyzer, comments):
+    """
+    Phân tích sentiment cho danh sách comment (gán sentiment/sentiment_score vào từng comment)
+
+    Args:
+        sentiment_analyzer: SentimentAnalyzer
+        comments: Danh sách comment
+
+    Returns:
+        tuple: (danh sách comment đã xử lý, dict số lượng positive/negative/neutral)
+    """
+    stats = {"positive": 0, "negative": 0, "neutral": 0}
+    processed = []
+    for comment in comments:
+        try:
+            content = (comment.get("noi_dung", "") or "").strip()
+            if content and len(content) > 3:
+                result = sentiment_analyzer.analyze(content)
+                comment["sentiment"] = result["sentiment"]
+                comment["sentiment_score"] = result["score"]
+            else:
+                comment["sentiment"] = "neutral"
+                comment["sentiment_score"] = 0.5
+        except Exception as e:
+            logger.error(f"Lỗi khi phân tích sentiment: {str(e)}")
+            comment["sentiment"] = "neutral"
+            comment["sentiment_score"] = 0.5
+        stats[comment["sentiment"]] = stats.get(comment["sentiment"], 0) + 1
+        processed.append(comment)
+    return processed, stats
+
+
+def build_result(comic, base_rating, comments=None, stats=None, error=None):
+    """Tạo dict kết quả phân tích của một truyện"""
+    stats = stats or {}
+    sentiment_rating = calculate_sentiment_rating(
+        stats.get("positive", 0), stats.get("negative", 0), stats.get("neutral", 0)
+    )
+    result = {
+        **comic.copy(),
+        "base_rating": base_rating,
+        "sentiment_rating": sentiment_rating if error is None else 0.0,
+        "comprehensive_rating": comprehensive_rating(base_rating, sentiment_rating) if error is None else base_rating * BASE_WEIGHT,
+        "comments": comments or [],
+        "positive_count": stats.get("positive", 0),
+        "negative_count": stats.get("negative", 0),
+        "neutral_count": stats.get("neutral", 0)
+    }
+    if error is not None:
+        result["error"] = error
+    return result
+
+
+def analyze_comic(comic, crawler, sentiment_analyzer, db_manager, time_limit=None, days_limit=None):
+    """
+    Phân tích đầy đủ một truyện
+
+    Args:
+        comic: Dict truyện (có id, nguon, link_truyen)
+        crawler: Crawler của nguồn
+        sentiment_analyzer: SentimentAnalyzer
+        db_manager: MultipleDBManager (đã set_source đúng nguồn)
+        time_limit: Chỉ lấy comment mới hơn thời điểm này
+        days_limit: Số ngày tương ứng với time_limit
+
+    Returns:
+        dict: Kết quả phân tích (xem build_result)
+    """
+    base_rating = RatingFactory.get_calculator(comic.get("nguon", "TruyenQQ")).calculate(comic)
+    try:
+        started = time.time()
+        comments = crawler.crawl_comments(comic, time_limit=time_limit, days_limit=days_limit) or []
+        logger.info(f"Đã crawl được {len(comments)} comment cho {comic.get('ten_truyen')} trong {time.time() - started:.2f} giây")
+        if not comments:
+            return build_result(comic, base_rating)
+
+        processed, stats = analyze_comments(sentiment_analyzer, comments)
+        db_manager.save_comments(comic.get("id"), processed)
+        return build_result(comic, base_rating, processed, stats)
+    except Exception as e:
+        logger.error(f"Lỗi khi xử lý truyện {comic.get('ten_truyen')}: {str(e)}")
+        return build_result(comic, base_rating, error="Lỗi khi xử lý truyện này")
@@ -1,8 +1,8 @@
 import logging
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
-import torch
 import os
 
+from utils import metrics
+
 logger = logging.getLogger(__name__)
 
 class SentimentAnalyzer:
@@ -24,6 +24,9 @@ class SentimentAnalyzer:
         os.makedirs(cache_dir, exist_ok=True)
         
         try:
+            # transformers/torch rất nặng, chỉ import khi thực sự tạo analyzer
+            from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
+            
             # Sử dụng transformer pipeline cho phân tích cảm xúc
             self.tokenizer = AutoTokenizer.from_pretrained(model_name, cache_dir=cache_dir)
             self.model = AutoModelForSequenceClassification.from_pretrained(model_name, cache_dir=cache_dir)
@@ -41,6 +44,7 @@ class SentimentAnalyzer:
             self.analyzer = None
             self.model_name = "simple"
     
+    @metrics.timed(metrics.STAGE_SENTIMENT)
     def analyze(self, text):
         """
         Phân tích tình cảm của văn bản
@@ -1,12 +1,15 @@
 import logging
 import numpy as np
 
+from utils import metrics
+
 logger = logging.getLogger(__name__)
 
 class TruyenQQRatingCalculator:
     """Tính điểm đánh giá cơ bản không sử dụng dữ liệu sentiment"""
     
     @staticmethod
+    @metrics.timed(metrics.STAGE_RATING, "TruyenQQ")
     def calculate(comic):
         """
         Tính điểm đánh giá cơ bản cho một truyện dựa trên số liệu định lượng
@@ -0,0 +1,290 @@
+"""
+HTTP server cục bộ phục vụ trang mẫu của các nguồn truyện cho benchmark
+
+Trang danh sách, trang chi tiết và comment được dựng từ template trong
+benchmarks/fixtures/<nguồn>/ (giữ nguyên cấu trúc DOM mà crawler dùng), kèm các endpoint
+comment AJAX và hàm JS giả lập loadComment/joinComment. Có thể cấu hình độ trễ và tỉ lệ
+lỗi (503) để đo crawler trong điều kiện mạng xấu mà không cần Internet.
+"""
+import os
+import json
+import time
+import random
+import logging
+import threading
+from string import Template
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+logger = logging.getLogger(__name__)
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Thư mục template của từng nguồn
+SITE_FIXTURES = {
+    "TruyenQQ": "truyenqq",
+    "NetTruyen": "nettruyen",
+    "Manhuavn": "manhuavn",
+    "Truyentranh3q": "truyentranh3q"
+}
+
+COMMENT_NAMES = ["Minh Anh", "Hoàng Long", "Thu Trang", "Quốc Bảo", "Ngọc Hân", "Đức Huy"]
+COMMENT_TEXTS = [
+    "Truyện hay quá, mong tác giả ra chương mới sớm",
+    "Nét vẽ đẹp nhưng cốt truyện hơi chậm",
+    "Chương này dở quá, drop thôi",
+    "Main bá đạo thật sự, đọc cuốn ghê",
+    "Dịch mượt, cảm ơn nhóm dịch",
+    "Bình thường, không có gì đặc sắc"
+]
+
+
+def _load_templates(site):
+    """Đọc các template của một nguồn"""
+    folder = os.path.join(FIXTURE_DIR, SITE_FIXTURES[site])
+    templates = {}
+    for name in os.listdir(folder):
+        if name.endswith(".html"):
+            with open(os.path.join(folder, name), "r", encoding="utf-8") as f:
+                templates[name[:-5]] = Template(f.read())
+    return templates
+
+
+class FixtureSite:
+    """
+    Dựng nội dung trang mẫu cho một nguồn
+    """
+
+    def __init__(self, site, pages=2, comics_per_page=10, comments_per_page=10, comment_pages=3):
+        """
+        Khởi tạo FixtureSite
+
+        Args:
+            site: Tên nguồn (TruyenQQ, NetTruyen, Manhuavn, Truyentranh3q)
+            pages: Số trang danh sách có truyện
+            comics_per_page: Số truyện mỗi trang danh sách
+            comments_per_page: Số comment mỗi trang comment
+            comment_pages: Số trang comment của mỗi truyện
+        """
+        if site not in SITE_FIXTURES:
+            raise ValueError(f"Không có fixture cho nguồn: {site}")
+        self.site = site
+        self.pages = pages
+        self.comics_per_page = comics_per_page
+        self.comments_per_page = comments_per_page
+        self.comment_pages = comment_pages
+        self.templates = _load_templates(site)
+        self.base_url = ""
+
+    @property
+    def total_comics(self):
+        return self.pages * self.comics_per_page
+
+    @property
+    def total_comments(self):
+        return self.total_comics * self.comments_per_page * self.comment_pages
+
+    def comic_link(self, comic_id):
+        return f"{self.base_url}/truyen-tranh/comic-{comic_id}"
+
+    def _comic_values(self, comic_id):
+        rng = random.Random(comic_id)
+        return {
+            "id": comic_id,
+            "name": f"Truyện mẫu {comic_id}",
+            "link": self.comic_link(comic_id),
+            "author": f"Tác giả {comic_id % 17}",
+            "chapter": rng.randint(1, 400),
+            "views": f"{rng.randint(1000, 9000000):,}",
+            "likes": f"{rng.randint(10, 90000):,}",
+            "follows": f"{rng.randint(10, 200000):,}",
+            "rating": f"{rng.uniform(3, 10):.1f}",
+            "rating_count": rng.randint(1, 5000),
+            "comment_count": self.comments_per_page * self.comment_pages,
+            "description": f"Mô tả ngắn cho truyện mẫu số {comic_id}."
+        }
+
+    def listing(self, page):
+        """HTML trang danh sách (trang vượt quá số trang thì không có truyện)"""
+        items = []
+        if 1 <= page <= self.pages:
+            first_id = (page - 1) * self.comics_per_page + 1
+            for comic_id in range(first_id, first_id + self.comics_per_page):
+                items.append(self.templates["item"].safe_substitute(self._comic_values(comic_id)))
+        return self.templates["listing"].safe_substitute(page=page, items="\n".join(items))
+
+    def comments(self, comic_id, page):
+        """HTML các comment của một trang comment (rỗng nếu hết comment)"""
+        if not 1 <= page <= self.comment_pages:
+            return ""
+        rng = random.Random(comic_id * 1000 + page)
+        parts = []
+        for index in range(self.comments_per_page):
+            # Comment càng về sau càng cũ
+            minutes = ((page - 1) * self.comments_per_page + index + 1) * 7
+            parts.append(self.templates["comment"].safe_substitute(
+                name=rng.choice(COMMENT_NAMES),
+                content=f"{rng.choice(COMMENT_TEXTS)} (#{comic_id}-{page}-{index})",
+                time=f"{minutes} phút trước"
+            ))
+        return "\n".join(parts)
+
+    def detail(self, comic_id):
+        """HTML trang chi tiết truyện"""
+        values = self._comic_values(comic_id)
+        values["comments"] = self.comments(comic_id, 1)
+        values["load_more"] = (
+            '<a class="load-more-comm" href="javascript:void(0)" onclick="loadMoreComment(this)">Xem thêm</a>'
+            if self.comment_pages > 1 else ""
+        )
+        return self.templates["detail"].safe_substitute(values)
+
+    def route(self, method, path, query, form):
+        """
+        Chọn nội dung trả về cho request
+
+        Returns:
+            tuple: (status, content_type, body), None nếu không có trang
+        """
+        html = "text/html; charset=utf-8"
+        parts = [part for part in path.split("/") if part]
+
+        # Trang danh sách
+        if self.site == "TruyenQQ" and len(parts) == 2 and parts[0] == "truyen-moi-cap-nhat":
+            return 200, html, self.listing(int(parts[1].replace("trang-", "").replace(".html", "")))
+        if self.site == "Truyentranh3q" and parts == ["danh-sach", "truyen-moi-cap-nhat"]:
+            return 200, html, self.listing(int(query.get("page", ["1"])[0]))
+        if self.site == "Manhuavn" and len(parts) == 3 and parts[0] == "danhsach":
+            return 200, html, self.listing(int(parts[1].lstrip("P")))
+        if self.site == "NetTruyen" and not parts:
+            return 200, html, self.listing(int(query.get("page", ["1"])[0]))
+
+        # Trang chi tiết
+        if len(parts) == 2 and parts[0] == "truyen-tranh" and parts[1].startswith("comic-"):
+            comic_id = int(parts[1][len("comic-"):])
+            if 1 <= comic_id <= self.total_comics:
+                return 200, html, self.detail(comic_id)
+            return None
+
+        # Endpoint comment
+        if path == "/frontend/comment/list" and method == "POST":
+            return 200, html, self.comments(int(form.get("book_id", ["0"])[0]), int(form.get("page", ["1"])[0]))
+        if path == "/Comic/Services/CommentService.asmx/List":
+            body = self.comments(int(query.get("comicId", ["0"])[0]), int(query.get("pageNumber", ["1"])[0]))
+            return 200, "application/json; charset=utf-8", json.dumps({"success": True, "response": body})
+        if len(parts) == 2 and parts[0] == "comments":
+            return 200, html, self.comments(int(parts[1]), int(query.get("page", ["1"])[0]))
+
+        return None
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    """Xử lý request cho FixtureServer"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _handle(self, method):
+        server = self.server.fixture_server
+        parsed = urlparse(self.path)
+        form = {}
+        if method == "POST":
+            length = int(self.headers.get("Content-Length") or 0)
+            form = parse_qs(self.rfile.read(length).decode("utf-8"))
+
+        server.record_request()
+        if server.latency[1] > 0:
+            time.sleep(random.uniform(*server.latency))
+
+        if server.error_rate and random.random() < server.error_rate:
+            server.record_error()
+            self._send(503, "text/html; charset=utf-8", "<html><body>Service Unavailable</body></html>")
+            return
+
+        try:
+            result = server.site.route(method, parsed.path, parse_qs(parsed.query), form)
+        except (ValueError, IndexError):
+            result = None
+        if result is None:
+            self._send(404, "text/html; charset=utf-8", "<html><head><title>404</title></head><body>Page not found</body></html>")
+        else:
+            self._send(*result)
+
+    def _send(self, status, content_type, body):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+
+class FixtureServer:
+    """
+    Server trang mẫu chạy trong thread nền, dùng như context manager
+
+    Ví dụ:
+        with FixtureServer(FixtureSite("TruyenQQ"), latency=(0.05, 0.2)) as server:
+            crawler = ...(base_url=server.base_url)
+    """
+
+    def __init__(self, site, host="127.0.0.1", port=0, latency=(0.0, 0.0), error_rate=0.0):
+        """
+        Khởi tạo FixtureServer
+
+        Args:
+            site: FixtureSite cần phục vụ
+            host: Địa chỉ lắng nghe
+            port: Cổng (0 là tự chọn cổng trống)
+            latency: Khoảng độ trễ ngẫu nhiên mỗi request (giây, (min, max))
+            error_rate: Tỉ lệ request trả về 503 (0-1)
+        """
+        self.site = site
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _FixtureHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.fixture_server = self
+        self._thread = None
+        self.base_url = f"http://{host}:{self._httpd.server_address[1]}"
+        site.base_url = self.base_url
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def start(self):
+        """Chạy server trong thread nền"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Fixture {self.site.site} đang chạy tại {self.base_url}")
+        return self
+
+    def stop(self):
+        """Dừng server"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        return False
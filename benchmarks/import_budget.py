@@ -0,0 +1,150 @@
+"""
+Kiểm tra thời gian import lúc khởi động
+
+Import các module khởi động trong process Python mới (giống lúc chạy main.py/cli.py),
+đo thời gian và kiểm tra không có thư viện nặng nào (torch, transformers, selenium,
+pandas, openpyxl...) bị import sớm. Vượt ngân sách hoặc có thư viện nặng thì trả mã lỗi 1,
+kèm danh sách module import chậm nhất theo -X importtime để tìm nguyên nhân.
+
+Chạy:
+    python -m benchmarks.import_budget
+    python -m benchmarks.import_budget --target cli --budget-ms 250
+"""
+import os
+import sys
+import json
+import argparse
+import importlib.util
+import subprocess
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Nhóm module được import lúc khởi động của từng entry point
+TARGETS = {
+    "cli": [
+        "cli", "utils.config_manager", "utils.multi_db_manager", "crawlers.crawler_factory",
+        "analysis.sentiment_analyzer", "analysis.pipeline"
+    ],
+    "gui": ["ui.main_window"]
+}
+# Ngân sách thời gian import (ms), đo trên máy phát triển
+BUDGET_MS = {
+    "cli": 400,
+    "gui": 1500
+}
+# Thư viện chỉ được import khi dùng tới
+HEAVY_MODULES = ["torch", "transformers", "selenium", "seleniumbase", "pandas", "openpyxl"]
+# Module chỉ có khi chạy giao diện
+TARGET_REQUIRES = {"gui": "PyQt6"}
+DEFAULT_REPEAT = 3
+TOP_IMPORTS = 15
+
+PROBE_SCRIPT = """
+import sys, time, json
+started = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - started
+print(json.dumps({{"ms": elapsed * 1000, "heavy": sorted(m for m in {heavy!r} if m in sys.modules)}}))
+"""
+
+
+def probe(modules, importtime=False):
+    """
+    Import modules trong một process mới
+
+    Returns:
+        tuple: (dict kết quả {ms, heavy}, stderr của process)
+    """
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", PROBE_SCRIPT.format(modules=modules, heavy=HEAVY_MODULES)]
+    completed = subprocess.run(command, cwd=PROJECT_DIR, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "lỗi không rõ")
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def slowest_imports(importtime_output, limit=TOP_IMPORTS):
+    """Các module có thời gian import tích lũy lớn nhất từ output của -X importtime"""
+    rows = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [part.strip() for part in line[len("import time:"):].split("|")]
+        if not parts[1].isdigit():
+            continue
+        rows.append((int(parts[1]) / 1000, parts[2]))
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def check_target(target, budget_ms, repeat):
+    """
+    Đo một entry point
+
+    Returns:
+        dict: target, ms (tốt nhất), budget_ms, heavy, slowest, ok (hoặc skipped/error)
+    """
+    required = TARGET_REQUIRES.get(target)
+    if required and importlib.util.find_spec(required) is None:
+        return {"target": target, "skipped": f"chưa cài {required}"}
+
+    modules = TARGETS[target]
+    try:
+        timings = [probe(modules)[0] for _ in range(repeat)]
+        _, importtime_output = probe(modules, importtime=True)
+    except Exception as e:
+        return {"target": target, "error": str(e), "ok": False}
+
+    best = min(timing["ms"] for timing in timings)
+    heavy = timings[0]["heavy"]
+    return {
+        "target": target,
+        "ms": round(best, 1),
+        "budget_ms": budget_ms,
+        "heavy": heavy,
+        "slowest": slowest_imports(importtime_output),
+        "ok": best <= budget_ms and not heavy
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Kiểm tra thời gian import lúc khởi động")
+    parser.add_argument("--target", nargs="+", default=list(TARGETS), choices=list(TARGETS))
+    parser.add_argument("--budget-ms", type=float, help="Ghi đè ngân sách cho mọi target")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--json", action="store_true", help="In kết quả dạng JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = [
+        check_target(target, args.budget_ms or BUDGET_MS[target], max(1, args.repeat))
+        for target in args.target
+    ]
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        for result in results:
+            if "skipped" in result:
+                print(f"[{result['target']}] bỏ qua: {result['skipped']}")
+                continue
+            if "error" in result:
+                print(f"[{result['target']}] LỖI khi import: {result['error']}")
+                continue
+            status = "OK" if result["ok"] else "VƯỢT NGÂN SÁCH"
+            print(f"[{result['target']}] {result['ms']:.1f} ms / {result['budget_ms']:.0f} ms - {status}")
+            if result["heavy"]:
+                print(f"  Thư viện nặng bị import sớm: {', '.join(result['heavy'])}")
+            for ms, name in result["slowest"]:
+                print(f"  {ms:8.1f} ms  {name}")
+
+    return 0 if all(result.get("ok", True) for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,434 @@
+"""
+Microbenchmark cho các đường nóng: parse số/thời gian/chương, tính điểm và ghi database
+
+Mỗi case chạy trên dữ liệu tổng hợp ở các quy mô 1k/100k/1M phần tử. Kết quả (thời gian
+tốt nhất mỗi phần tử) được so với baseline đã lưu; case chậm hơn quá ngưỡng bị đánh dấu và
+lệnh trả mã lỗi 1 để dùng làm cổng chặn hồi quy hiệu năng.
+
+Chạy:
+    python -m benchmarks.micro --scales 1k 100k                # so với baseline
+    python -m benchmarks.micro --scales 1k 100k 1m --save-baseline
+    python -m benchmarks.micro --filter truyenqq --threshold 0.3
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import importlib
+from datetime import datetime
+from itertools import cycle, islice
+
+logger = logging.getLogger(__name__)
+
+SCALES = {"1k": 1000, "100k": 100000, "1m": 1000000}
+DEFAULT_SCALES = ["1k", "100k"]
+DEFAULT_BASELINE = os.path.join("benchmarks", "baselines", "micro.json")
+DEFAULT_OUTPUT = os.path.join("benchmarks", "results", "micro_latest.json")
+# Chậm hơn baseline quá 20% thì bị coi là hồi quy
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_REPEAT = 3
+# Số mẫu khác nhau của dữ liệu tổng hợp (dữ liệu lớn hơn được lặp vòng để tiết kiệm RAM)
+FIXTURE_POOL_SIZE = 10000
+# Kích thước mỗi lần ghi database (giống batch của crawler)
+DB_BATCH_SIZE = 1000
+COMMENTS_PER_COMIC = 100
+
+CRAWLER_MODULES = {
+    "truyenqq": "crawlers.truyenqq_crawler",
+    "truyentranh3q": "crawlers.truyentranh3q_crawler",
+    "manhuavn": "crawlers.manhuavn_crawler",
+    "nettruyen": "crawlers.nettruyen_crawler"
+}
+PARSE_HELPERS = ["extract_number", "parse_relative_time", "extract_chapter_number"]
+RATING_SOURCES = ["TruyenQQ", "NetTruyen", "Manhuavn", "Truyentranh3q"]
+
+STATUS_OK = "OK"
+STATUS_SLOWER = "CHẬM HƠN"
+STATUS_FASTER = "NHANH HƠN"
+STATUS_NEW = "MỚI"
+
+
+# ---------------------------------------------------------------------------
+# Dữ liệu tổng hợp
+# ---------------------------------------------------------------------------
+
+def generate_numbers(count, seed=1):
+    """Chuỗi số theo các định dạng gặp trên trang: '1,234', '5K', '3.2M', '1.234.567'"""
+    rng = random.Random(seed)
+    formats = [
+        lambda: f"{rng.randint(0, 999999):,}",
+        lambda: f"{rng.randint(1, 999)}K",
+        lambda: f"{rng.uniform(1, 99):.1f}M",
+        lambda: f"{rng.randint(1, 9)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}",
+        lambda: str(rng.randint(0, 5000)),
+        lambda: "N/A"
+    ]
+    return [rng.choice(formats)() for _ in range(count)]
+
+
+def generate_times(count, seed=2):
+    """Chuỗi thời gian tương đối: '5 phút trước', '2 ngày trước', 'vừa xong'..."""
+    rng = random.Random(seed)
+    units = ["giây", "phút", "giờ", "ngày", "tuần", "tháng", "năm"]
+    values = []
+    for _ in range(count):
+        if rng.random() < 0.05:
+            values.append("Vừa xong")
+        else:
+            values.append(f"{rng.randint(1, 59)} {rng.choice(units)} trước")
+    return values
+
+
+def generate_chapters(count, seed=3):
+    """Tên chương: 'Chapter 124', 'Chương 12', 'Chap 5.5', 'Ch. 99 - End'"""
+    rng = random.Random(seed)
+    formats = [
+        lambda: f"Chapter {rng.randint(1, 1500)}",
+        lambda: f"Chương {rng.randint(1, 1500)}",
+        lambda: f"Chap {rng.randint(1, 300)}.{rng.randint(1, 9)}",
+        lambda: f"Ch. {rng.randint(1, 300)} - End"
+    ]
+    return [rng.choice(formats)() for _ in range(count)]
+
+
+def generate_comics(count, source, start=0, seed=4):
+    """
+    Truyện tổng hợp có đủ các cột của nguồn
+
+    Args:
+        count: Số truyện
+        source: Tên nguồn
+        start: ID bắt đầu (link_truyen phải khác nhau khi ghi database)
+        seed: Seed của bộ sinh ngẫu nhiên
+
+    Returns:
+        list: Danh sách dict truyện
+    """
+    rng = random.Random(seed + start)
+    comics = []
+    for comic_id in range(start, start + count):
+        comics.append({
+            "ten_truyen": f"Truyện tổng hợp {comic_id}",
+            "tac_gia": f"Tác giả {comic_id % 97}",
+            "the_loai": "Action, Fantasy",
+            "mo_ta": "Mô tả ngắn của truyện tổng hợp dùng cho benchmark.",
+            "link_truyen": f"https://example.com/truyen-tranh/comic-{comic_id}",
+            "so_chuong": rng.randint(1, 1500),
+            "luot_xem": rng.randint(0, 50000000),
+            "luot_thich": rng.randint(0, 500000),
+            "luot_theo_doi": rng.randint(0, 2000000),
+            "so_binh_luan": rng.randint(0, 20000),
+            "rating": f"{rng.uniform(0, 10):.1f}",
+            "danh_gia": f"{rng.uniform(0, 5):.1f}",
+            "luot_danh_gia": rng.randint(0, 20000),
+            "trang_thai": rng.choice(["Đang tiến hành", "Hoàn thành"]),
+            "nguon": source
+        })
+    return comics
+
+
+def generate_comments(count, start=0, seed=5):
+    """Bình luận tổng hợp (nội dung khác nhau để không bị khử trùng theo hash)"""
+    rng = random.Random(seed + start)
+    names = ["Minh Anh", "Hoàng Long", "Thu Trang", "Quốc Bảo", "Ngọc Hân", "Đức Huy"]
+    return [
+        {
+            "ten_nguoi_binh_luan": rng.choice(names),
+            "noi_dung": f"Bình luận tổng hợp số {index}, truyện hay mong ra chương mới",
+            "thoi_gian_binh_luan": "2024-01-01 00:00:00",
+            "sentiment": "",
+            "sentiment_score": 0
+        }
+        for index in range(start, start + count)
+    ]
+
+
+def _cycled(values, count):
+    return list(islice(cycle(values), count))
+
+
+# ---------------------------------------------------------------------------
+# Các case
+# ---------------------------------------------------------------------------
+
+def _loop_case(func, fixture):
+    """Case gọi func cho từng phần tử của fixture"""
+    def prepare(count):
+        data = _cycled(fixture(min(count, FIXTURE_POOL_SIZE)), count)
+
+        def run():
+            for value in data:
+                func(value)
+            return 0.0
+        return run, None
+    return prepare
+
+
+def _save_comics_case(source):
+    """Case ghi count truyện vào database mới theo batch DB_BATCH_SIZE"""
+    def prepare(count):
+        from utils.sqlite_helper import SQLiteHelper
+        folder = tempfile.mkdtemp(prefix="bench_micro_")
+
+        def run():
+            # Mỗi lần chạy dùng database riêng để đo đúng chi phí INSERT
+            db_folder = tempfile.mkdtemp(dir=folder)
+            helper = SQLiteHelper(db_folder)
+            elapsed = 0.0
+            try:
+                for start in range(0, count, DB_BATCH_SIZE):
+                    batch = generate_comics(min(DB_BATCH_SIZE, count - start), source, start)
+                    started = time.perf_counter()
+                    helper.save_comics_batch(batch, source, timeout=float("inf"))
+                    elapsed += time.perf_counter() - started
+            finally:
+                helper.close_all_connections()
+            return elapsed
+        return run, lambda: shutil.rmtree(folder, ignore_errors=True)
+    return prepare
+
+
+def _save_comments_case(source):
+    """Case ghi count bình luận (COMMENTS_PER_COMIC mỗi truyện) theo batch DB_BATCH_SIZE"""
+    def prepare(count):
+        from utils.sqlite_helper import SQLiteHelper
+        folder = tempfile.mkdtemp(prefix="bench_micro_")
+        comics_per_batch = max(1, DB_BATCH_SIZE // COMMENTS_PER_COMIC)
+
+        def run():
+            db_folder = tempfile.mkdtemp(dir=folder)
+            helper = SQLiteHelper(db_folder)
+            elapsed = 0.0
+            try:
+                comic_count = max(1, count // COMMENTS_PER_COMIC)
+                comic_ids = helper.save_comics_batch(generate_comics(comic_count, source), source, timeout=float("inf"))
+                for first in range(0, len(comic_ids), comics_per_batch):
+                    batch = {
+                        comic_id: generate_comments(COMMENTS_PER_COMIC, start=comic_id * COMMENTS_PER_COMIC)
+                        for comic_id in comic_ids[first:first + comics_per_batch]
+                    }
+                    started = time.perf_counter()
+                    helper.save_comments_batch(batch, source)
+                    elapsed += time.perf_counter() - started
+            finally:
+                helper.close_all_connections()
+            return elapsed
+        return run, lambda: shutil.rmtree(folder, ignore_errors=True)
+    return prepare
+
+
+def build_cases():
+    """
+    Danh sách case có thể chạy trong môi trường hiện tại
+
+    Returns:
+        tuple: (dict tên case -> hàm prepare(count), dict tên case bị bỏ qua -> lý do)
+    """
+    cases = {}
+    skipped = {}
+    fixtures = {
+        "extract_number": generate_numbers,
+        "parse_relative_time": generate_times,
+        "extract_chapter_number": generate_chapters
+    }
+
+    for short_name, module_name in CRAWLER_MODULES.items():
+        try:
+            module = importlib.import_module(module_name)
+        except Exception as e:
+            for helper in PARSE_HELPERS:
+                skipped[f"{short_name}.{helper}"] = f"không import được {module_name}: {e}"
+            continue
+        for helper in PARSE_HELPERS:
+            func = getattr(module, helper, None)
+            if func is not None:
+                cases[f"{short_name}.{helper}"] = _loop_case(func, fixtures[helper])
+
+    try:
+        from analysis.rating_factory import RatingFactory
+        for source in RATING_SOURCES:
+            calculator = RatingFactory.get_calculator(source)
+            cases[f"rating.{source}"] = _loop_case(
+                calculator.calculate, lambda count, source=source: generate_comics(count, source)
+            )
+    except Exception as e:
+        for source in RATING_SOURCES:
+            skipped[f"rating.{source}"] = f"không import được calculator: {e}"
+
+    cases["sqlite.save_comics_batch"] = _save_comics_case("TruyenQQ")
+    cases["sqlite.save_comments_batch"] = _save_comments_case("TruyenQQ")
+    return cases, skipped
+
+
+def run_case(prepare, count, repeat):
+    """
+    Chạy một case ở một quy mô
+
+    Args:
+        prepare: Hàm tạo (run, cleanup) cho quy mô count
+        count: Số phần tử
+        repeat: Số lần lặp, lấy lần nhanh nhất
+
+    Returns:
+        dict: seconds (tốt nhất), per_op_us, repeat
+    """
+    run, cleanup = prepare(count)
+    timings = []
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            measured = run()
+            # run() trả thời gian tự đo (bỏ phần sinh dữ liệu) hoặc 0 để dùng tổng thời gian
+            timings.append(measured or time.perf_counter() - started)
+    finally:
+        if cleanup:
+            cleanup()
+    best = min(timings)
+    return {"seconds": round(best, 6), "per_op_us": round(best * 1e6 / count, 4), "repeat": repeat}
+
+
+# ---------------------------------------------------------------------------
+# Baseline và báo cáo
+# ---------------------------------------------------------------------------
+
+def load_baseline(path):
+    """Đọc baseline, trả dict rỗng nếu chưa có"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Không đọc được baseline {path}: {e}")
+        return {}
+
+
+def save_baseline(path, report, baseline):
+    """Gộp kết quả mới vào baseline (giữ các case/quy mô không chạy lần này)"""
+    cases = baseline.get("cases", {})
+    for name, scales in report["cases"].items():
+        cases.setdefault(name, {}).update(scales)
+    data = {key: report[key] for key in ("timestamp", "python", "platform")}
+    data["cases"] = cases
+    _write_json(path, data)
+
+
+def compare(report, baseline, threshold):
+    """
+    So sánh kết quả với baseline
+
+    Args:
+        report: Kết quả lần chạy
+        baseline: Baseline đã lưu
+        threshold: Tỉ lệ chậm hơn cho phép (0.2 = 20%)
+
+    Returns:
+        list: Các dòng (case, scale, per_op_us, baseline_us, ratio, status)
+    """
+    rows = []
+    base_cases = baseline.get("cases", {})
+    for name, scales in sorted(report["cases"].items()):
+        for scale, result in scales.items():
+            base = base_cases.get(name, {}).get(scale)
+            if not base or not base.get("per_op_us"):
+                rows.append((name, scale, result["per_op_us"], None, None, STATUS_NEW))
+                continue
+            ratio = result["per_op_us"] / base["per_op_us"]
+            if ratio > 1 + threshold:
+                status = STATUS_SLOWER
+            elif ratio < 1 / (1 + threshold):
+                status = STATUS_FASTER
+            else:
+                status = STATUS_OK
+            rows.append((name, scale, result["per_op_us"], base["per_op_us"], ratio, status))
+    return rows
+
+
+def format_report(rows, skipped, threshold):
+    """Bảng so sánh dạng text"""
+    lines = [f"{'Case':<42} {'Quy mô':>6} {'µs/phần tử':>12} {'Baseline':>12} {'Tỉ lệ':>7}  Trạng thái"]
+    for name, scale, per_op, base, ratio, status in rows:
+        base_text = f"{base:.3f}" if base is not None else "-"
+        ratio_text = f"{ratio:.2f}x" if ratio is not None else "-"
+        lines.append(f"{name:<42} {scale:>6} {per_op:>12.3f} {base_text:>12} {ratio_text:>7}  {status}")
+    for name, reason in sorted(skipped.items()):
+        lines.append(f"{name:<42} bỏ qua: {reason}")
+    regressions = sum(1 for row in rows if row[5] == STATUS_SLOWER)
+    lines.append(f"{regressions} case chậm hơn baseline quá {threshold:.0%}")
+    return "\n".join(lines)
+
+
+def _write_json(path, data):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmark các đường nóng và so sánh với baseline")
+    parser.add_argument("--scales", nargs="+", default=DEFAULT_SCALES, choices=list(SCALES))
+    parser.add_argument("--filter", default="", help="Chỉ chạy case có tên chứa chuỗi này")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="Số lần lặp mỗi case (quy mô 1m chỉ chạy 1 lần)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Tỉ lệ chậm hơn baseline cho phép (0.2 = 20%%)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="File baseline JSON")
+    parser.add_argument("--save-baseline", action="store_true", help="Ghi kết quả lần này vào baseline")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="File JSON kết quả")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Log của các hàm được đo không được làm sai kết quả
+    logging.basicConfig(level=logging.CRITICAL)
+
+    cases, skipped = build_cases()
+    cases = {name: prepare for name, prepare in cases.items() if args.filter in name}
+    skipped = {name: reason for name, reason in skipped.items() if args.filter in name}
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cases": {}
+    }
+    for name, prepare in cases.items():
+        for scale in args.scales:
+            count = SCALES[scale]
+            repeat = 1 if count >= SCALES["1m"] else max(1, args.repeat)
+            try:
+                result = run_case(prepare, count, repeat)
+            except Exception as e:
+                skipped[f"{name}@{scale}"] = f"lỗi: {e}"
+                continue
+            report["cases"].setdefault(name, {})[scale] = result
+            print(f"{name} @ {scale}: {result['per_op_us']:.3f} µs/phần tử", file=sys.stderr)
+
+    baseline = load_baseline(args.baseline)
+    rows = compare(report, baseline, args.threshold)
+    report["comparison"] = [
+        {"case": name, "scale": scale, "per_op_us": per_op, "baseline_us": base, "ratio": ratio, "status": status}
+        for name, scale, per_op, base, ratio, status in rows
+    ]
+    report["skipped"] = skipped
+    _write_json(args.output, report)
+    print(format_report(rows, skipped, args.threshold))
+
+    if args.save_baseline:
+        save_baseline(args.baseline, report, baseline)
+        print(f"Đã cập nhật baseline {args.baseline}")
+        return 0
+    return 1 if any(row[5] == STATUS_SLOWER for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
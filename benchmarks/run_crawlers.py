@@ -0,0 +1,219 @@
+"""
+Benchmark crawler trên trang mẫu cục bộ (không cần Internet)
+
+Với mỗi nguồn: dựng FixtureServer, chạy crawl_basic_data rồi crawl comment cho toàn bộ
+truyện vừa lưu, đồng thời lấy mẫu RSS và số process Chrome của cả cây process. Kết quả
+(comics/phút, comments/phút, RSS đỉnh, số Chrome đỉnh...) được ghi ra JSON để so sánh giữa
+các lần build.
+
+Chạy:
+    python -m benchmarks.run_crawlers --sites TruyenQQ NetTruyen --pages 2 --latency 0.05 0.2 \
+        --error-rate 0.02 --output benchmarks/results/latest.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import psutil
+
+from benchmarks.fixture_server import FixtureServer, FixtureSite, SITE_FIXTURES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTPUT = os.path.join("benchmarks", "results", "latest.json")
+SAMPLE_INTERVAL = 0.5
+
+
+class ResourceSampler:
+    """
+    Lấy mẫu RSS tổng và số process Chrome của process hiện tại cùng mọi process con
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak_rss_mb = 0.0
+        self.peak_chrome = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        """Lấy một mẫu và cập nhật giá trị đỉnh"""
+        root = psutil.Process()
+        rss = 0
+        chrome = 0
+        for process in [root] + root.children(recursive=True):
+            try:
+                rss += process.memory_info().rss
+                if "chrome" in process.name().lower():
+                    chrome += 1
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        self.peak_rss_mb = max(self.peak_rss_mb, rss / (1024 * 1024))
+        self.peak_chrome = max(self.peak_chrome, chrome)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+        return False
+
+
+def _per_minute(count, seconds):
+    return round(count * 60 / seconds, 2) if seconds > 0 else 0.0
+
+
+def _crawl_all_comments(crawler, comics):
+    """Crawl comment cho danh sách truyện giống process_source_parallel của tab phân tích"""
+    concurrency = crawler.get_comment_concurrency()
+    total = 0
+
+    def crawl_one(comic):
+        with concurrency.slot():
+            return len(crawler.crawl_comments(comic) or [])
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency.max_limit, len(comics)))) as executor:
+        futures = [executor.submit(crawl_one, comic) for comic in comics]
+        for future in as_completed(futures):
+            try:
+                total += future.result()
+            except Exception as e:
+                logger.error(f"Lỗi khi crawl comment trong benchmark: {e}")
+    return total
+
+
+def run_site(site_name, args):
+    """
+    Benchmark một nguồn
+
+    Args:
+        site_name: Tên nguồn
+        args: Tham số dòng lệnh
+
+    Returns:
+        dict: Kết quả đo
+    """
+    from utils.config_manager import ConfigManager
+    from utils.multi_db_manager import MultipleDBManager
+    from crawlers.crawler_factory import CrawlerFactory
+
+    work_dir = tempfile.mkdtemp(prefix=f"bench_{site_name.lower()}_")
+    site = FixtureSite(site_name, pages=args.pages, comics_per_page=args.comics_per_page,
+                       comments_per_page=args.comments_per_page, comment_pages=args.comment_pages)
+    result = {"site": site_name, "expected_comics": site.total_comics, "expected_comments": site.total_comments}
+
+    try:
+        with FixtureServer(site, latency=tuple(args.latency), error_rate=args.error_rate) as server:
+            config_manager = ConfigManager(os.path.join(work_dir, "config", "config.json"))
+            config_manager.config.update({
+                "worker_count": args.workers,
+                "max_worker_count": args.workers,
+                "tabs_per_browser": args.tabs,
+                "request_interval": 0,
+                "database_folder": os.path.join(work_dir, "database")
+            })
+            db_manager = MultipleDBManager(db_folder=os.path.join(work_dir, "database"))
+            db_manager.set_source(site_name)
+            crawler = CrawlerFactory.create_crawler(
+                site_name, db_manager, config_manager,
+                base_url=server.base_url, start_page=1, end_page=args.pages, worker_count=args.workers
+            )
+
+            with ResourceSampler() as sampler:
+                started = time.monotonic()
+                crawl_result = crawler.crawl_basic_data()
+                basic_seconds = time.monotonic() - started
+
+                comics = db_manager.get_all_comics(site_name)
+                started = time.monotonic()
+                comments = _crawl_all_comments(crawler, comics) if not args.skip_comments else 0
+                comment_seconds = time.monotonic() - started
+
+            result.update({
+                "comics": crawl_result.get("count", 0),
+                "comics_in_db": len(comics),
+                "basic_seconds": round(basic_seconds, 2),
+                "comics_per_min": _per_minute(crawl_result.get("count", 0), basic_seconds),
+                "comments": comments,
+                "comment_seconds": round(comment_seconds, 2),
+                "comments_per_min": _per_minute(comments, comment_seconds),
+                "peak_rss_mb": round(sampler.peak_rss_mb, 1),
+                "peak_chrome_processes": sampler.peak_chrome,
+                "requests": server.requests,
+                "injected_errors": server.errors
+            })
+    except Exception as e:
+        logger.error(f"Benchmark {site_name} lỗi: {e}")
+        result["error"] = str(e)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    logger.info(f"Kết quả {site_name}: {result}")
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark crawler trên trang mẫu cục bộ")
+    parser.add_argument("--sites", nargs="+", default=list(SITE_FIXTURES), choices=list(SITE_FIXTURES))
+    parser.add_argument("--pages", type=int, default=2, help="Số trang danh sách")
+    parser.add_argument("--comics-per-page", type=int, default=10)
+    parser.add_argument("--comments-per-page", type=int, default=10)
+    parser.add_argument("--comment-pages", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=3, help="worker_count của crawler")
+    parser.add_argument("--tabs", type=int, default=1, help="tabs_per_browser của crawler")
+    parser.add_argument("--latency", type=float, nargs=2, default=[0.0, 0.0], metavar=("MIN", "MAX"),
+                        help="Độ trễ ngẫu nhiên mỗi request (giây)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Tỉ lệ request trả về 503 (0-1)")
+    parser.add_argument("--skip-comments", action="store_true", help="Chỉ đo crawl_basic_data")
+    parser.add_argument("--keep", action="store_true", help="Giữ lại database tạm để kiểm tra")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="File JSON kết quả")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    for name in ("selenium", "urllib3", "seleniumbase"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": multiprocessing.cpu_count(),
+        "params": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": [run_site(site_name, args) for site_name in args.sites]
+    }
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Đã ghi kết quả benchmark vào {args.output}")
+    return 0 if not any("error" in result for result in report["results"]) else 1
+
+
+if __name__ == "__main__":
+    multiprocessing.set_start_method("spawn", force=True)
+    sys.exit(main())
@@ -1,11 +1,11 @@
 # cleanup_processes.py
 import os
-import psutil
 import sys
-import time
 import logging
 from pathlib import Path
 
+from utils import process_registry
+
 # Thiết lập logging
 log_dir = Path(__file__).parent / "logs"
 log_dir.mkdir(exist_ok=True)
@@ -16,67 +16,15 @@ logging.basicConfig(
 )
 
 def find_and_terminate_processes():
-    """Tìm và kết thúc các tiến trình liên quan đến ứng dụng"""
-    terminated = 0
+    """
+    Kết thúc các tiến trình còn sót của ứng dụng
+
+    Chỉ dừng các process đã được ghi trong sổ đăng ký (utils.process_registry) của những
+    phiên mà ứng dụng chính không còn chạy, không quét toàn bộ process của hệ thống.
+    """
     try:
-        # Tìm tất cả các tiến trình của Chrome và chromedriver
-        chrome_procs = []
-        python_procs = []
-        
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-            try:
-                proc_name = proc.info['name'].lower() if proc.info['name'] else ''
-                cmdline = proc.info['cmdline'] if proc.info['cmdline'] else []
-                cmdline_str = ' '.join(cmdline).lower()
-                
-                # Tìm chrome và chromedriver
-                if 'chrome' in proc_name or 'chromedriver' in proc_name:
-                    # Kiểm tra xem có liên quan đến tự động hóa không
-                    if any(term in cmdline_str for term in ['--headless', 'webdriver', 'automation']):
-                        chrome_procs.append(proc)
-                
-                # Tìm các process Python có thể liên quan đến crawler
-                if 'python' in proc_name:
-                    if any(term in cmdline_str for term in ['crawler', 'selenium', 'ratingcomic', 'webdriver']):
-                        python_procs.append(proc)
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
-        
-        # Kết thúc các tiến trình Chrome trước
-        for proc in chrome_procs:
-            try:
-                proc.terminate()
-                logging.info(f"Đã kết thúc tiến trình Chrome: {proc.pid}")
-                terminated += 1
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                try:
-                    proc.kill()
-                    logging.info(f"Đã buộc kết thúc tiến trình Chrome: {proc.pid}")
-                    terminated += 1
-                except:
-                    pass
-        
-        # Đợi một chút để Chrome đóng
-        time.sleep(1)
-        
-        # Kết thúc các tiến trình Python
-        for proc in python_procs:
-            # Bỏ qua tiến trình hiện tại
-            if proc.pid == os.getpid():
-                continue
-                
-            try:
-                proc.terminate()
-                logging.info(f"Đã kết thúc tiến trình Python: {proc.pid}")
-                terminated += 1
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                try:
-                    proc.kill()
-                    logging.info(f"Đã buộc kết thúc tiến trình Python: {proc.pid}")
-                    terminated += 1
-                except:
-                    pass
-        
+        terminated = process_registry.recover_stale_sessions()
+        logging.info(f"Đã kết thúc {terminated} tiến trình còn sót theo sổ đăng ký")
         return terminated
     except Exception as e:
         logging.error(f"Lỗi khi dọn dẹp tiến trình: {e}")
@@ -126,6 +74,8 @@ def cleanup_temp_files():
         return 0
 
 if __name__ == "__main__":
+    # Sổ đăng ký process dùng đường dẫn tương đối theo thư mục dự án
+    os.chdir(Path(__file__).parent)
     logging.info("Bắt đầu quá trình dọn dẹp")
     terminated = find_and_terminate_processes()
     cleaned = cleanup_temp_files()
@@ -0,0 +1,377 @@
+"""
+Chạy Rating Comic không cần giao diện (server, cron, container)
+
+Không import PyQt6; các module nặng (Selenium, transformers...) chỉ được import khi lệnh
+cần tới.
+
+Ví dụ:
+    python cli.py crawl --site TruyenQQ --start-page 1 --end-page 5
+    python cli.py rate --source TruyenQQ NetTruyen
+    python cli.py analyze --source TruyenQQ --limit 20 --days 30
+    python cli.py crawl --site NetTruyen --end-page 3 --submit    # thêm vào hàng đợi
+    python cli.py daemon --poll 10                                 # xử lý hàng đợi
+    python cli.py export --source TruyenQQ --what comments --output output/truyenqq.parquet
+    python cli.py top --by luot_xem --limit 20                     # xếp hạng trên mọi nguồn
+    python cli.py search "one piece"
+    python cli.py status
+"""
+import os
+import sys
+import json
+import atexit
+import signal
+import logging
+import argparse
+import threading
+import multiprocessing
+from datetime import datetime, timedelta
+
+from utils import process_registry, logging_config
+from utils.job_queue import JobQueue, DEFAULT_JOBS_DIR
+from utils.cross_source import CrossSourceQuery, RANKING_COLUMNS
+
+logger = logging.getLogger("cli")
+
+DEFAULT_CONFIG = os.path.join("config", "config.json")
+DEFAULT_POLL_INTERVAL = 5.0
+OUTPUT_DIR = "output"
+
+
+class AppContext:
+    """
+    Các thành phần dùng chung giữa các lệnh (tạo khi cần, giữ lại giữa các job của daemon)
+    """
+
+    def __init__(self, config_file=DEFAULT_CONFIG):
+        self.config_file = config_file
+        self._config_manager = None
+        self._db_manager = None
+        self._sentiment_analyzer = None
+
+    @property
+    def config_manager(self):
+        if self._config_manager is None:
+            from utils.config_manager import ConfigManager
+            self._config_manager = ConfigManager(self.config_file)
+        return self._config_manager
+
+    @property
+    def db_manager(self):
+        if self._db_manager is None:
+            from utils.multi_db_manager import MultipleDBManager
+            self._db_manager = MultipleDBManager(self.config_manager.get_database_folder())
+        return self._db_manager
+
+    @property
+    def sentiment_analyzer(self):
+        # Mô hình chỉ được tải một lần cho cả phiên daemon
+        if self._sentiment_analyzer is None:
+            from analysis.sentiment_analyzer import SentimentAnalyzer
+            settings = self.config_manager.get("sentiment_analysis", {}) or {}
+            self._sentiment_analyzer = SentimentAnalyzer(
+                settings.get("model_name", "cardiffnlp/twitter-xlm-roberta-base-sentiment"),
+                settings.get("cache_dir", "models")
+            )
+        return self._sentiment_analyzer
+
+    def create_crawler(self, site, **kwargs):
+        from crawlers.crawler_factory import CrawlerFactory
+        if CrawlerFactory.config_manager is None:
+            CrawlerFactory.initialize(self.config_manager)
+        self.db_manager.set_source(site)
+        return CrawlerFactory.create_crawler(site, self.db_manager, self.config_manager, **kwargs)
+
+    def sources(self, sources=None):
+        return list(sources or self.config_manager.get_supported_websites().keys())
+
+
+def run_crawl(context, site, start_page=1, end_page=None, workers=None):
+    """
+    Crawl dữ liệu cơ bản của một nguồn
+
+    Returns:
+        dict: Kết quả của crawl_basic_data
+    """
+    kwargs = {"start_page": start_page}
+    if end_page is not None:
+        kwargs["end_page"] = end_page
+    if workers:
+        kwargs["worker_count"] = workers
+    crawler = context.create_crawler(site, **kwargs)
+    result = crawler.crawl_basic_data()
+    logger.info(f"Crawl {site} xong: {result.get('count', 0)} truyện trong {result.get('time_taken', 0):.1f}s")
+    return result
+
+
+def run_rate(context, sources=None):
+    """
+    Tính lại điểm cơ bản cho mọi truyện của các nguồn
+
+    Returns:
+        dict: Nguồn -> số truyện đã cập nhật
+    """
+    from analysis.rating_factory import RatingFactory
+
+    updated = {}
+    for source in context.sources(sources):
+        comics = context.db_manager.get_all_comics(source)
+        calculator = RatingFactory.get_calculator(source)
+        ratings = {comic["id"]: calculator.calculate(comic) for comic in comics}
+        context.db_manager.set_source(source)
+        if ratings and context.db_manager.save_batch_ratings(ratings):
+            updated[source] = len(ratings)
+        else:
+            updated[source] = 0
+        logger.info(f"Đã tính lại điểm cho {updated[source]} truyện của {source}")
+    return updated
+
+
+def run_analyze(context, source, ids=None, limit=None, days=None, output=None):
+    """
+    Crawl comment, phân tích sentiment và tính điểm tổng hợp cho các truyện của một nguồn
+
+    Args:
+        context: AppContext
+        source: Tên nguồn
+        ids: Chỉ phân tích các truyện có ID này
+        limit: Số truyện tối đa
+        days: Chỉ lấy comment trong số ngày gần đây
+        output: File JSON kết quả (mặc định output/analysis_<nguồn>_<thời điểm>.json)
+
+    Returns:
+        dict: Số truyện đã phân tích, số lỗi và đường dẫn file kết quả
+    """
+    from analysis.pipeline import analyze_comic
+
+    comics = context.db_manager.get_all_comics(source)
+    if ids:
+        wanted = {int(comic_id) for comic_id in ids}
+        comics = [comic for comic in comics if comic.get("id") in wanted]
+    if limit:
+        comics = comics[:limit]
+
+    time_limit = datetime.now() - timedelta(days=days) if days else None
+    crawler = context.create_crawler(source)
+    analyzer = context.sentiment_analyzer
+
+    results = []
+    for index, comic in enumerate(comics, 1):
+        logger.info(f"[{index}/{len(comics)}] Đang phân tích: {comic.get('ten_truyen')}")
+        context.db_manager.set_source(source)
+        result = analyze_comic(comic, crawler, analyzer, context.db_manager, time_limit, days)
+        # Comment đã được lưu vào database, file kết quả chỉ giữ số liệu
+        result.pop("comments", None)
+        results.append(result)
+
+    output = output or os.path.join(OUTPUT_DIR, f"analysis_{source}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+
+    errors = sum(1 for result in results if "error" in result)
+    logger.info(f"Đã phân tích {len(results)} truyện ({errors} lỗi), kết quả: {output}")
+    return {"count": len(results), "errors": errors, "output": output}
+
+
+def run_export(context, what="comics", sources=None, output=None, fmt=None):
+    """
+    Xuất dữ liệu từ database ra XLSX/CSV/Parquet theo luồng
+
+    Args:
+        context: AppContext
+        what: comics (danh sách truyện), comments (toàn bộ comment) hoặc history (lịch sử phân tích)
+        sources: Các nguồn (mặc định tất cả)
+        output: File đích (mặc định output/<what>_<thời điểm>.<định dạng>)
+        fmt: xlsx, csv hoặc parquet (mặc định theo đuôi file, không có thì xlsx)
+
+    Returns:
+        dict: Số dòng và các file đã tạo
+    """
+    from utils import exporter
+
+    sources = context.sources(sources)
+    if what == "comics":
+        datasets = [exporter.comics_dataset(context.db_manager, source) for source in sources]
+    elif what == "comments":
+        datasets = [exporter.comments_dataset(context.db_manager, sources, name="Comments")]
+    elif what == "history":
+        stats = exporter.SourceStats(sources)
+        datasets = [
+            exporter.history_dataset(context.db_manager, sources, stats),
+            exporter.stats_dataset(stats),
+            exporter.comments_dataset(context.db_manager, sources, analyzed_only=True)
+        ]
+    else:
+        raise ValueError(f"Loại dữ liệu không hỗ trợ: {what}")
+
+    fmt = fmt or (exporter.detect_format(output) if output else "xlsx")
+    output = output or os.path.join(OUTPUT_DIR, f"{what}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}")
+    result = exporter.export_datasets(datasets, output, fmt)
+    return {"rows": result["rows"], "files": result["files"]}
+
+
+def run_top(context, by="base_rating", limit=20, sources=None):
+    """
+    Bảng xếp hạng truyện trên mọi nguồn (một câu truy vấn)
+
+    Returns:
+        list: Truyện theo thứ hạng (nguồn, tên, giá trị xếp hạng)
+    """
+    comics = CrossSourceQuery(context.db_manager).leaderboard(by, limit, sources)
+    return [
+        {"rank": rank, "nguon": comic["nguon"], "id": comic["id"], "ten_truyen": comic["ten_truyen"], by: comic[by]}
+        for rank, comic in enumerate(comics, 1)
+    ]
+
+
+def run_search(context, keyword, limit=20, sources=None):
+    """
+    Tìm truyện theo tên hoặc tác giả trên mọi nguồn
+
+    Returns:
+        list: Truyện tìm được (nguồn, tên, tác giả, lượt xem, điểm cơ bản)
+    """
+    comics = CrossSourceQuery(context.db_manager).search(keyword, sources, limit)
+    keys = ("nguon", "id", "ten_truyen", "tac_gia", "luot_xem", "base_rating")
+    return [{key: comic[key] for key in keys} for comic in comics]
+
+
+JOB_HANDLERS = {
+    "crawl": run_crawl,
+    "rate": run_rate,
+    "analyze": run_analyze,
+    "export": run_export,
+    "top": run_top,
+    "search": run_search
+}
+
+
+def run_daemon(context, jobs_dir=DEFAULT_JOBS_DIR, poll_interval=DEFAULT_POLL_INTERVAL):
+    """
+    Xử lý lần lượt các job trong hàng đợi cho tới khi nhận SIGTERM/SIGINT
+
+    Job đang chạy được làm xong trước khi thoát.
+    """
+    queue = JobQueue(jobs_dir)
+    requeued = queue.requeue_stale()
+    if requeued:
+        logger.info(f"Đưa lại {requeued} job bị bỏ dở vào hàng đợi")
+
+    stop_event = threading.Event()
+
+    def request_stop(signum, frame):
+        logger.info("Nhận tín hiệu dừng, sẽ thoát sau job hiện tại")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    logger.info(f"Daemon bắt đầu, hàng đợi: {jobs_dir} ({queue.status()})")
+    while not stop_event.is_set():
+        job = queue.wait_for_job(poll_interval, stop_event)
+        if job is None:
+            break
+        handler = JOB_HANDLERS.get(job.get("type"))
+        if handler is None:
+            queue.finish(job, error=f"Loại job không hỗ trợ: {job.get('type')}")
+            continue
+        logger.info(f"Bắt đầu job {job['type']} ({job['id']}): {job.get('params')}")
+        try:
+            with queue.keep_alive(job):
+                result = handler(context, **job.get("params", {}))
+            queue.finish(job, result=result)
+        except Exception as e:
+            logger.error(f"Job {job['id']} lỗi: {e}")
+            queue.finish(job, error=str(e))
+    logger.info("Daemon đã dừng")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rating Comic - chế độ dòng lệnh")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="File cấu hình")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    parser.add_argument("--jobs-dir", default=DEFAULT_JOBS_DIR, help="Thư mục hàng đợi job")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    crawl = commands.add_parser("crawl", help="Crawl dữ liệu cơ bản của một nguồn")
+    crawl.add_argument("--site", required=True)
+    crawl.add_argument("--start-page", type=int, default=1)
+    crawl.add_argument("--end-page", type=int)
+    crawl.add_argument("--workers", type=int)
+
+    rate = commands.add_parser("rate", help="Tính lại điểm cơ bản")
+    rate.add_argument("--source", nargs="+", dest="sources", help="Các nguồn (mặc định tất cả)")
+
+    analyze = commands.add_parser("analyze", help="Crawl comment, phân tích sentiment và tính điểm tổng hợp")
+    analyze.add_argument("--source", required=True)
+    analyze.add_argument("--ids", type=int, nargs="+", help="Chỉ phân tích các truyện có ID này")
+    analyze.add_argument("--limit", type=int, help="Số truyện tối đa")
+    analyze.add_argument("--days", type=int, help="Chỉ lấy comment trong số ngày gần đây")
+    analyze.add_argument("--output", help="File JSON kết quả")
+
+    export = commands.add_parser("export", help="Xuất dữ liệu ra XLSX/CSV/Parquet")
+    export.add_argument("--what", default="comics", choices=["comics", "comments", "history"])
+    export.add_argument("--source", nargs="+", dest="sources", help="Các nguồn (mặc định tất cả)")
+    export.add_argument("--output", help="File đích")
+    export.add_argument("--format", dest="fmt", choices=["xlsx", "csv", "parquet"])
+
+    top = commands.add_parser("top", help="Xếp hạng truyện trên mọi nguồn")
+    top.add_argument("--by", default="base_rating", choices=RANKING_COLUMNS)
+    top.add_argument("--limit", type=int, default=20)
+    top.add_argument("--source", nargs="+", dest="sources", help="Các nguồn (mặc định tất cả)")
+
+    search = commands.add_parser("search", help="Tìm truyện theo tên hoặc tác giả trên mọi nguồn")
+    search.add_argument("keyword")
+    search.add_argument("--limit", type=int, default=20)
+    search.add_argument("--source", nargs="+", dest="sources", help="Các nguồn (mặc định tất cả)")
+
+    for command in (crawl, rate, analyze, export):
+        command.add_argument("--submit", action="store_true", help="Thêm vào hàng đợi của daemon thay vì chạy ngay")
+
+    daemon = commands.add_parser("daemon", help="Chạy liên tục, xử lý các job trong hàng đợi")
+    daemon.add_argument("--poll", type=float, default=DEFAULT_POLL_INTERVAL, help="Chu kỳ kiểm tra hàng đợi (giây)")
+
+    commands.add_parser("status", help="Số job theo trạng thái")
+    return parser.parse_args(argv)
+
+
+def _job_params(args):
+    """Tham số của job từ tham số dòng lệnh (bỏ các tham số chung)"""
+    excluded = {"config", "log_level", "jobs_dir", "command", "submit"}
+    return {key: value for key, value in vars(args).items() if key not in excluded and value is not None}
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.command == "status":
+        print(json.dumps(JobQueue(args.jobs_dir).status()))
+        return 0
+    if getattr(args, "submit", False):
+        print(JobQueue(args.jobs_dir).submit(args.command, _job_params(args)))
+        return 0
+
+    logging_config.setup_logging(level=getattr(logging, args.log_level))
+    atexit.register(logging_config.shutdown)
+    process_registry.recover_stale_sessions()
+    process_registry.start_session()
+    atexit.register(process_registry.end_session)
+
+    context = AppContext(args.config)
+    if args.command == "daemon":
+        return run_daemon(context, args.jobs_dir, args.poll)
+
+    try:
+        result = JOB_HANDLERS[args.command](context, **_job_params(args))
+    except Exception as e:
+        logger.error(f"Lệnh {args.command} lỗi: {e}")
+        return 1
+    print(json.dumps(result, ensure_ascii=False, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    # Dùng spawn giống ứng dụng giao diện (worker không kế thừa trạng thái của process chính)
+    multiprocessing.set_start_method("spawn", force=True)
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""
+Tự điều chỉnh mức song song theo từng host (AIMD)
+
+Mỗi host có một giới hạn song song riêng: tăng dần (+1 sau mỗi vòng request thành công)
+khi độ trễ và tỉ lệ lỗi còn ổn, giảm mạnh (nhân hệ số) khi gặp lỗi, timeout, challenge
+Cloudflare hoặc độ trễ tăng vọt so với mức nền. Nhờ đó tốc độ crawl tự khớp với sức chịu
+của từng trang thay vì phải chỉnh worker_count/batch_size bằng tay.
+"""
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Kết quả của một request/tác vụ
+OUTCOME_OK = "ok"
+OUTCOME_ERROR = "error"
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_CHALLENGE = "challenge"
+
+# Giảm giới hạn còn một nửa khi lỗi/timeout
+DECREASE_FACTOR = 0.5
+# Giảm nhẹ hơn khi chỉ có độ trễ tăng
+LATENCY_DECREASE_FACTOR = 0.8
+# Độ trễ trung bình vượt mức nền bao nhiêu lần thì coi là quá tải
+LATENCY_TOLERANCE = 2.0
+# Trọng số của mẫu mới trong độ trễ trung bình trượt
+LATENCY_ALPHA = 0.2
+# Mức nền tăng chậm theo độ trễ thực tế (tránh kẹt ở một mẫu nhanh bất thường)
+BASELINE_DRIFT = 0.01
+# Khoảng cách tối thiểu giữa hai lần giảm (giây), để các request đang chạy theo giới hạn cũ
+# không làm giảm nhiều lần liên tiếp
+MIN_DECREASE_INTERVAL = 2.0
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+class AdaptiveConcurrency:
+    """
+    Giới hạn song song AIMD cho một host, an toàn giữa các thread
+    """
+
+    def __init__(self, name, initial=2, min_limit=1, max_limit=8):
+        """
+        Khởi tạo AdaptiveConcurrency
+
+        Args:
+            name: Tên dùng trong log (thường là host)
+            initial: Giới hạn ban đầu
+            min_limit: Giới hạn nhỏ nhất
+            max_limit: Giới hạn lớn nhất
+        """
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self._limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._latency = None
+        self._baseline = None
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self):
+        """Giới hạn song song hiện tại (số nguyên)"""
+        return int(self._limit)
+
+    def acquire(self, timeout=None):
+        """
+        Chờ tới khi số tác vụ đang chạy nhỏ hơn giới hạn hiện tại
+
+        Args:
+            timeout: Thời gian chờ tối đa (giây), None là chờ tới khi có chỗ
+
+        Returns:
+            bool: True nếu đã giữ được chỗ, False nếu hết thời gian chờ
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            self._in_flight += 1
+            return True
+
+    def release(self):
+        """Kết thúc một tác vụ"""
+        with self._condition:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self):
+        """
+        Context manager giữ một chỗ trong giới hạn song song
+
+        Yields:
+            float: Thời điểm bắt đầu (time.monotonic), dùng để tính độ trễ khi record()
+        """
+        self.acquire()
+        try:
+            yield time.monotonic()
+        finally:
+            self.release()
+
+    def record(self, latency, outcome=OUTCOME_OK):
+        """
+        Ghi nhận kết quả của một tác vụ và điều chỉnh giới hạn
+
+        Args:
+            latency: Thời gian thực hiện (giây)
+            outcome: OUTCOME_OK / OUTCOME_ERROR / OUTCOME_TIMEOUT / OUTCOME_CHALLENGE
+        """
+        with self._condition:
+            old_limit = int(self._limit)
+            now = time.monotonic()
+            can_decrease = now - self._last_decrease >= max(MIN_DECREASE_INTERVAL, self._latency or 0)
+
+            if outcome == OUTCOME_CHALLENGE:
+                # Bị challenge: về mức thấp nhất ngay
+                self._limit = float(self.min_limit)
+                self._last_decrease = now
+            elif outcome != OUTCOME_OK:
+                if can_decrease:
+                    self._limit = max(self.min_limit, self._limit * DECREASE_FACTOR)
+                    self._last_decrease = now
+            else:
+                self._update_latency(latency)
+                if self._latency > self._baseline * LATENCY_TOLERANCE:
+                    if can_decrease:
+                        self._limit = max(self.min_limit, self._limit * LATENCY_DECREASE_FACTOR)
+                        self._last_decrease = now
+                else:
+                    # Tăng khoảng 1 sau mỗi vòng "limit" tác vụ thành công
+                    self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+
+            new_limit = int(self._limit)
+            if new_limit != old_limit:
+                logger.info(f"Concurrency {self.name}: {old_limit} -> {new_limit} ({outcome}, "
+                            f"độ trễ {self._latency or 0:.2f}s / nền {self._baseline or 0:.2f}s)")
+            if new_limit > old_limit:
+                self._condition.notify_all()
+
+    def _update_latency(self, latency):
+        """Cập nhật độ trễ trung bình trượt và mức nền"""
+        if self._latency is None:
+            self._latency = latency
+            self._baseline = latency
+            return
+        self._latency = (1 - LATENCY_ALPHA) * self._latency + LATENCY_ALPHA * latency
+        if latency < self._baseline:
+            self._baseline = latency
+        else:
+            self._baseline += (latency - self._baseline) * BASELINE_DRIFT
+        self._baseline = max(self._baseline, 1e-3)
+
+
+def get_concurrency_controller(host, scope="http", initial=2, min_limit=1, max_limit=8):
+    """
+    Lấy bộ điều chỉnh song song của host (tạo mới nếu chưa có)
+
+    Args:
+        host: Tên host
+        scope: Loại tác vụ ("http" cho request, "workers" cho process crawl)
+        initial: Giới hạn ban đầu, chỉ dùng khi tạo mới
+        min_limit: Giới hạn nhỏ nhất, chỉ dùng khi tạo mới
+        max_limit: Giới hạn lớn nhất, chỉ dùng khi tạo mới
+
+    Returns:
+        AdaptiveConcurrency: Bộ điều chỉnh dùng chung trong tiến trình
+    """
+    key = (scope, host)
+    with _controllers_lock:
+        controller = _controllers.get(key)
+        if controller is None:
+            controller = AdaptiveConcurrency(f"{host} ({scope})", initial, min_limit, max_limit)
+            _controllers[key] = controller
+        return controller
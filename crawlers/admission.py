@@ -0,0 +1,257 @@
+"""
+Kiểm soát số Chrome chạy đồng thời trên toàn bộ các process
+
+Semaphore tạo lúc import module không dùng chung được khi multiprocessing dùng "spawn"
+(mỗi process con import lại module và có semaphore riêng). AdmissionController được tạo
+một lần ở process chính và truyền cho các process con qua initializer của Pool, nên giới
+hạn có hiệu lực cho cả crawler lẫn comment crawler chạy cùng lúc.
+
+Ngoài số slot tối đa, một driver chỉ được cấp khi RAM còn trống đủ cho ước lượng RSS của
+một Chrome (đo thực tế từ các driver trước đó) và CPU chưa quá tải. Khi chưa đủ tài
+nguyên, worker xếp hàng chờ thay vì bỏ qua truyện.
+"""
+import os
+import time
+import logging
+import multiprocessing
+from contextlib import contextmanager
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_DRIVERS = 8
+# Ước lượng ban đầu cho một cây process Chrome (MB), được cập nhật theo số đo thực tế
+DEFAULT_DRIVER_ESTIMATE_MB = 350
+# RAM luôn chừa lại cho hệ thống và giao diện (MB)
+DEFAULT_MEMORY_RESERVE_MB = 1024
+DEFAULT_MAX_CPU_PERCENT = 90
+# Trọng số của số đo mới khi cập nhật ước lượng (trung bình trượt mũ)
+ESTIMATE_ALPHA = 0.3
+POLL_INTERVAL = 1.0
+# Log cảnh báo khi phải chờ quá lâu (giây)
+WAIT_WARNING_INTERVAL = 30
+
+_controller = None
+
+
+class DriverTicket:
+    """Slot driver đã được cấp, giữ lại để trả về sau khi đóng driver"""
+
+    def __init__(self, index):
+        self.index = index
+        self.measured = False
+        self.driver = None
+
+
+class AdmissionController:
+    """
+    Cấp slot tạo Chrome dựa trên số slot tối đa, RAM trống và CPU
+    """
+
+    def __init__(self, max_drivers=DEFAULT_MAX_DRIVERS, memory_reserve_mb=DEFAULT_MEMORY_RESERVE_MB,
+                 driver_estimate_mb=DEFAULT_DRIVER_ESTIMATE_MB, max_cpu_percent=DEFAULT_MAX_CPU_PERCENT):
+        """
+        Khởi tạo AdmissionController (chỉ gọi ở process chính)
+
+        Args:
+            max_drivers: Số Chrome tối đa trên toàn hệ thống
+            memory_reserve_mb: RAM luôn chừa lại (MB)
+            driver_estimate_mb: Ước lượng RSS ban đầu của một Chrome (MB)
+            max_cpu_percent: Không cấp thêm driver khi CPU vượt ngưỡng này
+        """
+        ctx = multiprocessing.get_context("spawn")
+        self.max_drivers = max_drivers
+        self.memory_reserve_mb = memory_reserve_mb
+        self.max_cpu_percent = max_cpu_percent
+        self._slots = ctx.BoundedSemaphore(max_drivers)
+        self._lock = ctx.Lock()
+        self._estimate_mb = ctx.Value('d', float(driver_estimate_mb), lock=False)
+        # Driver đã được cấp nhưng chưa đo RSS: RAM của chúng chưa phản ánh vào available
+        self._unmeasured = ctx.Value('i', 0, lock=False)
+        self._active = ctx.Value('i', 0, lock=False)
+        # PID đang giữ từng slot (0 = trống) và slot đó đã đo RSS chưa, để thu hồi khi process bị kill
+        self._owners = ctx.Array('i', max_drivers, lock=False)
+        self._owner_measured = ctx.Array('b', max_drivers, lock=False)
+
+    def _has_headroom(self):
+        """Kiểm tra RAM/CPU còn đủ cho thêm một driver (gọi khi đang giữ _lock)"""
+        try:
+            available_mb = psutil.virtual_memory().available / (1024 * 1024)
+            cpu_percent = psutil.cpu_percent(interval=None)
+        except Exception:
+            return True
+
+        estimate = self._estimate_mb.value
+        needed_mb = self.memory_reserve_mb + estimate * (self._unmeasured.value + 1)
+        if self._active.value > 0 and available_mb < needed_mb:
+            return False
+        if self._active.value > 0 and cpu_percent > self.max_cpu_percent:
+            return False
+        return True
+
+    def acquire(self, timeout=None):
+        """
+        Chờ tới khi được cấp slot tạo driver
+
+        Luôn cấp được ít nhất một driver khi không có driver nào đang chạy để tránh treo.
+
+        Args:
+            timeout: Thời gian chờ tối đa (giây), None là chờ tới khi được cấp
+
+        Returns:
+            DriverTicket: Slot đã cấp, None nếu hết thời gian chờ
+        """
+        start = time.monotonic()
+        last_warning = start
+
+        if not self._slots.acquire(timeout=timeout):
+            return None
+
+        while True:
+            with self._lock:
+                if self._has_headroom():
+                    index = list(self._owners).index(0)
+                    self._owners[index] = os.getpid()
+                    self._owner_measured[index] = 0
+                    self._active.value += 1
+                    self._unmeasured.value += 1
+                    return DriverTicket(index)
+
+            now = time.monotonic()
+            if timeout is not None and now - start > timeout:
+                self._slots.release()
+                return None
+            if now - last_warning > WAIT_WARNING_INTERVAL:
+                logger.warning(f"Đang chờ tài nguyên để tạo driver ({self._active.value} driver đang chạy, "
+                               f"ước lượng {self._estimate_mb.value:.0f}MB/driver)")
+                last_warning = now
+            time.sleep(POLL_INTERVAL)
+
+    def record_driver(self, ticket, driver):
+        """
+        Đo RSS thực tế của Chrome vừa tạo và cập nhật ước lượng
+
+        Args:
+            ticket: DriverTicket của driver
+            driver: WebDriver vừa tạo
+        """
+        if ticket is None or ticket.measured:
+            return
+        ticket.driver = driver
+        rss_mb = measure_driver_rss_mb(driver)
+        with self._lock:
+            if rss_mb:
+                self._estimate_mb.value = (1 - ESTIMATE_ALPHA) * self._estimate_mb.value + ESTIMATE_ALPHA * rss_mb
+            self._unmeasured.value = max(0, self._unmeasured.value - 1)
+            self._owner_measured[ticket.index] = 1
+        ticket.measured = True
+
+    def release(self, ticket):
+        """Trả slot sau khi đã đóng driver"""
+        if ticket is None:
+            return
+        with self._lock:
+            if self._owners[ticket.index] != os.getpid():
+                # Slot đã bị thu hồi (reclaim) trước đó
+                return
+            self._free_slot(ticket.index)
+        self._slots.release()
+
+    def reclaim(self, pid):
+        """
+        Thu hồi các slot của process đã bị kill (không kịp gọi release)
+
+        Args:
+            pid: PID của process
+
+        Returns:
+            int: Số slot đã thu hồi
+        """
+        reclaimed = 0
+        with self._lock:
+            for index in range(self.max_drivers):
+                if self._owners[index] == pid:
+                    self._free_slot(index)
+                    reclaimed += 1
+        for _ in range(reclaimed):
+            self._slots.release()
+        if reclaimed:
+            logger.warning(f"Đã thu hồi {reclaimed} slot driver của process {pid}")
+        return reclaimed
+
+    def _free_slot(self, index):
+        """Đánh dấu slot trống và cập nhật bộ đếm (gọi khi đang giữ _lock)"""
+        self._active.value = max(0, self._active.value - 1)
+        if not self._owner_measured[index]:
+            self._unmeasured.value = max(0, self._unmeasured.value - 1)
+        self._owners[index] = 0
+        self._owner_measured[index] = 0
+
+    @contextmanager
+    def driver_slot(self, timeout=None):
+        """
+        Context manager cấp slot driver
+
+        Driver đã gắn vào slot qua record_driver() được đóng trước khi trả slot, để process
+        khác không tạo Chrome mới khi Chrome cũ vẫn còn chiếm RAM.
+
+        Yields:
+            DriverTicket: Slot đã cấp (None nếu hết thời gian chờ)
+        """
+        ticket = self.acquire(timeout)
+        try:
+            yield ticket
+        finally:
+            if ticket is not None and ticket.driver is not None:
+                try:
+                    ticket.driver.quit()
+                except Exception:
+                    pass
+            self.release(ticket)
+
+
+def measure_driver_rss_mb(driver):
+    """
+    Đo tổng RSS của chromedriver và các process Chrome con
+
+    Returns:
+        float: RSS (MB), None nếu không đo được
+    """
+    try:
+        pid = driver.service.process.pid
+        root = psutil.Process(pid)
+        processes = [root] + root.children(recursive=True)
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return total / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def get_admission_controller(**kwargs):
+    """
+    Lấy AdmissionController của process (tạo mới ở process chính nếu chưa có)
+
+    Args:
+        **kwargs: Tham số khởi tạo, chỉ dùng khi tạo mới
+
+    Returns:
+        AdmissionController: Controller dùng chung
+    """
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController(**kwargs)
+        logger.info(f"Khởi tạo kiểm soát driver: tối đa {_controller.max_drivers} driver (PID {os.getpid()})")
+    return _controller
+
+
+def set_admission_controller(controller):
+    """Gán controller nhận từ process cha (gọi trong initializer của Pool)"""
+    global _controller
+    if controller is not None:
+        _controller = controller
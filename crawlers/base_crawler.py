@@ -1,5 +1,12 @@
+import time
 import logging
-from crawlers.comment_crawler import CommentCrawler
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from crawlers import comment_coverage
+from crawlers.comment_fetcher import get_comment_fetcher, get_rate_limiter, DEFAULT_PAGE_CONCURRENCY, DEFAULT_MIN_INTERVAL
+from crawlers.admission import get_admission_controller, DEFAULT_MAX_DRIVERS, DEFAULT_MEMORY_RESERVE_MB
+from crawlers.adaptive_concurrency import get_concurrency_controller, OUTCOME_OK, OUTCOME_ERROR
 
 logger = logging.getLogger(__name__)
 
@@ -19,8 +26,17 @@ class BaseCrawler:
         self.db_manager = db_manager
         self.config_manager = config_manager
         
-        # Khởi tạo comment crawler
-        self.comment_crawler = None
+        # Driver cho đường crawl comment bằng Selenium: mỗi luồng của crawl_comments_parallel
+        # giữ một driver và dùng lại cho các truyện kế tiếp
+        self._comment_driver_local = threading.local()
+        self._comment_driver_lock = threading.Lock()
+        self._comment_driver_tickets = {}
+        
+        # Giới hạn Chrome dùng chung cho mọi crawler (chỉ áp dụng lần tạo đầu tiên)
+        get_admission_controller(
+            max_drivers=config_manager.get("max_drivers", DEFAULT_MAX_DRIVERS),
+            memory_reserve_mb=config_manager.get("memory_reserve_mb", DEFAULT_MEMORY_RESERVE_MB)
+        )
         # logger.info("Khởi tạo BaseCrawler")
     
     def crawl_basic_data(self, progress_callback=None):
@@ -46,24 +62,289 @@ class BaseCrawler:
             list: Danh sách bình luận
         """
         raise NotImplementedError("Các lớp con phải implement phương thức này")
-    
+
+    def get_comment_high_water_mark(self, comic_id, source_name, time_limit=None):
+        """
+        Lấy thời gian bình luận mới nhất đã lưu để crawl tăng dần
+
+        Chỉ trả về mốc khi khoảng comment đã crawl đầy đủ trước đó phủ được khoảng cần lấy;
+        ví dụ lần trước chỉ lấy 30 ngày mà lần này lấy 90 ngày thì phải crawl lại từ đầu.
+
+        Args:
+            comic_id: ID của truyện
+            source_name: Tên nguồn dữ liệu
+            time_limit: Mốc thời gian cũ nhất cần lấy (None: lấy tất cả)
+
+        Returns:
+            datetime: Mốc thời gian, None nếu phải crawl lại toàn bộ khoảng cần lấy
+        """
+        sqlite_helper = getattr(self, "sqlite_helper", None)
+        if not sqlite_helper or not comic_id:
+            return None
+
+        coverage = sqlite_helper.get_comment_coverage(comic_id, source_name)
+        if not coverage or not coverage["newest_time"]:
+            return None
+        if not comment_coverage.covers(coverage["covered_since"], time_limit):
+            logger.info("Khoảng comment đã lưu không phủ khoảng cần lấy, crawl lại không dừng sớm")
+            return None
+
+        high_water_mark = coverage["newest_time"]
+        logger.info(f"Crawl tăng dần: dừng khi gặp comment cũ hơn {high_water_mark.strftime('%Y-%m-%d %H:%M:%S')}")
+        return high_water_mark
+
+    def finish_comment_scan(self, comic_id, source_name, comments, scan):
+        """
+        Lưu bình luận vừa crawl, cập nhật khoảng đã crawl đầy đủ và đọc lại bình luận trong khoảng cần lấy
+
+        Khoảng đã crawl chỉ được cập nhật khi lần crawl đi hết khoảng cần lấy và lưu thành công.
+
+        Args:
+            comic_id: ID của truyện
+            source_name: Tên nguồn dữ liệu
+            comments: Bình luận vừa crawl
+            scan: CommentScan của lần crawl
+
+        Returns:
+            list: Danh sách bình luận
+        """
+        sqlite_helper = getattr(self, "sqlite_helper", None)
+        if not sqlite_helper or not comic_id:
+            return comments
+
+        saved = True
+        if comments:
+            logger.info(f"Lưu {len(comments)} comment cho truyện ID {comic_id}")
+            saved = sqlite_helper.save_comments_to_db(comic_id, comments, source_name)
+
+        if saved and scan.complete:
+            coverage = comment_coverage.merge(sqlite_helper.get_comment_coverage(comic_id, source_name), scan)
+            if coverage:
+                sqlite_helper.save_comment_coverage(comic_id, coverage, source_name)
+        elif not scan.complete:
+            logger.info(f"Crawl comment truyện ID {comic_id} chưa đầy đủ ({scan.stop_reason}), giữ nguyên mốc đã lưu")
+
+        return self.load_stored_comments(comic_id, source_name, comments, scan.time_limit)
+
+    def load_stored_comments(self, comic_id, source_name, new_comments, time_limit=None):
+        """
+        Lấy toàn bộ bình luận đã lưu (gồm cả bình luận vừa crawl) trong khoảng thời gian
+
+        Khi crawl tăng dần chỉ lấy được bình luận mới, nên kết quả trả về cho phân tích
+        được đọc lại từ database.
+
+        Args:
+            comic_id: ID của truyện
+            source_name: Tên nguồn dữ liệu
+            new_comments: Bình luận vừa crawl (dùng khi không đọc được database)
+            time_limit: Chỉ lấy bình luận từ thời điểm này (datetime, tùy chọn)
+
+        Returns:
+            list: Danh sách bình luận
+        """
+        sqlite_helper = getattr(self, "sqlite_helper", None)
+        if not sqlite_helper or not comic_id:
+            return new_comments
+
+        stored_comments = sqlite_helper.get_comments_by_comic_id(comic_id, source_name, since=time_limit)
+        return stored_comments or new_comments
+
+    def crawl_comments_http(self, comic, source_name, parse_time, time_limit=None, high_water_mark=None):
+        """
+        Thử lấy bình luận qua HTTP trước khi phải mở Chrome
+
+        Args:
+            comic: Dictionary chứa thông tin truyện
+            source_name: Tên nguồn dữ liệu
+            parse_time: Hàm chuyển text thời gian thành datetime
+            time_limit: Chỉ lấy bình luận mới hơn thời điểm này (tùy chọn)
+            high_water_mark: Thời gian bình luận mới nhất đã lưu (tùy chọn)
+
+        Returns:
+            list: Danh sách bình luận, None nếu cần quay lại dùng Selenium
+        """
+        fetcher = get_comment_fetcher(
+            source_name,
+            getattr(self, "base_url", ""),
+            page_concurrency=self.config_manager.get("comment_page_concurrency", DEFAULT_PAGE_CONCURRENCY),
+            min_interval=self.config_manager.get("request_interval", DEFAULT_MIN_INTERVAL)
+        )
+        if not fetcher:
+            return None
+
+        comments = fetcher.fetch_comments(comic, parse_time, time_limit=time_limit, high_water_mark=high_water_mark)
+        if comments is None:
+            return None
+
+        return self.finish_comment_scan(comic.get("id"), source_name, comments, fetcher.scan)
+
+    def wait_comment_turn(self):
+        """
+        Chờ lượt tải trang comment bằng Selenium theo rate limit chung của host
+
+        Dùng chung rate limiter với đường HTTP nên tốc độ tới host không phụ thuộc đường nào
+        đang chạy; số truyện song song do get_comment_concurrency điều chỉnh.
+        """
+        get_rate_limiter(
+            urlparse(getattr(self, "base_url", "")).netloc,
+            self.config_manager.get("request_interval", DEFAULT_MIN_INTERVAL)
+        ).wait()
+
+    def get_worker_concurrency(self):
+        """
+        Lấy bộ điều chỉnh số process crawl chi tiết cho host của crawler
+
+        worker_count trong config là mức khởi đầu, max_worker_count là mức trần.
+
+        Returns:
+            AdaptiveConcurrency: Bộ điều chỉnh dùng chung trong tiến trình
+        """
+        worker_count = max(1, getattr(self, "worker_count", 1))
+        return get_concurrency_controller(
+            urlparse(getattr(self, "base_url", "")).netloc,
+            scope="workers",
+            initial=worker_count,
+            max_limit=max(worker_count, self.config_manager.get("max_worker_count", worker_count))
+        )
+
+    def get_comment_concurrency(self):
+        """
+        Lấy bộ điều chỉnh số truyện crawl comment đồng thời cho host của crawler
+
+        Returns:
+            AdaptiveConcurrency: Bộ điều chỉnh dùng chung trong tiến trình
+        """
+        return get_concurrency_controller(
+            urlparse(getattr(self, "base_url", "")).netloc,
+            scope="comments",
+            initial=self.config_manager.get("comment_worker_count", 2),
+            max_limit=self.config_manager.get("max_comment_worker_count", 6)
+        )
+
+    def acquire_comment_driver(self, create_driver):
+        """
+        Lấy WebDriver cho đường crawl comment bằng Selenium
+
+        Trong luồng của crawl_comments_parallel, driver đầu tiên được giữ lại cho các truyện
+        sau của luồng đó; ngoài batch mỗi lần gọi tạo một driver riêng. Driver mới luôn chờ
+        slot driver chung với các worker crawl.
+
+        Args:
+            create_driver: Hàm tạo WebDriver của nguồn
+
+        Returns:
+            WebDriver: Driver đã sẵn sàng, trả lại bằng release_comment_driver
+        """
+        local = self._comment_driver_local
+        batch_drivers = getattr(local, "batch_drivers", None)
+        driver = getattr(local, "driver", None)
+        if batch_drivers is not None and driver is not None:
+            return driver
+
+        ticket = get_admission_controller().acquire()
+        try:
+            driver = create_driver()
+        except Exception:
+            get_admission_controller().release(ticket)
+            raise
+        get_admission_controller().record_driver(ticket, driver)
+
+        with self._comment_driver_lock:
+            self._comment_driver_tickets[id(driver)] = ticket
+            if batch_drivers is not None:
+                batch_drivers.append(driver)
+        if batch_drivers is not None:
+            local.driver = driver
+        return driver
+
+    def release_comment_driver(self, driver):
+        """
+        Trả driver lấy từ acquire_comment_driver
+
+        Driver dùng chung của luồng được giữ lại nếu còn dùng được; driver riêng hoặc
+        driver đã hỏng thì đóng và trả slot.
+
+        Args:
+            driver: WebDriver cần trả (None thì bỏ qua)
+        """
+        if driver is None:
+            return
+        local = self._comment_driver_local
+        if driver is getattr(local, "driver", None):
+            try:
+                driver.current_window_handle
+                return
+            except Exception:
+                logger.warning("Driver crawl comment của luồng không còn dùng được, tạo lại ở truyện sau")
+                local.driver = None
+        self._quit_comment_driver(driver)
+
+    def _quit_comment_driver(self, driver):
+        """Đóng driver crawl comment và trả slot của nó"""
+        with self._comment_driver_lock:
+            ticket = self._comment_driver_tickets.pop(id(driver), None)
+            batch_drivers = getattr(self._comment_driver_local, "batch_drivers", None)
+            if batch_drivers is not None and driver in batch_drivers:
+                batch_drivers.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        get_admission_controller().release(ticket)
+
     def crawl_comments_parallel(self, comics_list, progress_callback=None):
         """
         Crawl comments song song cho danh sách truyện
-        
+
+        Mỗi truyện dùng crawl_comments của chính crawler (HTTP trước, Selenium khi cần,
+        lưu vào database của nguồn); số truyện chạy đồng thời do get_comment_concurrency
+        tự điều chỉnh. Khi cần Selenium, mỗi luồng dùng lại một driver cho mọi truyện của
+        luồng (xem acquire_comment_driver) thay vì mở Chrome mới cho từng truyện.
+
         Args:
-            comics_list: Danh sách truyện cần crawl comments
+            comics_list: Danh sách {'comic_url', 'comic_data', ...} cần crawl comments
             progress_callback: Callback để báo cáo tiến trình
-            
+
         Returns:
-            dict: Kết quả crawl
-        """
-        if not self.comment_crawler:
-            website_type = self.__class__.__name__.replace("Crawler", "")
-            self.comment_crawler = CommentCrawler(
-                website_type=website_type,
-                db_path=self.db_manager.db_folder,
-                max_workers=self.config_manager.get('comment_workers', 4)
-            )
-        
-        return self.comment_crawler.crawl_comments_parallel(comics_list, progress_callback)
\ No newline at end of file
+            dict: {comic_url: [comments]}
+        """
+        concurrency = self.get_comment_concurrency()
+        comments_by_url = {}
+        if not comics_list:
+            return comments_by_url
+
+        def crawl_single(item):
+            comic = item.get("comic_data") or {"link_truyen": item.get("comic_url")}
+            with concurrency.slot() as started:
+                try:
+                    comments = self.crawl_comments(comic)
+                except Exception:
+                    concurrency.record(time.monotonic() - started, OUTCOME_ERROR)
+                    raise
+            concurrency.record(time.monotonic() - started, OUTCOME_OK)
+            return comments or []
+
+        # Driver Selenium của từng luồng, đóng hết khi xong batch
+        batch_drivers = []
+
+        def init_thread():
+            self._comment_driver_local.batch_drivers = batch_drivers
+
+        max_workers = max(1, min(concurrency.max_limit, len(comics_list)))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="comment-crawl",
+                                initializer=init_thread) as executor:
+            futures = {executor.submit(crawl_single, item): item for item in comics_list}
+            for completed, future in enumerate(as_completed(futures), 1):
+                comic_url = futures[future].get("comic_url", "")
+                try:
+                    comments_by_url[comic_url] = future.result()
+                except Exception as e:
+                    logger.error(f"Lỗi khi crawl comment {comic_url}: {e}")
+                    comments_by_url[comic_url] = []
+                if progress_callback:
+                    progress_callback.emit(int(completed / len(comics_list) * 100))
+
+        for driver in list(batch_drivers):
+            self._quit_comment_driver(driver)
+
+        return comments_by_url
\ No newline at end of file
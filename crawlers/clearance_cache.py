@@ -0,0 +1,206 @@
+"""
+Cache phiên vượt Cloudflare (cookie cf_clearance + user-agent) theo host
+
+Cookie clearance gắn với user-agent đã giải challenge, nên cả hai được lưu cùng nhau vào
+file JSON (dùng chung giữa các process) kèm thời điểm hết hạn. Driver hoặc HTTP session mới
+chỉ cần nạp lại cookie và user-agent thay vì giải challenge lại từ đầu.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join("cache", "clearance")
+# Thời gian dùng lại tối đa nếu cookie không có expiry (giây)
+DEFAULT_TTL = 30 * 60
+# Hết hạn sớm hơn cookie một chút để tránh dùng cookie sắp hết hạn
+EXPIRY_MARGIN = 60
+
+# Dấu hiệu riêng của trang chặn (interstitial): tiêu đề "Just a moment..." và cấu hình
+# challenge _cf_chl_opt. Script challenge-platform còn được nhúng vào cả trang bình thường
+# nên không dùng để nhận diện.
+CHALLENGE_MARKERS = [
+    "<title>Just a moment...</title>",
+    "_cf_chl_opt"
+]
+# Cloudflare trả trang chặn với các mã này
+CHALLENGE_STATUSES = (403, 503)
+
+_memory_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_host(url):
+    """Lấy host từ URL (hoặc trả lại chính chuỗi nếu đã là host)"""
+    return urlparse(url).netloc or url
+
+
+def _cache_path(host):
+    safe_host = "".join(c if c.isalnum() or c in ".-" else "_" for c in host)
+    return os.path.join(CACHE_DIR, f"{safe_host}.json")
+
+
+def is_challenge_page(html, status=None):
+    """
+    Kiểm tra HTML có phải trang challenge của Cloudflare không
+
+    Args:
+        html: Nội dung trang
+        status: HTTP status (None khi không biết, ví dụ trang mở bằng Selenium)
+
+    Returns:
+        bool: True nếu đang bị challenge
+    """
+    if not html:
+        return False
+    if status is not None and status not in CHALLENGE_STATUSES:
+        return False
+    return any(marker in html for marker in CHALLENGE_MARKERS)
+
+
+def load_clearance(url):
+    """
+    Lấy phiên clearance còn hạn của host
+
+    Args:
+        url: URL hoặc host
+
+    Returns:
+        dict: {"user_agent", "cookies", "expires_at"}, None nếu chưa có hoặc đã hết hạn
+    """
+    host = get_host(url)
+    now = time.time()
+
+    with _cache_lock:
+        entry = _memory_cache.get(host)
+        if entry is None:
+            try:
+                with open(_cache_path(host), "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                _memory_cache[host] = entry
+            except FileNotFoundError:
+                return None
+            except Exception as e:
+                logger.warning(f"Không đọc được cache clearance của {host}: {e}")
+                return None
+
+    if entry.get("expires_at", 0) <= now:
+        return None
+    return entry
+
+
+def save_clearance(url, user_agent, cookies):
+    """
+    Lưu phiên clearance của host
+
+    Args:
+        url: URL hoặc host
+        user_agent: User-agent đã dùng để giải challenge
+        cookies: Danh sách cookie dạng driver.get_cookies()
+
+    Returns:
+        dict: Phiên đã lưu, None nếu không có cookie clearance
+    """
+    host = get_host(url)
+    if not any(cookie.get("name") == "cf_clearance" for cookie in cookies):
+        logger.debug(f"Không có cookie cf_clearance cho {host}, không lưu cache")
+        return None
+
+    expires_at = time.time() + DEFAULT_TTL
+    for cookie in cookies:
+        if cookie.get("name") == "cf_clearance" and cookie.get("expiry"):
+            expires_at = min(expires_at, cookie["expiry"] - EXPIRY_MARGIN)
+
+    entry = {"host": host, "user_agent": user_agent, "cookies": cookies, "expires_at": expires_at}
+
+    with _cache_lock:
+        _memory_cache[host] = entry
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = f"{_cache_path(host)}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, _cache_path(host))
+        except Exception as e:
+            logger.warning(f"Không ghi được cache clearance của {host}: {e}")
+
+    logger.info(f"Đã lưu phiên Cloudflare cho {host} (hết hạn sau {int(expires_at - time.time())} giây)")
+    return entry
+
+
+def invalidate_clearance(url):
+    """Xóa phiên clearance của host (khi bị challenge lại)"""
+    host = get_host(url)
+    with _cache_lock:
+        _memory_cache.pop(host, None)
+        try:
+            os.remove(_cache_path(host))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Không xóa được cache clearance của {host}: {e}")
+
+
+def capture_from_driver(driver, url):
+    """
+    Lưu cookie và user-agent hiện tại của driver sau khi đã vượt challenge
+
+    Returns:
+        dict: Phiên đã lưu, None nếu thất bại
+    """
+    try:
+        user_agent = driver.execute_script("return navigator.userAgent")
+        return save_clearance(url, user_agent, driver.get_cookies())
+    except Exception as e:
+        logger.warning(f"Không lấy được phiên Cloudflare từ driver: {e}")
+        return None
+
+
+def apply_to_driver(driver, entry):
+    """
+    Nạp cookie và user-agent của phiên vào driver qua DevTools (không cần mở trang trước)
+
+    Returns:
+        bool: True nếu nạp thành công
+    """
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": entry["user_agent"]})
+        for cookie in entry["cookies"]:
+            params = {
+                "name": cookie["name"],
+                "value": cookie["value"],
+                "domain": cookie.get("domain", entry["host"]),
+                "path": cookie.get("path", "/"),
+                "secure": cookie.get("secure", False),
+                "httpOnly": cookie.get("httpOnly", False)
+            }
+            if cookie.get("expiry"):
+                params["expires"] = cookie["expiry"]
+            if cookie.get("sameSite"):
+                params["sameSite"] = cookie["sameSite"]
+            driver.execute_cdp_cmd("Network.setCookie", params)
+        return True
+    except Exception as e:
+        logger.warning(f"Không nạp được phiên Cloudflare vào driver: {e}")
+        return False
+
+
+def apply_to_session(session, entry):
+    """
+    Nạp cookie của phiên vào requests.Session
+
+    Returns:
+        dict: Header cần gửi kèm (User-Agent phải trùng với lúc giải challenge)
+    """
+    for cookie in entry["cookies"]:
+        session.cookies.set(
+            cookie["name"], cookie["value"],
+            domain=cookie.get("domain", entry["host"]),
+            path=cookie.get("path", "/")
+        )
+    return {"User-Agent": entry["user_agent"]}
@@ -0,0 +1,117 @@
+"""
+Khoảng thời gian comment đã được crawl đầy đủ của từng truyện
+
+Mỗi lần crawl comment ghi lại lý do dừng phân trang và comment cũ nhất/mới nhất đã đi
+qua. Chỉ khi lần crawl đi hết khoảng cần lấy (hết comment, chạm time_limit, chạm comment
+đã lưu hoặc giới hạn số trang) thì khoảng đó mới được lưu làm mốc; lần crawl sau chỉ dừng
+sớm ở comment đã lưu khi khoảng đã lưu phủ được khoảng thời gian mới cần lấy.
+"""
+
+# Lý do dừng phân trang
+STOP_END = "end"                # Hết comment
+STOP_TIME_LIMIT = "time_limit"  # Gặp trang toàn comment cũ hơn time_limit
+STOP_STORED = "stored"          # Chạm tới comment đã lưu
+STOP_PAGE_LIMIT = "page_limit"  # Hết số trang cho phép (chỉ phủ tới comment cũ nhất đã thấy)
+STOP_ERROR = "error"            # Lỗi giữa chừng, kết quả không đầy đủ
+
+COMPLETE_REASONS = (STOP_END, STOP_TIME_LIMIT, STOP_STORED, STOP_PAGE_LIMIT)
+
+
+class CommentScan:
+    """
+    Theo dõi một lần crawl comment: lý do dừng và khoảng thời gian đã đi qua
+    """
+
+    def __init__(self, time_limit=None):
+        """
+        Args:
+            time_limit: Mốc thời gian cũ nhất cần lấy (None: lấy tất cả)
+        """
+        self.time_limit = time_limit
+        self.oldest_time = None
+        self.newest_time = None
+        self.stop_reason = None
+
+    def see(self, comment_time):
+        """Ghi nhận thời gian của một comment đã đi qua (None thì bỏ qua)"""
+        if comment_time is None:
+            return
+        if self.oldest_time is None or comment_time < self.oldest_time:
+            self.oldest_time = comment_time
+        if self.newest_time is None or comment_time > self.newest_time:
+            self.newest_time = comment_time
+
+    def stop(self, reason):
+        """Ghi lý do dừng (giữ lý do đầu tiên)"""
+        if self.stop_reason is None:
+            self.stop_reason = reason
+
+    @property
+    def complete(self):
+        """Lần crawl đã đi hết khoảng cần lấy hay chưa"""
+        return self.stop_reason in COMPLETE_REASONS
+
+    def covered_since(self):
+        """
+        Mốc cũ nhất mà mọi comment mới hơn đều đã được lấy
+
+        Returns:
+            tuple: (có phủ hay không, mốc - None nghĩa là phủ toàn bộ)
+        """
+        if self.stop_reason == STOP_END:
+            return True, None
+        if self.stop_reason == STOP_TIME_LIMIT:
+            return True, self.time_limit
+        if self.stop_reason in (STOP_STORED, STOP_PAGE_LIMIT) and self.oldest_time is not None:
+            return True, self.oldest_time
+        return False, None
+
+
+def covers(covered_since, time_limit):
+    """
+    Khoảng đã lưu (từ covered_since tới nay) có phủ khoảng cần lấy hay không
+
+    Args:
+        covered_since: Mốc đã lưu (None: phủ toàn bộ)
+        time_limit: Mốc cần lấy (None: lấy tất cả)
+
+    Returns:
+        bool: True nếu phủ
+    """
+    if covered_since is None:
+        return True
+    return time_limit is not None and covered_since <= time_limit
+
+
+def merge(previous, scan):
+    """
+    Gộp khoảng đã lưu với khoảng của lần crawl vừa xong
+
+    Args:
+        previous: Dict mốc đã lưu (covered_since, newest_time) hoặc None
+        scan: CommentScan đã hoàn thành
+
+    Returns:
+        dict: (covered_since, newest_time, oldest_time, time_limit), None nếu lần crawl không phủ được gì
+    """
+    covered, since = scan.covered_since()
+    if not covered:
+        return None
+
+    newest = scan.newest_time
+    if previous:
+        previous_newest = previous.get("newest_time")
+        # Hai khoảng nối liền nhau (lần này đi tới mốc mới nhất đã lưu) thì lấy mốc cũ hơn
+        if previous_newest is not None and (since is None or since <= previous_newest):
+            previous_since = previous.get("covered_since")
+            if since is not None and (previous_since is None or previous_since < since):
+                since = previous_since
+        if newest is None or (previous_newest is not None and previous_newest > newest):
+            newest = previous_newest
+
+    return {
+        "covered_since": since,
+        "newest_time": newest,
+        "oldest_time": scan.oldest_time,
+        "time_limit": scan.time_limit
+    }
@@ -0,0 +1,637 @@
+"""
+Lấy comment trực tiếp qua HTTP (endpoint AJAX / HTML tĩnh) thay vì điều khiển Chrome
+
+Mỗi nguồn có một fetcher riêng. Khi endpoint không dùng được (bị chặn, đổi cấu trúc,
+không tìm thấy ID truyện...) fetch_comments trả về None để crawler quay lại dùng Selenium.
+"""
+import os
+import re
+import json
+import logging
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+
+from crawlers.clearance_cache import load_clearance, apply_to_session, is_challenge_page
+from crawlers.adaptive_concurrency import (
+    get_concurrency_controller, OUTCOME_OK, OUTCOME_ERROR, OUTCOME_TIMEOUT, OUTCOME_CHALLENGE
+)
+from crawlers.resilience import call_with_retry, RetryableError
+from crawlers.comment_coverage import (
+    CommentScan, STOP_END, STOP_TIME_LIMIT, STOP_STORED, STOP_PAGE_LIMIT, STOP_ERROR
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+REQUEST_TIMEOUT = 15
+# Số request đồng thời ban đầu tới một host (gồm cả trang tải trước), tự điều chỉnh sau đó
+DEFAULT_PAGE_CONCURRENCY = 3
+# Số request đồng thời tối đa tới một host
+MAX_PAGE_CONCURRENCY = 8
+# Khoảng cách tối thiểu giữa hai request tới cùng một host (giây)
+DEFAULT_MIN_INTERVAL = 0.5
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+class CommentEndpointError(Exception):
+    """Lỗi khi endpoint comment không dùng được"""
+
+
+def get_http_session():
+    """
+    Lấy requests.Session dùng chung trong tiến trình (keep-alive + connection pool)
+
+    Session được tạo lại sau khi fork/spawn để không chia sẻ socket giữa các tiến trình.
+
+    Returns:
+        requests.Session: Session dùng chung
+    """
+    global _session, _session_pid
+
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({
+                "User-Agent": DEFAULT_USER_AGENT,
+                "Accept-Language": "vi-VN,vi;q=0.9,en;q=0.8"
+            })
+            _session = session
+            _session_pid = os.getpid()
+        return _session
+
+
+class HostRateLimiter:
+    """
+    Giới hạn tốc độ request tới một host, dùng chung giữa các thread trong tiến trình
+    """
+
+    def __init__(self, min_interval=DEFAULT_MIN_INTERVAL):
+        self.min_interval = min_interval
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Chờ tới lượt gửi request tiếp theo"""
+        with self._lock:
+            now = time.monotonic()
+            wait_time = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.min_interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+def get_rate_limiter(host, min_interval=None):
+    """
+    Lấy rate limiter của host (tạo mới nếu chưa có)
+
+    Args:
+        host: Tên host
+        min_interval: Khoảng cách tối thiểu giữa hai request (giây, tùy chọn)
+
+    Returns:
+        HostRateLimiter: Rate limiter của host
+    """
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(host)
+        if limiter is None:
+            limiter = HostRateLimiter(DEFAULT_MIN_INTERVAL if min_interval is None else min_interval)
+            _rate_limiters[host] = limiter
+        elif min_interval is not None:
+            limiter.min_interval = min_interval
+        return limiter
+
+
+def classify_response(response):
+    """
+    Phân loại phản hồi cho bộ điều chỉnh song song
+
+    Chỉ 429, 5xx và trang challenge được coi là dấu hiệu host quá tải; 404 hay các lỗi
+    4xx khác là lỗi của riêng truyện đó.
+
+    Returns:
+        str: Một trong các OUTCOME_*
+    """
+    status = response.status_code
+    if status == 200:
+        return OUTCOME_OK
+    if is_challenge_page(response.text, status):
+        return OUTCOME_CHALLENGE
+    if status == 429 or status >= 500:
+        return OUTCOME_ERROR
+    return OUTCOME_OK
+
+
+def make_soup(html):
+    """Parse HTML với lxml nếu có, nếu không dùng html.parser"""
+    try:
+        return BeautifulSoup(html, "lxml")
+    except Exception:
+        return BeautifulSoup(html, "html.parser")
+
+
+def select_text(element, selectors, attribute=None):
+    """
+    Lấy text (hoặc thuộc tính) của phần tử con đầu tiên khớp một trong các selector
+
+    Args:
+        element: Phần tử BeautifulSoup
+        selectors: Danh sách CSS selector thử lần lượt
+        attribute: Tên thuộc tính ưu tiên lấy (ví dụ "title", "datetime")
+
+    Returns:
+        str: Text đã strip, chuỗi rỗng nếu không tìm thấy
+    """
+    for selector in selectors:
+        found = element.select_one(selector)
+        if found is None:
+            continue
+        if attribute and found.get(attribute):
+            return found.get(attribute).strip()
+        text = found.get_text(" ", strip=True)
+        if text:
+            return text
+    return ""
+
+
+class CommentFetcher:
+    """
+    Class cơ sở cho các fetcher comment qua HTTP
+    """
+
+    # Selector cho từng comment và các trường bên trong (lớp con ghi đè)
+    item_selectors = []
+    name_selectors = []
+    content_selectors = []
+    time_selectors = []
+    time_attribute = None
+    default_name = "Người dùng ẩn danh"
+    # Giới hạn độ dài giống nhánh Selenium để hash comment trùng khớp
+    max_name_length = None
+    max_content_length = None
+
+    def __init__(self, base_url, session=None, page_concurrency=DEFAULT_PAGE_CONCURRENCY, min_interval=None):
+        """
+        Khởi tạo CommentFetcher
+
+        Args:
+            base_url: URL gốc của trang
+            session: requests.Session (mặc định dùng session chung của tiến trình)
+            page_concurrency: Số request đồng thời ban đầu tới host (tự điều chỉnh theo độ trễ/lỗi)
+            min_interval: Khoảng cách tối thiểu giữa hai request tới host (giây, tùy chọn)
+        """
+        self.base_url = base_url.rstrip("/")
+        self.session = session or get_http_session()
+        host = urlparse(self.base_url).netloc
+        self.rate_limiter = get_rate_limiter(host, min_interval)
+        # Giới hạn song song dùng chung cho mọi fetcher của host trong tiến trình
+        self.concurrency = get_concurrency_controller(
+            host, initial=max(1, page_concurrency), max_limit=max(page_concurrency, MAX_PAGE_CONCURRENCY)
+        )
+        # Lần lấy gần nhất đã chạm tới comment cũ/đã lưu hay chưa
+        self.reached_known = False
+        # Lý do dừng và khoảng thời gian của lần lấy gần nhất
+        self.scan = CommentScan()
+        # Header gửi kèm mọi request (ví dụ User-Agent của phiên Cloudflare)
+        self.extra_headers = {}
+
+    def request(self, method, url, **kwargs):
+        """
+        Gửi request (có rate limit, giới hạn song song, timeout mặc định), raise CommentEndpointError nếu thất bại
+
+        Lỗi tạm thời (timeout, mất kết nối, 429/5xx) được thử lại riêng cho URL này với backoff
+        có jitter; host lỗi liên tiếp bị circuit breaker tạm dừng.
+        """
+        headers = dict(self.extra_headers)
+        headers.update(kwargs.pop("headers", None) or {})
+
+        def send():
+            with self.concurrency.slot():
+                self.rate_limiter.wait()
+                started = time.monotonic()
+                try:
+                    response = self.session.request(method, url, timeout=REQUEST_TIMEOUT, headers=headers, **kwargs)
+                except requests.Timeout:
+                    self.concurrency.record(time.monotonic() - started, OUTCOME_TIMEOUT)
+                    raise
+                except requests.RequestException:
+                    self.concurrency.record(time.monotonic() - started, OUTCOME_ERROR)
+                    raise
+            outcome = classify_response(response)
+            self.concurrency.record(time.monotonic() - started, outcome)
+            if outcome == OUTCOME_ERROR:
+                raise RetryableError(f"HTTP {response.status_code}")
+            return response
+
+        try:
+            response = call_with_retry(send, url)
+        except (requests.RequestException, RetryableError) as e:
+            raise CommentEndpointError(f"Không thể truy cập {url}: {e}")
+        if response.status_code != 200:
+            raise CommentEndpointError(f"{url} trả về HTTP {response.status_code}")
+        return response
+
+    def get(self, url, **kwargs):
+        """GET qua request()"""
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """POST qua request()"""
+        return self.request("POST", url, **kwargs)
+
+    def prepare(self, comic):
+        """
+        Chuẩn bị trạng thái cần cho việc gọi endpoint (ID truyện, token...)
+
+        Args:
+            comic: Dictionary thông tin truyện
+
+        Returns:
+            dict: Context truyền vào fetch_page
+        """
+        return {"link": comic.get("link_truyen")}
+
+    def fetch_page_html(self, context, page):
+        """
+        Lấy HTML chứa danh sách comment của một trang
+
+        Args:
+            context: Context từ prepare()
+            page: Số trang (bắt đầu từ 1)
+
+        Returns:
+            str: HTML, None nếu nguồn không có trang này
+        """
+        raise NotImplementedError("Các lớp con phải implement phương thức này")
+
+    def parse_comments(self, html):
+        """
+        Parse HTML thành danh sách comment thô
+
+        Args:
+            html: HTML chứa danh sách comment
+
+        Returns:
+            list: Danh sách dict (ten_nguoi_binh_luan, noi_dung, time_text)
+        """
+        soup = make_soup(html)
+        items = []
+        for selector in self.item_selectors:
+            items = soup.select(selector)
+            if items:
+                break
+
+        raw_comments = []
+        for item in items:
+            name = select_text(item, self.name_selectors) or self.default_name
+            content = select_text(item, self.content_selectors) or "N/A"
+            if self.max_name_length and len(name) > self.max_name_length:
+                name = name[:self.max_name_length - 3] + "..."
+            if self.max_content_length and len(content) > self.max_content_length:
+                content = content[:self.max_content_length - 3] + "..."
+            time_text = select_text(item, self.time_selectors, self.time_attribute)
+            raw_comments.append({
+                "ten_nguoi_binh_luan": name,
+                "noi_dung": content,
+                "time_text": time_text
+            })
+        return raw_comments
+
+    def has_fragment(self, html):
+        """
+        HTML trang comment có nội dung hay không (endpoint trả về đoạn HTML chỉ chứa comment)
+
+        Returns:
+            bool: True nếu có nội dung
+        """
+        return bool(html and make_soup(html).get_text(strip=True))
+
+    def fetch_page(self, context, page):
+        """
+        Lấy và parse một trang comment
+
+        Returns:
+            list: Danh sách comment thô, list rỗng nếu hết trang
+        """
+        html = self.fetch_page_html(context, page)
+        if not html:
+            return []
+        return self.parse_comments(html)
+
+    def fetch_comments(self, comic, parse_time, time_limit=None, high_water_mark=None, max_pages=100):
+        """
+        Lấy comment của một truyện qua HTTP
+
+        Dừng khi hết trang, khi cả trang đều cũ hơn time_limit hoặc khi chạm tới
+        comment đã lưu (high_water_mark).
+
+        Args:
+            comic: Dictionary thông tin truyện
+            parse_time: Hàm chuyển text thời gian thành datetime
+            time_limit: Chỉ lấy comment mới hơn thời điểm này (tùy chọn)
+            high_water_mark: Thời gian comment mới nhất đã lưu (tùy chọn)
+            max_pages: Số trang tối đa
+
+        Returns:
+            list: Danh sách comment, None nếu endpoint không dùng được, trang 1 không parse
+                  được comment nào dù truyện có comment hoặc lỗi ở một trang giữa chừng
+        """
+        comic_id = comic.get("id")
+        self.scan = CommentScan(time_limit)
+        try:
+            context = self.prepare(comic)
+            first_html = self.fetch_page_html(context, 1)
+            first_page = self.parse_comments(first_html) if first_html else []
+        except CommentEndpointError as e:
+            logger.info(f"Không dùng được endpoint comment, chuyển sang Selenium: {e}")
+            return None
+        except Exception as e:
+            logger.warning(f"Lỗi khi gọi endpoint comment, chuyển sang Selenium: {e}")
+            return None
+
+        # Trang đầu không parse được comment nào trong khi truyện có comment (hoặc endpoint
+        # có trả về nội dung) thường là do selector lỗi thời/trang bị chặn, không phải truyện
+        # chưa có comment
+        try:
+            comment_count = int(comic.get("so_binh_luan") or 0)
+        except (TypeError, ValueError):
+            comment_count = 0
+        if not first_page and (comment_count > 0 or self.has_fragment(first_html)):
+            logger.warning(
+                f"Lỗi fetcher comment: trang 1 không có comment nào (so_binh_luan="
+                f"{comic.get('so_binh_luan')}) cho truyện {comic.get('ten_truyen')}, chuyển sang Selenium"
+            )
+            return None
+
+        comments = []
+        seen = set()
+        page = 1
+        raw_comments = first_page
+        self.reached_known = False
+
+        # Các trang sau được tải trước theo cửa sổ bằng giới hạn song song hiện tại của host,
+        # xử lý theo thứ tự; khi gặp điều kiện dừng thì hủy các trang chưa bắt đầu tải
+        executor = None
+        pending = {}
+        next_page = 2
+        if self.concurrency.max_limit > 1 and max_pages > 1:
+            executor = ThreadPoolExecutor(max_workers=self.concurrency.max_limit, thread_name_prefix="comment-page")
+
+        try:
+            while raw_comments:
+                if executor:
+                    while next_page <= max_pages and next_page <= page + self.concurrency.limit:
+                        pending[next_page] = executor.submit(self.fetch_page, context, next_page)
+                        next_page += 1
+
+                page_old, page_stored = self._collect_page(raw_comments, comic_id, parse_time, time_limit,
+                                                           high_water_mark, comments, seen)
+
+                if page_old > 0 or page_stored > 0:
+                    self.reached_known = True
+                if page_old == len(raw_comments):
+                    self.scan.stop(STOP_TIME_LIMIT)
+                elif page_stored > 0:
+                    self.scan.stop(STOP_STORED)
+                elif page >= max_pages:
+                    self.scan.stop(STOP_PAGE_LIMIT)
+                if self.scan.stop_reason:
+                    break
+
+                page += 1
+                try:
+                    if executor:
+                        raw_comments = pending.pop(page).result()
+                    else:
+                        raw_comments = self.fetch_page(context, page)
+                except Exception as e:
+                    # Trả về các trang đã lấy sẽ làm mất các trang cũ hơn, để Selenium lấy lại
+                    logger.warning(f"Lỗi khi lấy comment trang {page} qua HTTP, chuyển sang Selenium: {e}")
+                    self.scan.stop(STOP_ERROR)
+                    return None
+            # Hết trang comment
+            self.scan.stop(STOP_END)
+        finally:
+            if executor:
+                for future in pending.values():
+                    future.cancel()
+                executor.shutdown(wait=False)
+
+        logger.info(f"Đã lấy {len(comments)} comment qua HTTP ({page} trang) cho truyện {comic.get('ten_truyen')}")
+        return comments
+
+
+    def _collect_page(self, raw_comments, comic_id, parse_time, time_limit, high_water_mark, comments, seen):
+        """
+        Chuyển comment thô của một trang sang định dạng database, bỏ qua comment trùng
+
+        Returns:
+            tuple: (số comment cũ hơn time_limit, số comment đã lưu)
+        """
+        page_old = 0
+        page_stored = 0
+        for raw in raw_comments:
+            # Không có thời gian thì lưu NULL (giờ crawl sẽ khác nhau giữa các lần crawl)
+            comment_time = parse_time(raw["time_text"]) if raw["time_text"] else None
+            self.scan.see(comment_time)
+
+            if time_limit and comment_time and comment_time < time_limit:
+                page_old += 1
+                continue
+            if high_water_mark and comment_time and comment_time <= high_water_mark:
+                page_stored += 1
+
+            key = (raw["ten_nguoi_binh_luan"], raw["noi_dung"])
+            if key in seen:
+                continue
+            seen.add(key)
+
+            comments.append({
+                "ten_nguoi_binh_luan": raw["ten_nguoi_binh_luan"],
+                "noi_dung": raw["noi_dung"],
+                "comic_id": comic_id,
+                "thoi_gian_binh_luan": comment_time.strftime("%Y-%m-%d %H:%M:%S") if comment_time else None,
+                "thoi_gian_cap_nhat": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            })
+        return page_old, page_stored
+
+class TruyenQQCommentFetcher(CommentFetcher):
+    """
+    Gọi endpoint mà hàm loadComment(page) của TruyenQQ sử dụng
+    """
+
+    comment_path = "/frontend/comment/list"
+    book_id_patterns = [
+        r"book_id\s*[:=]\s*['\"]?(\d+)",
+        r"data-book-id=['\"](\d+)",
+        r"data-id=['\"](\d+)['\"][^>]*class=['\"][^'\"]*book"
+    ]
+    item_selectors = ["article.info-comment"]
+    name_selectors = ["div.outsite-comment div.outline-content-comment div:nth-child(1) strong", "strong"]
+    content_selectors = ["div.outsite-comment div.outline-content-comment div.content-comment", "div.content-comment"]
+    time_selectors = ["div.action-comment span.time", "span.time"]
+    default_name = "N/A"
+
+    def prepare(self, comic):
+        link = comic.get("link_truyen")
+        html = self.get(link).text
+        for pattern in self.book_id_patterns:
+            match = re.search(pattern, html)
+            if match:
+                return {"link": link, "book_id": match.group(1)}
+        raise CommentEndpointError("Không tìm thấy book_id trên trang truyện")
+
+    def fetch_page_html(self, context, page):
+        response = self.post(
+            urljoin(self.base_url + "/", self.comment_path.lstrip("/")),
+            data={"book_id": context["book_id"], "parent_id": 0, "episode_id": 0, "page": page},
+            headers={"X-Requested-With": "XMLHttpRequest", "Referer": context["link"]}
+        )
+        return response.text
+
+
+class NetTruyenCommentFetcher(CommentFetcher):
+    """
+    Gọi CommentService của NetTruyen (trả về JSON chứa HTML danh sách comment)
+    """
+
+    comment_path = "/Comic/Services/CommentService.asmx/List"
+    item_selectors = [".comment-list .item.clearfix .info", ".item.clearfix .info", "li .info"]
+    name_selectors = [".comment-header span.authorname", ".authorname"]
+    content_selectors = [".comment-content"]
+    time_selectors = ["ul.comment-footer li abbr", ".comment-header abbr", "abbr"]
+    time_attribute = "title"
+
+    def prepare(self, comic):
+        # Dùng phiên Cloudflare mà driver đã giải (nếu còn hạn)
+        clearance = load_clearance(self.base_url)
+        if clearance:
+            self.extra_headers = apply_to_session(self.session, clearance)
+
+        link = comic.get("link_truyen")
+        # Trang challenge (403/503) đã được ghi nhận và báo lỗi trong request()
+        html = self.get(link).text
+        comic_match = re.search(r"comicId\s*[:=]\s*['\"]?(\d+)", html)
+        if not comic_match:
+            raise CommentEndpointError("Không tìm thấy comicId (có thể bị Cloudflare chặn)")
+        token_match = re.search(r"(?:token|key)\s*[:=]\s*['\"]([^'\"]+)['\"]", html)
+        return {
+            "link": link,
+            "comic_id": comic_match.group(1),
+            "token": token_match.group(1) if token_match else ""
+        }
+
+    def fetch_page_html(self, context, page):
+        response = self.get(
+            urljoin(self.base_url + "/", self.comment_path.lstrip("/")),
+            params={
+                "comicId": context["comic_id"],
+                "orderBy": 0,
+                "chapterId": -1,
+                "parentId": 0,
+                "pageNumber": page,
+                "token": context["token"]
+            },
+            headers={"X-Requested-With": "XMLHttpRequest", "Referer": context["link"]}
+        )
+        try:
+            data = response.json()
+        except (ValueError, json.JSONDecodeError):
+            raise CommentEndpointError("CommentService không trả về JSON")
+        if not data.get("success", True):
+            return None
+        return data.get("response", "")
+
+
+class StaticPageCommentFetcher(CommentFetcher):
+    """
+    Lấy comment có sẵn trong HTML của trang truyện (không cần endpoint riêng)
+
+    Chỉ có trang đầu; nếu cần tải thêm (chưa chạm mốc đã lưu) thì trả về None để
+    crawler dùng Selenium bấm "Xem thêm".
+    """
+
+    requires_stop_on_first_page = False
+
+    def has_fragment(self, html):
+        # HTML là cả trang truyện nên luôn có nội dung, chỉ dựa vào so_binh_luan
+        return False
+
+    def fetch_page_html(self, context, page):
+        if page > 1:
+            return None
+        return self.get(context["link"]).text
+
+    def fetch_comments(self, comic, parse_time, time_limit=None, high_water_mark=None, max_pages=1):
+        comments = super().fetch_comments(comic, parse_time, time_limit, high_water_mark, max_pages=1)
+        if comments is None:
+            return None
+        # Trang đầu chưa chạm mốc đã lưu/time_limit thì còn comment phải bấm "Xem thêm"
+        if self.requires_stop_on_first_page and comments and not self.reached_known:
+            logger.info("Trang đầu chưa đủ comment, chuyển sang Selenium để tải thêm")
+            return None
+        return comments
+
+
+class ManhuavnCommentFetcher(StaticPageCommentFetcher):
+    """Comment trang đầu của Manhuavn được render sẵn trong HTML"""
+
+    requires_stop_on_first_page = True
+    item_selectors = [".comment_item"]
+    name_selectors = [".comment-head"]
+    content_selectors = [".comment-content"]
+    time_selectors = ["div.comment-head > span.time", "span.time"]
+    time_attribute = "datetime"
+    max_name_length = 100
+    max_content_length = 2000
+
+
+class Truyentranh3qCommentFetcher(StaticPageCommentFetcher):
+    """Truyentranh3q chỉ hiển thị một trang comment trong HTML của trang truyện"""
+
+    item_selectors = [".list-comment article", ".item-comment", ".comment-container .comment"]
+    name_selectors = [".outline-content-comment > div:nth-child(1) > strong", ".user-name", ".comment-info .name"]
+    content_selectors = [".outline-content-comment > div.content-comment > div > p", ".comment-content p", ".content"]
+    time_selectors = [".action-comment.time i", ".comment-time", ".time"]
+    time_attribute = "datetime"
+    max_name_length = 100
+    max_content_length = 2000
+
+
+COMMENT_FETCHERS = {
+    "TruyenQQ": TruyenQQCommentFetcher,
+    "NetTruyen": NetTruyenCommentFetcher,
+    "Manhuavn": ManhuavnCommentFetcher,
+    "Truyentranh3q": Truyentranh3qCommentFetcher
+}
+
+
+def get_comment_fetcher(source_name, base_url, **kwargs):
+    """
+    Tạo fetcher comment cho nguồn
+
+    Args:
+        source_name: Tên nguồn dữ liệu
+        base_url: URL gốc của trang
+        **kwargs: Tham số cho fetcher (page_concurrency, min_interval)
+
+    Returns:
+        CommentFetcher: Fetcher, None nếu nguồn không hỗ trợ
+    """
+    fetcher_class = COMMENT_FETCHERS.get(source_name)
+    return fetcher_class(base_url, **kwargs) if fetcher_class else None
@@ -1,11 +1,17 @@
-from crawlers.truyenqq_crawler import TruyenQQCrawler
-from crawlers.nettruyen_crawler import NetTruyenCrawler
-from crawlers.manhuavn_crawler import ManhuavnCrawler
-from crawlers.truyentranh3q_crawler import Truyentranh3qCrawler
 import logging
+import importlib
 
 logger = logging.getLogger(__name__)
 
+# Loại crawler -> (module, class, URL mặc định); module (Selenium, SeleniumBase...) chỉ được
+# import khi tạo crawler lần đầu để không làm chậm lúc khởi động
+CRAWLER_CLASSES = {
+    "TruyenQQ": ("crawlers.truyenqq_crawler", "TruyenQQCrawler", "https://truyenqqgo.com"),
+    "NetTruyen": ("crawlers.nettruyen_crawler", "NetTruyenCrawler", "https://nettruyenvia.com"),
+    "Manhuavn": ("crawlers.manhuavn_crawler", "ManhuavnCrawler", "https://manhuavn.top"),
+    "Truyentranh3q": ("crawlers.truyentranh3q_crawler", "Truyentranh3qCrawler", "https://truyentranh3q.com")
+}
+
 class CrawlerFactory:
     """
     Factory tạo crawler phù hợp với từng website
@@ -85,26 +91,13 @@ class CrawlerFactory:
         
         # logger.info(f"Tham số crawler: start_page={start_page}, end_page={end_page}, max_pages={actual_max_pages}, worker_count={worker_count}")
         
-        if crawler_type == "TruyenQQ":
-            return TruyenQQCrawler(
-                **common_kwargs,
-                base_url=kwargs.get('base_url', supported_websites.get('TruyenQQ', 'https://truyenqqgo.com'))
-            )
-        elif crawler_type == "NetTruyen":
-            return NetTruyenCrawler(
-                **common_kwargs,
-                base_url=kwargs.get('base_url', supported_websites.get('NetTruyen', 'https://nettruyenvia.com'))
-            )
-        elif crawler_type == "Manhuavn":
-            return ManhuavnCrawler(
-                **common_kwargs,
-                base_url=kwargs.get('base_url', supported_websites.get('Manhuavn', 'https://manhuavn.top'))
-            )
-        elif crawler_type == "Truyentranh3q":
-            return Truyentranh3qCrawler(
-                **common_kwargs,
-                base_url=kwargs.get('base_url', supported_websites.get('Truyentranh3q', 'https://truyentranh3q.com'))
-            )
-        else:
+        if crawler_type not in CRAWLER_CLASSES:
             logger.error(f"Không hỗ trợ loại crawler: {crawler_type}")
-            raise ValueError(f"Không hỗ trợ loại crawler: {crawler_type}")
\ No newline at end of file
+            raise ValueError(f"Không hỗ trợ loại crawler: {crawler_type}")
+        
+        module_name, class_name, default_url = CRAWLER_CLASSES[crawler_type]
+        crawler_class = getattr(importlib.import_module(module_name), class_name)
+        return crawler_class(
+            **common_kwargs,
+            base_url=kwargs.get('base_url', supported_websites.get(crawler_type, default_url))
+        )
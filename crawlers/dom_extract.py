@@ -0,0 +1,80 @@
+"""
+Trích xuất hàng loạt dữ liệu từ DOM bằng một lần gọi execute_script
+
+Thay vì gọi find_element/get_attribute cho từng phần tử (mỗi lần là một round-trip
+tới WebDriver), script chạy trong trình duyệt, đọc hết các khối trên trang và trả về
+một chuỗi JSON duy nhất.
+"""
+import json
+import logging
+
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+EXTRACT_ITEMS_SCRIPT = """
+var spec = arguments[0];
+var items = [];
+for (var i = 0; i < spec.items.length; i++) {
+    items = document.querySelectorAll(spec.items[i]);
+    if (items.length) break;
+}
+function readField(root, field) {
+    for (var j = 0; j < field.selectors.length; j++) {
+        var el = field.selectors[j] ? root.querySelector(field.selectors[j]) : root;
+        if (!el) continue;
+        var value = '';
+        if (field.attr) {
+            value = (field.attr === 'href' || field.attr === 'src') ? el[field.attr] : el.getAttribute(field.attr);
+        }
+        if (!value && field.text) value = el.innerText;
+        value = (value || '').trim();
+        if (value) return value;
+    }
+    return '';
+}
+var result = [];
+for (var k = 0; k < items.length; k++) {
+    var row = {};
+    for (var key in spec.fields) row[key] = readField(items[k], spec.fields[key]);
+    result.push(row);
+}
+return JSON.stringify(result);
+"""
+
+
+def field(*selectors, attr=None, text=True):
+    """
+    Mô tả một trường cần lấy trong mỗi khối
+
+    Args:
+        *selectors: Các CSS selector thử lần lượt (chuỗi rỗng là chính khối đó)
+        attr: Thuộc tính ưu tiên lấy (href/src lấy URL tuyệt đối)
+        text: Có lấy innerText khi thuộc tính trống hay không
+
+    Returns:
+        dict: Mô tả trường
+    """
+    return {"selectors": list(selectors), "attr": attr, "text": text}
+
+
+@metrics.timed(metrics.STAGE_DOM_EXTRACT)
+def extract_items(driver, item_selectors, fields):
+    """
+    Lấy toàn bộ các khối trên trang trong một lần gọi execute_script
+
+    Args:
+        driver: WebDriver
+        item_selectors: Các CSS selector của khối, dùng selector đầu tiên có kết quả
+        fields: Dictionary tên trường -> field(...)
+
+    Returns:
+        list: Danh sách dict theo thứ tự trên trang, list rỗng nếu lỗi
+    """
+    spec = {"items": list(item_selectors), "fields": fields}
+    try:
+        payload = driver.execute_script(EXTRACT_ITEMS_SCRIPT, spec)
+        return json.loads(payload) if payload else []
+    except Exception as e:
+        logger.error(f"Lỗi khi trích xuất dữ liệu từ DOM: {e}")
+        return []
@@ -0,0 +1,276 @@
+"""
+Cấu hình Chrome WebDriver dùng chung cho các crawler
+
+- Chặn hình ảnh, font, media, quảng cáo và script thống kê ở tầng mạng qua DevTools
+  (Network.setBlockedURLs) thay vì chỉ tắt hình ảnh qua prefs
+- page_load_strategy "eager": driver.get() trả về khi DOM sẵn sàng, không chờ tài nguyên phụ;
+  crawler chờ đúng selector mình cần bằng wait_for_selector()
+"""
+import os
+import logging
+from tempfile import mkdtemp
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+from crawlers.resilience import call_with_retry
+from utils.process_registry import register_driver
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 30  # Timeout mặc định (giây)
+PAGE_LOAD_STRATEGY = "eager"
+
+# Gắn cờ cho các phần tử đang hiển thị, nội dung mới thay vào sẽ không còn cờ
+MARK_STALE_SCRIPT = """
+var items = document.querySelectorAll(arguments[0]);
+for (var i = 0; i < items.length; i++) items[i].setAttribute('data-crawler-stale', '1');
+"""
+
+# Mẫu URL bị chặn (cú pháp wildcard của Network.setBlockedURLs)
+BLOCKED_URL_PATTERNS = [
+    # Hình ảnh
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico", "*.bmp",
+    # Font
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    # Media
+    "*.mp4", "*.webm", "*.m3u8", "*.mp3", "*.ogg", "*.wav",
+    # Quảng cáo và thống kê
+    "*googletagmanager.com*", "*google-analytics.com*", "*googlesyndication.com*",
+    "*doubleclick.net*", "*adservice.google.*", "*googleadservices.com*",
+    "*facebook.net*", "*connect.facebook.com*", "*amazon-adsystem.com*",
+    "*adnxs.com*", "*popads.net*", "*popcash.net*", "*adsterra*", "*exoclick.com*",
+    "*histats.com*", "*statcounter.com*", "*hotjar.com*", "*clarity.ms*"
+]
+
+# Prefs dự phòng khi không dùng được DevTools
+CONTENT_PREFS = {
+    'profile.default_content_settings.images': 2,
+    'profile.managed_default_content_settings.images': 2,
+    'profile.default_content_settings.media_stream': 2,
+    'plugins.plugins_disabled': ['Chrome PDF Viewer'],
+    'hardware_acceleration_mode.enabled': False,
+    'profile.hardware_acceleration_enabled': False,
+}
+
+
+def _quiet_environment():
+    """Vô hiệu hóa logging của các thư viện để tránh crash"""
+    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+    os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
+    os.environ['TF_FORCE_GPU_ALLOW_GROWTH'] = 'false'
+    os.environ['TF_USE_LEGACY_CPU'] = '0'
+    os.environ['TF_DISABLE_MKL'] = '1'
+    os.environ['PYTHONWARNINGS'] = 'ignore::DeprecationWarning,ignore::UserWarning'
+
+
+def build_chrome_options(headless=True):
+    """
+    Tạo Chrome Options dùng chung
+
+    Args:
+        headless: Chạy không giao diện
+
+    Returns:
+        Options: Cấu hình Chrome
+    """
+    chrome_options = Options()
+    chrome_options.page_load_strategy = PAGE_LOAD_STRATEGY
+
+    if headless:
+        chrome_options.add_argument("--headless")
+
+    # Tắt các tính năng không cần thiết
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--disable-accelerated-2d-canvas")
+    chrome_options.add_argument("--disable-accelerated-video-decode")
+    chrome_options.add_argument("--disable-accelerated-video-encode")
+    chrome_options.add_argument("--disable-gpu-compositing")
+    chrome_options.add_argument("--disable-webgl")
+    chrome_options.add_argument("--disable-webrtc-hw-encoding")
+    chrome_options.add_argument("--disable-webrtc-hw-decoding")
+    chrome_options.add_argument("--disable-gl-drawing-for-tests")
+    chrome_options.add_argument("--disable-usb")
+    chrome_options.add_argument("--disable-features=WebUSB,UsbChooserUI")
+    chrome_options.add_argument("--memory-model=low")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--disable-software-rasterizer")
+    chrome_options.add_argument("--disable-web-security")
+    chrome_options.add_argument("--disable-popup-blocking")
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.add_argument(f'--user-data-dir={mkdtemp()}')
+    chrome_options.add_experimental_option('excludeSwitches', ["enable-automation", "enable-logging"])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    chrome_options.add_experimental_option('prefs', CONTENT_PREFS)
+    return chrome_options
+
+
+def apply_network_blocking(driver, patterns=None):
+    """
+    Chặn các request không cần thiết qua DevTools
+
+    Args:
+        driver: WebDriver (Chrome hoặc SeleniumBase)
+        patterns: Danh sách mẫu URL (mặc định BLOCKED_URL_PATTERNS)
+
+    Returns:
+        bool: True nếu áp dụng thành công
+    """
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns or BLOCKED_URL_PATTERNS})
+        return True
+    except Exception as e:
+        logger.warning(f"Không thể chặn request qua DevTools: {e}")
+        return False
+
+
+def configure_driver(driver):
+    """Thiết lập timeout, chặn request và đăng ký process của driver vừa tạo"""
+    register_driver(driver)
+    driver.set_page_load_timeout(DEFAULT_TIMEOUT)
+    driver.set_script_timeout(DEFAULT_TIMEOUT)
+    apply_network_blocking(driver)
+    return driver
+
+
+@metrics.timed(metrics.STAGE_DRIVER_STARTUP)
+def create_chrome_driver(headless=True):
+    """
+    Tạo Chrome WebDriver với cấu hình dùng chung
+
+    Args:
+        headless: Chạy không giao diện
+
+    Returns:
+        WebDriver: Driver đã cấu hình
+    """
+    _quiet_environment()
+
+    try:
+        service = Service(log_path=os.devnull)
+        driver = webdriver.Chrome(service=service, options=build_chrome_options(headless))
+        return configure_driver(driver)
+    except Exception as e:
+        logger.error(f"Lỗi khi khởi tạo Chrome driver: {e}")
+        try:
+            # Fallback với ít tùy chọn hơn
+            fallback_options = Options()
+            fallback_options.page_load_strategy = PAGE_LOAD_STRATEGY
+            fallback_options.add_argument("--headless")
+            fallback_options.add_argument("--no-sandbox")
+            fallback_options.add_argument("--disable-gpu")
+            fallback_options.add_argument("--disable-dev-shm-usage")
+            return configure_driver(webdriver.Chrome(options=fallback_options))
+        except Exception as e2:
+            logger.critical(f"Lỗi nghiêm trọng khi khởi tạo Chrome driver: {e2}")
+            raise RuntimeError(f"Không thể khởi tạo Chrome driver: {e2}")
+
+
+def wait_for_selector(driver, selector, timeout=10):
+    """
+    Chờ tới khi selector xuất hiện (thay cho sleep cố định khi dùng eager)
+
+    Args:
+        driver: WebDriver
+        selector: CSS selector
+        timeout: Thời gian chờ tối đa (giây)
+
+    Returns:
+        bool: True nếu selector đã xuất hiện
+    """
+    try:
+        WebDriverWait(driver, timeout).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, selector))
+        )
+        return True
+    except Exception:
+        logger.debug(f"Hết thời gian chờ selector {selector}")
+        return False
+
+
+def mark_stale(driver, selector):
+    """
+    Đánh dấu các phần tử hiện tại trước khi tải lại bằng AJAX (chuyển trang comment...)
+
+    Args:
+        driver: WebDriver
+        selector: CSS selector của các phần tử sẽ bị thay
+    """
+    driver.execute_script(MARK_STALE_SCRIPT, selector)
+
+
+def wait_for_refresh(driver, timeout=10):
+    """
+    Chờ các phần tử đã đánh dấu bằng mark_stale bị thay bằng nội dung mới
+
+    Args:
+        driver: WebDriver
+        timeout: Thời gian chờ tối đa (giây)
+
+    Returns:
+        bool: True nếu nội dung đã được thay
+    """
+    try:
+        WebDriverWait(driver, timeout).until(
+            lambda d: d.execute_script("return document.querySelector('[data-crawler-stale]') === null;")
+        )
+        return True
+    except Exception:
+        logger.debug("Hết thời gian chờ nội dung mới thay vào")
+        return False
+
+
+def wait_for_count(driver, selector, minimum, timeout=10):
+    """
+    Chờ tới khi số phần tử khớp selector đạt tối thiểu (dùng cho nút "Xem thêm")
+
+    Args:
+        driver: WebDriver
+        selector: CSS selector của phần tử
+        minimum: Số phần tử cần có
+        timeout: Thời gian chờ tối đa (giây)
+
+    Returns:
+        bool: True nếu đã đủ số phần tử
+    """
+    try:
+        WebDriverWait(driver, timeout).until(
+            lambda d: len(d.find_elements(By.CSS_SELECTOR, selector)) >= minimum
+        )
+        return True
+    except Exception:
+        logger.debug(f"Hết thời gian chờ {minimum} phần tử {selector}")
+        return False
+
+
+def load_page(driver, url, ready_selector=None, timeout=10, policy=None):
+    """
+    Mở URL và chờ selector, thử lại theo chính sách retry chung và circuit breaker của host
+
+    Args:
+        driver: WebDriver
+        url: URL cần mở
+        ready_selector: CSS selector báo trang đã sẵn sàng (None là không chờ)
+        timeout: Thời gian chờ selector mỗi lần thử (giây)
+        policy: RetryPolicy (mặc định của crawlers.resilience)
+
+    Raises:
+        Exception: Lỗi cuối cùng khi không mở được trang
+    """
+    def open_page():
+        driver.get(url)
+        if ready_selector:
+            WebDriverWait(driver, timeout).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, ready_selector))
+            )
+
+    with metrics.timer(metrics.STAGE_PAGE_LOAD):
+        call_with_retry(open_page, url, policy)
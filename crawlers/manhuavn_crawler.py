@@ -9,16 +9,19 @@ import gc
 import signal
 import psutil
 import multiprocessing
-from multiprocessing import Pool, Value, current_process
-from functools import wraps
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
+from multiprocessing import Value, current_process
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException, NoSuchElementException, StaleElementReferenceException
 from utils.sqlite_helper import SQLiteHelper
+from crawlers.dom_extract import extract_items, field
+from utils import metrics
+from crawlers.driver_config import create_chrome_driver, wait_for_selector, wait_for_count, load_page
+from crawlers.tab_pool import TabPool, tab_group_size, tab_task_timeout
+from crawlers.comment_coverage import CommentScan, STOP_END, STOP_TIME_LIMIT, STOP_STORED, STOP_PAGE_LIMIT, STOP_ERROR
+from crawlers.admission import get_admission_controller, set_admission_controller
+from crawlers.worker_pool import run_worker_pool, DEFAULT_TASK_TIMEOUT
 
 # Thiết lập logging
 logger = logging.getLogger(__name__)
@@ -27,31 +30,23 @@ logger = logging.getLogger(__name__)
 MAX_MEMORY_PERCENT = 80  # Giới hạn % RAM sử dụng
 MAX_DRIVER_INSTANCES = 25  # Giới hạn số lượng driver đồng thời
 DEFAULT_TIMEOUT = 30  # Timeout mặc định (giây)
-MAX_RETRIES = 3  # Số lần thử lại tối đa
-
-# Semaphore để kiểm soát số lượng driver
-driver_semaphore = multiprocessing.Semaphore(MAX_DRIVER_INSTANCES)
-
-# Decorator để thêm retry mechanism
-def retry(max_retries=MAX_RETRIES, delay=2):
-    """Decorator để thử lại các hàm nếu chúng thất bại"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            retries = 0
-            while retries < max_retries:
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    retries += 1
-                    if retries >= max_retries:
-                        logger.error(f"Hàm {func.__name__} thất bại sau {max_retries} lần thử: {e}")
-                        raise
-                    logger.warning(f"Thử lại {func.__name__} lần {retries}/{max_retries} sau {delay} giây. Lỗi: {e}")
-                    time.sleep(delay * (2 ** (retries - 1)))  # Exponential backoff
-            return None
-        return wrapper
-    return decorator
+
+# Selector cho biết trang chi tiết truyện đã tải xong
+DETAIL_READY_SELECTOR = ".info-row .contiep"
+
+# Cấu trúc DOM cho trích xuất hàng loạt (xem crawlers/dom_extract.py)
+LISTING_ITEM_SELECTORS = [".lst_story .story_item"]
+LISTING_FIELDS = {
+    "title": field(".story_title"),
+    "link": field("a", attr="href", text=False)
+}
+COMMENT_ITEM_SELECTORS = [".comment_item"]
+COMMENT_FIELDS = {
+    "user": field(".comment-head"),
+    "content": field(".comment-content"),
+    "time": field("div.comment-head > span.time", attr="datetime")
+}
+
 
 # Hàm kiểm tra RAM và tài nguyên hệ thống
 def check_system_resources():
@@ -78,10 +73,12 @@ def setup_signal_handlers():
         signal.signal(signal.SIGTERM, handle_sigterm)
 
 # Hàm khởi tạo riêng cho mỗi process
-def init_process():
+def init_process(admission_controller=None):
     """Khởi tạo các thiết lập cho mỗi process"""
     multiprocessing.current_process().daemon = False
     setup_signal_handlers()
+    # Dùng chung giới hạn driver với process chính (semaphore tạo lúc import không dùng chung được khi spawn)
+    set_admission_controller(admission_controller)
 
 # Định nghĩa hàm xử lý truyện ở cấp độ module
 def process_comic_worker(params):
@@ -92,11 +89,6 @@ def process_comic_worker(params):
     sqlite_helper = None
     
     try:
-        # Kiểm tra tài nguyên trước khi tạo driver
-        if not check_system_resources():
-            logger.warning(f"Worker {worker_id}: Tài nguyên hệ thống không đủ, bỏ qua truyện {comic.get('Tên truyện', '')}")
-            return None
-        
         # Mở kết nối database
         try:
             sqlite_helper = SQLiteHelper(db_path)
@@ -104,11 +96,12 @@ def process_comic_worker(params):
             logger.error(f"Worker {worker_id}: Không thể kết nối đến database: {e}")
             return None
         
-        # Giới hạn số lượng driver đồng thời
-        with driver_semaphore:
+        # Chờ slot driver chung cho mọi process (xếp hàng khi thiếu RAM/CPU thay vì bỏ qua truyện)
+        with get_admission_controller().driver_slot() as ticket:
             # Tạo driver mới cho mỗi process
             try:
                 driver = setup_driver()
+                get_admission_controller().record_driver(ticket, driver)
                 logger.debug(f"Worker {worker_id}: Đã tạo driver thành công")
             except Exception as e:
                 logger.error(f"Worker {worker_id}: Không thể tạo driver: {e}")
@@ -147,7 +140,6 @@ def process_comic_worker(params):
             except:
                 pass
 
-@retry(max_retries=MAX_RETRIES)
 def crawl_comic_details(comic, driver, worker_id=0):
     """Crawl chi tiết của một truyện"""
     try:
@@ -157,116 +149,183 @@ def crawl_comic_details(comic, driver, worker_id=0):
             logger.warning(f"Worker {worker_id}: URL không hợp lệ: {url}")
             return None
             
-        # Giới hạn số lần thử truy cập URL
-        for attempt in range(5):
-            try:
-                driver.get(url)
-                WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, ".info-row .contiep"))
-                )
-                break
-            except TimeoutException:
-                logger.warning(f"Worker {worker_id}: Timeout khi truy cập {url}, thử lần {attempt + 1}/5")
-                time.sleep(random.uniform(2, 4))
-            except WebDriverException as e:
-                logger.warning(f"Worker {worker_id}: Lỗi WebDriver khi truy cập {url}, thử lần {attempt + 1}/5: {e}")
-                time.sleep(random.uniform(2, 4))
-            except Exception as e:
-                logger.warning(f"Worker {worker_id}: Lỗi không xác định khi truy cập {url}, thử lần {attempt + 1}/5: {e}")
-                time.sleep(random.uniform(2, 4))
-        else:
-            logger.error(f"Worker {worker_id}: Không thể truy cập trang sau 5 lần thử: {url}")
-            return None
-
-        # Lấy thông tin chi tiết
-        story = {}
-        story["Tên truyện"] = comic.get("Tên truyện", "Không có tên")
-        story["Link truyện"] = url
-        
-        # Lấy thông tin chi tiết với xử lý ngoại lệ chi tiết
+        # Retry theo request và circuit breaker của host: lỗi chỉ làm mất trang này
         try:
-            story["Tình trạng"] = get_text_safe(driver, ".info-row .contiep")
+            load_page(driver, url, DETAIL_READY_SELECTOR)
         except Exception as e:
-            logger.warning(f"Worker {worker_id}: Không thể lấy tình trạng: {e}")
-            story["Tình trạng"] = "N/A"
-            
-        try:
-            story["Lượt theo dõi"] = get_text_safe(driver, "li.info-row strong")
-        except Exception as e:
-            logger.warning(f"Worker {worker_id}: Không thể lấy lượt theo dõi: {e}")
-            story["Lượt theo dõi"] = "0"
-            
-        try:
-            story["Lượt xem"] = parse_number(get_text_safe(driver, "li.info-row view.colorblue"))
-        except Exception as e:
-            logger.warning(f"Worker {worker_id}: Không thể lấy lượt xem: {e}")
-            story["Lượt xem"] = "0"
-            
-        try:
-            story["Đánh giá"] = get_text_safe(driver, 'span[itemprop="ratingValue"]')
-        except Exception as e:
-            logger.warning(f"Worker {worker_id}: Không thể lấy đánh giá: {e}")
-            story["Đánh giá"] = "0"
-            
-        try:
-            story["Lượt đánh giá"] = get_text_safe(driver, 'span[itemprop="ratingCount"]')
-        except Exception as e:
-            logger.warning(f"Worker {worker_id}: Không thể lấy lượt đánh giá: {e}")
-            story["Lượt đánh giá"] = "0"
+            logger.error(f"Worker {worker_id}: Không thể truy cập trang {url}: {e}")
+            return None
+
+        return parse_comic_details(driver, comic, url, worker_id)
             
+    except Exception as e:
+        logger.error(f"Worker {worker_id}: Lỗi không xử lý được khi lấy chi tiết truyện {comic.get('Tên truyện', '')}: {e}")
+        return None
+
+def parse_comic_details(driver, comic, url, worker_id=0):
+    """
+    Lấy thông tin chi tiết từ trang truyện đang mở trên driver
+
+    Args:
+        driver: WebDriver đang ở trang truyện
+        comic: Dictionary thông tin truyện từ danh sách
+        url: Link truyện
+        worker_id: ID worker để ghi log
+
+    Returns:
+        dict: Truyện theo định dạng database
+    """
+    # Lấy thông tin chi tiết
+    story = {}
+    story["Tên truyện"] = comic.get("Tên truyện", "Không có tên")
+    story["Link truyện"] = url
+    
+    # Lấy thông tin chi tiết với xử lý ngoại lệ chi tiết
+    try:
+        story["Tình trạng"] = get_text_safe(driver, ".info-row .contiep")
+    except Exception as e:
+        logger.warning(f"Worker {worker_id}: Không thể lấy tình trạng: {e}")
+        story["Tình trạng"] = "N/A"
+        
+    try:
+        story["Lượt theo dõi"] = get_text_safe(driver, "li.info-row strong")
+    except Exception as e:
+        logger.warning(f"Worker {worker_id}: Không thể lấy lượt theo dõi: {e}")
+        story["Lượt theo dõi"] = "0"
+        
+    try:
+        story["Lượt xem"] = parse_number(get_text_safe(driver, "li.info-row view.colorblue"))
+    except Exception as e:
+        logger.warning(f"Worker {worker_id}: Không thể lấy lượt xem: {e}")
+        story["Lượt xem"] = "0"
+        
+    try:
+        story["Đánh giá"] = get_text_safe(driver, 'span[itemprop="ratingValue"]')
+    except Exception as e:
+        logger.warning(f"Worker {worker_id}: Không thể lấy đánh giá: {e}")
+        story["Đánh giá"] = "0"
+        
+    try:
+        story["Lượt đánh giá"] = get_text_safe(driver, 'span[itemprop="ratingCount"]')
+    except Exception as e:
+        logger.warning(f"Worker {worker_id}: Không thể lấy lượt đánh giá: {e}")
+        story["Lượt đánh giá"] = "0"
+        
+    try:
+        story["Mô tả"] = get_text_safe(driver, "li.clearfix p")
+    except Exception as e:
+        logger.warning(f"Worker {worker_id}: Không thể lấy mô tả: {e}")
+        story["Mô tả"] = ""
+
+    # Lấy số chương
+    try:
+        chapter_text = get_text_safe(driver, "li.info-row a.colorblue")
+        chapter_match = re.search(r'\d+', chapter_text)
+        story["Số chương"] = chapter_match.group() if chapter_text != "N/A" and chapter_match else "0"
+    except Exception as e:
+        logger.warning(f"Worker {worker_id}: Không thể lấy số chương: {e}")
+        story["Số chương"] = "0"
+    
+    # Lấy tác giả
+    try:
+        author_element = driver.find_element(By.XPATH, "/html/body/div[2]/div[2]/div/div[1]/div[1]/div[1]/div[3]/ul/li[6]/a")
+        story["Tác giả"] = author_element.text.strip()
+    except (NoSuchElementException, StaleElementReferenceException):
         try:
-            story["Mô tả"] = get_text_safe(driver, "li.clearfix p")
-        except Exception as e:
-            logger.warning(f"Worker {worker_id}: Không thể lấy mô tả: {e}")
-            story["Mô tả"] = ""
+            # Thử cách khác để tìm tác giả
+            author_elements = driver.find_elements(By.CSS_SELECTOR, ".info-row a")
+            for elem in author_elements:
+                if "tác giả" in elem.get_attribute("title").lower():
+                    story["Tác giả"] = elem.text.strip()
+                    break
+            else:
+                story["Tác giả"] = "N/A"
+        except:
+            story["Tác giả"] = "N/A"
+            
+    # Chuyển đổi sang định dạng database
+    db_comic = {
+        "ten_truyen": story.get("Tên truyện", ""),
+        "tac_gia": story.get("Tác giả", "N/A"),
+        "mo_ta": story.get("Mô tả", ""),
+        "link_truyen": story.get("Link truyện", ""),
+        "so_chuong": int(story.get("Số chương", "0")) if story.get("Số chương", "0").isdigit() else 0,
+        "luot_xem": parse_number(story.get("Lượt xem", "0")),
+        "luot_theo_doi": extract_number(story.get("Lượt theo dõi", "0")),
+        "danh_gia": story.get("Đánh giá", "0"),
+        "luot_danh_gia": extract_number(story.get("Lượt đánh giá", "0")),
+        "trang_thai": story.get("Tình trạng", ""),
+        "nguon": "Manhuavn"
+    }
+    
+    logger.info(f"Worker {worker_id}: Hoàn thành thu thập dữ liệu cho truyện: {story.get('Tên truyện', '')}")
+    return db_comic
+
+def process_comic_tabs_worker(params):
+    """
+    Xử lý một nhóm truyện trong một process với một Chrome nhiều tab
+
+    Args:
+        params: Tuple (comics, db_path, base_url, worker_id, tab_count)
 
-        # Lấy số chương
+    Returns:
+        list: Danh sách truyện đã crawl thành công
+    """
+    comics, db_path, base_url, worker_id, tab_count = params
+    
+    driver = None
+    sqlite_helper = None
+    results = []
+    
+    try:
         try:
-            chapter_text = get_text_safe(driver, "li.info-row a.colorblue")
-            chapter_match = re.search(r'\d+', chapter_text)
-            story["Số chương"] = chapter_match.group() if chapter_text != "N/A" and chapter_match else "0"
+            sqlite_helper = SQLiteHelper(db_path)
         except Exception as e:
-            logger.warning(f"Worker {worker_id}: Không thể lấy số chương: {e}")
-            story["Số chương"] = "0"
+            logger.error(f"Worker {worker_id}: Không thể kết nối đến database: {e}")
+            return results
         
-        # Lấy tác giả
-        try:
-            author_element = driver.find_element(By.XPATH, "/html/body/div[2]/div[2]/div/div[1]/div[1]/div[1]/div[3]/ul/li[6]/a")
-            story["Tác giả"] = author_element.text.strip()
-        except (NoSuchElementException, StaleElementReferenceException):
-            try:
-                # Thử cách khác để tìm tác giả
-                author_elements = driver.find_elements(By.CSS_SELECTOR, ".info-row a")
-                for elem in author_elements:
-                    if "tác giả" in elem.get_attribute("title").lower():
-                        story["Tác giả"] = elem.text.strip()
-                        break
-                else:
-                    story["Tác giả"] = "N/A"
-            except:
-                story["Tác giả"] = "N/A"
-                
-        # Chuyển đổi sang định dạng database
-        db_comic = {
-            "ten_truyen": story.get("Tên truyện", ""),
-            "tac_gia": story.get("Tác giả", "N/A"),
-            "mo_ta": story.get("Mô tả", ""),
-            "link_truyen": story.get("Link truyện", ""),
-            "so_chuong": int(story.get("Số chương", "0")) if story.get("Số chương", "0").isdigit() else 0,
-            "luot_xem": parse_number(story.get("Lượt xem", "0")),
-            "luot_theo_doi": extract_number(story.get("Lượt theo dõi", "0")),
-            "danh_gia": story.get("Đánh giá", "0"),
-            "luot_danh_gia": extract_number(story.get("Lượt đánh giá", "0")),
-            "trang_thai": story.get("Tình trạng", ""),
-            "nguon": "Manhuavn"
-        }
+        # Bỏ qua link không hợp lệ trước khi giao cho tab
+        comics = [comic for comic in comics if comic.get("Link truyện", "").startswith("http")]
         
-        logger.info(f"Worker {worker_id}: Hoàn thành thu thập dữ liệu cho truyện: {story.get('Tên truyện', '')}")
-        return db_comic
+        # Chờ slot driver chung cho mọi process (xếp hàng khi thiếu RAM/CPU thay vì bỏ qua truyện)
+        with get_admission_controller().driver_slot() as ticket:
+            try:
+                driver = setup_driver()
+                get_admission_controller().record_driver(ticket, driver)
+            except Exception as e:
+                logger.error(f"Worker {worker_id}: Không thể tạo driver: {e}")
+                return results
             
+            with TabPool(driver, tab_count, ready_selector=DETAIL_READY_SELECTOR) as tab_pool:
+                for comic, loaded in tab_pool.run(comics, lambda c: c["Link truyện"]):
+                    if not loaded:
+                        logger.error(f"Worker {worker_id}: Không thể tải trang: {comic.get('Link truyện')}")
+                        continue
+                    
+                    try:
+                        result = parse_comic_details(driver, comic, comic["Link truyện"], worker_id)
+                        sqlite_helper.save_comic_to_db(result, "Manhuavn")
+                        results.append(result)
+                        logger.info(f"Worker {worker_id}: Hoàn thành lưu truyện {comic.get('Tên truyện', '')}")
+                    except Exception as e:
+                        logger.error(f"Worker {worker_id}: Lỗi khi xử lý truyện {comic.get('Tên truyện', '')}: {e}")
+        
+        return results
+    
     except Exception as e:
-        logger.error(f"Worker {worker_id}: Lỗi không xử lý được khi lấy chi tiết truyện {comic.get('Tên truyện', '')}: {e}")
-        raise  # Để retry decorator có thể xử lý
+        logger.error(f"Worker {worker_id}: Lỗi không xác định: {e}")
+        return results
+    finally:
+        if driver:
+            try:
+                driver.quit()
+            except:
+                pass
+        if sqlite_helper:
+            try:
+                sqlite_helper.close_all_connections()
+            except:
+                pass
 
 def get_text_safe(element, selector, default="N/A"):
     """Trích xuất nội dung văn bản an toàn từ phần tử"""
@@ -326,50 +385,8 @@ def extract_number(text_value):
         return 0
 
 def setup_driver():
-    """Cấu hình Chrome WebDriver tối ưu"""
-    chrome_options = Options()
-    
-    # Chạy chế độ headless nếu không cần giao diện
-    chrome_options.add_argument("--headless")  
-    
-    # Tắt các tính năng không cần thiết
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-gpu")
-
-    chrome_options.add_argument("--disable-usb") 
-    chrome_options.add_argument("--disable-features=WebUSB,UsbChooserUI")
-    
-    # Giảm tài nguyên tiêu thụ
-    chrome_options.add_argument("--memory-model=low")
-    chrome_options.add_argument("--disable-extensions")
-    chrome_options.add_argument("--disable-software-rasterizer")
-    chrome_options.add_argument("--disable-web-security")
-    chrome_options.add_argument("--disable-popup-blocking")
-    
-    # Bỏ qua cảnh báo automation
-    chrome_options.add_experimental_option('excludeSwitches', ["enable-automation"])
-    chrome_options.add_experimental_option('useAutomationExtension', False)
-
-    # Vô hiệu hóa logging để tránh crash
-    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
-    os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
-    os.environ['TF_FORCE_GPU_ALLOW_GROWTH'] = 'false'
-    os.environ['TF_USE_LEGACY_CPU'] = '0'
-    os.environ['TF_DISABLE_MKL'] = '1'
-    os.environ['PYTHONWARNINGS'] = 'ignore::DeprecationWarning,ignore::UserWarning'
-
-    try:
-        service = Service(log_path=os.devnull)  
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        
-        # Thêm timeout
-        driver.set_page_load_timeout(DEFAULT_TIMEOUT)
-        driver.set_script_timeout(DEFAULT_TIMEOUT)
-        return driver
-    except Exception as e:
-        logger.error(f"Lỗi khi khởi tạo Chrome driver: {e}")
-        raise RuntimeError(f"Không thể khởi tạo Chrome driver: {e}")
+    """Cấu hình Chrome WebDriver tối ưu (dùng cấu hình chung trong driver_config)"""
+    return create_chrome_driver()
 
 def parse_relative_time(time_text):
     """Phân tích thời gian tương đối thành đối tượng datetime"""
@@ -488,9 +505,9 @@ class ManhuavnCrawler(BaseCrawler):
         self.total_comics = 0
         self.processed_comics = Value('i', 0)
     
-    @retry(max_retries=2)
     def crawl_basic_data(self, progress_callback=None):
         """Crawl dữ liệu cơ bản từ Manhuavn với multiprocessing"""
+        metrics.set_site("Manhuavn")
         start_time = time.time()
         comics_count = 0
         
@@ -528,60 +545,42 @@ class ManhuavnCrawler(BaseCrawler):
                 logger.warning("Không lấy được truyện nào, kết thúc quá trình crawl")
                 return {"count": 0, "time_taken": time.time() - start_time, "website": "Manhuavn"}
                 
-            batch_size = min(50, len(raw_comics))
-            
-            for i in range(0, len(raw_comics), batch_size):
-                # Kiểm tra tài nguyên hệ thống trước khi bắt đầu batch mới
-                if not check_system_resources():
-                    logger.warning("Tài nguyên hệ thống thấp, tạm dừng để phục hồi")
-                    time.sleep(10)  # Đợi hệ thống phục hồi
-                
-                batch = raw_comics[i:i+batch_size]
-                logger.info(f"Xử lý batch {i//batch_size + 1}/{(len(raw_comics)-1)//batch_size + 1} ({len(batch)} truyện)")
-                
-                # Chuẩn bị tham số cho worker
-                worker_params = [(comic, self.db_manager.db_folder, self.base_url, idx) for idx, comic in enumerate(batch)]
-                
-                # Tạo và quản lý pool processes
-                try:
-                    # Số lượng process động dựa trên tình trạng hệ thống
-                    dynamic_worker_count = max(self.worker_count, 1)
-                    
-                    with Pool(processes=dynamic_worker_count, initializer=init_process, maxtasksperchild=3) as pool:
-                        try:
-                            # Sử dụng map thay vì map_async để đơn giản hóa
-                            results = pool.map(process_comic_worker, worker_params, chunksize=1)
-                            
-                            # Lọc ra các kết quả không None
-                            valid_results = [r for r in results if r is not None]
-                            
-                            # Cập nhật số lượng truyện đã xử lý
-                            batch_comics_count = len(valid_results)
-                            comics_count += batch_comics_count
-                            
-                            # Cập nhật biến đếm shared
-                            with self.processed_comics.get_lock():
-                                self.processed_comics.value += batch_comics_count
-                            
-                            logger.info(f"Kết thúc batch {i//batch_size + 1}: Đã xử lý {batch_comics_count}/{len(batch)} truyện trong batch")
-                            
-                            # Cập nhật tiến độ
-                            if progress_callback and len(raw_comics) > 0:
-                                progress = (self.processed_comics.value / len(raw_comics)) * 100
-                                progress_callback.emit(int(min(progress, 100)))
-                            
-                        except Exception as e:
-                            logger.error(f"Lỗi khi xử lý map trong pool: {e}")
-                            
-                except Exception as e:
-                    logger.error(f"Lỗi khi xử lý batch: {e}")
+            # Chuẩn bị tác vụ; chế độ nhiều tab: mỗi tác vụ là một nhóm truyện cho một Chrome nhiều tab
+            db_path = self.db_manager.db_folder
+            tab_count = self.config_manager.get("tabs_per_browser", 1)
+            task_timeout = self.config_manager.get("task_timeout", DEFAULT_TASK_TIMEOUT)
+            if tab_count > 1:
+                # Hạn chót tính cho cả nhóm truyện, không phải một truyện
+                group_size = tab_group_size(tab_count)
+                task_timeout = tab_task_timeout(task_timeout)
+                tasks = [(raw_comics[k:k + group_size], db_path, self.base_url, n, tab_count)
+                         for n, k in enumerate(range(0, len(raw_comics), group_size))]
+                worker = process_comic_tabs_worker
+            else:
+                tasks = [(comic, db_path, self.base_url, idx) for idx, comic in enumerate(raw_comics)]
+                worker = process_comic_worker
+            
+            # Một pool dùng suốt lượt crawl, cấp việc liên tục theo giới hạn song song của host
+            for task, result in run_worker_pool(worker, tasks, self.get_worker_concurrency(),
+                                                initializer=init_process, initargs=(get_admission_controller(),),
+                                                task_timeout=task_timeout,
+                                                site="Manhuavn"):
+                if tab_count > 1:
+                    saved_count = len(result or [])
+                else:
+                    saved_count = 1 if result is not None else 0
+                comics_count += saved_count
                 
-                # Gọi garbage collector
-                gc.collect()
+                # Cập nhật biến đếm shared
+                with self.processed_comics.get_lock():
+                    self.processed_comics.value += saved_count
                 
-                # Pause nhỏ giữa các batch để giải phóng tài nguyên
-                logger.info("Nghỉ giữa các batch để giải phóng tài nguyên...")
-                time.sleep(3)
+                # Cập nhật tiến độ
+                if progress_callback and len(raw_comics) > 0:
+                    progress = (self.processed_comics.value / len(raw_comics)) * 100
+                    progress_callback.emit(int(min(progress, 100)))
+            
+            logger.info(f"Kết thúc crawl chi tiết: Đã xử lý {comics_count}/{len(raw_comics)} truyện")
                 
         except Exception as e:
             logger.error(f"Lỗi trong quá trình crawl: {e}")
@@ -604,7 +603,6 @@ class ManhuavnCrawler(BaseCrawler):
             "website": "Manhuavn"
         }
     
-    @retry(max_retries=2)
     def get_all_stories(self, driver, max_pages=None, progress_callback=None):
         """Lấy danh sách truyện từ nhiều trang"""
         stories = []
@@ -628,15 +626,10 @@ class ManhuavnCrawler(BaseCrawler):
                 logger.info(f"Đang tải trang {page}: {url}")
                 
                 try:
-                    driver.get(url)
-                except WebDriverException as e:
+                    load_page(driver, url)
+                except Exception as e:
                     logger.error(f"Lỗi khi truy cập URL {url}: {e}")
-                    # Thử lại với backoff
-                    time.sleep(random.uniform(3, 6))
-                    try:
-                        driver.get(url)
-                    except:
-                        continue  # Tiếp tục với trang tiếp theo
+                    continue  # Tiếp tục với trang tiếp theo
                 
                 time.sleep(random.uniform(2, 4))
 
@@ -662,35 +655,20 @@ class ManhuavnCrawler(BaseCrawler):
 
                 # Lấy tất cả các item truyện
                 try:
-                    item_elements = driver.find_elements(By.CSS_SELECTOR, ".lst_story .story_item")
+                    # Lấy toàn bộ item truyện của trang trong một lần gọi script
+                    item_elements = extract_items(driver, LISTING_ITEM_SELECTORS, LISTING_FIELDS)
                     
                     if not item_elements:
                         logger.info("Không tìm thấy truyện nào trên trang, kết thúc")
                         break
                         
                     for item in item_elements:
-                        try:
-                            # Lấy tiêu đề và link truyện
-                            title_element = item.find_elements(By.CSS_SELECTOR, ".story_title")
-                            if title_element:
-                                title = title_element[0].text.strip()
-                            else:
-                                title = "Không có tên"
-                                
-                            link_element = item.find_elements(By.CSS_SELECTOR, "a")
-                            if link_element:
-                                link = link_element[0].get_attribute("href")
-                                if link and title:
-                                    stories.append({
-                                        "Tên truyện": title, 
-                                        "Link truyện": link
-                                    })
-                        except StaleElementReferenceException:
-                            logger.warning("Phần tử không còn tồn tại trong DOM, bỏ qua")
-                            continue
-                        except Exception as e:
-                            logger.error(f"Lỗi khi xử lý truyện: {e}")
-                            continue
+                        title = item["title"] or "Không có tên"
+                        if item["link"]:
+                            stories.append({
+                                "Tên truyện": title, 
+                                "Link truyện": item["link"]
+                            })
 
                     # Cập nhật tiến độ
                     if progress_callback:
@@ -718,9 +696,9 @@ class ManhuavnCrawler(BaseCrawler):
         logger.info(f"Đã tìm thấy {len(valid_stories)} truyện hợp lệ để crawl (từ {len(stories)} kết quả ban đầu)")
         return valid_stories
 
-    @retry(max_retries=2)
     def crawl_comments(self, comic, time_limit=None, days_limit=None):
         """Crawl comments cho một truyện cụ thể"""
+        metrics.set_site("Manhuavn")
         driver = None
         comments = []
         old_comments_count = 0
@@ -739,28 +717,32 @@ class ManhuavnCrawler(BaseCrawler):
             else:
                 logger.info(f"Crawl tất cả comment cho truyện: {comic.get('ten_truyen')}")
             
-            # Khởi tạo driver với kiểm tra tài nguyên
-            if not check_system_resources():
-                logger.warning("Tài nguyên hệ thống thấp, tạm dừng trước khi tạo driver")
-                time.sleep(5)
-                gc.collect()
+            # Mốc comment mới nhất đã lưu, dừng tải thêm khi chạm tới
+            high_water_mark = self.get_comment_high_water_mark(comic_id, "Manhuavn", time_limit)
+            scan = CommentScan(time_limit)
+            
+            # Trang đầu đã đủ comment mới thì không cần mở Chrome để bấm "Xem thêm"
+            http_comments = self.crawl_comments_http(comic, "Manhuavn", parse_relative_time, time_limit, high_water_mark)
+            if http_comments is not None:
+                return http_comments
                 
-            # Khởi tạo driver
+            # Lấy driver (trong batch dùng lại driver của luồng, driver mới chờ slot chung)
             try:
-                driver = setup_driver()
+                driver = self.acquire_comment_driver(setup_driver)
             except Exception as e:
                 logger.error(f"Không thể tạo driver cho crawl comment: {e}")
                 return []
             
             try:
+                self.wait_comment_turn()
                 driver.get(link)
             except WebDriverException as e:
                 logger.error(f"Lỗi khi truy cập URL {link}: {e}")
-                if driver:
-                    driver.quit()
                 return []
             
-            time.sleep(random.uniform(2, 3))
+            # Trang tải theo chế độ eager, chờ khung comment thay vì sleep cố định
+            wait_for_selector(driver, ".comment_item, .load-more-comm", timeout=5)
+            
             load_more_attempts = 0
             stop_loading = False
             max_load_attempts = 20  
@@ -771,30 +753,32 @@ class ManhuavnCrawler(BaseCrawler):
                     if load_more_attempts > 0 and load_more_attempts % 5 == 0:
                         if not check_system_resources():
                             logger.warning("Tài nguyên hệ thống thấp, dừng tải thêm comment")
+                            scan.stop(STOP_ERROR)
                             break
                     
-                    # Kiểm tra thời gian của comment cuối nếu có giới hạn thời gian
-                    if time_limit:
+                    # Kiểm tra thời gian của comment cuối nếu có giới hạn thời gian hoặc mốc đã lưu
+                    if time_limit or high_water_mark:
                         try:
-                            current_comments = driver.find_elements(By.CSS_SELECTOR, ".comment_item")
+                            current_comments = extract_items(driver, COMMENT_ITEM_SELECTORS, COMMENT_FIELDS)
                             
                             # Kiểm tra comment cuối cùng 
-                            if current_comments:
-                                last_comment = current_comments[-1]
-                                try:
-                                    time_span = last_comment.find_element(By.CSS_SELECTOR, "div.comment-head > span.time")
-                                    time_text = time_span.get_attribute("datetime") or time_span.text.strip()
-                                    
-                                    if time_text:
-                                        comment_time = parse_relative_time(time_text)
-                                        
-                                        # Kiểm tra nếu comment cuối cùng đã quá cũ
-                                        if comment_time < time_limit:
-                                            logger.info(f"Dừng tải thêm comment: Đã phát hiện comment quá cũ ({time_text})")
-                                            stop_loading = True
-                                            break
-                                except (NoSuchElementException, StaleElementReferenceException) as e:
-                                    logger.debug(f"Không thể lấy thời gian của comment cuối: {e}")
+                            time_text = current_comments[-1]["time"] if current_comments else ""
+                            if time_text:
+                                comment_time = parse_relative_time(time_text)
+                                
+                                # Kiểm tra nếu comment cuối cùng đã quá cũ
+                                if time_limit and comment_time and comment_time < time_limit:
+                                    logger.info(f"Dừng tải thêm comment: Đã phát hiện comment quá cũ ({time_text})")
+                                    scan.stop(STOP_TIME_LIMIT)
+                                    stop_loading = True
+                                    break
+                                
+                                # Kiểm tra nếu đã tải tới comment đã lưu
+                                if high_water_mark and comment_time and comment_time <= high_water_mark:
+                                    logger.info(f"Dừng tải thêm comment: Đã chạm tới comment đã lưu ({time_text})")
+                                    scan.stop(STOP_STORED)
+                                    stop_loading = True
+                                    break
                         except Exception as e:
                             logger.warning(f"Lỗi khi kiểm tra thời gian comment: {e}")
                     
@@ -812,114 +796,83 @@ class ManhuavnCrawler(BaseCrawler):
                             elements = driver.find_elements(selector_type, selector)
                             if elements and elements[0].is_displayed():
                                 # Scroll đến nút
-                                driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", elements[0])
-                                time.sleep(0.5)
+                                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", elements[0])
                                 
                                 # Nhấp vào nút bằng JavaScript để tránh lỗi "element not clickable"
+                                loaded_count = len(driver.find_elements(By.CSS_SELECTOR, COMMENT_ITEM_SELECTORS[0]))
+                                self.wait_comment_turn()
                                 driver.execute_script("arguments[0].click();", elements[0])
                                 button_found = True
                                 load_more_attempts += 1
                                 logger.debug(f"Đã nhấp nút 'Xem thêm' lần {load_more_attempts} với selector {selector}")
-                                time.sleep(2)
+                                # Chờ comment mới được nối thêm thay vì sleep cố định
+                                wait_for_count(driver, COMMENT_ITEM_SELECTORS[0], loaded_count + 1)
                                 break
                         except Exception:
                             continue
                     
                     if not button_found:
                         logger.info("Không tìm thấy nút 'Xem thêm', có thể đã tải hết comment")
+                        scan.stop(STOP_END)
                         break
 
                 except Exception as e:
                     logger.debug(f"Không thể tải thêm comment: {e}")
+                    scan.stop(STOP_ERROR)
                     break
+            scan.stop(STOP_PAGE_LIMIT)
 
             # Lấy danh sách tất cả các comment đã tải
             try:
-                comment_elements = driver.find_elements(By.CSS_SELECTOR, ".comment_item")
+                comment_elements = extract_items(driver, COMMENT_ITEM_SELECTORS, COMMENT_FIELDS)
                 logger.info(f"Đã tìm thấy {len(comment_elements)} comment")
                 
                 # Xử lý từng comment
+                seen_comments = set()
                 for comment_elem in comment_elements:
-                    try:
-                        user = get_text_safe(comment_elem, ".comment-head")
-                        content = get_text_safe(comment_elem, ".comment-content")
-                        
-                        time_text = ""
-                        try:
-                            time_span = comment_elem.find_element(By.CSS_SELECTOR, "div.comment-head > span.time")
-                            time_text = time_span.get_attribute("datetime") or time_span.text.strip()
-                        except (NoSuchElementException, StaleElementReferenceException):
-                            pass
-                        
-                        comment_time = datetime.now()
-                        if time_text:
-                            comment_time = parse_relative_time(time_text)
-                        
-                        if time_limit and comment_time < time_limit:
-                            logger.debug(f"Bỏ qua comment quá cũ: {time_text} ({comment_time.strftime('%Y-%m-%d')} < {time_limit.strftime('%Y-%m-%d')})")
-                            old_comments_count += 1
-                            continue
-                        
-                        # Làm sạch dữ liệu
-                        if not content or content.strip() == "":
-                            content = "N/A"
-                            
-                        if not user or user.strip() == "":
-                            user = "Người dùng ẩn danh"
-                            
-                        # Loại bỏ các ký tự đặc biệt có thể gây lỗi SQL
-                        content = content.replace("'", "''").replace('"', '""')
-                        user = user.replace("'", "''").replace('"', '""')
-                        
-                        # Giới hạn độ dài để tránh lỗi database
-                        if len(content) > 2000:
-                            content = content[:1997] + "..."
-                            
-                        if len(user) > 100:
-                            user = user[:97] + "..."
-                        
-                        comments.append({
-                            "ten_nguoi_binh_luan": user,
-                            "noi_dung": content,
-                            "comic_id": comic_id,
-                            "thoi_gian_binh_luan": comment_time.strftime("%Y-%m-%d %H:%M:%S"),
-                            "thoi_gian_cap_nhat": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        })
-                        
-                    except (StaleElementReferenceException, NoSuchElementException) as e:
-                        logger.debug(f"Phần tử comment không còn tồn tại: {e}")
+                    user = comment_elem["user"] or "Người dùng ẩn danh"
+                    content = comment_elem["content"] or "N/A"
+                    time_text = comment_elem["time"]
+                    
+                    comment_time = None  # Không có thời gian thì lưu NULL
+                    if time_text:
+                        comment_time = parse_relative_time(time_text)
+                    scan.see(comment_time)
+                    
+                    if time_limit and comment_time and comment_time < time_limit:
+                        logger.debug(f"Bỏ qua comment quá cũ: {time_text} ({comment_time.strftime('%Y-%m-%d')} < {time_limit.strftime('%Y-%m-%d')})")
+                        old_comments_count += 1
                         continue
-                    except Exception as e:
-                        logger.error(f"Lỗi khi xử lý comment: {e}")
+                    
+                    # Giới hạn độ dài để tránh lỗi database
+                    if len(content) > 2000:
+                        content = content[:1997] + "..."
+                        
+                    if len(user) > 100:
+                        user = user[:97] + "..."
+                    
+                    comment_key = (user, content)
+                    if comment_key in seen_comments:
                         continue
+                    seen_comments.add(comment_key)
+                    
+                    comments.append({
+                        "ten_nguoi_binh_luan": user,
+                        "noi_dung": content,
+                        "comic_id": comic_id,
+                        "thoi_gian_binh_luan": comment_time.strftime("%Y-%m-%d %H:%M:%S") if comment_time else None,
+                        "thoi_gian_cap_nhat": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    })
                 
-                # Lưu comments vào database theo batch để tránh lỗi
-                if comments:
-                    try:
-                        logger.info(f"Lưu {len(comments)} comment cho truyện ID {comic_id}")
-                        
-                        # Lưu theo batch nhỏ để tránh lỗi
-                        batch_size = 100
-                        for i in range(0, len(comments), batch_size):
-                            batch = comments[i:i+batch_size]
-                            try:
-                                self.sqlite_helper.save_comments_to_db(comic_id, batch, "Manhuavn")
-                                logger.debug(f"Đã lưu batch {i//batch_size + 1}/{(len(comments)-1)//batch_size + 1} ({len(batch)} comment)")
-                            except Exception as e:
-                                logger.error(f"Lỗi khi lưu batch comment: {e}")
-                    except Exception as e:
-                        logger.error(f"Lỗi khi lưu comments vào database: {e}")
+                # Lưu comments và khoảng đã crawl vào database
+                comments = self.finish_comment_scan(comic_id, "Manhuavn", comments, scan)
             except Exception as e:
                 logger.error(f"Lỗi khi xử lý danh sách comment: {e}")
             
         except Exception as e:
             logger.error(f"Lỗi khi crawl comment: {e}")
         finally:
-            try:
-                if driver:
-                    driver.quit()
-            except:
-                pass
+            self.release_comment_driver(driver)
         
         if time_limit:
             logger.info(f"Đã crawl được {len(comments)} comment cho truyện {comic.get('ten_truyen')} (bỏ qua {old_comments_count} comment quá cũ)")
@@ -958,7 +911,7 @@ class ManhuavnCrawler(BaseCrawler):
         logger.info(f"Bắt đầu crawl comments batch cho {len(comics_list)} truyện Manhuavn")
         
         try:
-            # Chuẩn bị dữ liệu input cho CommentCrawler
+            # Chuẩn bị dữ liệu input cho crawl_comments_parallel
             crawl_data = []
             for comic in comics_list:
                 comic_url = comic.get("link_truyen", "")
@@ -974,7 +927,7 @@ class ManhuavnCrawler(BaseCrawler):
                 logger.warning("Không có truyện hợp lệ để crawl comments")
                 return {}
             
-            # Sử dụng CommentCrawler từ base class để crawl song song
+            # Crawl song song bằng crawl_comments của crawler (base class)
             batch_result = self.crawl_comments_parallel(crawl_data, progress_callback)
             
             # Chuyển đổi kết quả về format {comic_url: comments}
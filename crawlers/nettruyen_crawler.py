@@ -7,17 +7,24 @@ import gc
 import signal
 import psutil
 import multiprocessing
-from multiprocessing import Pool, Value, current_process
-from functools import wraps
+from multiprocessing import Value, current_process
 from datetime import datetime, timedelta
 from seleniumbase import Driver
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import TimeoutException, WebDriverException, NoSuchElementException, StaleElementReferenceException
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
 from crawlers.base_crawler import BaseCrawler
+from crawlers.comment_coverage import CommentScan, STOP_END, STOP_TIME_LIMIT, STOP_STORED, STOP_PAGE_LIMIT, STOP_ERROR
 from utils.sqlite_helper import SQLiteHelper
-from tempfile import mkdtemp
+from crawlers.admission import get_admission_controller, set_admission_controller
+from crawlers.worker_pool import run_worker_pool, DEFAULT_TASK_TIMEOUT
+from crawlers.dom_extract import extract_items, field
+from utils import metrics
+from crawlers.driver_config import (configure_driver, load_page, wait_for_selector, mark_stale, wait_for_refresh,
+                                    PAGE_LOAD_STRATEGY)
+from crawlers.clearance_cache import (load_clearance, invalidate_clearance, capture_from_driver,
+                                      apply_to_driver, is_challenge_page)
 
 logger = logging.getLogger(__name__)
 
@@ -25,31 +32,21 @@ logger = logging.getLogger(__name__)
 MAX_MEMORY_PERCENT = 80  
 MAX_DRIVER_INSTANCES = 25  
 DEFAULT_TIMEOUT = 30  
-MAX_RETRIES = 3  
 
-# Semaphore để kiểm soát số lượng driver
-driver_semaphore = multiprocessing.Semaphore(MAX_DRIVER_INSTANCES)
+# Cấu trúc DOM cho trích xuất hàng loạt (xem crawlers/dom_extract.py)
+LISTING_ITEM_SELECTORS = [".items .row .item"]
+LISTING_FIELDS = {
+    "title": field("figcaption h3 a"),
+    "link": field("figcaption h3 a", attr="href", text=False),
+    "chapter": field("figcaption ul li a", attr="title", text=False)
+}
+COMMENT_ITEM_SELECTORS = [".comment-list .item.clearfix .info"]
+COMMENT_FIELDS = {
+    "name": field(".comment-header span.authorname"),
+    "content": field(".comment-content"),
+    "time": field("ul.comment-footer .li .abbr", "ul.comment-footer li abbr", ".comment-header abbr", attr="title")
+}
 
-# Decorator để thêm retry mechanism
-def retry(max_retries=MAX_RETRIES, delay=2):
-    """Decorator để thử lại các hàm nếu chúng thất bại"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            retries = 0
-            while retries < max_retries:
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    retries += 1
-                    if retries >= max_retries:
-                        logger.error(f"Hàm {func.__name__} thất bại sau {max_retries} lần thử: {e}")
-                        raise
-                    logger.warning(f"Thử lại {func.__name__} lần {retries}/{max_retries} sau {delay} giây. Lỗi: {e}")
-                    time.sleep(delay * (2 ** (retries - 1)))  # Exponential backoff
-            return None
-        return wrapper
-    return decorator
 
 # Hàm kiểm tra RAM và tài nguyên hệ thống
 def check_system_resources():
@@ -76,27 +73,22 @@ def setup_signal_handlers():
         signal.signal(signal.SIGTERM, handle_sigterm)
 
 # Hàm khởi tạo riêng cho mỗi process
-def init_process():
+def init_process(admission_controller=None):
     """Khởi tạo các thiết lập cho mỗi process"""
     multiprocessing.current_process().daemon = False
     setup_signal_handlers()
+    # Dùng chung giới hạn driver với process chính (semaphore tạo lúc import không dùng chung được khi spawn)
+    set_admission_controller(admission_controller)
 
 # Định nghĩa hàm xử lý truyện ở cấp độ module
 def process_comic_worker(params):
     """Hàm để xử lý một truyện trong một process riêng biệt"""
     comic, db_path, base_url, worker_id = params
     
-    time.sleep(random.uniform(1, 3)*(worker_id % 5 + 1) / 5)
-
     driver = None
     sqlite_helper = None
     
     try:
-        # Kiểm tra tài nguyên trước khi tạo driver
-        if not check_system_resources():
-            logger.warning(f"Worker {worker_id}: Tài nguyên hệ thống không đủ, bỏ qua truyện {comic.get('Tên truyện', '')}")
-            return None
-        
         # Mở kết nối database
         try:
             sqlite_helper = SQLiteHelper(db_path)
@@ -104,22 +96,21 @@ def process_comic_worker(params):
             logger.error(f"Worker {worker_id}: Không thể kết nối đến database: {e}")
             return None
         
-        # Giới hạn số lượng driver đồng thời
-        with driver_semaphore:
+        # Chờ slot driver chung cho mọi process (xếp hàng khi thiếu RAM/CPU thay vì bỏ qua truyện)
+        with get_admission_controller().driver_slot() as ticket:
             # Tạo driver mới cho mỗi process
             try:
                 driver = setup_driver()
+                get_admission_controller().record_driver(ticket, driver)
                 logger.debug(f"Worker {worker_id}: Đã tạo driver thành công")
             except Exception as e:
                 logger.error(f"Worker {worker_id}: Không thể tạo driver: {e}")
                 return None
             
-            # # Bypass Cloudflare
-            # try:
-            #     bypass_cloudflare(driver, base_url)
-            # except Exception as e:
-            #     logger.error(f"Worker {worker_id}: Không thể bypass Cloudflare: {e}")
-            #     return None
+            # Nạp phiên Cloudflare đã lưu (nếu có), không tự giải challenge trong worker
+            clearance = load_clearance(base_url)
+            if clearance:
+                apply_to_driver(driver, clearance)
                 
             # Lấy chi tiết truyện
             try:
@@ -160,6 +151,7 @@ def process_comic_worker(params):
             except:
                 pass
 
+@metrics.timed(metrics.STAGE_DRIVER_STARTUP)
 def setup_driver():
     """Tạo và cấu hình SeleniumBase Driver để bypass Cloudflare"""
     try:
@@ -176,21 +168,20 @@ def setup_driver():
             browser="chrome",   
             uc=True,           
             headless=True,      
-            no_sandbox=True
+            no_sandbox=True,
+            block_images=True,
+            page_load_strategy=PAGE_LOAD_STRATEGY
         )
         
-        # Thiết lập các timeout sau khi tạo driver
+        # Thiết lập các timeout và chặn request không cần thiết sau khi tạo driver
         driver.implicitly_wait(5)
-        driver.set_page_load_timeout(DEFAULT_TIMEOUT)
-        driver.set_script_timeout(DEFAULT_TIMEOUT)
-        
-        return driver
+        return configure_driver(driver)
         
     except Exception as e:
         logger.error(f"Lỗi khi khởi tạo SeleniumBase driver: {e}")
         try:
             # Fallback với ít tùy chọn hơn
-            return Driver(browser="chrome", headless=True, no_sandbox=True)
+            return configure_driver(Driver(browser="chrome", headless=True, no_sandbox=True, page_load_strategy=PAGE_LOAD_STRATEGY))
         except Exception as e2:
             logger.critical(f"Lỗi nghiêm trọng khi khởi tạo SeleniumBase driver: {e2}")
             raise RuntimeError(f"Không thể khởi tạo SeleniumBase driver: {e2}")
@@ -313,37 +304,26 @@ def transform_comic_data(raw_comic):
         "nguon": "NetTruyen",
     }
 
-@retry(max_retries=2)
-def bypass_cloudflare(driver, base_url):
+def bypass_cloudflare(driver, base_url, max_wait=30):
     """Bypass Cloudflare protection"""
     try:
         url = f"{base_url}/?page={1}"
         logger.info(f"Đang truy cập {url} để bypass Cloudflare...")
         
-        for attempt in range(3):
-            try:
-                driver.get(url)
-                break
-            except Exception as e:
-                logger.warning(f"Lỗi khi truy cập URL để bypass Cloudflare, thử lần {attempt + 1}/3: {e}")
-                time.sleep(random.uniform(2, 4))
-        else:
-            logger.error("Không thể truy cập URL để bypass Cloudflare sau 3 lần thử")
+        try:
+            load_page(driver, url)
+        except Exception as e:
+            logger.error(f"Không thể truy cập URL để bypass Cloudflare: {e}")
             return False
         
-        # Đợi để Cloudflare hoàn tất kiểm tra
+        # Đợi tới khi Cloudflare hoàn tất kiểm tra thay vì sleep cố định
         logger.info("Đợi để vượt qua Cloudflare...")
-        time.sleep(5)  # Thời gian đợi có thể điều chỉnh
-        
-        # Kiểm tra xem đã bypass thành công chưa
-        if "Just a moment" in driver.page_source or "Checking your browser" in driver.page_source:
-            logger.info("Đang chờ Cloudflare hoàn tất kiểm tra...")
-            time.sleep(10)
-            
-        # Kiểm tra lại
-        if "Just a moment" in driver.page_source or "Checking your browser" in driver.page_source:
-            logger.warning("Cloudflare vẫn đang kiểm tra, chờ thêm...")
-            time.sleep(15)
+        deadline = time.time() + max_wait
+        while is_challenge_page(driver.page_source):
+            if time.time() > deadline:
+                logger.warning("Cloudflare vẫn đang kiểm tra sau khi hết thời gian chờ")
+                return False
+            time.sleep(1)
             
         logger.info("Đã vượt qua Cloudflare")
         return True
@@ -351,22 +331,47 @@ def bypass_cloudflare(driver, base_url):
         logger.error(f"Lỗi khi bypass Cloudflare: {e}")
         return False
 
-@retry(max_retries=2)
+def ensure_clearance(driver, base_url, force=False):
+    """
+    Dùng lại phiên Cloudflare đã lưu, chỉ giải challenge khi chưa có, hết hạn hoặc bị chặn lại
+
+    Args:
+        driver: SeleniumBase driver
+        base_url: URL gốc của NetTruyen
+        force: Bỏ phiên đã lưu và giải challenge lại
+
+    Returns:
+        bool: True nếu driver đã có phiên hợp lệ
+    """
+    if force:
+        invalidate_clearance(base_url)
+    else:
+        entry = load_clearance(base_url)
+        if entry and apply_to_driver(driver, entry):
+            logger.info("Dùng lại phiên Cloudflare đã lưu")
+            return True
+    
+    if not bypass_cloudflare(driver, base_url):
+        return False
+    capture_from_driver(driver, base_url)
+    return True
+
+def get_with_clearance(driver, url, base_url):
+    """Mở URL, giải lại challenge nếu phiên đã lưu không còn được chấp nhận"""
+    driver.get(url)
+    if is_challenge_page(driver.page_source):
+        logger.info("Phiên Cloudflare không còn hợp lệ, giải lại challenge")
+        if ensure_clearance(driver, base_url, force=True):
+            driver.get(url)
+
 def get_story_details(story, driver, worker_id=0):
     """Lấy thông tin chi tiết của truyện sử dụng driver được cung cấp"""
     try:
-        for attempt in range(5):
-            try:
-                driver.get(story["Link truyện"])
-                WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "li.author.row p.col-xs-8"))
-                )
-                break
-            except Exception as e:
-                logger.warning(f"Worker {worker_id}: Thử lần {attempt + 1} truy cập {story['Link truyện']}: {e}")
-                time.sleep(random.uniform(2, 4))
-        else:
-            logger.error(f"Worker {worker_id}: Không thể truy cập trang sau 5 lần thử")
+        # Retry theo request và circuit breaker của host: lỗi chỉ làm mất trang này
+        try:
+            load_page(driver, story["Link truyện"], "li.author.row p.col-xs-8")
+        except Exception as e:
+            logger.error(f"Worker {worker_id}: Không thể truy cập trang {story['Link truyện']}: {e}")
             return None
 
         # Lấy thông tin cơ bản với xử lý ngoại lệ chi tiết
@@ -539,9 +544,9 @@ class NetTruyenCrawler(BaseCrawler):
         self.total_comics = 0
         self.processed_comics = Value('i', 0)
     
-    @retry(max_retries=2)
     def crawl_basic_data(self, progress_callback=None):
         """Crawl dữ liệu cơ bản từ NetTruyen với multiprocessing"""
+        metrics.set_site("NetTruyen")
         start_time = time.time()
         comics_count = 0
         
@@ -582,61 +587,27 @@ class NetTruyenCrawler(BaseCrawler):
                 logger.warning("Không lấy được truyện nào, kết thúc quá trình crawl")
                 return {"count": 0, "time_taken": time.time() - start_time, "website": "NetTruyen"}
             
-            batch_size = min(50, len(raw_comics))
-            
-            for i in range(0, len(raw_comics), batch_size):
-                # Kiểm tra tài nguyên hệ thống trước khi bắt đầu batch mới
-                if not check_system_resources():
-                    logger.warning("Tài nguyên hệ thống thấp, tạm dừng để phục hồi")
-                    time.sleep(10)  
-                
-                batch = raw_comics[i:i+batch_size]
-                logger.info(f"Xử lý batch {i//batch_size + 1}/{(len(raw_comics)-1)//batch_size + 1} ({len(batch)} truyện)")
-                
-                # Chuẩn bị tham số cho worker
-                worker_params = [(comic, self.db_manager.db_folder, self.base_url, idx) for idx, comic in enumerate(batch)]
-                
-                # Tạo và quản lý pool processes
-                try:
-                    # Số lượng process động dựa trên tình trạng hệ thống
-                    dynamic_worker_count = max(self.worker_count, 1)
-                    
-                    with Pool(processes=dynamic_worker_count, initializer=init_process, maxtasksperchild=3) as pool:
-                        try:
-                            # Sử dụng map thay vì map_async để đơn giản hóa
-                            results = pool.map(process_comic_worker, worker_params, chunksize=1)
-                            
-                            # Lọc ra các kết quả không None
-                            valid_results = [r for r in results if r is not None]
-                            
-                            # Cập nhật số lượng truyện đã xử lý
-                            batch_comics_count = len(valid_results)
-                            comics_count += batch_comics_count
-                            
-                            # Cập nhật biến đếm shared
-                            with self.processed_comics.get_lock():
-                                self.processed_comics.value += batch_comics_count
-                            
-                            logger.info(f"Kết thúc batch {i//batch_size + 1}: Đã xử lý {batch_comics_count}/{len(batch)} truyện trong batch")
-                            
-                            # Cập nhật tiến độ
-                            if progress_callback and len(raw_comics) > 0:
-                                progress = (self.processed_comics.value / len(raw_comics)) * 100
-                                progress_callback.emit(int(min(progress, 100)))
-                            
-                        except Exception as e:
-                            logger.error(f"Lỗi khi xử lý map trong pool: {e}")
-                            
-                except Exception as e:
-                    logger.error(f"Lỗi khi xử lý batch: {e}")
+            # Một pool dùng suốt lượt crawl, cấp việc liên tục theo giới hạn song song của host
+            db_path = self.db_manager.db_folder
+            tasks = [(comic, db_path, self.base_url, idx) for idx, comic in enumerate(raw_comics)]
+            for task, result in run_worker_pool(process_comic_worker, tasks, self.get_worker_concurrency(),
+                                                initializer=init_process, initargs=(get_admission_controller(),),
+                                                task_timeout=self.config_manager.get("task_timeout", DEFAULT_TASK_TIMEOUT),
+                                                site="NetTruyen"):
+                saved_count = 1 if result is not None else 0
+                comics_count += saved_count
                 
-                # Gọi garbage collector
-                gc.collect()
+                # Cập nhật biến đếm shared
+                with self.processed_comics.get_lock():
+                    self.processed_comics.value += saved_count
                 
-                # Pause nhỏ giữa các batch để giải phóng tài nguyên
-                logger.info("Nghỉ giữa các batch để giải phóng tài nguyên...")
-                time.sleep(3)
+                # Cập nhật tiến độ
+                if progress_callback and len(raw_comics) > 0:
+                    progress = (self.processed_comics.value / len(raw_comics)) * 100
+                    progress_callback.emit(int(min(progress, 100)))
             
+            logger.info(f"Kết thúc crawl chi tiết: Đã xử lý {comics_count}/{len(raw_comics)} truyện")
+                
         except Exception as e:
             logger.error(f"Lỗi trong quá trình crawl: {e}")
         finally:
@@ -658,7 +629,6 @@ class NetTruyenCrawler(BaseCrawler):
             "website": "NetTruyen"
         }
     
-    @retry(max_retries=2)
     def get_all_stories(self, driver, max_pages=None, progress_callback=None):
         """Lấy danh sách truyện từ nhiều trang"""
         stories = []
@@ -676,8 +646,8 @@ class NetTruyenCrawler(BaseCrawler):
                 end_page = max_pages
                 logger.info(f"Sử dụng logic cũ: crawl {max_pages} trang từ trang 1")
             
-            # Bypass Cloudflare trước tiên
-            bypass_cloudflare(driver, self.base_url)
+            # Bypass Cloudflare trước tiên (dùng lại phiên đã lưu nếu còn hạn)
+            ensure_clearance(driver, self.base_url)
             
             # Duyệt qua từng trang trong phạm vi đã định
             for page in range(start_page, end_page + 1):
@@ -689,15 +659,10 @@ class NetTruyenCrawler(BaseCrawler):
                 logger.info(f"Đang tải trang {page}: {url}")
                 
                 try:
-                    driver.get(url)
-                except WebDriverException as e:
+                    load_page(driver, url)
+                except Exception as e:
                     logger.error(f"Lỗi khi truy cập URL {url}: {e}")
-                    # Thử lại với backoff
-                    time.sleep(random.uniform(3, 6))
-                    try:
-                        driver.get(url)
-                    except:
-                        continue  # Tiếp tục với trang tiếp theo
+                    continue  # Tiếp tục với trang tiếp theo
                         
                 time.sleep(random.uniform(2, 4))
 
@@ -710,44 +675,20 @@ class NetTruyenCrawler(BaseCrawler):
                     logger.info(f"Không tìm thấy phần tử truyện trên trang {page}, kết thúc")
                     break
 
-                # Lấy tất cả các item truyện
-                item_elements = driver.find_elements("css selector", ".items .row .item")
+                # Lấy toàn bộ item truyện của trang trong một lần gọi script
+                item_elements = extract_items(driver, LISTING_ITEM_SELECTORS, LISTING_FIELDS)
                 
                 if not item_elements:
                     logger.info("Không tìm thấy truyện nào trên trang, kết thúc")
                     break
                     
                 for item in item_elements:
-                    try:
-                        # Lấy tiêu đề và link truyện
-                        title_element = item.find_element("css selector", "figcaption h3 a")
-                        title = title_element.text.strip() if title_element.text else "Không có tên"
-                        link = title_element.get_attribute("href")
-                        
-                        # Lấy thông tin chương
-                        chapter_info = "Chapter 0"  # Giá trị mặc định
-                        try:
-                            chapter_info_elements = item.find_elements("css selector", "figcaption ul li a")
-                            if chapter_info_elements:
-                                chapter_info = chapter_info_elements[0].get_attribute("title") or "Chapter 0"
-                        except Exception:
-                            pass
-                        
-                        # Trích xuất số chương
-                        chapter_count = extract_chapter_number(chapter_info)
-                        
-                        if link:
-                            stories.append({
-                                "Tên truyện": title, 
-                                "Link truyện": link,
-                                "Số chương": chapter_count
-                            })
-                    except StaleElementReferenceException:
-                        logger.warning("Phần tử không còn tồn tại trong DOM, bỏ qua")
-                        continue
-                    except Exception as e:
-                        logger.error(f"Lỗi khi xử lý truyện: {e}")
-                        continue
+                    if item["link"]:
+                        stories.append({
+                            "Tên truyện": item["title"] or "Không có tên", 
+                            "Link truyện": item["link"],
+                            "Số chương": extract_chapter_number(item["chapter"] or "Chapter 0")
+                        })
 
                 # Cập nhật tiến độ
                 if progress_callback:
@@ -769,25 +710,35 @@ class NetTruyenCrawler(BaseCrawler):
         logger.info(f"Đã tìm thấy {len(valid_stories)} truyện hợp lệ để crawl (từ {len(stories)} kết quả ban đầu)")
         return valid_stories
     
-    @retry(max_retries=2)
     def crawl_comments(self, comic, time_limit=None, days_limit=None):
         """Crawl comment cho một truyện cụ thể với giới hạn thời gian"""
-        driver = setup_driver()
+        metrics.set_site("NetTruyen")
+        driver = None
         comments = []
         unique_contents = set()
         old_comments_count = 0
         
         try:
-
-            
             # Lấy link từ comic
             link = comic.get("link_truyen")
-            bypass_cloudflare(driver, link)
             if not link:
                 logger.error(f"Không tìm thấy link truyện cho: {comic.get('ten_truyen')}")
-                driver.quit()
                 return []
             
+            # Mốc comment mới nhất đã lưu, dừng phân trang khi chạm tới
+            comic_id = comic.get("id")
+            high_water_mark = self.get_comment_high_water_mark(comic_id, "NetTruyen", time_limit)
+            scan = CommentScan(time_limit)
+            
+            # Gọi thẳng CommentService, chỉ mở Chrome (vượt Cloudflare) khi bị chặn
+            http_comments = self.crawl_comments_http(comic, "NetTruyen", parse_relative_time, time_limit, high_water_mark)
+            if http_comments is not None:
+                return http_comments
+            
+            # Lấy driver (trong batch dùng lại driver của luồng, driver mới chờ slot chung)
+            driver = self.acquire_comment_driver(setup_driver)
+            ensure_clearance(driver, self.base_url)
+            
             # Log thông tin về giới hạn thời gian
             if time_limit:
                 logger.info(f"Crawl comment cho truyện: {comic.get('ten_truyen')} từ {days_limit} ngày gần đây ({time_limit.strftime('%Y-%m-%d')})")
@@ -795,11 +746,12 @@ class NetTruyenCrawler(BaseCrawler):
                 logger.info(f"Crawl tất cả comment cho truyện: {comic.get('ten_truyen')}")
             
             # Truy cập trang và chuyển đến phần comment
-            driver.get(link)
-            time.sleep(random.uniform(2, 3))
+            self.wait_comment_turn()
+            get_with_clearance(driver, link, self.base_url)
             try:
                 driver.execute_script("joinComment()")
-                time.sleep(random.uniform(2, 3))
+                # Chờ danh sách comment hiện ra thay vì sleep cố định
+                wait_for_selector(driver, COMMENT_ITEM_SELECTORS[0])
             except:
                 logger.warning("Không thể gọi hàm joinComment, trang có thể không có phần comment")
                     
@@ -810,6 +762,7 @@ class NetTruyenCrawler(BaseCrawler):
             while page_comment <= max_comment_pages and not stop_crawling:
                 comments_in_current_page = 0
                 old_comments_in_page = 0
+                stored_comments_in_page = 0
                 
                 # Lấy elements comments với retry
                 comment_elements = []
@@ -818,7 +771,7 @@ class NetTruyenCrawler(BaseCrawler):
                         WebDriverWait(driver, 5).until(
                             EC.presence_of_element_located((By.CSS_SELECTOR, ".comment-list"))
                         )
-                        comment_elements = driver.find_elements("css selector", ".comment-list .item.clearfix .info")
+                        comment_elements = extract_items(driver, COMMENT_ITEM_SELECTORS, COMMENT_FIELDS)
                         if comment_elements:
                             break
                         time.sleep(1)
@@ -828,6 +781,7 @@ class NetTruyenCrawler(BaseCrawler):
                 
                 if not comment_elements:
                     logger.info(f"Không tìm thấy comment nào trên trang {page_comment}, dừng crawl")
+                    scan.stop(STOP_END)
                     break
                     
                 total_comments_in_page = len(comment_elements)
@@ -836,70 +790,45 @@ class NetTruyenCrawler(BaseCrawler):
                 # Xử lý từng comment
                 for comment in comment_elements:
                     try:
-                        # Lấy tên người bình luận
-                        try:
-                            name_elem = comment.find_element("css selector", ".comment-header span.authorname")
-                            name = name_elem.text.strip() if name_elem.text else "Người dùng ẩn danh"
-                        except:
-                            name = "Người dùng ẩn danh"
-                        
-                        # Lấy nội dung bình luận
-                        try:
-                            content_elem = comment.find_element("css selector", ".comment-content")
-                            content = content_elem.text.strip() if content_elem.text else "N/A"
-                        except:
-                            content = "N/A"
-                        
-                        time_text = ""
-                        try:
-                            # Thử nhiều selector cho thời gian comment
-                            selectors = [
-                                "ul.comment-footer .li .abbr",
-                                "ul.comment-footer li abbr",
-                                ".comment-header abbr"
-                            ]
-                            
-                            for selector in selectors:
-                                try:
-                                    abbr_elem = comment.find_element("css selector", selector)
-                                    time_text = abbr_elem.get_attribute("title") or abbr_elem.text.strip()
-                                    if time_text:
-                                        break
-                                except:
-                                    continue
-                                    
-                            if time_text:
-                                logger.info(f"Thời gian comment raw: '{time_text}'")
-                        except:
-                            logger.debug("Không tìm thấy thẻ chứa thời gian")
+                        name = comment["name"] or "Người dùng ẩn danh"
+                        content = comment["content"] or "N/A"
+                        time_text = comment["time"]
+                        if time_text:
+                            logger.debug(f"Thời gian comment raw: '{time_text}'")
                         
                         # Xử lý thời gian
-                        comment_time = datetime.now() 
+                        comment_time = None  # Không có thời gian thì lưu NULL
                         if time_text:
-                            comment_time = self.parse_relative_time(time_text)
+                            comment_time = parse_relative_time(time_text)
+                        scan.see(comment_time)
                         
                         # Kiểm tra giới hạn thời gian
-                        if time_limit and comment_time < time_limit:
+                        if time_limit and comment_time and comment_time < time_limit:
                             logger.info(f"Comment quá cũ: '{time_text}' ({comment_time.strftime('%Y-%m-%d')} < {time_limit.strftime('%Y-%m-%d')})")
                             old_comments_count += 1
+                            scan.stop(STOP_TIME_LIMIT)
                             stop_crawling = True
                             break
                         
                         # Kiểm tra trùng lặp (chỉ với nội dung có ý nghĩa)
                         if content != "N/A" and content in unique_contents:
                             logger.info("Phát hiện comment trùng lặp, dừng crawl")
+                            scan.stop(STOP_END)
                             stop_crawling = True
                             break
                         
                         if content != "N/A" and len(content) > 5:
                             unique_contents.add(content)
                         
+                        if high_water_mark and comment_time and comment_time <= high_water_mark:
+                            stored_comments_in_page += 1
+                        
                         # Thêm comment vào danh sách kết quả
                         comments.append({
                             "ten_nguoi_binh_luan": name,
                             "noi_dung": content,
                             "comic_id": comic.get("id"),
-                            "thoi_gian_binh_luan": comment_time.strftime("%Y-%m-%d %H:%M:%S"),
+                            "thoi_gian_binh_luan": comment_time.strftime("%Y-%m-%d %H:%M:%S") if comment_time else None,
                             "thoi_gian_cap_nhat": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                         })
                         
@@ -915,6 +844,11 @@ class NetTruyenCrawler(BaseCrawler):
                     logger.info("Dừng crawl do nhiều comment quá cũ")
                     break
                 
+                if stored_comments_in_page > 0:
+                    logger.info(f"Đã chạm tới comment đã lưu trên trang {page_comment}, dừng crawl")
+                    scan.stop(STOP_STORED)
+                    break
+                
                 # Tìm nút Next bằng nhiều cách khác nhau
                 next_button = None
                 try:
@@ -949,7 +883,8 @@ class NetTruyenCrawler(BaseCrawler):
                     if next_button:
                         # Scroll đến nút trước khi nhấp
                         driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", next_button)
-                        time.sleep(1)  # Đợi sau khi scroll
+                        self.wait_comment_turn()
+                        mark_stale(driver, COMMENT_ITEM_SELECTORS[0])
                         
                         # Thử click an toàn
                         try:
@@ -970,27 +905,35 @@ class NetTruyenCrawler(BaseCrawler):
                                         logger.info(f"Đã chuyển trang bằng URL: {next_url}")
                                     else:
                                         logger.error("Không thể lấy URL từ nút Next")
+                                        scan.stop(STOP_ERROR)
                                         break
                                 except:
                                     # Không thể tiếp tục
                                     logger.error("Không thể chuyển trang, dừng crawl")
+                                    scan.stop(STOP_ERROR)
                                     break
                         
                         page_comment += 1
                         logger.info(f"Chuyển sang trang comment {page_comment}")
-                        time.sleep(random.uniform(2, 3))
+                        # Chờ comment của trang mới thay vào thay vì sleep cố định
+                        wait_for_refresh(driver)
                     else:
                         logger.info("Không tìm thấy nút chuyển trang, kết thúc crawl")
+                        scan.stop(STOP_END)
                         break
                 except Exception as e:
                     logger.error(f"Lỗi khi tìm/click nút chuyển trang: {e}")
+                    scan.stop(STOP_ERROR)
                     break
+            scan.stop(STOP_PAGE_LIMIT)
+            
+            # Lưu comments mới và khoảng đã crawl để làm mốc cho lần crawl sau
+            comments = self.finish_comment_scan(comic_id, "NetTruyen", comments, scan)
 
         except Exception as e:
             logger.error(f"Lỗi khi crawl comment: {e}")
         finally:
-            if driver:
-                driver.quit()
+            self.release_comment_driver(driver)
             
         if time_limit:
             logger.info(f"Đã crawl được {len(comments)} comment cho truyện {comic.get('ten_truyen')} (bỏ qua {old_comments_count} comment quá cũ)")
@@ -1013,7 +956,7 @@ class NetTruyenCrawler(BaseCrawler):
         logger.info(f"Bắt đầu crawl comments batch cho {len(comics_list)} truyện NetTruyen")
         
         try:
-            # Chuẩn bị dữ liệu input cho CommentCrawler
+            # Chuẩn bị dữ liệu input cho crawl_comments_parallel
             crawl_data = []
             for comic in comics_list:
                 comic_url = comic.get("link_truyen", "")
@@ -1029,7 +972,7 @@ class NetTruyenCrawler(BaseCrawler):
                 logger.warning("Không có truyện hợp lệ để crawl comments")
                 return {}
             
-            # Sử dụng CommentCrawler từ base class để crawl song song
+            # Crawl song song bằng crawl_comments của crawler (base class)
             batch_result = self.crawl_comments_parallel(crawl_data, progress_callback)
             
             # Chuyển đổi kết quả về format {comic_url: comments}
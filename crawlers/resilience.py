@@ -0,0 +1,231 @@
+"""
+Retry theo từng request và circuit breaker theo host
+
+Lỗi chỉ làm mất một trang chứ không làm chạy lại cả lượt crawl:
+- call_with_retry() thử lại một request (một URL) với backoff có jitter, chỉ với lỗi tạm thời
+  (timeout, mất kết nối, 429/5xx...). Lỗi của riêng trang đó (404, parse lỗi...) không thử lại.
+- CircuitBreaker tạm dừng mọi request tới một host sau nhiều lỗi tạm thời liên tiếp, rồi cho
+  một request thử (half-open) sau reset_timeout; thành công thì mở lại cho tất cả.
+"""
+import time
+import random
+import logging
+import threading
+from urllib.parse import urlparse
+
+import requests
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+try:
+    from selenium.common.exceptions import WebDriverException
+except ImportError:
+    WebDriverException = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 30.0
+# Số lỗi tạm thời liên tiếp trước khi tạm dừng host
+DEFAULT_FAILURE_THRESHOLD = 5
+# Thời gian tạm dừng host trước khi cho request thử (giây)
+DEFAULT_RESET_TIMEOUT = 60.0
+# Lỗi mạng của Chrome khi tải trang (net::ERR_CONNECTION_RESET, net::ERR_TIMED_OUT...)
+BROWSER_NETWORK_ERROR_MARKER = "net::ERR_"
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+class RetryableError(Exception):
+    """Lỗi tạm thời, nên thử lại (ví dụ HTTP 429/5xx)"""
+
+
+class CircuitOpenError(Exception):
+    """Host đang bị tạm dừng do lỗi liên tiếp"""
+
+
+def is_retryable(error):
+    """
+    Phân loại lỗi: True nếu là lỗi tạm thời đáng thử lại
+
+    Với Selenium chỉ lỗi mạng khi tải trang và lỗi kết nối tới chromedriver được thử lại.
+    Hết thời gian chờ selector (TimeoutException), không tìm thấy phần tử hay driver đã chết
+    là lỗi của riêng trang/driver, không tính là lỗi của host.
+
+    Args:
+        error: Exception
+
+    Returns:
+        bool: True nếu nên thử lại
+    """
+    if isinstance(error, RetryableError):
+        return True
+    if isinstance(error, (requests.Timeout, requests.ConnectionError, TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, (ProtocolError, ReadTimeoutError)):
+        # Kết nối tới chromedriver bị ngắt hoặc phản hồi chậm
+        return True
+    if WebDriverException is not None and isinstance(error, WebDriverException):
+        return BROWSER_NETWORK_ERROR_MARKER in (error.msg or "")
+    return False
+
+
+class RetryPolicy:
+    """
+    Số lần thử và thời gian chờ giữa các lần (exponential backoff, full jitter)
+    """
+
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        """
+        Thời gian chờ trước lần thử tiếp theo
+
+        Args:
+            attempt: Số lần đã thử (bắt đầu từ 1)
+
+        Returns:
+            float: Số giây chờ, ngẫu nhiên trong [0, min(max_delay, base_delay * 2^(attempt-1))]
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker của một host, an toàn giữa các thread
+    """
+
+    def __init__(self, host, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._condition = threading.Condition()
+
+    def acquire(self, block=True):
+        """
+        Xin phép gửi request tới host, chờ nếu host đang bị tạm dừng
+
+        Args:
+            block: False để raise CircuitOpenError thay vì chờ
+
+        Returns:
+            bool: True khi được phép gửi
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if self.state == STATE_CLOSED:
+                    return True
+                if self.state == STATE_OPEN:
+                    remaining = self._opened_at + self.reset_timeout - now
+                    if remaining <= 0:
+                        # Hết thời gian tạm dừng: cho một request thử
+                        self.state = STATE_HALF_OPEN
+                        self._probing = True
+                        logger.info(f"Circuit {self.host}: thử lại sau khi tạm dừng")
+                        return True
+                elif not self._probing:
+                    self._probing = True
+                    return True
+                else:
+                    remaining = self.reset_timeout
+
+                if not block:
+                    raise CircuitOpenError(f"Host {self.host} đang tạm dừng")
+                self._condition.wait(remaining)
+
+    def record_success(self):
+        """Ghi nhận request thành công (hoặc lỗi không do host)"""
+        with self._condition:
+            if self.state != STATE_CLOSED:
+                logger.info(f"Circuit {self.host}: host hoạt động lại")
+            self.state = STATE_CLOSED
+            self._failures = 0
+            self._probing = False
+            self._condition.notify_all()
+
+    def record_failure(self):
+        """Ghi nhận lỗi tạm thời, tạm dừng host nếu vượt ngưỡng"""
+        with self._condition:
+            self._failures += 1
+            if self.state == STATE_HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != STATE_OPEN:
+                    logger.warning(f"Circuit {self.host}: tạm dừng {self.reset_timeout:.0f}s sau {self._failures} lỗi liên tiếp")
+                self.state = STATE_OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+                self._condition.notify_all()
+
+
+def get_circuit_breaker(url):
+    """
+    Lấy circuit breaker của host (tạo mới nếu chưa có)
+
+    Args:
+        url: URL hoặc host
+
+    Returns:
+        CircuitBreaker: Breaker dùng chung trong tiến trình
+    """
+    host = urlparse(url).netloc or url
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(host)
+            _breakers[host] = breaker
+        return breaker
+
+
+def call_with_retry(func, url, policy=None, breaker=None):
+    """
+    Gọi func() cho một URL với retry và circuit breaker của host
+
+    Args:
+        func: Hàm không tham số thực hiện request
+        url: URL của request (dùng cho log và chọn breaker)
+        policy: RetryPolicy (mặc định DEFAULT_POLICY)
+        breaker: CircuitBreaker (mặc định theo host của url)
+
+    Returns:
+        Kết quả của func()
+
+    Raises:
+        Exception: Lỗi cuối cùng khi hết lượt thử hoặc lỗi không thể thử lại
+    """
+    policy = policy or DEFAULT_POLICY
+    breaker = breaker or get_circuit_breaker(url)
+
+    for attempt in range(1, policy.max_attempts + 1):
+        breaker.acquire()
+        try:
+            result = func()
+        except Exception as e:
+            if not is_retryable(e):
+                # Lỗi của riêng trang: host vẫn phản hồi bình thường
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            if attempt >= policy.max_attempts:
+                logger.error(f"Không thể truy cập {url} sau {attempt} lần thử: {e}")
+                raise
+            delay = policy.delay(attempt)
+            logger.warning(f"Lỗi tạm thời khi truy cập {url}, thử lại lần {attempt + 1}/{policy.max_attempts} sau {delay:.1f}s: {e}")
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
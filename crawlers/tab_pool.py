@@ -0,0 +1,179 @@
+"""
+Chạy nhiều tab trong một tiến trình Chrome
+
+Mỗi Chrome (kèm renderer, GPU process...) tốn hàng trăm MB, trong khi một tab mới chỉ tốn
+thêm một renderer. TabPool mở nhiều tab trên cùng một driver, phát URL cho các tab rảnh
+để chúng tải song song, rồi trả lại từng trang khi đã sẵn sàng để crawler trích xuất.
+"""
+import time
+import logging
+from collections import deque
+
+from crawlers.driver_config import DEFAULT_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Số vòng tab mỗi Chrome xử lý trong một tác vụ ở chế độ nhiều tab
+BATCH_ROUNDS = 5
+
+# Trang mới không còn cờ __tabPoolPending (cờ được đặt trên document cũ trước khi chuyển trang)
+READY_SCRIPT = """
+if (window.__tabPoolPending) return false;
+if (document.readyState === 'loading') return false;
+return !arguments[0] || document.querySelector(arguments[0]) !== null;
+"""
+
+
+class TabPool:
+    """
+    Quản lý nhiều tab trên một WebDriver và phân phối trang cho các tab
+    """
+
+    def __init__(self, driver, tab_count=4, ready_selector=None, page_timeout=DEFAULT_TIMEOUT, poll_interval=0.2):
+        """
+        Khởi tạo TabPool
+
+        Args:
+            driver: WebDriver đã tạo
+            tab_count: Số tab tải đồng thời
+            ready_selector: CSS selector cho biết trang đã có dữ liệu cần lấy (tùy chọn)
+            page_timeout: Thời gian chờ tối đa cho một trang (giây)
+            poll_interval: Khoảng nghỉ giữa các lần kiểm tra khi chưa tab nào sẵn sàng (giây)
+        """
+        self.driver = driver
+        self.tab_count = max(1, tab_count)
+        self.ready_selector = ready_selector
+        self.page_timeout = page_timeout
+        self.poll_interval = poll_interval
+        self.handles = []
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
+
+    def open(self):
+        """Mở đủ số tab (tab hiện tại được dùng làm tab đầu tiên)"""
+        self.handles = [self.driver.current_window_handle]
+        while len(self.handles) < self.tab_count:
+            try:
+                self.driver.switch_to.new_window('tab')
+                self.handles.append(self.driver.current_window_handle)
+            except Exception as e:
+                logger.warning(f"Không thể mở thêm tab, dùng {len(self.handles)} tab: {e}")
+                break
+        logger.debug(f"TabPool: đã mở {len(self.handles)} tab")
+
+    def close(self):
+        """Đóng các tab phụ, giữ lại tab đầu tiên"""
+        for handle in self.handles[1:]:
+            try:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            except Exception:
+                pass
+        if self.handles:
+            try:
+                self.driver.switch_to.window(self.handles[0])
+            except Exception:
+                pass
+        self.handles = self.handles[:1]
+
+    def _navigate(self, handle, url):
+        """Cho tab bắt đầu tải URL mà không chờ tải xong"""
+        try:
+            self.driver.switch_to.window(handle)
+            self.driver.execute_script("window.__tabPoolPending = true; window.location.href = arguments[0];", url)
+            return True
+        except Exception as e:
+            logger.warning(f"TabPool: không thể mở {url}: {e}")
+            return False
+
+    def _is_ready(self, handle):
+        """Kiểm tra tab đã tải xong trang mới và có selector cần thiết chưa"""
+        try:
+            self.driver.switch_to.window(handle)
+            return bool(self.driver.execute_script(READY_SCRIPT, self.ready_selector))
+        except Exception:
+            # Tab đang chuyển trang, thử lại ở lượt sau
+            return False
+
+    def run(self, items, url_of):
+        """
+        Tải các trang trên các tab và trả lần lượt từng trang đã sẵn sàng
+
+        Khi nhận được (item, loaded), driver đang ở tab chứa trang của item; tab đó chỉ được
+        giao trang mới sau khi vòng lặp của bên gọi chuyển sang phần tử tiếp theo.
+
+        Args:
+            items: Danh sách phần tử cần xử lý
+            url_of: Hàm lấy URL từ phần tử
+
+        Yields:
+            tuple: (item, loaded) - loaded là False nếu trang lỗi hoặc quá thời gian chờ
+        """
+        if not self.handles:
+            self.open()
+
+        pending = deque(items)
+        idle = list(self.handles)
+        loading = {}
+
+        while pending or loading:
+            # Giao trang cho các tab rảnh
+            while idle and pending:
+                handle = idle.pop()
+                item = pending.popleft()
+                if self._navigate(handle, url_of(item)):
+                    loading[handle] = (item, time.monotonic())
+                else:
+                    idle.append(handle)
+                    yield item, False
+
+            # Tìm tab đã sẵn sàng hoặc quá thời gian chờ
+            finished = None
+            loaded = False
+            for handle, (item, started) in list(loading.items()):
+                if self._is_ready(handle):
+                    finished, loaded = handle, True
+                    break
+                if time.monotonic() - started > self.page_timeout:
+                    logger.warning(f"TabPool: quá thời gian chờ trang {url_of(item)}")
+                    try:
+                        self.driver.execute_script("window.stop();")
+                    except Exception:
+                        pass
+                    finished = handle
+                    break
+
+            if finished is None:
+                time.sleep(self.poll_interval)
+                continue
+
+            item, _ = loading.pop(finished)
+            yield item, loaded
+            idle.append(finished)
+
+
+def tab_group_size(tab_count):
+    """Số truyện trong một tác vụ ở chế độ nhiều tab"""
+    return max(1, tab_count) * BATCH_ROUNDS
+
+
+def tab_task_timeout(task_timeout):
+    """
+    Hạn chót cho một tác vụ ở chế độ nhiều tab
+
+    task_timeout là hạn cho một truyện; các tab trong một vòng tải song song nên mỗi vòng
+    của nhóm được một task_timeout.
+
+    Args:
+        task_timeout: Hạn chót của một truyện (giây)
+
+    Returns:
+        float: Hạn chót cho cả nhóm tab_group_size truyện (giây)
+    """
+    return task_timeout * BATCH_ROUNDS
@@ -8,18 +8,20 @@ import gc
 import signal
 import psutil
 import multiprocessing
-from multiprocessing import Pool, Value, current_process
-from functools import wraps
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
+from multiprocessing import Value, current_process
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, WebDriverException, NoSuchElementException, StaleElementReferenceException
+from selenium.common.exceptions import WebDriverException, NoSuchElementException, StaleElementReferenceException
 from utils.sqlite_helper import SQLiteHelper
+from crawlers.dom_extract import extract_items, field
+from utils import metrics
+from crawlers.driver_config import create_chrome_driver, load_page
+from crawlers.tab_pool import TabPool, tab_group_size, tab_task_timeout
+from crawlers.comment_coverage import CommentScan, STOP_END, STOP_TIME_LIMIT, STOP_STORED, STOP_PAGE_LIMIT, STOP_ERROR
+from crawlers.admission import get_admission_controller, set_admission_controller
+from crawlers.worker_pool import run_worker_pool, DEFAULT_TASK_TIMEOUT
 from datetime import datetime, timedelta
-from tempfile import mkdtemp
 
 logger = logging.getLogger(__name__)
 
@@ -27,31 +29,24 @@ logger = logging.getLogger(__name__)
 MAX_MEMORY_PERCENT = 80  # Giới hạn % RAM sử dụng
 MAX_DRIVER_INSTANCES = 25  # Giới hạn số lượng driver đồng thời
 DEFAULT_TIMEOUT = 30  # Timeout mặc định (giây)
-MAX_RETRIES = 3  
 
-# Semaphore để kiểm soát số lượng driver
-driver_semaphore = multiprocessing.Semaphore(MAX_DRIVER_INSTANCES)
+# Selector cho biết trang chi tiết truyện đã tải xong
+DETAIL_READY_SELECTOR = ".status.row .col-xs-9"
+
+# Cấu trúc DOM cho trích xuất hàng loạt (xem crawlers/dom_extract.py)
+LISTING_ITEM_SELECTORS = ["ul.list_grid.grid li"]
+LISTING_FIELDS = {
+    "name": field(".book_info .book_name.qtip a", attr="title", text=False),
+    "link": field(".book_info .book_name.qtip a", attr="href", text=False),
+    "chapter": field(".last_chapter", attr="title")
+}
+COMMENT_ITEM_SELECTORS = [".list-comment article", ".item-comment", ".comment-container .comment"]
+COMMENT_FIELDS = {
+    "name": field(".outline-content-comment > div:nth-child(1) > strong", ".user-name", ".comment-info .name"),
+    "content": field(".outline-content-comment > div.content-comment > div > p", ".comment-content p", ".content"),
+    "time": field(".action-comment.time i", ".comment-time", ".time", attr="datetime")
+}
 
-# Decorator để thêm retry mechanism
-def retry(max_retries=MAX_RETRIES, delay=2):
-    """Decorator để thử lại các hàm nếu chúng thất bại"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            retries = 0
-            while retries < max_retries:
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    retries += 1
-                    if retries >= max_retries:
-                        logger.error(f"Hàm {func.__name__} thất bại sau {max_retries} lần thử: {e}")
-                        raise
-                    logger.warning(f"Thử lại {func.__name__} lần {retries}/{max_retries} sau {delay} giây. Lỗi: {e}")
-                    time.sleep(delay * (2 ** (retries - 1)))  # Exponential backoff
-            return None
-        return wrapper
-    return decorator
 
 # Hàm kiểm tra RAM và tài nguyên hệ thống
 def check_system_resources():
@@ -78,27 +73,22 @@ def setup_signal_handlers():
         signal.signal(signal.SIGTERM, handle_sigterm)
 
 # Hàm khởi tạo riêng cho mỗi process
-def init_process():
+def init_process(admission_controller=None):
     """Khởi tạo các thiết lập cho mỗi process"""
     multiprocessing.current_process().daemon = False
     setup_signal_handlers()
+    # Dùng chung giới hạn driver với process chính (semaphore tạo lúc import không dùng chung được khi spawn)
+    set_admission_controller(admission_controller)
 
 # Định nghĩa hàm xử lý truyện ở cấp độ module
 def process_comic_worker(params):
     """Hàm để xử lý một truyện trong một process riêng biệt"""
     comic, db_path, base_url, worker_id = params
 
-    time.sleep(random.uniform(1, 3) * (worker_id % 5 + 1) / 5)
-
     driver = None
     sqlite_helper = None
     
     try:
-        # Kiểm tra tài nguyên trước khi tạo driver
-        if not check_system_resources():
-            logger.warning(f"Worker {worker_id}: Tài nguyên hệ thống không đủ, bỏ qua truyện {comic.get('ten_truyen', '')}")
-            return None
-        
         # Mở kết nối database
         try:
             sqlite_helper = SQLiteHelper(db_path)
@@ -106,11 +96,12 @@ def process_comic_worker(params):
             logger.error(f"Worker {worker_id}: Không thể kết nối đến database: {e}")
             return None
         
-        # Giới hạn số lượng driver đồng thời
-        with driver_semaphore:
+        # Chờ slot driver chung cho mọi process (xếp hàng khi thiếu RAM/CPU thay vì bỏ qua truyện)
+        with get_admission_controller().driver_slot() as ticket:
             # Tạo driver mới cho mỗi process
             try:
                 driver = create_chrome_driver()
+                get_admission_controller().record_driver(ticket, driver)
                 logger.debug(f"Worker {worker_id}: Đã tạo driver thành công")
             except Exception as e:
                 logger.error(f"Worker {worker_id}: Không thể tạo driver: {e}")
@@ -120,61 +111,14 @@ def process_comic_worker(params):
                 comic_url = comic["link_truyen"]
                 logger.debug(f"Worker {worker_id}: Đang crawl chi tiết truyện: {comic_url}")
                 
-                # Giới hạn số lần thử truy cập URL
-                for attempt in range(5):
-                    try:
-                        driver.get(comic_url)
-                        WebDriverWait(driver, 10).until(
-                            EC.presence_of_element_located((By.CSS_SELECTOR, ".status.row .col-xs-9"))
-                        )
-                        break
-                    except TimeoutException:
-                        logger.warning(f"Worker {worker_id}: Timeout khi truy cập {comic_url}, thử lần {attempt + 1}/5")
-                        time.sleep(random.uniform(2, 4))
-                    except WebDriverException as e:
-                        logger.warning(f"Worker {worker_id}: Lỗi WebDriver khi truy cập {comic_url}, thử lần {attempt + 1}/5: {e}")
-                        time.sleep(random.uniform(2, 4))
-                    except Exception as e:
-                        logger.warning(f"Worker {worker_id}: Lỗi không xác định khi truy cập {comic_url}, thử lần {attempt + 1}/5: {e}")
-                        time.sleep(random.uniform(2, 4))
-                else:
-                    logger.error(f"Worker {worker_id}: Không thể truy cập trang sau 5 lần thử: {comic_url}")
-                    return None
-                
-                # Cập nhật các selector theo đúng thông tin bạn đã cung cấp
-                try:
-                    comic["tac_gia"] = get_text_safe(driver, "li.author.row a.org", "N/A")
-                    comic["trang_thai"] = get_text_safe(driver, ".status.row .col-xs-9", "N/A")
-                    comic["luot_thich"] = get_text_safe(driver, ".row .col-xs-9.number-like", "0")
-                    comic["luot_theo_doi"] = get_text_safe(driver, "li:nth-child(4) .col-xs-9", "0")
-                    comic["luot_xem"] = get_text_safe(driver, "li:nth-child(5) .col-xs-9", "0")
-                except Exception as e:
-                    logger.warning(f"Worker {worker_id}: Lỗi khi lấy thông tin cơ bản: {e}")
-                
-                # # Cố gắng nhấp vào "Xem thêm" nếu có để lấy mô tả đầy đủ
-                # try:
-                #     readmore_button = WebDriverWait(driver, 3).until(
-                #         EC.element_to_be_clickable((By.CSS_SELECTOR, ".story-detail-info.detail-content a.morelink"))
-                #     )
-                #     readmore_button.click()
-                #     time.sleep(1)
-                # except Exception as e:
-                #     logger.debug(f"Worker {worker_id}: Không tìm thấy nút 'Xem thêm' hoặc không thể click: {e}")
-                
-                # Lấy mô tả
+                # Retry theo request và circuit breaker của host: lỗi chỉ làm mất trang này
                 try:
-                    comic["mo_ta"] = get_text_safe(driver, ".story-detail-info.detail-content", "")
+                    load_page(driver, comic_url, DETAIL_READY_SELECTOR)
                 except Exception as e:
-                    logger.warning(f"Worker {worker_id}: Không thể lấy mô tả: {e}")
-                    comic["mo_ta"] = ""
+                    logger.error(f"Worker {worker_id}: Không thể truy cập trang {comic_url}: {e}")
+                    return None
                 
-                # Chuyển các giá trị sang số
-                try:
-                    comic["luot_xem"] = extract_number(comic["luot_xem"])
-                    comic["luot_thich"] = extract_number(comic["luot_thich"])
-                    comic["luot_theo_doi"] = extract_number(comic["luot_theo_doi"])
-                except Exception as e:
-                    logger.warning(f"Worker {worker_id}: Lỗi khi chuyển đổi giá trị số: {e}")
+                parse_comic_details(driver, comic, worker_id)
                 
                 # Lưu vào database
                 try:
@@ -207,6 +151,118 @@ def process_comic_worker(params):
             except:
                 pass
 
+def parse_comic_details(driver, comic, worker_id=0):
+    """
+    Lấy thông tin chi tiết từ trang truyện đang mở trên driver
+
+    Args:
+        driver: WebDriver đang ở trang truyện
+        comic: Dictionary thông tin truyện (được cập nhật tại chỗ)
+        worker_id: ID worker để ghi log
+
+    Returns:
+        dict: comic đã cập nhật
+    """
+    # Cập nhật các selector theo đúng thông tin bạn đã cung cấp
+    try:
+        comic["tac_gia"] = get_text_safe(driver, "li.author.row a.org", "N/A")
+        comic["trang_thai"] = get_text_safe(driver, ".status.row .col-xs-9", "N/A")
+        comic["luot_thich"] = get_text_safe(driver, ".row .col-xs-9.number-like", "0")
+        comic["luot_theo_doi"] = get_text_safe(driver, "li:nth-child(4) .col-xs-9", "0")
+        comic["luot_xem"] = get_text_safe(driver, "li:nth-child(5) .col-xs-9", "0")
+    except Exception as e:
+        logger.warning(f"Worker {worker_id}: Lỗi khi lấy thông tin cơ bản: {e}")
+    
+    # # Cố gắng nhấp vào "Xem thêm" nếu có để lấy mô tả đầy đủ
+    # try:
+    #     readmore_button = WebDriverWait(driver, 3).until(
+    #         EC.element_to_be_clickable((By.CSS_SELECTOR, ".story-detail-info.detail-content a.morelink"))
+    #     )
+    #     readmore_button.click()
+    #     time.sleep(1)
+    # except Exception as e:
+    #     logger.debug(f"Worker {worker_id}: Không tìm thấy nút 'Xem thêm' hoặc không thể click: {e}")
+    
+    # Lấy mô tả
+    try:
+        comic["mo_ta"] = get_text_safe(driver, ".story-detail-info.detail-content", "")
+    except Exception as e:
+        logger.warning(f"Worker {worker_id}: Không thể lấy mô tả: {e}")
+        comic["mo_ta"] = ""
+    
+    # Chuyển các giá trị sang số
+    try:
+        comic["luot_xem"] = extract_number(comic["luot_xem"])
+        comic["luot_thich"] = extract_number(comic["luot_thich"])
+        comic["luot_theo_doi"] = extract_number(comic["luot_theo_doi"])
+    except Exception as e:
+        logger.warning(f"Worker {worker_id}: Lỗi khi chuyển đổi giá trị số: {e}")
+    
+    return comic
+
+def process_comic_tabs_worker(params):
+    """
+    Xử lý một nhóm truyện trong một process với một Chrome nhiều tab
+
+    Args:
+        params: Tuple (comics, db_path, base_url, worker_id, tab_count)
+
+    Returns:
+        list: Danh sách truyện đã crawl thành công
+    """
+    comics, db_path, base_url, worker_id, tab_count = params
+    
+    driver = None
+    sqlite_helper = None
+    results = []
+    
+    try:
+        try:
+            sqlite_helper = SQLiteHelper(db_path)
+        except Exception as e:
+            logger.error(f"Worker {worker_id}: Không thể kết nối đến database: {e}")
+            return results
+        
+        # Chờ slot driver chung cho mọi process (xếp hàng khi thiếu RAM/CPU thay vì bỏ qua truyện)
+        with get_admission_controller().driver_slot() as ticket:
+            try:
+                driver = create_chrome_driver()
+                get_admission_controller().record_driver(ticket, driver)
+            except Exception as e:
+                logger.error(f"Worker {worker_id}: Không thể tạo driver: {e}")
+                return results
+            
+            with TabPool(driver, tab_count, ready_selector=DETAIL_READY_SELECTOR) as tab_pool:
+                for comic, loaded in tab_pool.run(comics, lambda c: c["link_truyen"]):
+                    if not loaded:
+                        logger.error(f"Worker {worker_id}: Không thể tải trang: {comic.get('link_truyen')}")
+                        continue
+                    
+                    try:
+                        parse_comic_details(driver, comic, worker_id)
+                        sqlite_helper.save_comic_to_db(comic, "Truyentranh3q")
+                        results.append(comic)
+                        logger.info(f"Worker {worker_id}: Hoàn thành lưu truyện {comic.get('ten_truyen', '')}")
+                    except Exception as e:
+                        logger.error(f"Worker {worker_id}: Lỗi khi xử lý truyện {comic.get('ten_truyen', '')}: {e}")
+        
+        return results
+    
+    except Exception as e:
+        logger.error(f"Worker {worker_id}: Lỗi không xác định: {e}")
+        return results
+    finally:
+        if driver:
+            try:
+                driver.quit()
+            except:
+                pass
+        if sqlite_helper:
+            try:
+                sqlite_helper.close_all_connections()
+            except:
+                pass
+
 # Các hàm trợ giúp định nghĩa ở cấp module
 def get_text_safe(element, selector, default="N/A"):
     """Trích xuất nội dung văn bản an toàn từ phần tử"""
@@ -347,76 +403,6 @@ def parse_relative_time(time_text):
         logger.error(f"Lỗi khi phân tích thời gian '{time_text}': {e}")
         return datetime.now()
 
-def create_chrome_driver():
-    """Cấu hình Chrome WebDriver tối ưu"""
-    chrome_options = Options()
-    
-    # Chạy chế độ headless nếu không cần giao diện
-    chrome_options.add_argument("--headless")  
-    
-    # Tắt các tính năng không cần thiết
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--disable-accelerated-2d-canvas")
-    chrome_options.add_argument("--disable-accelerated-video-decode")
-    chrome_options.add_argument("--disable-accelerated-video-encode")
-    chrome_options.add_argument("--disable-gpu-compositing")
-    chrome_options.add_argument("--disable-webgl")
-    chrome_options.add_argument("--disable-webrtc-hw-encoding")
-    chrome_options.add_argument("--disable-webrtc-hw-decoding")
-    chrome_options.add_argument("--disable-gl-drawing-for-tests")
-    chrome_options.add_argument("--disable-usb") 
-    chrome_options.add_argument("--disable-features=WebUSB,UsbChooserUI")
-    chrome_options.add_argument("--memory-model=low")
-    chrome_options.add_argument("--disable-extensions")
-    chrome_options.add_argument("--disable-software-rasterizer")
-    chrome_options.add_argument("--disable-web-security")
-    chrome_options.add_argument("--disable-popup-blocking")
-    chrome_options.add_argument(f'--user-data-dir={mkdtemp()}')
-    chrome_options.add_experimental_option('excludeSwitches', ["enable-automation", "enable-logging"])
-    chrome_options.add_experimental_option('useAutomationExtension', False)
-    
-    # Thiết lập không tải hình ảnh để giảm tài nguyên
-    prefs = {
-        'profile.default_content_settings.images': 2,
-        'profile.managed_default_content_settings.images': 2,
-        'plugins.plugins_disabled': ['Chrome PDF Viewer'],
-        'hardware_acceleration_mode.enabled': False,
-        'profile.hardware_acceleration_enabled': False,
-    }
-    chrome_options.add_experimental_option('prefs', prefs)
-
-    # Vô hiệu hóa logging để tránh crash
-    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
-    os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
-    os.environ['TF_FORCE_GPU_ALLOW_GROWTH'] = 'false'
-    os.environ['TF_USE_LEGACY_CPU'] = '0'
-    os.environ['TF_DISABLE_MKL'] = '1'
-    os.environ['PYTHONWARNINGS'] = 'ignore::DeprecationWarning,ignore::UserWarning'
-
-    try:
-        service = Service(log_path=os.devnull)  
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        
-        # Thêm timeout
-        driver.set_page_load_timeout(DEFAULT_TIMEOUT)
-        driver.set_script_timeout(DEFAULT_TIMEOUT)
-        return driver
-    except Exception as e:
-        logger.error(f"Lỗi khi khởi tạo Chrome driver: {e}")
-        try:
-            # Fallback với ít tùy chọn hơn
-            fallback_options = Options()
-            fallback_options.add_argument("--headless")
-            fallback_options.add_argument("--no-sandbox")
-            fallback_options.add_argument("--disable-gpu")
-            fallback_options.add_argument("--disable-dev-shm-usage")
-            return webdriver.Chrome(options=fallback_options)
-        except Exception as e2:
-            logger.critical(f"Lỗi nghiêm trọng khi khởi tạo Chrome driver: {e2}")
-            raise RuntimeError(f"Không thể khởi tạo Chrome driver: {e2}")
-
 class Truyentranh3qCrawler(BaseCrawler):
     """Crawler cho trang Truyentranh3q sử dụng multiprocessing"""
     
@@ -453,7 +439,6 @@ class Truyentranh3qCrawler(BaseCrawler):
         
         logger.info(f"Khởi tạo Truyentranh3qCrawler với base_url={self.base_url}")
     
-    @retry(max_retries=2)
     def get_comic_listings(self, max_pages=None, progress_callback=None):
         """Lấy danh sách truyện từ các trang danh sách"""
         all_comics = []
@@ -485,25 +470,14 @@ class Truyentranh3qCrawler(BaseCrawler):
                     url = f"{self.base_url}/danh-sach/truyen-moi-cap-nhat?page={page_num}"
                     logger.info(f"Đang crawl trang {page_num}: {url}")
                     
-                    for attempt in range(3):
-                        try:
-                            driver.get(url)
-                            WebDriverWait(driver, 10).until(
-                                EC.presence_of_all_elements_located((By.CSS_SELECTOR, "ul.list_grid.grid li"))
-                            )
-                            break
-                        except TimeoutException:
-                            logger.warning(f"Timeout khi truy cập {url}, thử lần {attempt + 1}/3")
-                            time.sleep(random.uniform(2, 4))
-                        except WebDriverException as e:
-                            logger.warning(f"Lỗi WebDriver khi truy cập {url}, thử lần {attempt + 1}/3: {e}")
-                            time.sleep(random.uniform(2, 4))
-                    else:
-                        logger.error(f"Không thể truy cập trang sau 3 lần thử: {url}")
+                    try:
+                        load_page(driver, url, "ul.list_grid.grid li")
+                    except Exception as e:
+                        logger.error(f"Không thể truy cập trang {url}: {e}")
                         break
                     
-                    # Lấy danh sách các khối truyện với selector đúng
-                    story_blocks = driver.find_elements(By.CSS_SELECTOR, "ul.list_grid.grid li")
+                    # Lấy toàn bộ khối truyện của trang trong một lần gọi script
+                    story_blocks = extract_items(driver, LISTING_ITEM_SELECTORS, LISTING_FIELDS)
 
                     # Nếu không tìm thấy truyện nào, thoát khỏi vòng lặp
                     if not story_blocks:
@@ -514,45 +488,15 @@ class Truyentranh3qCrawler(BaseCrawler):
                     page_stories = []
                     
                     for story_block in story_blocks:
-                        try:
-                            # Lấy thông tin tên và link truyện với selector đúng
-                            try:
-                                name_elem = story_block.find_element(By.CSS_SELECTOR, ".book_info .book_name.qtip a")
-                                story_name = name_elem.get_attribute("title")
-                                story_link = name_elem.get_attribute("href")
-                            except (NoSuchElementException, StaleElementReferenceException) as e:
-                                logger.debug(f"Lỗi khi lấy tên và link truyện: {e}")
-                                continue
-                            
-                            # Lấy thông tin chương với selector đúng
-                            chapter_info = "Chapter 0"  # Giá trị mặc định
-                            try:
-                                chapter_elements = story_block.find_elements(By.CSS_SELECTOR, ".last_chapter")
-                                if chapter_elements:
-                                    chapter_title = chapter_elements[0].get_attribute("title") or chapter_elements[0].text.strip()
-                                    if chapter_title:
-                                        chapter_info = chapter_title
-                            except (NoSuchElementException, StaleElementReferenceException) as e:
-                                logger.debug(f"Lỗi khi lấy thông tin chương: {e}")
-                            
-                            # Trích xuất số chương
-                            chapter_count = extract_chapter_number(chapter_info)
-                            
-                            # Tạo đối tượng truyện
-                            comic_data = {
-                                "ten_truyen": story_name,
-                                "link_truyen": story_link,
-                                "so_chuong": chapter_count,
-                                "nguon": "Truyentranh3q"
-                            }
-                            
-                            page_stories.append(comic_data)
-                        except StaleElementReferenceException:
-                            logger.warning("Phần tử không còn tồn tại trong DOM, bỏ qua")
-                            continue
-                        except Exception as e:
-                            logger.error(f"Lỗi khi xử lý truyện: {e}")
+                        if not story_block["link"]:
                             continue
+                        
+                        page_stories.append({
+                            "ten_truyen": story_block["name"],
+                            "link_truyen": story_block["link"],
+                            "so_chuong": extract_chapter_number(story_block["chapter"] or "Chapter 0"),
+                            "nguon": "Truyentranh3q"
+                        })
                     
                     logger.info(f"Trang {page_num}: Đã tìm thấy {len(page_stories)} truyện")
                     all_comics.extend(page_stories)
@@ -597,9 +541,9 @@ class Truyentranh3qCrawler(BaseCrawler):
         logger.info(f"Tổng cộng đã tìm thấy {len(valid_comics)} truyện hợp lệ để crawl (từ {len(all_comics)} kết quả ban đầu)")
         return valid_comics
     
-    @retry(max_retries=2)
     def crawl_basic_data(self, progress_callback=None):
         """Crawl dữ liệu cơ bản của truyện từ trang Truyentranh3q với multiprocessing"""
+        metrics.set_site("Truyentranh3q")
         start_time = time.time()
         comics_count = 0
         
@@ -622,58 +566,42 @@ class Truyentranh3qCrawler(BaseCrawler):
                 logger.warning("Không lấy được truyện nào, kết thúc quá trình crawl")
                 return {"count": 0, "time_taken": time.time() - start_time, "website": "Truyentranh3q"}
             
-            # Xử lý theo batch để kiểm soát tài nguyên tốt hơn
-            batch_size = min(50, len(raw_comics))
-            
-            for i in range(0, len(raw_comics), batch_size):
-                if not check_system_resources():
-                    logger.warning("Tài nguyên hệ thống thấp, tạm dừng để phục hồi")
-                    time.sleep(10) 
-                
-                batch = raw_comics[i:i+batch_size]
-                logger.info(f"Xử lý batch {i//batch_size + 1}/{(len(raw_comics)-1)//batch_size + 1} ({len(batch)} truyện)")
-                
-                # Chuẩn bị tham số cho worker
-                worker_params = [(comic, self.db_manager.db_folder, self.base_url, idx) for idx, comic in enumerate(batch)]
-                
-                # Tạo và quản lý pool processes
-                try:
-                    dynamic_worker_count = max(self.worker_count, 1)
-                    
-                    with Pool(processes=dynamic_worker_count, initializer=init_process, maxtasksperchild=1) as pool:
-                        try:
-                            # Sử dụng map thay vì map_async để đơn giản hóa
-                            results = pool.map(process_comic_worker, worker_params, chunksize=1)
-                            
-                            valid_results = [r for r in results if r is not None]
-                            
-                            # Cập nhật số lượng truyện đã xử lý
-                            batch_comics_count = len(valid_results)
-                            comics_count += batch_comics_count
-                            
-                            # Cập nhật biến đếm shared
-                            with self.processed_comics.get_lock():
-                                self.processed_comics.value += batch_comics_count
-                            
-                            logger.info(f"Kết thúc batch {i//batch_size + 1}: Đã xử lý {batch_comics_count}/{len(batch)} truyện trong batch")
-                            
-                            # Cập nhật tiến độ
-                            if progress_callback and len(raw_comics) > 0:
-                                progress = 25 + (self.processed_comics.value / len(raw_comics)) * 75
-                                progress_callback.emit(int(min(progress, 100)))
-                            
-                        except Exception as e:
-                            logger.error(f"Lỗi khi xử lý map trong pool: {e}")
-                            
-                except Exception as e:
-                    logger.error(f"Lỗi khi xử lý batch: {e}")
+            # Chuẩn bị tác vụ; chế độ nhiều tab: mỗi tác vụ là một nhóm truyện cho một Chrome nhiều tab
+            db_path = self.db_manager.db_folder
+            tab_count = self.config_manager.get("tabs_per_browser", 1)
+            task_timeout = self.config_manager.get("task_timeout", DEFAULT_TASK_TIMEOUT)
+            if tab_count > 1:
+                # Hạn chót tính cho cả nhóm truyện, không phải một truyện
+                group_size = tab_group_size(tab_count)
+                task_timeout = tab_task_timeout(task_timeout)
+                tasks = [(raw_comics[k:k + group_size], db_path, self.base_url, n, tab_count)
+                         for n, k in enumerate(range(0, len(raw_comics), group_size))]
+                worker = process_comic_tabs_worker
+            else:
+                tasks = [(comic, db_path, self.base_url, idx) for idx, comic in enumerate(raw_comics)]
+                worker = process_comic_worker
+            
+            # Một pool dùng suốt lượt crawl, cấp việc liên tục theo giới hạn song song của host
+            for task, result in run_worker_pool(worker, tasks, self.get_worker_concurrency(),
+                                                initializer=init_process, initargs=(get_admission_controller(),),
+                                                task_timeout=task_timeout,
+                                                site="Truyentranh3q"):
+                if tab_count > 1:
+                    saved_count = len(result or [])
+                else:
+                    saved_count = 1 if result is not None else 0
+                comics_count += saved_count
                 
-                # Gọi garbage collector
-                gc.collect()
+                # Cập nhật biến đếm shared
+                with self.processed_comics.get_lock():
+                    self.processed_comics.value += saved_count
                 
-                # Pause dài hơn giữa các batch để giải phóng tài nguyên
-                logger.info("Nghỉ giữa các batch để giải phóng tài nguyên...")
-                time.sleep(10)  # Tăng thời gian nghỉ để tránh lỗi tài nguyên
+                # Cập nhật tiến độ
+                if progress_callback and len(raw_comics) > 0:
+                    progress = 25 + (self.processed_comics.value / len(raw_comics)) * 75
+                    progress_callback.emit(int(min(progress, 100)))
+            
+            logger.info(f"Kết thúc crawl chi tiết: Đã xử lý {comics_count}/{len(raw_comics)} truyện")
                 
         except Exception as e:
             logger.error(f"Lỗi trong quá trình crawl: {e}")
@@ -697,36 +625,26 @@ class Truyentranh3qCrawler(BaseCrawler):
             "website": "Truyentranh3q"
         }
     
-    @retry(max_retries=2)
     def crawl_comic_details(self, comic):
         """Crawl thông tin chi tiết của một truyện (phiên bản truyền thống dùng cho API)"""
         driver = None
+        ticket = None
         
         try:
-            # Kiểm tra tài nguyên trước khi tạo driver
-            if not check_system_resources():
-                logger.warning(f"Tài nguyên hệ thống không đủ, bỏ qua truyện {comic.get('ten_truyen', '')}")
-                return comic
+            # Chờ slot driver chung thay vì bỏ qua truyện khi thiếu tài nguyên
+            ticket = get_admission_controller().acquire()
             
             # Khởi tạo driver
             driver = create_chrome_driver()
+            get_admission_controller().record_driver(ticket, driver)
             
             comic_url = comic["link_truyen"]
             logger.debug(f"Đang crawl chi tiết truyện: {comic_url}")
             
-            for attempt in range(5):
-                try:
-                    driver.get(comic_url)
-                    # Cập nhật selector
-                    WebDriverWait(driver, 10).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, "li.author.row a.org"))
-                    )
-                    break
-                except Exception as e:
-                    logger.warning(f"Thử lần {attempt + 1}: {e}")
-                    time.sleep(random.uniform(2, 4))
-            else:
-                logger.error("Không thể truy cập trang sau 5 lần thử")
+            try:
+                load_page(driver, comic_url, "li.author.row a.org")
+            except Exception as e:
+                logger.error(f"Không thể truy cập trang {comic_url}: {e}")
                 if driver:
                     driver.quit()
                 return comic
@@ -764,15 +682,20 @@ class Truyentranh3qCrawler(BaseCrawler):
             # Đảm bảo vẫn trả về đối tượng comic với thông tin cơ bản
         finally:
             if driver:
-                driver.quit()
+                try:
+                    driver.quit()
+                except:
+                    pass
+            get_admission_controller().release(ticket)
                 
         return comic
     
-    @retry(max_retries=2)
     def crawl_comments(self, comic, time_limit=None, days_limit=None):
         """Crawl comment cho một truyện cụ thể"""
+        metrics.set_site("Truyentranh3q")
         driver = None
         all_comments = []
+        seen_comments = set()
         old_comments_count = 0  # Khởi tạo biến ở đầu phương thức để tránh lỗi
         
         try:
@@ -781,8 +704,6 @@ class Truyentranh3qCrawler(BaseCrawler):
             
             if not comic_url or not comic_id:
                 logger.error(f"Không tìm thấy link hoặc ID truyện: {comic.get('ten_truyen', 'Unknown')}")
-                if driver:
-                    driver.quit()
                 return []
             
             if time_limit:
@@ -790,29 +711,27 @@ class Truyentranh3qCrawler(BaseCrawler):
             else:
                 logger.info(f"Crawl tất cả comment cho truyện: {comic.get('ten_truyen')}")
             
-            # Kiểm tra tài nguyên trước khi tạo driver
-            if not check_system_resources():
-                logger.warning("Tài nguyên hệ thống thấp, tạm dừng trước khi tạo driver")
-                time.sleep(5)
-                gc.collect()
+            # Mốc comment mới nhất đã lưu, dừng phân trang khi chạm tới
+            high_water_mark = self.get_comment_high_water_mark(comic_id, "Truyentranh3q", time_limit)
+            scan = CommentScan(time_limit)
+            
+            # Comment nằm sẵn trong HTML, thử lấy qua HTTP trước khi mở Chrome
+            http_comments = self.crawl_comments_http(comic, "Truyentranh3q", parse_relative_time, time_limit, high_water_mark)
+            if http_comments is not None:
+                return http_comments
                 
-            # Khởi tạo WebDriver
-            driver = create_chrome_driver()
+            # Lấy driver (trong batch dùng lại driver của luồng, driver mới chờ slot chung)
+            driver = self.acquire_comment_driver(create_chrome_driver)
             
             try:
+                self.wait_comment_turn()
                 driver.get(comic_url)
             except WebDriverException as e:
                 logger.error(f"Lỗi khi truy cập URL {comic_url}: {str(e)}")
-                if driver:
-                    driver.quit()
                 return []
-        
-            time.sleep(random.uniform(1, 2))  
             
             if "Page not found" in driver.title or "404" in driver.title:
                 logger.error(f"Trang không tồn tại: {comic_url}")
-                if driver:
-                    driver.quit()
                 return []
 
             # Chờ phần tử comment container được tải
@@ -837,26 +756,15 @@ class Truyentranh3qCrawler(BaseCrawler):
                     if page_comment > 1 and page_comment % 5 == 0:
                         if not check_system_resources():
                             logger.warning("Tài nguyên hệ thống thấp, dừng tải thêm comment")
+                            scan.stop(STOP_ERROR)
                             break
                     
-                    # Thử tìm các phần tử comment với nhiều selector khác nhau
-                    comment_elements = []
-                    
-                    # Thử các selector khác nhau để tìm bình luận
-                    selectors = [
-                        ".list-comment article",  # Thử selector này trước
-                        ".item-comment",          # Selector thứ hai
-                        ".comment-container .comment" # Selector thứ ba
-                    ]
-                    
-                    for selector in selectors:
-                        comment_elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                        if comment_elements:
-                            logger.info(f"Đã tìm thấy bình luận với selector: {selector}")
-                            break
+                    # Lấy toàn bộ comment của trang trong một lần gọi script
+                    comment_elements = extract_items(driver, COMMENT_ITEM_SELECTORS, COMMENT_FIELDS)
                     
                     if not comment_elements:
                         logger.info(f"Không tìm thấy comment nào trên trang {page_comment}")
+                        scan.stop(STOP_END)
                         break
                         
                     logger.info(f"Tìm thấy {len(comment_elements)} comment trên trang {page_comment}")
@@ -864,124 +772,62 @@ class Truyentranh3qCrawler(BaseCrawler):
                     # Xử lý từng comment
                     new_comments_found = 0
                     page_old_comments_count = 0
+                    stored_comments_count = 0
                     
                     for comment_elem in comment_elements:
-                        try:
-                            # Thử các selector khác nhau để lấy tên người bình luận
-                            name = None
-                            for name_selector in [
-                                ".outline-content-comment > div:nth-child(1) > strong", 
-                                ".user-name", 
-                                ".comment-info .name"
-                            ]:
-                                try:
-                                    name_elem = comment_elem.find_element(By.CSS_SELECTOR, name_selector)
-                                    if name_elem:
-                                        name = name_elem.text.strip()
-                                        break
-                                except:
-                                    continue
-                            
-                            if not name:
-                                name = "Người dùng ẩn danh"
-                            
-                            # Thử các selector khác nhau để lấy nội dung bình luận
-                            content = None
-                            for content_selector in [
-                                ".outline-content-comment > div.content-comment > div > p",
-                                ".comment-content p",
-                                ".content"
-                            ]:
-                                try:
-                                    content_elem = comment_elem.find_element(By.CSS_SELECTOR, content_selector)
-                                    if content_elem:
-                                        content = content_elem.text.strip()
-                                        break
-                                except:
-                                    continue
-                            
-                            if not content:
-                                content = "N/A"
-                            
-                            # Thử các selector khác nhau để lấy thời gian bình luận
-                            time_text = None
-                            for time_selector in [
-                                ".action-comment.time i",
-                                ".comment-time",
-                                ".time"
-                            ]:
-                                try:
-                                    time_elem = comment_elem.find_element(By.CSS_SELECTOR, time_selector)
-                                    if time_elem:
-                                        time_text = time_elem.get_attribute("datetime") or time_elem.text.strip()
-                                        break
-                                except:
-                                    continue
-                            
-                            # Đảm bảo nội dung bình luận không để trống
-                            if not content or content.strip() == "":
-                                content = "N/A"
-                                
-                            # Đảm bảo tên người bình luận không để trống
-                            if not name or name.strip() == "":
-                                name = "Người dùng ẩn danh"
-                                
-                            comment_time = datetime.now()  
-                            if time_text:
-                                comment_time = parse_relative_time(time_text)
+                        name = comment_elem["name"] or "Người dùng ẩn danh"
+                        content = comment_elem["content"] or "N/A"
+                        time_text = comment_elem["time"]
                             
-                            if time_limit and comment_time < time_limit:
-                                logger.debug(f"Comment quá cũ ({time_text}), bỏ qua")
-                                page_old_comments_count += 1
-                                old_comments_count += 1
-                                continue
-                            
-                            # Loại bỏ các ký tự đặc biệt có thể gây lỗi SQL
-                            content = content.replace("'", "''").replace('"', '""')
-                            name = name.replace("'", "''").replace('"', '""')
-                            
-                            # Giới hạn độ dài để tránh lỗi database
-                            if len(content) > 2000:
-                                content = content[:1997] + "..."
-                                
-                            if len(name) > 100:
-                                name = name[:97] + "..."
-                            
-                            # Tạo đối tượng comment
-                            comment_data = {
-                                "ten_nguoi_binh_luan": name,
-                                "noi_dung": content,
-                                "comic_id": comic_id,
-                                "thoi_gian_binh_luan": comment_time.strftime("%Y-%m-%d %H:%M:%S"),
-                                "thoi_gian_cap_nhat": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                            }
-                            
-                            # Kiểm tra trùng lặp trước khi thêm
-                            is_duplicate = False
-                            for existing in all_comments:
-                                if (existing["ten_nguoi_binh_luan"] == name and 
-                                    existing["noi_dung"] == content):
-                                    is_duplicate = True
-                                    break
-                            
-                            if not is_duplicate:
-                                all_comments.append(comment_data)
-                                new_comments_found += 1
-                                
-                        except (StaleElementReferenceException, NoSuchElementException) as e:
-                            logger.debug(f"Phần tử comment không còn tồn tại: {e}")
+                        comment_time = None  # Không có thời gian thì lưu NULL
+                        if time_text:
+                            comment_time = parse_relative_time(time_text)
+                        scan.see(comment_time)
+                        
+                        if time_limit and comment_time and comment_time < time_limit:
+                            logger.debug(f"Comment quá cũ ({time_text}), bỏ qua")
+                            page_old_comments_count += 1
+                            old_comments_count += 1
                             continue
-                        except Exception as e:
-                            logger.error(f"Lỗi khi xử lý comment: {str(e)}")
+                        
+                        if high_water_mark and comment_time and comment_time <= high_water_mark:
+                            stored_comments_count += 1
+                        
+                        # Giới hạn độ dài để tránh lỗi database
+                        if len(content) > 2000:
+                            content = content[:1997] + "..."
+                            
+                        if len(name) > 100:
+                            name = name[:97] + "..."
+                        
+                        # Kiểm tra trùng lặp trước khi thêm
+                        comment_key = (name, content)
+                        if comment_key in seen_comments:
                             continue
+                        seen_comments.add(comment_key)
+                        
+                        all_comments.append({
+                            "ten_nguoi_binh_luan": name,
+                            "noi_dung": content,
+                            "comic_id": comic_id,
+                            "thoi_gian_binh_luan": comment_time.strftime("%Y-%m-%d %H:%M:%S") if comment_time else None,
+                            "thoi_gian_cap_nhat": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                        })
+                        new_comments_found += 1
                     
                     logger.info(f"Đã thêm {new_comments_found} comment mới từ trang {page_comment}")
                     
                     if time_limit and page_old_comments_count > 0 and page_old_comments_count == len(comment_elements):
                         logger.info(f"Tất cả {len(comment_elements)} comment trên trang {page_comment} đều cũ hơn {days_limit} ngày, dừng crawl")
+                        scan.stop(STOP_TIME_LIMIT)
                         stop_crawling = True
                         break                    
                     
+                    if stored_comments_count > 0:
+                        logger.info(f"Đã chạm tới comment đã lưu trên trang {page_comment}, dừng crawl")
+                        scan.stop(STOP_STORED)
+                        break
+                    
                     # Nếu không có comment mới nào được thêm, dừng lại
                     if new_comments_found == 0:
                         logger.info(f"Không tìm thấy comment mới nào trên trang {page_comment}")
@@ -991,35 +837,20 @@ class Truyentranh3qCrawler(BaseCrawler):
                     
                 except Exception as e:
                     logger.error(f"Lỗi khi xử lý trang comment {page_comment}: {str(e)}")
+                    scan.stop(STOP_ERROR)
                     break
+            # Chỉ đọc comment đang hiển thị trên trang, phủ tới comment cũ nhất đã thấy
+            scan.stop(STOP_PAGE_LIMIT)
             
-            # Lưu comments vào database sử dụng SQLiteHelper
-            if all_comments:
-                try:
-                    logger.info(f"Lưu {len(all_comments)} comment cho truyện ID {comic_id}")
-                    
-                    # Lưu theo batch nhỏ để tránh lỗi
-                    batch_size = 100
-                    for i in range(0, len(all_comments), batch_size):
-                        batch = all_comments[i:i+batch_size]
-                        try:
-                            self.sqlite_helper.save_comments_to_db(comic_id, batch, "Truyentranh3q")
-                            logger.debug(f"Đã lưu batch {i//batch_size + 1}/{(len(all_comments)-1)//batch_size + 1} ({len(batch)} comment)")
-                        except Exception as e:
-                            logger.error(f"Lỗi khi lưu batch comment: {e}")
-                except Exception as e:
-                    logger.error(f"Lỗi khi lưu comments vào database: {e}")
+            # Lưu comments và khoảng đã crawl vào database
+            all_comments = self.finish_comment_scan(comic_id, "Truyentranh3q", all_comments, scan)
             
         except Exception as e:
             logger.error(f"Lỗi khi crawl comment: {str(e)}")
             all_comments = []
             
         finally:
-            if driver is not None:
-                try:
-                    driver.quit()
-                except:
-                    pass
+            self.release_comment_driver(driver)
         
         if time_limit:
             logger.info(f"Đã crawl được {len(all_comments)} comment cho truyện {comic.get('ten_truyen')} (bỏ qua {old_comments_count} comment quá cũ)")
@@ -1042,7 +873,7 @@ class Truyentranh3qCrawler(BaseCrawler):
         logger.info(f"Bắt đầu crawl comments batch cho {len(comics_list)} truyện Truyentranh3q")
         
         try:
-            # Chuẩn bị dữ liệu input cho CommentCrawler
+            # Chuẩn bị dữ liệu input cho crawl_comments_parallel
             crawl_data = []
             for comic in comics_list:
                 comic_url = comic.get("link_truyen", "")
@@ -1058,7 +889,7 @@ class Truyentranh3qCrawler(BaseCrawler):
                 logger.warning("Không có truyện hợp lệ để crawl comments")
                 return {}
             
-            # Sử dụng CommentCrawler từ base class để crawl song song
+            # Crawl song song bằng crawl_comments của crawler (base class)
             batch_result = self.crawl_comments_parallel(crawl_data, progress_callback)
             
             # Chuyển đổi kết quả về format {comic_url: comments}
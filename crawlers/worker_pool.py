@@ -0,0 +1,294 @@
+"""
+Pool process dùng suốt một lượt crawl
+
+Thay vì tạo Pool mới cho từng batch (mỗi lần spawn lại phải import Selenium, psutil và
+module crawler), các process con được giữ trong cả lượt crawl và nhận việc liên tục. Việc
+chỉ được cấp khi còn chỗ trong giới hạn song song của host (backpressure), nên pipeline
+không bị cạn giữa các batch.
+
+Mỗi process con có pipe riêng với process chính: nhận tác vụ, báo "bắt đầu" (PID, thời
+điểm) và "kết thúc" (kết quả) qua pipe đó, nên process chính luôn biết chính xác process
+nào đang chạy tác vụ nào. Khi tác vụ chạy quá hạn (ví dụ Chrome treo trong driver.get),
+watchdog kill cả cây process (worker, chromedriver, Chrome), thu hồi slot driver của nó,
+bỏ process đó và đưa tác vụ vào hàng đợi chạy lại; process mới được tạo khi cần. Kill một
+process không ảnh hưởng process khác vì chúng không dùng chung hàng đợi/khóa nào.
+"""
+import os
+import time
+import logging
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import wait
+
+import psutil
+
+from crawlers.adaptive_concurrency import OUTCOME_OK, OUTCOME_ERROR, OUTCOME_TIMEOUT
+from crawlers.admission import get_admission_controller
+from utils.process_registry import register_process
+from utils import metrics, profiler, logging_config
+
+logger = logging.getLogger(__name__)
+
+# Số tác vụ mỗi process xử lý trước khi được thay mới (giải phóng bộ nhớ rò rỉ dần)
+MAX_TASKS_PER_CHILD = 50
+# Hạn chót mặc định của một tác vụ (giây)
+DEFAULT_TASK_TIMEOUT = 300
+# Số lần chạy tối đa của một tác vụ (gồm lần đầu)
+DEFAULT_MAX_ATTEMPTS = 2
+# Chu kỳ kiểm tra của watchdog (giây)
+WATCHDOG_INTERVAL = 1.0
+# Thời gian chờ process con thoát khi dừng (giây)
+STOP_TIMEOUT = 5
+
+# Loại thông báo process con gửi về qua pipe
+STATUS_STARTED = "started"
+STATUS_FINISHED = "finished"
+
+
+def _init_pool_worker(log_queue, site, initializer, initargs):
+    """Khởi tạo process con: chuyển log về process chính, nguồn đo hiệu năng rồi gọi initializer của crawler"""
+    logging_config.configure_worker(log_queue)
+    register_process(kind="worker")
+    profiler.install_worker_hook()
+    if site:
+        metrics.set_site(site)
+    if initializer:
+        initializer(*initargs)
+
+
+def _timed_call(conn, worker, index, attempt, task):
+    """
+    Chạy worker trong process con, báo thời điểm bắt đầu và đo thời gian thực hiện
+
+    Args:
+        conn: Đầu pipe phía process con
+        worker: Hàm xử lý tác vụ
+        index: Vị trí tác vụ
+        attempt: Lần chạy
+        task: Tham số cho worker
+
+    Returns:
+        tuple: (STATUS_FINISHED, index, attempt, thời gian chạy, kết quả), kết quả là None nếu worker lỗi
+    """
+    started = time.monotonic()
+    conn.send((STATUS_STARTED, index, attempt, os.getpid(), time.time()))
+    try:
+        result = worker(task)
+    except Exception as e:
+        logger.error(f"Worker {worker.__name__} lỗi ở tác vụ {index}: {e}")
+        result = None
+    # Ghi số liệu hiệu năng sau mỗi tác vụ (process có thể bị thay mới bất cứ lúc nào)
+    metrics.flush()
+    return STATUS_FINISHED, index, attempt, time.monotonic() - started, result
+
+
+def _worker_main(conn, worker, log_queue, site, initializer, initargs):
+    """Vòng lặp của process con: nhận tác vụ qua pipe cho tới khi nhận None hoặc pipe đóng"""
+    _init_pool_worker(log_queue, site, initializer, initargs)
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        index, attempt, task = message
+        conn.send(_timed_call(conn, worker, index, attempt, task))
+
+
+class _PoolWorker:
+    """
+    Một process con dùng lại cho nhiều tác vụ, kill và thay mới được riêng lẻ
+    """
+
+    def __init__(self, ctx, args):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, *args), daemon=True)
+        self.process.start()
+        child_conn.close()
+        # (index, attempt) của tác vụ đang chạy, None nếu đang rảnh
+        self.task = None
+        # Thời điểm bắt đầu theo báo cáo của process con
+        self.start_time = None
+        self.completed = 0
+
+    def submit(self, index, attempt, task):
+        self.conn.send((index, attempt, task))
+        self.task = (index, attempt)
+        self.start_time = None
+
+    def stop(self):
+        """Yêu cầu process thoát sau tác vụ hiện tại, kill nếu không thoát kịp"""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(STOP_TIMEOUT)
+        if self.process.is_alive():
+            kill_process_tree(self.process.pid)
+        self.conn.close()
+
+    def kill(self):
+        """Kill process cùng Chrome/chromedriver của nó"""
+        kill_process_tree(self.process.pid)
+        self.process.join(STOP_TIMEOUT)
+        self.conn.close()
+
+
+def kill_process_tree(pid):
+    """
+    Kill process và toàn bộ process con (chromedriver, Chrome)
+
+    Args:
+        pid: PID của process gốc
+
+    Returns:
+        int: Số process đã kill
+    """
+    try:
+        root = psutil.Process(pid)
+        processes = root.children(recursive=True) + [root]
+    except psutil.NoSuchProcess:
+        return 0
+
+    killed = 0
+    for process in processes:
+        try:
+            process.kill()
+            killed += 1
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    psutil.wait_procs(processes, timeout=5)
+    return killed
+
+
+def run_worker_pool(worker, tasks, concurrency, initializer=None, initargs=(),
+                    max_tasks_per_child=MAX_TASKS_PER_CHILD, task_timeout=DEFAULT_TASK_TIMEOUT,
+                    max_attempts=DEFAULT_MAX_ATTEMPTS, site=None):
+    """
+    Chạy các tác vụ trên một nhóm process dùng lại, trả kết quả theo thứ tự hoàn thành
+
+    Số tác vụ đang chạy không vượt quá concurrency.limit; kết quả của từng tác vụ (độ trễ,
+    thành công hay không) được báo lại cho concurrency để tự điều chỉnh giới hạn. Tác vụ quá
+    task_timeout hoặc có process chết giữa chừng được chạy lại trên process mới, tối đa
+    max_attempts lần.
+
+    Args:
+        worker: Hàm cấp module nhận một tác vụ
+        tasks: Danh sách tham số cho worker
+        concurrency: AdaptiveConcurrency của host
+        initializer: Hàm khởi tạo process con
+        initargs: Tham số cho initializer
+        max_tasks_per_child: Số tác vụ mỗi process xử lý trước khi được thay mới
+        task_timeout: Hạn chót của một tác vụ tính từ lúc bắt đầu chạy (giây)
+        max_attempts: Số lần chạy tối đa của một tác vụ
+        site: Tên nguồn gắn cho số liệu hiệu năng đo trong process con
+
+    Yields:
+        tuple: (task, result) - result rỗng/None được tính là thất bại (kể cả khi quá hạn)
+    """
+    if not tasks:
+        return
+
+    process_count = max(1, min(concurrency.max_limit, len(tasks)))
+    logger.info(f"Dùng tối đa {process_count} process cho {len(tasks)} tác vụ")
+
+    ctx = multiprocessing.get_context()
+    worker_args = (worker, logging_config.get_log_queue(), site, initializer, initargs)
+    pending = deque((index, 1) for index in range(len(tasks)))
+    workers = []
+
+    def retire(pool_worker, elapsed, outcome):
+        """Bỏ process đã chết/bị kill, trả chỗ và chạy lại tác vụ nếu còn lượt"""
+        index, attempt = pool_worker.task
+        workers.remove(pool_worker)
+        get_admission_controller().reclaim(pool_worker.process.pid)
+        concurrency.release()
+        concurrency.record(elapsed, outcome)
+        if attempt < max_attempts:
+            pending.append((index, attempt + 1))
+            return None
+        logger.error(f"Bỏ tác vụ {index} sau {attempt} lần thất bại")
+        return index
+
+    try:
+        while pending or any(pool_worker.task for pool_worker in workers):
+            # Gửi thêm tác vụ khi còn chỗ, tạo process mới nếu chưa đủ số process
+            while pending:
+                idle = next((pool_worker for pool_worker in workers if pool_worker.task is None), None)
+                if idle is None and len(workers) >= process_count:
+                    break
+                if not concurrency.acquire(timeout=0):
+                    break
+                if idle is None:
+                    idle = _PoolWorker(ctx, worker_args)
+                    workers.append(idle)
+                index, attempt = pending.popleft()
+                try:
+                    idle.submit(index, attempt, tasks[index])
+                except OSError:
+                    # Process rảnh đã chết, bỏ và gửi lại tác vụ cho process khác
+                    workers.remove(idle)
+                    idle.kill()
+                    pending.appendleft((index, attempt))
+                    concurrency.release()
+
+            busy = [pool_worker for pool_worker in workers if pool_worker.task]
+            if not busy:
+                time.sleep(WATCHDOG_INTERVAL)
+                continue
+            ready = wait([pool_worker.conn for pool_worker in busy], timeout=WATCHDOG_INTERVAL)
+
+            # Đọc hết thông báo đã về trước khi chạy watchdog
+            for pool_worker in busy:
+                if pool_worker.conn not in ready:
+                    continue
+                try:
+                    while pool_worker.task and pool_worker.conn.poll():
+                        message = pool_worker.conn.recv()
+                        if message[0] == STATUS_STARTED:
+                            pool_worker.start_time = message[4]
+                            continue
+                        _, index, attempt, elapsed, result = message
+                        pool_worker.task = None
+                        pool_worker.start_time = None
+                        pool_worker.completed += 1
+                        concurrency.release()
+                        concurrency.record(elapsed, OUTCOME_OK if result else OUTCOME_ERROR)
+                        if pool_worker.completed >= max_tasks_per_child:
+                            workers.remove(pool_worker)
+                            pool_worker.stop()
+                        yield tasks[index], result
+                except (EOFError, OSError):
+                    # Process con chết giữa chừng (hết RAM, bị kill từ bên ngoài...)
+                    index = pool_worker.task[0]
+                    logger.warning(f"Process {pool_worker.process.pid} dừng bất thường ở tác vụ {index}")
+                    pool_worker.kill()
+                    elapsed = time.time() - pool_worker.start_time if pool_worker.start_time else 0
+                    failed = retire(pool_worker, elapsed, OUTCOME_ERROR)
+                    if failed is not None:
+                        yield tasks[failed], None
+
+            # Watchdog: kill process của tác vụ quá hạn và chạy lại tác vụ
+            now = time.time()
+            for pool_worker in list(workers):
+                if not pool_worker.task or pool_worker.start_time is None:
+                    continue
+                if now - pool_worker.start_time <= task_timeout or pool_worker.conn.poll():
+                    continue
+                index, attempt = pool_worker.task
+                logger.warning(f"Tác vụ {index} quá hạn {task_timeout}s (lần {attempt}), kill process {pool_worker.process.pid}")
+                pool_worker.kill()
+                failed = retire(pool_worker, now - pool_worker.start_time, OUTCOME_TIMEOUT)
+                if failed is not None:
+                    yield tasks[failed], None
+    finally:
+        # Dừng mọi process; trả lại chỗ của các tác vụ chưa nhận kết quả (khi dừng giữa chừng)
+        for pool_worker in workers:
+            if pool_worker.task:
+                concurrency.release()
+                pool_worker.kill()
+                get_admission_controller().reclaim(pool_worker.process.pid)
+            else:
+                pool_worker.stop()
+        workers.clear()
@@ -1,9 +1,9 @@
 import sys
 import logging
 import os
+import atexit
+import argparse
 import multiprocessing
-import subprocess
-from pathlib import Path
 
 # Đơn giản hóa xử lý multiprocessing - DI CHUYỂN LÊN TRƯỚC KHI IMPORT PYQT6
 if hasattr(sys, 'frozen'):
@@ -23,51 +23,48 @@ from PyQt6.QtWidgets import QApplication
 from ui.main_window import MainWindow
 from utils.config_manager import ConfigManager
 from crawlers.crawler_factory import CrawlerFactory
+from utils import process_registry, profiler, logging_config
 
 # Thiết lập logging
 def setup_logging():
-    log_dir = "logs"
-    os.makedirs(log_dir, exist_ok=True)
-    
-    # Định dạng logging
-    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    date_format = "%Y-%m-%d %H:%M:%S"
-    
-    # Thiết lập root logger
-    logging.basicConfig(
-        level=logging.INFO,
-        format=log_format,
-        datefmt=date_format,
-        handlers=[
-            logging.FileHandler(f"{log_dir}/rating_comic.log", encoding="utf-8"),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
-    
-    # Thiết lập logger cho thư viện bên thứ ba
-    logging.getLogger("selenium").setLevel(logging.WARNING)
-    logging.getLogger("urllib3").setLevel(logging.WARNING)
+    # Ghi log qua hàng đợi: file/console/giao diện được ghi trên thread riêng
+    logging_config.setup_logging(os.path.join("logs", "rating_comic.log"))
+    atexit.register(logging_config.shutdown)
 
 def cleanup_before_start():
+    """Dọn process còn sót từ lần chạy trước bị crash (chỉ các process đã đăng ký) và bắt đầu phiên mới"""
     try:
-        cleanup_script = Path(__file__).parent / "cleanup_processes.py"
-        if cleanup_script.exists():
-            subprocess.run([sys.executable, str(cleanup_script)], 
-                          timeout=30, 
-                          stderr=subprocess.PIPE, 
-                          stdout=subprocess.PIPE)
-            print("Đã hoàn thành quá trình dọn dẹp tiến trình")
+        terminated = process_registry.recover_stale_sessions()
+        if terminated:
+            print(f"Đã dừng {terminated} tiến trình còn sót từ lần chạy trước")
     except Exception as e:
         print(f"Lỗi khi dọn dẹp tiến trình: {e}")
+    process_registry.start_session()
+    atexit.register(process_registry.end_session)
+
+def parse_args():
+    """Đọc tham số dòng lệnh của ứng dụng (các tham số còn lại được chuyển cho Qt)"""
+    parser = argparse.ArgumentParser(description="Rating Comic")
+    parser.add_argument("--profile", type=float, metavar="SECONDS",
+                        help="Profile toàn bộ process (kể cả worker crawler) trong SECONDS giây ngay khi khởi động")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="Kèm so sánh tracemalloc khi profile (kể cả khi bật bằng SIGUSR1)")
+    return parser.parse_known_args()
 
 if __name__ == "__main__":
+    args, qt_args = parse_args()
     cleanup_before_start()
     setup_logging()
     logger = logging.getLogger(__name__)
     logger.info("Khởi động ứng dụng Rating Comic")
     
+    # Profile theo yêu cầu: kill -USR1 <pid> hoặc --profile SECONDS
+    profiler.install_signal_handler(trace_memory=args.profile_memory)
+    if args.profile:
+        profiler.start_profiling(args.profile, trace_memory=args.profile_memory)
+    
     # Khởi tạo ứng dụng PyQt
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv[:1] + qt_args)
     
     # Tạo thư mục cần thiết
     os.makedirs("database", exist_ok=True)
@@ -29,6 +29,12 @@ a = Analysis(
         'torch._C',
         'torchvision',
         'openpyxl',
+        'pandas',
+        'crawlers.truyenqq_crawler',
+        'crawlers.nettruyen_crawler',
+        'crawlers.manhuavn_crawler',
+        'crawlers.truyentranh3q_crawler',
+        'seleniumbase',
         'multiprocessing',
         'multiprocessing.pool',
         'multiprocessing.managers',
@@ -0,0 +1,26 @@
+from crawlers.clearance_cache import is_challenge_page
+
+INTERSTITIAL = (
+    "<html><head><title>Just a moment...</title></head><body>"
+    "<script>window._cf_chl_opt={cvId: '3'};</script></body></html>"
+)
+# Trang bình thường vẫn nhúng script challenge-platform của Cloudflare
+NORMAL_PAGE = (
+    "<html><head><title>Truyện tranh</title></head><body><div class='comment-list'></div>"
+    "<script src='/cdn-cgi/challenge-platform/scripts/jsd/main.js'></script></body></html>"
+)
+
+
+def test_interstitial_with_block_status_is_challenge():
+    assert is_challenge_page(INTERSTITIAL, 403)
+    assert is_challenge_page(INTERSTITIAL, 503)
+
+
+def test_normal_page_with_challenge_platform_script_is_not_challenge():
+    assert not is_challenge_page(NORMAL_PAGE)
+    assert not is_challenge_page(NORMAL_PAGE, 403)
+
+
+def test_interstitial_markers_need_block_status_when_status_is_known():
+    assert not is_challenge_page(INTERSTITIAL, 200)
+    assert is_challenge_page(INTERSTITIAL)
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+from crawlers.base_crawler import BaseCrawler
+from crawlers.comment_coverage import CommentScan, STOP_END, STOP_TIME_LIMIT, STOP_STORED, STOP_ERROR
+from utils.sqlite_helper import SQLiteHelper
+
+SOURCE = "TruyenQQ"
+NOW = datetime(2025, 6, 1, 12, 0, 0)
+
+
+class Config(dict):
+    def get(self, key, default=None):
+        return dict.get(self, key, default)
+
+
+class Crawler(BaseCrawler):
+    def __init__(self, db_folder):
+        super().__init__(None, Config())
+        self.sqlite_helper = SQLiteHelper(db_folder)
+
+
+def comment(days_ago, content):
+    return {
+        "ten_nguoi_binh_luan": "Độc giả",
+        "noi_dung": content,
+        "thoi_gian_binh_luan": (NOW - timedelta(days=days_ago)).strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+def crawl(crawler, comments, time_limit, reason):
+    scan = CommentScan(time_limit)
+    for item in comments:
+        scan.see(datetime.strptime(item["thoi_gian_binh_luan"], "%Y-%m-%d %H:%M:%S"))
+    scan.stop(reason)
+    return crawler.finish_comment_scan(1, SOURCE, comments, scan)
+
+
+def test_wider_window_is_not_cut_short_by_earlier_narrow_crawl(tmp_path):
+    crawler = Crawler(str(tmp_path))
+    last_30_days = NOW - timedelta(days=30)
+    crawl(crawler, [comment(1, "mới"), comment(20, "tuần trước")], last_30_days, STOP_TIME_LIMIT)
+
+    # Cùng khoảng 30 ngày (hoặc hẹp hơn) thì được dừng sớm ở comment đã lưu
+    assert crawler.get_comment_high_water_mark(1, SOURCE, last_30_days) == NOW - timedelta(days=1)
+    # Khoảng 90 ngày hoặc không giới hạn phải crawl lại
+    assert crawler.get_comment_high_water_mark(1, SOURCE, NOW - timedelta(days=90)) is None
+    assert crawler.get_comment_high_water_mark(1, SOURCE, None) is None
+
+    # Crawl hết toàn bộ comment thì mọi khoảng đều được phủ
+    crawl(crawler, [comment(1, "mới"), comment(20, "tuần trước"), comment(200, "cũ")], None, STOP_END)
+    assert crawler.get_comment_high_water_mark(1, SOURCE, None) == NOW - timedelta(days=1)
+
+
+def test_incremental_crawl_keeps_older_coverage(tmp_path):
+    crawler = Crawler(str(tmp_path))
+    crawl(crawler, [comment(5, "a"), comment(100, "b")], None, STOP_END)
+
+    stored = crawl(crawler, [comment(0, "c"), comment(5, "a")], None, STOP_STORED)
+
+    assert {item["noi_dung"] for item in stored} == {"a", "b", "c"}
+    assert crawler.get_comment_high_water_mark(1, SOURCE, None) == NOW
+
+
+def test_failed_crawl_does_not_advance_mark(tmp_path):
+    crawler = Crawler(str(tmp_path))
+    crawl(crawler, [comment(5, "a")], None, STOP_END)
+
+    crawl(crawler, [comment(0, "c")], None, STOP_ERROR)
+
+    assert crawler.get_comment_high_water_mark(1, SOURCE, None) == NOW - timedelta(days=5)
+
+
+def test_http_fetch_falls_back_when_a_later_page_fails():
+    from crawlers.comment_fetcher import TruyenQQCommentFetcher, CommentEndpointError
+
+    item = '<article class="info-comment"><strong>{0}</strong><div class="content-comment">{0}</div></article>'
+
+    class Fetcher(TruyenQQCommentFetcher):
+        def prepare(self, comic):
+            return {}
+
+        def fetch_page_html(self, context, page):
+            if page == 2:
+                raise CommentEndpointError("HTTP 503")
+            return item.format(page)
+
+    fetcher = Fetcher("http://truyenqq.test", page_concurrency=1)
+    assert fetcher.fetch_comments({"id": 1}, lambda text: None) is None
+    assert fetcher.scan.stop_reason == STOP_ERROR
@@ -0,0 +1,65 @@
+import threading
+
+from crawlers.base_crawler import BaseCrawler
+
+
+class Config(dict):
+    def get(self, key, default=None):
+        return dict.get(self, key, default)
+
+
+class FakeDriver:
+    def __init__(self):
+        self.quit_count = 0
+
+    @property
+    def current_window_handle(self):
+        if self.quit_count:
+            raise RuntimeError("session closed")
+        return "tab-1"
+
+    def quit(self):
+        self.quit_count += 1
+
+
+class Crawler(BaseCrawler):
+    base_url = "https://example.test"
+
+    def __init__(self):
+        super().__init__(None, Config(comment_worker_count=2, max_comment_worker_count=2))
+        self.created = []
+        self.lock = threading.Lock()
+
+    def create_driver(self):
+        driver = FakeDriver()
+        with self.lock:
+            self.created.append(driver)
+        return driver
+
+    def crawl_comments(self, comic):
+        driver = self.acquire_comment_driver(self.create_driver)
+        try:
+            return [{"noi_dung": comic["link_truyen"]}]
+        finally:
+            self.release_comment_driver(driver)
+
+
+def test_batch_reuses_one_driver_per_thread():
+    crawler = Crawler()
+    comics = [{"comic_url": f"u{i}", "comic_data": {"link_truyen": f"u{i}"}} for i in range(10)]
+
+    result = crawler.crawl_comments_parallel(comics)
+
+    assert len(result) == 10
+    assert 1 <= len(crawler.created) <= 2
+    assert all(driver.quit_count == 1 for driver in crawler.created)
+
+
+def test_single_crawl_closes_its_driver():
+    crawler = Crawler()
+
+    crawler.crawl_comments({"link_truyen": "u1"})
+    crawler.crawl_comments({"link_truyen": "u2"})
+
+    assert len(crawler.created) == 2
+    assert all(driver.quit_count == 1 for driver in crawler.created)
@@ -0,0 +1,80 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+from utils.sqlite_helper import migrate_schema, insert_comments
+
+
+def create_db():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE comics (id INTEGER PRIMARY KEY AUTOINCREMENT, ten_truyen TEXT)")
+    conn.execute('''
+        CREATE TABLE comments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            comic_id INTEGER,
+            ten_nguoi_binh_luan TEXT,
+            noi_dung TEXT,
+            sentiment TEXT,
+            sentiment_score REAL,
+            thoi_gian_cap_nhat TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    migrate_schema(conn)
+    return conn
+
+
+def crawl(crawl_day):
+    """Bình luận "2 tuần trước" được quy đổi theo ngày crawl như crawler thực hiện"""
+    comment_time = crawl_day - timedelta(weeks=2)
+    return [{
+        "ten_nguoi_binh_luan": "Độc giả",
+        "noi_dung": "Truyện hay quá",
+        "thoi_gian_binh_luan": comment_time.strftime("%Y-%m-%d %H:%M:%S")
+    }]
+
+
+def test_recrawl_on_another_day_keeps_one_row():
+    conn = create_db()
+    cursor = conn.cursor()
+
+    insert_comments(cursor, 1, crawl(datetime(2025, 5, 1, 23, 50)))
+    insert_comments(cursor, 1, crawl(datetime(2025, 5, 2, 0, 10)))
+    insert_comments(cursor, 1, crawl(datetime(2025, 5, 9, 8, 0)))
+
+    assert cursor.execute("SELECT COUNT(*) FROM comments").fetchone()[0] == 1
+
+
+def test_migration_merges_comments_stored_with_old_hash():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE comics (id INTEGER PRIMARY KEY AUTOINCREMENT, ten_truyen TEXT)")
+    conn.execute('''
+        CREATE TABLE comments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, comic_id INTEGER, ten_nguoi_binh_luan TEXT,
+            noi_dung TEXT, sentiment TEXT, sentiment_score REAL, thoi_gian_binh_luan TIMESTAMP,
+            comment_hash TEXT
+        )
+    ''')
+    conn.executemany(
+        "INSERT INTO comments (comic_id, ten_nguoi_binh_luan, noi_dung, sentiment, comment_hash) VALUES (?, ?, ?, ?, ?)",
+        [(1, "Độc giả", "Truyện hay quá", "", "old-1"),
+         (1, "Độc giả", "Truyện hay quá", "positive", "old-2"),
+         (1, "Độc giả khác", "Truyện hay quá", "", "old-3")]
+    )
+
+    migrate_schema(conn)
+
+    rows = conn.execute("SELECT ten_nguoi_binh_luan, sentiment FROM comments ORDER BY id").fetchall()
+    assert rows == [("Độc giả", "positive"), ("Độc giả khác", "")]
+
+
+def test_analysis_updates_analysis_time():
+    conn = create_db()
+    cursor = conn.cursor()
+    comments = crawl(datetime(2025, 5, 1))
+    insert_comments(cursor, 1, comments)
+    cursor.execute("UPDATE comments SET thoi_gian_cap_nhat = '2025-05-01 00:00:00'")
+
+    insert_comments(cursor, 1, [dict(comments[0], sentiment="positive", sentiment_score=0.9)])
+
+    sentiment, updated = cursor.execute("SELECT sentiment, thoi_gian_cap_nhat FROM comments").fetchone()
+    assert sentiment == "positive"
+    assert updated > "2025-05-01 00:00:00"
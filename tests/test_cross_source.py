@@ -0,0 +1,60 @@
+import os
+import sqlite3
+
+from utils.cross_source import CrossSourceQuery
+from utils.sqlite_helper import migrate_schema, insert_comments
+
+SOURCE = "TruyenQQ"
+
+
+class DBManager:
+    supported_sources = {SOURCE: {}}
+
+    def __init__(self, db_folder):
+        self.db_folder = db_folder
+
+    def get_db_file(self, source):
+        return os.path.join(self.db_folder, f"{source}.db")
+
+
+def create_db(db_manager):
+    conn = sqlite3.connect(db_manager.get_db_file(SOURCE))
+    conn.execute("CREATE TABLE comics (id INTEGER PRIMARY KEY AUTOINCREMENT, ten_truyen TEXT)")
+    conn.execute('''
+        CREATE TABLE comments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, comic_id INTEGER, ten_nguoi_binh_luan TEXT,
+            noi_dung TEXT, sentiment TEXT, sentiment_score REAL, thoi_gian_binh_luan TIMESTAMP,
+            thoi_gian_cap_nhat TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    migrate_schema(conn)
+    conn.executemany("INSERT INTO comics (ten_truyen) VALUES (?)", [("Truyện A",), ("Truyện B",)])
+    cursor = conn.cursor()
+    insert_comments(cursor, 1, [
+        {"ten_nguoi_binh_luan": "a", "noi_dung": "hay", "sentiment": "positive", "sentiment_score": 0.9},
+        {"ten_nguoi_binh_luan": "b", "noi_dung": "chưa phân tích"}
+    ])
+    # Truyện mới crawl, chưa phân tích comment nào
+    insert_comments(cursor, 2, [{"ten_nguoi_binh_luan": "c", "noi_dung": "chưa phân tích"}])
+    conn.commit()
+    conn.close()
+
+
+def test_counts_only_analyzed_comments(tmp_path):
+    db_manager = DBManager(str(tmp_path))
+    create_db(db_manager)
+
+    counts = CrossSourceQuery(db_manager).counts()
+
+    assert counts[SOURCE] == {"comics": 2, "comments": 3, "analyzed_comments": 1}
+
+
+def test_sentiment_summary_skips_unanalyzed_comments(tmp_path):
+    db_manager = DBManager(str(tmp_path))
+    create_db(db_manager)
+
+    summary = CrossSourceQuery(db_manager).sentiment_summary()
+
+    assert [row["ten_truyen"] for row in summary] == ["Truyện A"]
+    assert summary[0]["total_comments"] == 1
+    assert summary[0]["positive_count"] == 1
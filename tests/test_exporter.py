@@ -0,0 +1,63 @@
+import os
+import sqlite3
+
+from utils import exporter
+from utils.sqlite_helper import migrate_schema, insert_comments
+
+SOURCE = "TruyenQQ"
+
+
+class DBManager:
+    def __init__(self, db_folder):
+        self.db_folder = db_folder
+
+    def get_db_file(self, source):
+        return os.path.join(self.db_folder, f"{source}.db")
+
+
+def create_db(db_manager):
+    conn = sqlite3.connect(db_manager.get_db_file(SOURCE))
+    conn.execute("CREATE TABLE comics (id INTEGER PRIMARY KEY AUTOINCREMENT, ten_truyen TEXT)")
+    conn.execute('''
+        CREATE TABLE comments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, comic_id INTEGER, ten_nguoi_binh_luan TEXT,
+            noi_dung TEXT, sentiment TEXT, sentiment_score REAL, thoi_gian_binh_luan TIMESTAMP,
+            thoi_gian_cap_nhat TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    migrate_schema(conn)
+    conn.executemany("INSERT INTO comics (ten_truyen) VALUES (?)", [("Truyện A",), ("Truyện B",)])
+    cursor = conn.cursor()
+    insert_comments(cursor, 1, [
+        {"ten_nguoi_binh_luan": "a", "noi_dung": "hay", "sentiment": "positive", "sentiment_score": 0.9},
+        {"ten_nguoi_binh_luan": "b", "noi_dung": "chưa phân tích"}
+    ])
+    insert_comments(cursor, 2, [
+        {"ten_nguoi_binh_luan": "c", "noi_dung": "dở", "sentiment": "negative", "sentiment_score": 0.8}
+    ])
+    conn.commit()
+    conn.close()
+
+
+def rows(dataset):
+    return [row for chunk in dataset.rows() for row in chunk]
+
+
+def test_analyzed_only_skips_comments_stored_without_sentiment(tmp_path):
+    db_manager = DBManager(str(tmp_path))
+    create_db(db_manager)
+
+    dataset = exporter.comments_dataset(db_manager, [SOURCE], analyzed_only=True)
+
+    assert sorted(row[3] for row in rows(dataset)) == ["dở", "hay"]
+    assert dataset.total() == 2
+
+
+def test_comments_can_be_limited_to_given_comics(tmp_path):
+    db_manager = DBManager(str(tmp_path))
+    create_db(db_manager)
+
+    dataset = exporter.comments_dataset(db_manager, [SOURCE], comic_ids={SOURCE: [1]})
+
+    assert sorted(row[3] for row in rows(dataset)) == ["chưa phân tích", "hay"]
+    assert dataset.total() == 2
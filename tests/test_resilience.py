@@ -0,0 +1,31 @@
+import pytest
+from selenium.common.exceptions import (WebDriverException, TimeoutException, InvalidSessionIdException,
+                                        NoSuchElementException)
+
+from crawlers.resilience import CircuitBreaker, RetryPolicy, call_with_retry, is_retryable, STATE_CLOSED
+
+
+def test_selector_timeout_is_not_retryable():
+    assert not is_retryable(TimeoutException("Message: "))
+    assert not is_retryable(NoSuchElementException("no such element"))
+    assert not is_retryable(InvalidSessionIdException("invalid session id"))
+
+
+def test_browser_network_error_is_retryable():
+    assert is_retryable(WebDriverException("unknown error: net::ERR_CONNECTION_RESET"))
+    assert is_retryable(ConnectionRefusedError())
+
+
+def test_selector_timeout_does_not_trip_breaker():
+    breaker = CircuitBreaker("example.test", failure_threshold=1)
+    calls = []
+
+    def open_page():
+        calls.append(1)
+        raise TimeoutException()
+
+    with pytest.raises(TimeoutException):
+        call_with_retry(open_page, "https://example.test/a", RetryPolicy(max_attempts=3, base_delay=0), breaker)
+
+    assert len(calls) == 1
+    assert breaker.state == STATE_CLOSED
@@ -1,7 +1,7 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                             QTabWidget, QTableWidget, QTableWidgetItem, 
-                            QPushButton, QFileDialog, QHeaderView, QProgressBar,
-                            QMessageBox, QComboBox, QProgressDialog, QSpinBox, QCheckBox)
+                            QPushButton, QHeaderView, QProgressBar,
+                            QMessageBox, QComboBox, QSpinBox, QCheckBox)
 from PyQt6.QtCore import Qt, QThreadPool, pyqtSlot
 import logging
 import time
@@ -12,13 +12,17 @@ from PyQt6.QtWidgets import QDialog
 from PyQt6.QtGui import QColor
 from datetime import datetime, timedelta
 from analysis.rating_factory import RatingFactory
-import pandas as pd
 from PyQt6.QtGui import QIcon
 import gc
 
 from utils.worker import Worker
+from crawlers.adaptive_concurrency import OUTCOME_OK, OUTCOME_ERROR
 from analysis.sentiment_analyzer import SentimentAnalyzer
+from analysis.pipeline import calculate_sentiment_rating, comprehensive_rating as calculate_comprehensive_rating
+from utils import metrics, exporter
+from utils.cross_source import CrossSourceQuery
 from analysis.rating_factory import RatingFactory
+from ui.export_dialog import ask_export_file, start_export
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +35,7 @@ class DetailAnalysisTab(QWidget):
         super().__init__()
         
         self.db_manager = db_manager
+        self.cross_source = CrossSourceQuery(db_manager)
         self.crawler_factory = crawler_factory
         self.log_widget = log_widget
         self.config_manager = config_manager
@@ -216,7 +221,7 @@ class DetailAnalysisTab(QWidget):
         button_layout = QHBoxLayout()
         self.refresh_button = QPushButton("Làm mới dữ liệu")
         self.refresh_button.clicked.connect(self.load_history_data)
-        self.export_history_button = QPushButton("Xuất ra Excel")
+        self.export_history_button = QPushButton("Xuất dữ liệu")
         self.export_history_button.clicked.connect(self.export_history_to_excel)
         self.export_history_button.setIcon(QIcon.fromTheme("document-save"))
 
@@ -266,214 +271,35 @@ class DetailAnalysisTab(QWidget):
         # Thêm tab vào result_tabs
         self.result_tabs.addTab(self.history_tab, "Lịch sử phân tích")
             
-    def get_comment_table_for_comic(self, comic_name, source):
-        """
-        Lấy bảng comment cho một truyện cụ thể
-        """
-        try:
-            self.db_manager.set_source(source)
-            
-            # Lấy tất cả truyện và tìm truyện cần thiết
-            all_comics = self.db_manager.get_all_comics()
-            comic = next((c for c in all_comics if c['ten_truyen'] == comic_name), None)
-            
-            if comic:
-                comic_id = comic['id']
-                comments = self.db_manager.get_all_comments(comic_id)
-                
-                # Tạo bảng tạm thời để lưu comments
-                temp_table = QTableWidget()
-                temp_table.setColumnCount(4)
-                temp_table.setHorizontalHeaderLabels([
-                    "Người bình luận", "Nội dung", "Sentiment", "Điểm sentiment"
-                ])
-                
-                for comment in comments:
-                    row = temp_table.rowCount()
-                    temp_table.insertRow(row)
-                    
-                    # Tên người bình luận
-                    ten_nguoi_bl = comment.get("ten_nguoi_binh_luan", "N/A")
-                    ten_nguoi_bl_short = (ten_nguoi_bl[:20] + "...") if len(ten_nguoi_bl) > 20 else ten_nguoi_bl
-                    name_item = QTableWidgetItem(ten_nguoi_bl_short)
-                    if len(ten_nguoi_bl) > 20:
-                        name_item.setToolTip(ten_nguoi_bl)
-                    temp_table.setItem(row, 0, name_item)
-                    
-                    # Nội dung comment
-                    noi_dung = comment.get("noi_dung", "N/A")
-                    noi_dung_short = (noi_dung[:100] + "...") if len(noi_dung) > 100 else noi_dung
-                    content_item = QTableWidgetItem(noi_dung_short)
-                    content_item.setToolTip(noi_dung)
-                    temp_table.setItem(row, 1, content_item)
-                    
-                    # Sentiment và điểm
-                    sentiment = comment.get("sentiment", "neutral")
-                    sentiment_score = comment.get("sentiment_score", 0.5)
-                    
-                    sentiment_item = QTableWidgetItem(sentiment)
-                    score_item = QTableWidgetItem(f"{sentiment_score:.2f}")
-                    
-                    # Màu sắc cho các loại sentiment
-                    if sentiment == "positive":
-                        sentiment_item.setBackground(QColor(200, 255, 200))
-                    elif sentiment == "negative":
-                        sentiment_item.setBackground(QColor(255, 200, 200))
-                    
-                    temp_table.setItem(row, 2, sentiment_item)
-                    temp_table.setItem(row, 3, score_item)
-                
-                return temp_table
-                
-            return None
-                
-        except Exception as e:
-            logger.error(f"Lỗi khi lấy bảng comment cho truyện {comic_name}: {str(e)}")
-            logger.error(traceback.format_exc())
-            return None
-
     def export_history_to_excel(self):
-        """Xuất dữ liệu lịch sử phân tích ra file Excel"""
+        """Xuất dữ liệu lịch sử phân tích ra file Excel/CSV/Parquet (đọc thẳng từ database)"""
         if self.history_table.rowCount() == 0:
             QMessageBox.warning(self, "Cảnh báo", "Không có dữ liệu để xuất!")
             return
         
         try:
             current_datetime = datetime.now().strftime("%Y%m%d_%H%M%S")
-            default_filename = f"output/sentiment_history_{current_datetime}.xlsx"
-            
-            file_path, _ = QFileDialog.getSaveFileName(
-                self, "Lưu file Excel", default_filename, "Excel Files (*.xlsx)"
-            )
-            
+            file_path, fmt = ask_export_file(self, f"output/sentiment_history_{current_datetime}")
             if not file_path:
                 return
 
-            progress_dialog = QProgressDialog("Đang xuất dữ liệu...", "Hủy", 0, self.history_table.rowCount(), self)
-            progress_dialog.setWindowTitle("Xuất Excel")
-            progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
-            
-            with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-                # Sheet 1: Phân tích Sentiment
-                data = []
-                for row in range(self.history_table.rowCount()):
-                    row_data = {
-                        "Tên truyện": self.history_table.item(row, 0).text(),
-                        "Nguồn": self.history_table.item(row, 1).text(),
-                        "Số comment": int(self.history_table.item(row, 2).text()),
-                        "Sentiment tích cực (%)": float(self.history_table.item(row, 3).text().replace('%', '')),
-                        "Sentiment tiêu cực (%)": float(self.history_table.item(row, 4).text().replace('%', '')),
-                        "Sentiment trung tính (%)": float(self.history_table.item(row, 5).text().replace('%', '')),
-                        "Điểm sentiment": float(self.history_table.item(row, 6).text()),
-                        "Điểm tổng hợp": float(self.history_table.item(row, 7).text()),
-                        "Thời gian phân tích": self.history_table.item(row, 8).text()
-                    }
-                    data.append(row_data)
-                
-                df = pd.DataFrame(data)
-                df.to_excel(writer, sheet_name='Phân tích Sentiment', index=False)
-                
-                # Sheet 2: Thống kê nguồn
-                stats_df = pd.DataFrame(self.create_stats_data(data))
-                stats_df.to_excel(writer, sheet_name='Thống kê nguồn', index=False)
-                
-                # Sheet 3: Chi tiết Comments
-                comment_data = []
-                total_rows = self.history_table.rowCount()
-                
-                for row in range(total_rows):
-                    if progress_dialog.wasCanceled():
-                        break
-                        
-                    comic_name = self.history_table.item(row, 0).text()
-                    source = self.history_table.item(row, 1).text()
-                    
-                    progress_dialog.setValue(row)
-                    progress_dialog.setLabelText(f"Đang xử lý: {comic_name}")
-                    
-                    logger.info(f"Đang xử lý comments cho truyện {comic_name} ({row + 1}/{total_rows})")
-                    
-                    comment_table = self.get_comment_table_for_comic(comic_name, source)
-                    if comment_table:
-                        for comment_row in range(comment_table.rowCount()):
-                            comment_data.append({
-                                "Tên truyện": comic_name,
-                                "Nguồn": source,
-                                "Người bình luận": comment_table.item(comment_row, 0).text(),
-                                "Nội dung": comment_table.item(comment_row, 1).text(),
-                                "Sentiment": comment_table.item(comment_row, 2).text(),
-                                "Độ tin cậy": float(comment_table.item(comment_row, 3).text()),
-                                "Thời gian xuất": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            })
-                
-                progress_dialog.setValue(total_rows)
-                
-                if comment_data:
-                    comments_df = pd.DataFrame(comment_data)
-                    comments_df.to_excel(writer, sheet_name='Chi tiết Comments', index=False)
-                    
-                    # Tự động điều chỉnh độ rộng cột
-                    worksheet = writer.sheets['Chi tiết Comments']
-                    for idx, col in enumerate(comments_df.columns):
-                        max_length = max(
-                            comments_df[col].astype(str).apply(len).max(),
-                            len(col)
-                        )
-                        worksheet.column_dimensions[chr(65 + idx)].width = min(max_length + 2, 50)
+            source = self.source_combo.currentText()
+            sources = ["TruyenQQ", "NetTruyen", "Manhuavn", "Truyentranh3q"] if source == "Tất cả" else [source]
 
-            if not progress_dialog.wasCanceled():
-                QMessageBox.information(
-                    self, "Thành công", 
-                    f"Đã xuất dữ liệu ra file:\n{file_path}"
-                )
-                
-                logger.info(f"Đã xuất dữ liệu lịch sử phân tích ra file: {file_path}")
+            # Sheet thống kê được cộng dồn trong lúc ghi sheet phân tích nên phải đứng sau
+            stats = exporter.SourceStats(sources)
+            datasets = [
+                exporter.history_dataset(self.db_manager, sources, stats),
+                exporter.stats_dataset(stats),
+                exporter.comments_dataset(self.db_manager, sources, analyzed_only=True)
+            ]
+            start_export(self, datasets, file_path, fmt, "Xuất lịch sử phân tích")
             
         except Exception as e:
-            logger.error(f"Lỗi khi xuất file Excel: {str(e)}")
+            logger.error(f"Lỗi khi xuất file: {str(e)}")
             logger.error(traceback.format_exc())
-            QMessageBox.critical(self, "Lỗi", f"Lỗi khi xuất file Excel: {str(e)}")
-        
-        
-    def create_stats_data(self, data):
-        """Tạo dữ liệu thống kê cho từng nguồn"""
-        sources = ['TruyenQQ', 'NetTruyen', 'Manhuavn', 'Truyentranh3q', 'Tất cả']
-        stats = {
-            'Nguồn': sources,
-            'Số lượng truyện': [],
-            'Điểm sentiment trung bình': [],
-            'Điểm tổng hợp trung bình': [],
-            'Sentiment tích cực trung bình (%)': [],
-            'Sentiment tiêu cực trung bình (%)': []
-        }
-        
-        for source in sources:
-            source_data = [d for d in data if d['Nguồn'] == source] if source != 'Tất cả' else data
-            count = len(source_data)
-            
-            stats['Số lượng truyện'].append(count)
-            
-            if count > 0:
-                stats['Điểm sentiment trung bình'].append(
-                    sum(d['Điểm sentiment'] for d in source_data) / count
-                )
-                stats['Điểm tổng hợp trung bình'].append(
-                    sum(d['Điểm tổng hợp'] for d in source_data) / count
-                )
-                stats['Sentiment tích cực trung bình (%)'].append(
-                    sum(d['Sentiment tích cực (%)'] for d in source_data) / count
-                )
-                stats['Sentiment tiêu cực trung bình (%)'].append(
-                    sum(d['Sentiment tiêu cực (%)'] for d in source_data) / count
-                )
-            else:
-                stats['Điểm sentiment trung bình'].append(0)
-                stats['Điểm tổng hợp trung bình'].append(0)
-                stats['Sentiment tích cực trung bình (%)'].append(0)
-                stats['Sentiment tiêu cực trung bình (%)'].append(0)
+            QMessageBox.critical(self, "Lỗi", f"Lỗi khi xuất file: {str(e)}")
         
-        return stats
-    
     def load_history_data(self):
         """Tải dữ liệu lịch sử phân tích từ cơ sở dữ liệu"""
         self.history_table.setRowCount(0)
@@ -496,63 +322,32 @@ class DetailAnalysisTab(QWidget):
         
         analyzed_comics = []
         
-        # Lấy dữ liệu từ mỗi nguồn
-        for source_name in sources:
-            # Đặt nguồn
-            self.db_manager.set_source(source_name)
+        # Thống kê sentiment của mọi nguồn trong một câu truy vấn, đã sắp xếp mới nhất lên đầu
+        for comic in self.cross_source.sentiment_summary(sources, days):
+            total = comic["total_comments"]
+            positive_percent = (comic["positive_count"] or 0) / total * 100
+            negative_percent = (comic["negative_count"] or 0) / total * 100
+            neutral_percent = (comic["neutral_count"] or 0) / total * 100
             
-            # Lấy tất cả truyện từ nguồn này
-            comics = self.db_manager.get_all_comics()
+            sentiment_score = calculate_sentiment_rating(
+                comic["positive_count"] or 0, comic["negative_count"] or 0, comic["neutral_count"] or 0
+            )
             
-            for comic in comics:
-                # Lấy tất cả comments cho truyện này
-                comments = self.db_manager.get_all_comments(comic["id"])
-                
-                # Chỉ xử lý truyện có comments đã phân tích sentiment
-                sentiment_comments = [c for c in comments if c.get("sentiment") is not None]
-                
-                if sentiment_comments:
-                    # Tính toán thống kê sentiment
-                    positive = [c for c in sentiment_comments if c.get("sentiment") == "positive"]
-                    negative = [c for c in sentiment_comments if c.get("sentiment") == "negative"]
-                    neutral = [c for c in sentiment_comments if c.get("sentiment") == "neutral"]
-                    
-                    total = len(sentiment_comments)
-                    positive_percent = len(positive) / total * 100 if total > 0 else 0
-                    negative_percent = len(negative) / total * 100 if total > 0 else 0
-                    neutral_percent = len(neutral) / total * 100 if total > 0 else 0
-                    
-                    # Tính điểm sentiment dựa trên công thức hiện tại
-                    sentiment_score = (positive_percent * 8/100 ) - (negative_percent * 5/100) + (neutral_percent * 6/100)
-                    sentiment_score = max(0, min(10, sentiment_score * 2))
-                    
-                    # Tính điểm tổng hợp
-                    rating_calculator = RatingFactory.get_calculator(source_name)
-                    base_rating = rating_calculator.calculate(comic)
-                    comprehensive_rating = base_rating * 0.6 + sentiment_score * 0.4
-                    
-                    # Thêm thời gian phân tích (sử dụng thời gian cập nhật của comment gần nhất)
-                    if sentiment_comments:
-                        analysis_time = max(c.get("thoi_gian_cap_nhat", "") for c in sentiment_comments)
-                    else:
-                        analysis_time = "Không rõ"
-                    
-                    # Thêm vào danh sách
-                    analyzed_comics.append({
-                        "comic": comic,
-                        "source": source_name,
-                        "comments": sentiment_comments,
-                        "positive_percent": positive_percent,
-                        "negative_percent": negative_percent,
-                        "neutral_percent": neutral_percent,
-                        "sentiment_score": sentiment_score,
-                        "base_rating": base_rating,
-                        "comprehensive_rating": comprehensive_rating,
-                        "analysis_time": analysis_time
-                    })
-        
-        # Sắp xếp theo thời gian phân tích, mới nhất lên đầu
-        analyzed_comics.sort(key=lambda x: x["analysis_time"], reverse=True)
+            # Tính điểm tổng hợp
+            base_rating = RatingFactory.get_calculator(comic["nguon"]).calculate(comic)
+            
+            analyzed_comics.append({
+                "comic": comic,
+                "source": comic["nguon"],
+                "comment_count": total,
+                "positive_percent": positive_percent,
+                "negative_percent": negative_percent,
+                "neutral_percent": neutral_percent,
+                "sentiment_score": sentiment_score,
+                "base_rating": base_rating,
+                "comprehensive_rating": calculate_comprehensive_rating(base_rating, sentiment_score),
+                "analysis_time": comic["analysis_time"] or "Không rõ"
+            })
         
         # Hiển thị dữ liệu trong bảng
         for comic_data in analyzed_comics:
@@ -563,7 +358,7 @@ class DetailAnalysisTab(QWidget):
             
             self.history_table.setItem(row, 0, QTableWidgetItem(comic.get("ten_truyen", "")))
             self.history_table.setItem(row, 1, QTableWidgetItem(comic_data["source"]))
-            self.history_table.setItem(row, 2, QTableWidgetItem(str(len(comic_data["comments"]))))
+            self.history_table.setItem(row, 2, QTableWidgetItem(str(comic_data["comment_count"])))
             
             # Format phần trăm
             self.history_table.setItem(row, 3, QTableWidgetItem(f"{comic_data['positive_percent']:.1f}%"))
@@ -859,6 +654,9 @@ class DetailAnalysisTab(QWidget):
             # Lock để thread-safe progress update
             progress_lock = threading.Lock()
             
+            # Số truyện crawl đồng thời tự điều chỉnh theo độ trễ/lỗi của nguồn
+            comment_concurrency = crawler.get_comment_concurrency()
+            
             def crawl_single_comic(comic_index, comic):
                 """Crawl comments cho một truyện"""
                 nonlocal completed_count
@@ -870,11 +668,17 @@ class DetailAnalysisTab(QWidget):
                     logger.info(f"🔗 [{comic_index+1}/{total_count}] Thread bắt đầu crawl: {comic_name}")
                     
                     # SỬ DỤNG METHOD CRAWL_COMMENTS GỐC CỦA CRAWLER
-                    comments = crawler.crawl_comments(
-                        comic, 
-                        time_limit=time_limit, 
-                        days_limit=days_limit
-                    )
+                    with comment_concurrency.slot() as started:
+                        try:
+                            comments = crawler.crawl_comments(
+                                comic, 
+                                time_limit=time_limit, 
+                                days_limit=days_limit
+                            )
+                        except Exception:
+                            comment_concurrency.record(time.monotonic() - started, OUTCOME_ERROR)
+                            raise
+                    comment_concurrency.record(time.monotonic() - started, OUTCOME_OK)
                     
                     comment_count = len(comments) if comments else 0
                     logger.info(f"✅ [{comic_index+1}/{total_count}] Thread hoàn thành: {comic_name} ({comment_count} comments)")
@@ -886,7 +690,7 @@ class DetailAnalysisTab(QWidget):
                     return comic_url, [], str(e)
             
             # Tạo ThreadPool và submit các tasks
-            max_workers = min(4, len(comics_list))  # Tối đa 4 threads để tránh quá tải
+            max_workers = max(1, min(comment_concurrency.max_limit, len(comics_list)))  # Số thread thực chạy do comment_concurrency giới hạn
             logger.info(f"Sử dụng {max_workers} threads để crawl song song")
             
             start_crawl_time = time.time()
@@ -1120,16 +924,7 @@ class DetailAnalysisTab(QWidget):
 
     def calculate_sentiment_rating(self, positive, negative, neutral):
         """Tính điểm sentiment dựa trên số lượng các loại comment"""
-        total = positive + negative + neutral
-        if total == 0:
-            return 5.0
-        
-        positive_ratio = positive / total
-        negative_ratio = negative / total
-        neutral_ratio = neutral / total
-        
-        sentiment_rating = (positive_ratio * 8) - (negative_ratio * 5) + (neutral_ratio * 6)
-        return max(0, min(10, sentiment_rating * 2))
+        return calculate_sentiment_rating(positive, negative, neutral)
 
     def create_basic_result(self, comic):
         """Tạo kết quả cơ bản khi không có comment"""
@@ -1358,6 +1153,7 @@ class DetailAnalysisTab(QWidget):
     
     def analyze_comments_sentiment(self, comic, comments):
         """Phân tích sentiment cho comments của một comic"""
+        metrics.set_site(comic.get("nguon"))
         try:
             sentiment_stats = {"positive": 0, "negative": 0, "neutral": 0}
             processed_comments = []
@@ -0,0 +1,110 @@
+import os
+import logging
+import threading
+
+from PyQt6.QtWidgets import QFileDialog, QMessageBox, QProgressDialog
+from PyQt6.QtCore import Qt, QThreadPool
+
+from utils.worker import Worker
+from utils import exporter
+
+logger = logging.getLogger(__name__)
+
+
+def ask_export_file(parent, default_name, title="Xuất dữ liệu"):
+    """
+    Hộp thoại chọn file và định dạng xuất
+
+    Args:
+        parent: Widget cha
+        default_name: Tên file mặc định (không có đuôi)
+        title: Tiêu đề hộp thoại
+
+    Returns:
+        tuple: (đường dẫn file, định dạng), (None, None) nếu người dùng hủy
+    """
+    filters = list(exporter.FORMATS.values())
+    file_path, selected_filter = QFileDialog.getSaveFileName(
+        parent, title, f"{default_name}.xlsx", ";;".join(filters)
+    )
+    if not file_path:
+        return None, None
+
+    # Định dạng theo bộ lọc đã chọn, thêm đuôi nếu người dùng không gõ
+    fmt = next((key for key, value in exporter.FORMATS.items() if value == selected_filter), None)
+    fmt = fmt or exporter.detect_format(file_path)
+    if not file_path.lower().endswith(f".{fmt}"):
+        file_path += f".{fmt}"
+    return file_path, fmt
+
+
+def open_containing_folder(file_path):
+    """Mở thư mục chứa file"""
+    try:
+        if os.name == 'nt':  # Windows
+            os.startfile(os.path.dirname(file_path))
+        elif os.name == 'posix':  # macOS và Linux
+            import subprocess
+            subprocess.call(['open', os.path.dirname(file_path)])
+    except Exception as e:
+        logger.warning(f"Không thể mở thư mục chứa file: {e}")
+
+
+def start_export(parent, datasets, file_path, fmt, title="Xuất dữ liệu"):
+    """
+    Xuất dữ liệu trong thread nền, hiển thị tiến trình và cho phép hủy
+
+    Giao diện vẫn dùng được trong lúc xuất; chỉ chạy một lần xuất mỗi widget.
+
+    Args:
+        parent: Widget gọi xuất (giữ tham chiếu worker trong parent.export_worker)
+        datasets: Danh sách exporter.Dataset
+        file_path: File đích
+        fmt: Định dạng (xlsx, csv, parquet)
+        title: Tiêu đề hộp thoại tiến trình
+
+    Returns:
+        Worker: Worker đang chạy, None nếu đang có lần xuất khác
+    """
+    if getattr(parent, "export_worker", None) is not None:
+        QMessageBox.warning(parent, "Cảnh báo", "Đang xuất dữ liệu, vui lòng chờ!")
+        return None
+
+    cancel_event = threading.Event()
+    progress_dialog = QProgressDialog("Đang xuất dữ liệu...", "Hủy", 0, 100, parent)
+    progress_dialog.setWindowTitle(title)
+    progress_dialog.setWindowModality(Qt.WindowModality.NonModal)
+    progress_dialog.setAutoClose(False)
+    progress_dialog.setMinimumDuration(0)
+    progress_dialog.canceled.connect(cancel_event.set)
+
+    worker = Worker(exporter.export_datasets, datasets, file_path, fmt, cancel_event=cancel_event)
+
+    def on_result(result):
+        if result["cancelled"]:
+            QMessageBox.information(parent, "Đã hủy", "Đã hủy xuất dữ liệu")
+            return
+        QMessageBox.information(
+            parent,
+            "Xuất dữ liệu thành công",
+            f"Đã xuất {result['rows']} dòng dữ liệu ra file:\n" + "\n".join(result["files"])
+        )
+        open_containing_folder(file_path)
+
+    def on_error(error):
+        QMessageBox.critical(parent, "Lỗi", f"Không thể xuất dữ liệu: {error}")
+
+    def on_finished():
+        progress_dialog.close()
+        parent.export_worker = None
+
+    worker.signals.progress.connect(progress_dialog.setValue)
+    worker.signals.result.connect(on_result)
+    worker.signals.error.connect(on_error)
+    worker.signals.finished.connect(on_finished)
+
+    parent.export_worker = worker
+    progress_dialog.show()
+    logger.info(f"Bắt đầu xuất dữ liệu ra {file_path} ({fmt})")
+    QThreadPool.globalInstance().start(worker)
+    return worker
@@ -4,36 +4,67 @@ from PyQt6.QtWidgets import (QMainWindow, QTabWidget, QVBoxLayout,
 from PyQt6.QtCore import Qt, QTimer
 import logging
 import sys
+import threading
+from collections import deque
 
 from ui.website_tab import WebsiteTab
 from ui.analysis_tab import DetailAnalysisTab
 from ui.settings_tab import SettingsTab
+from ui.metrics_tab import MetricsTab
 from utils.multi_db_manager import MultipleDBManager
 from crawlers.crawler_factory import CrawlerFactory
+from utils import logging_config
 
 logger = logging.getLogger(__name__)
 
+# Số dòng log tối đa giữ trong giao diện (dòng cũ bị bỏ)
+MAX_LOG_LINES = 2000
+# Chu kỳ cập nhật log lên giao diện (ms)
+LOG_REFRESH_MS = 250
+
 class LogHandler(logging.Handler):
     """
     Handler tùy chỉnh để chuyển log messages đến QTextEdit
+
+    emit() chỉ đưa dòng log vào ring buffer (chạy trên thread của QueueListener); một QTimer
+    trên thread giao diện gom các dòng mới và append một lần mỗi LOG_REFRESH_MS.
     """
     
-    def __init__(self, text_widget):
+    def __init__(self, text_widget, max_lines=MAX_LOG_LINES):
         super().__init__()
         self.text_widget = text_widget
+        self.text_widget.document().setMaximumBlockCount(max_lines)
         self.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        self.buffer = deque(maxlen=max_lines)
+        self.dropped = 0
+        self.buffer_lock = threading.Lock()
+        
+        self.timer = QTimer(text_widget)
+        self.timer.timeout.connect(self.flush_to_widget)
+        self.timer.start(LOG_REFRESH_MS)
     
     def emit(self, record):
         try:
             msg = self.format(record)
-            # Sử dụng QTimer để đảm bảo thread-safe
-            QTimer.singleShot(0, lambda: self.append_message(msg))
+            with self.buffer_lock:
+                if len(self.buffer) == self.buffer.maxlen:
+                    self.dropped += 1
+                self.buffer.append(msg)
         except Exception:
             pass
     
-    def append_message(self, msg):
+    def flush_to_widget(self):
+        """Append các dòng log mới trong một lần (chạy trên thread giao diện)"""
+        with self.buffer_lock:
+            if not self.buffer:
+                return
+            lines = list(self.buffer)
+            self.buffer.clear()
+            dropped, self.dropped = self.dropped, 0
         try:
-            self.text_widget.append(msg)
+            if dropped:
+                lines.insert(0, f"... bỏ qua {dropped} dòng log cũ ...")
+            self.text_widget.append("\n".join(lines))
             self.text_widget.ensureCursorVisible()
         except Exception:
             pass
@@ -100,10 +131,12 @@ class MainWindow(QMainWindow):
             self.website_tab = WebsiteTab(self.db_manager, self.config_manager)
             self.analysis_tab = DetailAnalysisTab(self.db_manager, CrawlerFactory, None, self.config_manager)
             self.settings_tab = SettingsTab(self.config_manager)
+            self.metrics_tab = MetricsTab(self.config_manager)
             
             self.tabs.addTab(self.website_tab, "Thu thập dữ liệu")
             self.tabs.addTab(self.analysis_tab, "Phân tích đánh giá")
             self.tabs.addTab(self.settings_tab, "Cài đặt")
+            self.tabs.addTab(self.metrics_tab, "Hiệu năng")
             
             # Kết nối signals
             self.website_tab.selection_updated.connect(self.update_selection)
@@ -152,8 +185,9 @@ class MainWindow(QMainWindow):
             text_handler = LogHandler(self.log_widget)
             text_handler.setLevel(logging.INFO)
             
-            # Thêm handler vào root logger
-            logging.getLogger().addHandler(text_handler)
+            # Thêm handler vào listener của hàng đợi log (nhận cả log của process con)
+            logging_config.add_handler(text_handler)
+            self.log_handler = text_handler
             
         except Exception as e:
             print(f"Lỗi khi thiết lập logging: {e}")
@@ -201,6 +235,8 @@ class MainWindow(QMainWindow):
             if reply == QMessageBox.StandardButton.Yes:
                 # Dọn dẹp tài nguyên
                 logger.info("Đóng ứng dụng...")
+                if getattr(self, "log_handler", None):
+                    logging_config.remove_handler(self.log_handler)
                 event.accept()
             else:
                 event.ignore()
@@ -0,0 +1,158 @@
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QSpinBox, QCheckBox,
+                             QGroupBox, QTableWidget, QTableWidgetItem, QHeaderView, QFileDialog, QMessageBox)
+from PyQt6.QtCore import QTimer, pyqtSignal
+import logging
+
+from utils import metrics, profiler
+
+logger = logging.getLogger(__name__)
+
+# Chu kỳ làm mới bảng và file Prometheus (ms)
+REFRESH_INTERVAL_MS = 5000
+
+STAGE_LABELS = {
+    metrics.STAGE_DRIVER_STARTUP: "Khởi tạo driver",
+    metrics.STAGE_PAGE_LOAD: "Tải trang",
+    metrics.STAGE_DOM_EXTRACT: "Trích xuất DOM",
+    metrics.STAGE_DB_WRITE: "Ghi database",
+    metrics.STAGE_RATING: "Tính điểm",
+    metrics.STAGE_SENTIMENT: "Phân tích cảm xúc"
+}
+
+COLUMNS = ["Giai đoạn", "Nguồn", "Số lần", "Tổng (s)", "Trung bình (ms)", "p50 (ms)", "p95 (ms)"]
+
+
+class MetricsTab(QWidget):
+    """
+    Tab hiển thị thời gian từng giai đoạn của pipeline (gộp từ mọi process) và bật profiler
+    """
+
+    # Signal bật profile: (số giây, có tracemalloc không)
+    profile_requested = pyqtSignal(int, bool)
+    # Signal báo profile xong (phát từ thread nền, Qt chuyển về thread giao diện)
+    profile_finished = pyqtSignal(dict)
+
+    def __init__(self, config_manager):
+        super().__init__()
+
+        self.config_manager = config_manager
+        self.prometheus_file = config_manager.get("metrics_file", metrics.DEFAULT_PROMETHEUS_FILE)
+
+        self.init_ui()
+
+        # Làm mới định kỳ, đồng thời cập nhật file Prometheus cho node_exporter
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(REFRESH_INTERVAL_MS)
+
+        logger.info("Khởi tạo MetricsTab thành công")
+
+    def init_ui(self):
+        """Thiết lập giao diện người dùng"""
+        main_layout = QVBoxLayout(self)
+
+        header = QHBoxLayout()
+        self.status_label = QLabel("Chưa có số liệu")
+        refresh_button = QPushButton("Làm mới")
+        refresh_button.clicked.connect(self.refresh)
+        export_button = QPushButton("Xuất Prometheus...")
+        export_button.clicked.connect(self.export_prometheus)
+        header.addWidget(self.status_label)
+        header.addStretch()
+        header.addWidget(refresh_button)
+        header.addWidget(export_button)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+
+        # Profiler lấy mẫu cho process chính và các worker crawler
+        profile_group = QGroupBox("Profiler")
+        profile_layout = QHBoxLayout(profile_group)
+        self.profile_duration_spin = QSpinBox()
+        self.profile_duration_spin.setRange(5, 600)
+        self.profile_duration_spin.setValue(profiler.DEFAULT_DURATION)
+        self.profile_duration_spin.setSuffix(" giây")
+        self.profile_memory_check = QCheckBox("So sánh bộ nhớ (tracemalloc)")
+        self.profile_button = QPushButton("Bắt đầu profile")
+        self.profile_button.clicked.connect(
+            lambda: self.profile_requested.emit(self.profile_duration_spin.value(), self.profile_memory_check.isChecked())
+        )
+        self.profile_label = QLabel("")
+        profile_layout.addWidget(QLabel("Thời gian:"))
+        profile_layout.addWidget(self.profile_duration_spin)
+        profile_layout.addWidget(self.profile_memory_check)
+        profile_layout.addWidget(self.profile_button)
+        profile_layout.addWidget(self.profile_label)
+        profile_layout.addStretch()
+
+        self.profile_requested.connect(self.start_profile)
+        self.profile_finished.connect(self.on_profile_finished)
+
+        main_layout.addLayout(header)
+        main_layout.addWidget(self.table)
+        main_layout.addWidget(profile_group)
+
+    def refresh(self):
+        """Gộp số liệu, cập nhật bảng và file Prometheus"""
+        try:
+            histograms = metrics.collect()
+            rows = metrics.summarize(histograms)
+
+            self.table.setRowCount(len(rows))
+            for index, row in enumerate(rows):
+                values = [
+                    STAGE_LABELS.get(row["stage"], row["stage"]),
+                    row["site"],
+                    str(row["count"]),
+                    f"{row['total']:.2f}",
+                    f"{row['mean'] * 1000:.1f}",
+                    f"{row['p50'] * 1000:.1f}",
+                    f"{row['p95'] * 1000:.1f}"
+                ]
+                for column, value in enumerate(values):
+                    self.table.setItem(index, column, QTableWidgetItem(value))
+
+            if histograms:
+                metrics.write_prometheus(self.prometheus_file, histograms)
+                self.status_label.setText(f"{len(rows)} nhóm số liệu - {self.prometheus_file}")
+        except Exception as e:
+            logger.error(f"Lỗi khi làm mới số liệu hiệu năng: {e}")
+
+    def start_profile(self, duration, trace_memory):
+        """
+        Bật sampling profiler cho mọi process của phiên
+
+        Args:
+            duration: Thời gian lấy mẫu (giây)
+            trace_memory: Kèm so sánh tracemalloc
+        """
+        profile_id = profiler.start_profiling(duration, trace_memory=trace_memory, callback=self.profile_finished.emit)
+        if profile_id is None:
+            QMessageBox.warning(self, "Profiler", "Đang có phiên profile khác chạy")
+            return
+        self.profile_button.setEnabled(False)
+        self.profile_label.setText(f"Đang profile {duration} giây...")
+
+    def on_profile_finished(self, result):
+        """Hiển thị kết quả profile"""
+        self.profile_button.setEnabled(True)
+        if "error" in result:
+            self.profile_label.setText(f"Lỗi: {result['error']}")
+            return
+        text = f"{result['samples']} mẫu - {result['collapsed']}"
+        if result.get("memory"):
+            text += f" - {result['memory']}"
+        self.profile_label.setText(text)
+
+    def export_prometheus(self):
+        """Xuất số liệu ra file text Prometheus do người dùng chọn"""
+        path, _ = QFileDialog.getSaveFileName(self, "Xuất số liệu Prometheus", self.prometheus_file,
+                                              "Prometheus text (*.prom);;All files (*)")
+        if not path:
+            return
+        if metrics.write_prometheus(path):
+            QMessageBox.information(self, "Thành công", f"Đã xuất số liệu vào {path}")
+        else:
+            QMessageBox.critical(self, "Lỗi", f"Không thể ghi file {path}")
@@ -1,16 +1,16 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                             QComboBox, QPushButton, QProgressBar, QTableWidget, 
                             QTableWidgetItem, QCheckBox, QHeaderView, QMessageBox,
-                            QSpinBox, QGroupBox, QApplication, QFileDialog)
+                            QSpinBox, QGroupBox, QApplication)
 from PyQt6.QtCore import Qt, QThreadPool, pyqtSignal, pyqtSlot, QTimer
 from analysis.rating_thread import RatingCalculationThread
 import logging
 import time
 from analysis.rating_factory import RatingFactory
-import pandas as pd
-import os
 from utils.worker import Worker
+from utils import exporter
 from crawlers.crawler_factory import CrawlerFactory
+from ui.export_dialog import ask_export_file, start_export
 
 logger = logging.getLogger(__name__)
 
@@ -175,7 +175,7 @@ class WebsiteTab(QWidget):
         self.select_for_analysis_button = QPushButton("Chọn để phân tích")
         self.select_for_analysis_button.clicked.connect(self.select_for_analysis)
         
-        self.export_excel_button = QPushButton("Xuất Excel")
+        self.export_excel_button = QPushButton("Xuất dữ liệu")
         self.export_excel_button.clicked.connect(self.export_to_excel)
 
         filter_layout.addWidget(filter_label)
@@ -240,102 +240,24 @@ class WebsiteTab(QWidget):
             self.pages_spin.setValue(total_pages)
     
     def export_to_excel(self):
-        """Xuất dữ liệu từ bảng kết quả ra file Excel"""
+        """Xuất danh sách truyện của nguồn hiện tại ra file Excel/CSV/Parquet (đọc thẳng từ database)"""
         try:
-            # Lấy tên website hiện tại làm tên file mặc định
-            current_website = self.website_combo.currentText()
-            default_filename = f"{current_website}_comics_{time.strftime('%Y%m%d_%H%M%S')}.xlsx"
-            
-            # Hiển thị hộp thoại chọn nơi lưu file
-            file_path, _ = QFileDialog.getSaveFileName(
-                self, "Lưu file Excel", 
-                default_filename,
-                "Excel Files (*.xlsx)"
-            )
-            
-            if not file_path: 
-                return
-                
-            # Nếu người dùng không thêm .xlsx vào tên file, thêm đuôi
-            if not file_path.endswith('.xlsx'):
-                file_path += '.xlsx'
-            
             # Kiểm tra xem có dữ liệu để xuất không
-            row_count = self.results_table.rowCount()
-            if row_count == 0:
+            if self.results_table.rowCount() == 0:
                 QMessageBox.warning(self, "Cảnh báo", "Không có dữ liệu để xuất!")
                 return
-            
-            # Hiển thị dialog tiến trình
-            # progress_dialog = QMessageBox(self)
-            # progress_dialog.setWindowTitle("Đang xuất dữ liệu")
-            # progress_dialog.setText("Đang chuẩn bị dữ liệu để xuất ra Excel...")
-            # progress_dialog.setStandardButtons(QMessageBox.StandardButton.NoButton)
-            # progress_dialog.show()
-            # QApplication.processEvents()
-            
-            # Thu thập dữ liệu từ bảng
-            data = []
-            headers = []
-            
-            # Lấy tên các cột (bỏ qua cột checkbox)
-            for col in range(1, self.results_table.columnCount()):
-                headers.append(self.results_table.horizontalHeaderItem(col).text())
-            
-            # Thu thập dữ liệu từng dòng
-            for row in range(row_count):
-                row_data = []
-                for col in range(1, self.results_table.columnCount()):
-                    item = self.results_table.item(row, col)
-                    if item is not None:
-                        row_data.append(item.text())
-                    else:
-                        row_data.append("")
-                data.append(row_data)
-            
-            # Tạo DataFrame từ dữ liệu
-            df = pd.DataFrame(data, columns=headers)
-            
-            # Cập nhật thông báo
-            # progress_dialog.setText("Đang ghi dữ liệu vào file Excel...")
-            QApplication.processEvents()
-            
-            # Xuất DataFrame ra file Excel
-            with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name=current_website, index=False)
-                
-                # Điều chỉnh độ rộng cột
-                worksheet = writer.sheets[current_website]
-                for i, col in enumerate(df.columns):
-                    # Xác định độ rộng dựa trên giá trị dài nhất
-                    max_length = max(df[col].astype(str).map(len).max(), len(col)) + 2
-                    worksheet.column_dimensions[chr(65 + i)].width = min(max_length, 50) 
-            
-            # Đóng dialog tiến trình
-            # progress_dialog.close()
-            
-            # Hiển thị thông báo thành công
-            QMessageBox.information(
-                self, 
-                "Xuất dữ liệu thành công", 
-                f"Đã xuất {row_count} dòng dữ liệu ra file:\n{file_path}"
-            )
-            
-            # Mở file hoặc thư mục chứa file
-            try:
-                if os.name == 'nt':  # Windows
-                    os.startfile(os.path.dirname(file_path))
-                elif os.name == 'posix':  # macOS và Linux
-                    import subprocess
-                    subprocess.call(['open', os.path.dirname(file_path)])
-            except Exception as e:
-                logger.warning(f"Không thể mở thư mục chứa file: {e}")
-            
-            logger.info(f"Đã xuất {row_count} dòng dữ liệu ra file: {file_path}")
+
+            # Lấy tên website hiện tại làm tên file mặc định
+            current_website = self.website_combo.currentText()
+            file_path, fmt = ask_export_file(self, f"{current_website}_comics_{time.strftime('%Y%m%d_%H%M%S')}")
+            if not file_path:
+                return
+
+            start_export(self, [exporter.comics_dataset(self.db_manager, current_website)], file_path, fmt)
             
         except Exception as e:
-            logger.error(f"Lỗi khi xuất dữ liệu ra Excel: {e}")
-            QMessageBox.critical(self, "Lỗi", f"Không thể xuất file Excel: {str(e)}")
+            logger.error(f"Lỗi khi xuất dữ liệu: {e}")
+            QMessageBox.critical(self, "Lỗi", f"Không thể xuất file: {str(e)}")
 
     def apply_sorting(self):
         """Áp dụng sắp xếp theo trường đã chọn"""
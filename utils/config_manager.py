@@ -36,7 +36,16 @@ class ConfigManager:
         default_config = {
             "chrome_driver_path": "",  # Để trống để Selenium tự tìm
             "max_pages": 10,  # Số trang tối đa để crawl
-            "worker_count": 5,  # Số worker cho multi-threading
+            "worker_count": 5,  # Số worker cho multi-threading (mức khởi đầu, tự điều chỉnh theo host)
+            "max_worker_count": 10,  # Số worker tối đa khi tự điều chỉnh
+            "comment_worker_count": 2,  # Số truyện crawl comment đồng thời ban đầu
+            "max_comment_worker_count": 6,  # Số truyện crawl comment đồng thời tối đa
+            "comment_page_concurrency": 3,  # Số trang comment tải đồng thời cho một truyện
+            "request_interval": 0.5,  # Khoảng cách tối thiểu giữa hai request tới cùng host (giây)
+            "tabs_per_browser": 1,  # Số tab mỗi Chrome dùng khi crawl chi tiết (1 = mỗi truyện một Chrome)
+            "task_timeout": 300,  # Hạn chót của một tác vụ crawl chi tiết, quá hạn thì kill và chạy lại (giây)
+            "max_drivers": 8,  # Số Chrome chạy đồng thời tối đa trên toàn bộ các process
+            "memory_reserve_mb": 1024,  # RAM luôn chừa lại, không cấp thêm Chrome khi RAM trống thấp hơn (MB)
             "supported_websites": {
                 "TruyenQQ": "https://truyenqqgo.com",
                 "NetTruyen": "https://nettruyenvia.com",
@@ -0,0 +1,284 @@
+"""
+Truy vấn gộp nhiều nguồn trên các file SQLite riêng biệt
+
+Mỗi nguồn vẫn nằm trong file database riêng; mỗi lần truy vấn mở một connection
+:memory:, ATTACH các file đang có và tạo view tạm all_comics / all_comments với tên cột
+đã chuẩn hóa (rating của NetTruyen và danh_gia của Manhuavn cùng là cột rating, cột
+nguồn không có thì là NULL). Xếp hạng, đếm và tìm kiếm trên mọi nguồn chỉ còn là một câu
+lệnh SQL thay vì vòng lặp set_source theo từng nguồn.
+"""
+import os
+import sqlite3
+import logging
+from datetime import date
+
+from utils import data_cache
+
+logger = logging.getLogger(__name__)
+
+# Cột chuẩn của view all_comics (cùng với cột nguon)
+COMIC_COLUMNS = [
+    "id", "ten_truyen", "tac_gia", "the_loai", "mo_ta", "link_truyen", "so_chuong", "luot_xem",
+    "luot_thich", "luot_theo_doi", "rating", "luot_danh_gia", "so_binh_luan", "trang_thai",
+    "base_rating", "thoi_gian_cap_nhat"
+]
+# Cột chuẩn của view all_comments (cùng với cột nguon)
+COMMENT_COLUMNS = [
+    "id", "comic_id", "ten_nguoi_binh_luan", "noi_dung", "sentiment", "sentiment_score",
+    "thoi_gian_binh_luan", "thoi_gian_cap_nhat"
+]
+# Cột chuẩn -> tên cột có thể có trong database của nguồn (lấy tên đầu tiên tồn tại)
+COLUMN_ALIASES = {
+    "rating": ["rating", "danh_gia"]
+}
+# Cột chuẩn -> tên cột riêng mà bộ tính điểm của nguồn đọc
+SOURCE_FIELDS = {
+    "Manhuavn": {"rating": "danh_gia"}
+}
+# Các cột được phép dùng để xếp hạng
+RANKING_COLUMNS = ["base_rating", "luot_xem", "luot_thich", "luot_theo_doi", "luot_danh_gia", "so_chuong", "so_binh_luan"]
+DEFAULT_LIMIT = 50
+# Comment chưa phân tích được lưu với sentiment rỗng ('') chứ không phải NULL
+ANALYZED_CONDITION = "sentiment IN ('positive', 'negative', 'neutral')"
+
+
+def normalized_select(available, columns=COMIC_COLUMNS, prefix=""):
+    """
+    Danh sách biểu thức SELECT đổi cột của một nguồn sang tên cột chuẩn
+
+    Args:
+        available: Tập tên cột thực có trong bảng của nguồn
+        columns: Danh sách cột chuẩn
+        prefix: Tiền tố bảng cho cột nguồn (vd. "c.")
+
+    Returns:
+        str: Các biểu thức "<cột nguồn> AS <cột chuẩn>" (NULL nếu nguồn không có)
+    """
+    expressions = []
+    for name in columns:
+        found = next((alias for alias in COLUMN_ALIASES.get(name, [name]) if alias in available), None)
+        expressions.append(f"{prefix}{found} AS {name}" if found else f"NULL AS {name}")
+    return ", ".join(expressions)
+
+
+def to_source_fields(comic):
+    """
+    Thêm lại tên cột riêng của nguồn vào dict truyện đã chuẩn hóa (để dùng bộ tính điểm)
+
+    Args:
+        comic: Dict truyện từ all_comics (có nguon)
+
+    Returns:
+        dict: Chính dict đó
+    """
+    for normalized, field in SOURCE_FIELDS.get(comic.get("nguon"), {}).items():
+        comic.setdefault(field, comic.get(normalized))
+    return comic
+
+
+class CrossSourceQuery:
+    """
+    Truy vấn trên mọi nguồn bằng một câu lệnh SQL
+    """
+
+    def __init__(self, db_manager):
+        """
+        Khởi tạo CrossSourceQuery
+
+        Args:
+            db_manager: MultipleDBManager (lấy danh sách nguồn và đường dẫn file)
+        """
+        self.db_manager = db_manager
+
+    def _schemas(self, conn):
+        """ATTACH các file database đang có, trả về [(nguồn, schema)]"""
+        schemas = []
+        for index, source in enumerate(self.db_manager.supported_sources):
+            db_file = self.db_manager.get_db_file(source)
+            if not os.path.exists(db_file):
+                continue
+            schema = f"src{index}"
+            conn.execute("ATTACH DATABASE ? AS " + schema, (db_file,))
+            schemas.append((source, schema))
+        return schemas
+
+    @staticmethod
+    def _table_columns(conn, schema, table):
+        return {row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})").fetchall()}
+
+    def connect(self):
+        """
+        Mở connection đã ATTACH mọi nguồn và tạo view all_comics, all_comments
+
+        Returns:
+            sqlite3.Connection: Connection (row_factory là sqlite3.Row), người gọi tự đóng
+        """
+        return self._open()[0]
+
+    def _open(self):
+        """
+        Returns:
+            tuple: (connection, [(nguồn, schema, cột bảng comics, cột bảng comments)])
+        """
+        conn = sqlite3.connect(":memory:")
+        conn.row_factory = sqlite3.Row
+        schemas = []
+        try:
+            for source, schema in self._schemas(conn):
+                comic_columns = self._table_columns(conn, schema, "comics")
+                comment_columns = self._table_columns(conn, schema, "comments")
+                # File mới tạo chưa có bảng thì bỏ qua
+                if comic_columns and comment_columns:
+                    schemas.append((source, schema, comic_columns, comment_columns))
+
+            for view, columns, index in (("all_comics", COMIC_COLUMNS, 2), ("all_comments", COMMENT_COLUMNS, 3)):
+                table = view[len("all_"):]
+                parts = [
+                    f"SELECT '{entry[0]}' AS nguon, {normalized_select(entry[index], columns)} FROM {entry[1]}.{table}"
+                    for entry in schemas
+                ]
+                if not parts:
+                    parts = [f"SELECT NULL AS nguon, {normalized_select(set(), columns)} WHERE 0"]
+                conn.execute(f"CREATE TEMP VIEW {view} AS " + " UNION ALL ".join(parts))
+            return conn, schemas
+        except Exception:
+            conn.close()
+            raise
+
+    def query(self, sql, params=()):
+        """
+        Chạy câu truy vấn trên view all_comics / all_comments
+
+        Returns:
+            list: Danh sách dict
+        """
+        conn = self.connect()
+        try:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _source_filter(sources, column="nguon"):
+        if not sources:
+            return "1", ()
+        return f"{column} IN ({', '.join('?' for _ in sources)})", tuple(sources)
+
+    def leaderboard(self, order_by="base_rating", limit=DEFAULT_LIMIT, sources=None):
+        """
+        Bảng xếp hạng truyện trên mọi nguồn
+
+        Args:
+            order_by: Cột xếp hạng (một trong RANKING_COLUMNS)
+            limit: Số truyện
+            sources: Chỉ xếp hạng trong các nguồn này (mặc định tất cả)
+
+        Returns:
+            list: Danh sách dict truyện, cao nhất trước
+        """
+        if order_by not in RANKING_COLUMNS:
+            raise ValueError(f"Không thể xếp hạng theo cột: {order_by}")
+        condition, params = self._source_filter(sources)
+        return self.query(
+            f"SELECT * FROM all_comics WHERE {condition} AND {order_by} IS NOT NULL "
+            f"ORDER BY {order_by} DESC LIMIT ?",
+            (*params, limit)
+        )
+
+    def search(self, keyword, sources=None, limit=DEFAULT_LIMIT):
+        """
+        Tìm truyện theo tên hoặc tác giả trên mọi nguồn
+
+        Returns:
+            list: Danh sách dict truyện, nhiều lượt xem trước
+        """
+        condition, params = self._source_filter(sources)
+        pattern = f"%{keyword}%"
+        return self.query(
+            f"SELECT * FROM all_comics WHERE {condition} AND (ten_truyen LIKE ? OR tac_gia LIKE ?) "
+            f"ORDER BY luot_xem DESC LIMIT ?",
+            (*params, pattern, pattern, limit)
+        )
+
+    def counts(self):
+        """
+        Số truyện, comment và comment đã phân tích của từng nguồn
+
+        Returns:
+            dict: Nguồn -> {comics, comments, analyzed_comments}
+        """
+        conn, schemas = self._open()
+        try:
+            if not schemas:
+                return {}
+            sql = " UNION ALL ".join(f"""
+                SELECT '{source}' AS nguon,
+                       (SELECT COUNT(*) FROM {schema}.comics) AS comics,
+                       (SELECT COUNT(*) FROM {schema}.comments) AS comments,
+                       (SELECT COUNT(*) FROM {schema}.comments WHERE {ANALYZED_CONDITION}) AS analyzed_comments
+            """ for source, schema, _, _ in schemas)
+            return {
+                row["nguon"]: {key: row[key] for key in ("comics", "comments", "analyzed_comments")}
+                for row in conn.execute(sql).fetchall()
+            }
+        finally:
+            conn.close()
+
+    def sentiment_summary(self, sources=None, days=None):
+        """
+        Thống kê sentiment của mọi truyện đã phân tích trên các nguồn
+
+        Gộp comment theo từng nguồn trước khi JOIN (mỗi nhánh dùng index của file đó)
+        rồi nối các nguồn lại trong cùng một câu lệnh. Kết quả được cache tới khi dữ liệu
+        của một trong các nguồn thay đổi.
+
+        Args:
+            sources: Danh sách nguồn (mặc định tất cả)
+            days: Chỉ lấy truyện được phân tích trong số ngày gần đây
+
+        Returns:
+            list: Dict truyện (cột chuẩn + tên cột riêng của nguồn) kèm total_comments,
+                  positive_count, negative_count, neutral_count, analysis_time;
+                  mới phân tích nhất trước
+        """
+        sources = list(sources or self.db_manager.supported_sources)
+        # Lọc theo số ngày phụ thuộc thời điểm hiện tại nên khóa cache đổi theo ngày
+        key = ("sentiment_summary", self.db_manager.db_folder, tuple(sources), days,
+               date.today().isoformat() if days else None)
+        db_files = {source: self.db_manager.get_db_file(source) for source in sources}
+        return data_cache.get_query(key, sources, db_files, lambda: self._sentiment_summary(sources, days))
+
+    def _sentiment_summary(self, sources, days):
+        conn, schemas = self._open()
+        try:
+            parts = []
+            for source, schema, comic_columns, _ in schemas:
+                if source not in sources:
+                    continue
+                parts.append(f"""
+                    SELECT '{source}' AS nguon, {normalized_select(comic_columns, prefix="c.")},
+                           s.total_comments, s.positive_count, s.negative_count, s.neutral_count, s.analysis_time
+                    FROM (
+                        SELECT comic_id,
+                               COUNT(*) AS total_comments,
+                               SUM(sentiment = 'positive') AS positive_count,
+                               SUM(sentiment = 'negative') AS negative_count,
+                               SUM(sentiment = 'neutral') AS neutral_count,
+                               MAX(thoi_gian_cap_nhat) AS analysis_time
+                        FROM {schema}.comments
+                        WHERE {ANALYZED_CONDITION}
+                        GROUP BY comic_id
+                    ) s JOIN {schema}.comics c ON c.id = s.comic_id
+                """)
+            if not parts:
+                return []
+
+            sql = "SELECT * FROM (" + " UNION ALL ".join(parts) + ")"
+            params = ()
+            if days:
+                sql += " WHERE analysis_time >= datetime('now', ?)"
+                params = (f"-{int(days)} days",)
+            sql += " ORDER BY analysis_time DESC"
+            return [to_source_fields(dict(row)) for row in conn.execute(sql, params).fetchall()]
+        finally:
+            conn.close()
@@ -0,0 +1,158 @@
+"""
+Cache dữ liệu truyện trong bộ nhớ, dùng chung cho cả process
+
+Mỗi nguồn có một bộ đếm phiên bản; mọi đường ghi (lưu truyện, cập nhật điểm, lưu/xóa
+comment) tăng phiên bản sau khi commit. Dữ liệu cache còn được gắn với mtime/kích thước
+file database nên lần ghi từ process khác (worker crawl) cũng làm cache hết hạn. Dữ liệu lưu dạng cột (mỗi cột một tuple, chuỗi trùng lặp dùng chung
+một object) và mỗi lần đọc tạo dict mới, nên người gọi sửa dict trả về không ảnh hưởng cache.
+"""
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Số kết quả truy vấn dẫn xuất (thống kê, xếp hạng...) giữ lại tối đa
+MAX_QUERY_ENTRIES = 16
+
+_lock = threading.Lock()
+_versions = {}
+_tables = {}
+_queries = OrderedDict()
+_stats = {"hits": 0, "misses": 0}
+
+
+class ColumnarTable:
+    """
+    Bảng dữ liệu dạng cột, chỉ đọc
+    """
+
+    def __init__(self, columns, rows):
+        """
+        Args:
+            columns: Tên các cột
+            rows: Danh sách dòng (tuple/sqlite3.Row theo thứ tự columns)
+        """
+        self.columns = tuple(columns)
+        self.count = len(rows)
+        data = []
+        for values in zip(*rows) if rows else [()] * len(self.columns):
+            # Chuỗi trùng lặp trong cùng cột (nguồn, trạng thái, thể loại...) chỉ giữ một bản
+            pool = {}
+            data.append(tuple(pool.setdefault(value, value) if isinstance(value, str) else value for value in values))
+        self.data = tuple(data)
+
+    def to_dicts(self):
+        """Danh sách dict mới, mỗi dòng một dict"""
+        return [dict(zip(self.columns, values)) for values in zip(*self.data)] if self.count else []
+
+
+def _file_signature(db_file):
+    try:
+        stat = os.stat(db_file)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+
+def version(source):
+    """Phiên bản dữ liệu của một nguồn trong process này"""
+    return _versions.get(source, 0)
+
+
+def bump(source):
+    """
+    Tăng phiên bản sau khi ghi (gọi sau commit)
+
+    Args:
+        source: Tên nguồn vừa ghi
+    """
+    with _lock:
+        _versions[source] = _versions.get(source, 0) + 1
+
+
+def _signature(sources, db_files):
+    return tuple((source, version(source), _file_signature(db_files[source])) for source in sources)
+
+
+def get_comics(source, db_file, loader):
+    """
+    Danh sách truyện của một nguồn, đọc từ database khi cache hết hạn
+
+    Args:
+        source: Tên nguồn
+        db_file: File database của nguồn
+        loader: Hàm không tham số trả về (tên cột, danh sách dòng)
+
+    Returns:
+        list: Danh sách dict truyện (bản sao mới mỗi lần gọi)
+    """
+    # Lấy chữ ký trước khi đọc: có ghi trong lúc đọc thì lần sau sẽ đọc lại
+    signature = _signature([source], {source: db_file})
+    entry = _tables.get(db_file)
+    if entry is not None and entry[0] == signature:
+        _stats["hits"] += 1
+        return entry[1].to_dicts()
+
+    _stats["misses"] += 1
+    columns, rows = loader()
+    table = ColumnarTable(columns, rows)
+    with _lock:
+        _tables[db_file] = (signature, table)
+    logger.debug(f"Đã nạp {table.count} truyện của {source} vào cache")
+    return table.to_dicts()
+
+
+def get_query(key, sources, db_files, loader):
+    """
+    Kết quả truy vấn dẫn xuất trên nhiều nguồn, hết hạn khi một trong các nguồn thay đổi
+
+    Args:
+        key: Khóa của truy vấn (gồm cả tham số)
+        sources: Các nguồn mà truy vấn đọc
+        db_files: Dict nguồn -> file database
+        loader: Hàm không tham số trả về danh sách dict
+
+    Returns:
+        list: Danh sách dict (bản sao mới mỗi lần gọi)
+    """
+    signature = _signature(sources, db_files)
+    with _lock:
+        entry = _queries.get(key)
+        if entry is not None and entry[0] == signature:
+            _queries.move_to_end(key)
+            _stats["hits"] += 1
+            return entry[1].to_dicts()
+
+    _stats["misses"] += 1
+    rows = loader()
+    # Các dòng có thể có thêm cột riêng của nguồn, lấy hợp các cột theo thứ tự xuất hiện
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    table = ColumnarTable(columns, [tuple(row.get(column) for column in columns) for row in rows])
+    with _lock:
+        _queries[key] = (signature, table)
+        _queries.move_to_end(key)
+        while len(_queries) > MAX_QUERY_ENTRIES:
+            _queries.popitem(last=False)
+    return table.to_dicts()
+
+
+def invalidate(source=None):
+    """Xóa cache của một nguồn (None: tất cả)"""
+    with _lock:
+        if source is None:
+            _tables.clear()
+            _queries.clear()
+            return
+        for entries in (_tables, _queries):
+            for key in [key for key, entry in entries.items() if any(part[0] == source for part in entry[0])]:
+                del entries[key]
+
+
+def stats():
+    """Số lần đọc trúng/trượt cache và số truyện đang giữ theo file database"""
+    return {
+        **_stats,
+        "comics": {db_file: entry[1].count for db_file, entry in _tables.items()}
+    }
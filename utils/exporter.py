@@ -0,0 +1,563 @@
+"""
+Xuất dữ liệu ra XLSX, CSV và Parquet theo luồng
+
+Dữ liệu được đọc thẳng từ database theo từng khối (phân trang theo khóa chính, mỗi khối
+là một câu lệnh riêng nên không giữ khóa đọc suốt quá trình xuất) và ghi ngay ra file:
+XLSX dùng chế độ write-only của openpyxl, CSV dùng module csv, Parquet ghi từng row group
+bằng pyarrow. Bộ nhớ chỉ phụ thuộc kích thước khối, không phụ thuộc số dòng.
+"""
+import os
+import csv
+import json
+import sqlite3
+import logging
+from collections import namedtuple
+
+from utils.sqlite_helper import COMIC_COLUMNS
+from utils import cross_source
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    "xlsx": "Excel (*.xlsx)",
+    "csv": "CSV (*.csv)",
+    "parquet": "Parquet (*.parquet)"
+}
+DEFAULT_CHUNK_SIZE = 5000
+# Giới hạn của Excel: số dòng mỗi sheet (kể cả tiêu đề), độ dài tên sheet và nội dung ô
+XLSX_MAX_ROWS = 1048576
+XLSX_MAX_SHEET_NAME = 31
+XLSX_MAX_CELL_LENGTH = 32767
+
+TEXT = "text"
+INT = "int"
+FLOAT = "float"
+
+Column = namedtuple("Column", ["header", "kind", "width"])
+Column.__new__.__defaults__ = (TEXT, 20)
+
+
+class Dataset:
+    """
+    Một bảng cần xuất (một sheet XLSX hoặc một file CSV/Parquet)
+
+    rows là hàm trả về iterator các khối dòng (list tuple theo thứ tự columns); được gọi
+    trong thread xuất file nên connection SQLite cũng được mở trong thread đó.
+    """
+
+    def __init__(self, name, columns, rows, total=None):
+        """
+        Args:
+            name: Tên sheet / hậu tố tên file
+            columns: Danh sách Column
+            rows: Hàm không tham số trả về iterator các khối dòng
+            total: Hàm trả về tổng số dòng (để tính tiến trình), None nếu không biết
+        """
+        self.name = name
+        self.columns = columns
+        self.rows = rows
+        self.total = total
+
+
+def detect_format(file_path, default="xlsx"):
+    """Định dạng xuất theo đuôi file"""
+    extension = os.path.splitext(file_path)[1].lower().lstrip(".")
+    return extension if extension in FORMATS else default
+
+
+def _to_int(value):
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return int(float(str(value).replace(",", "")))
+        except ValueError:
+            return None
+
+
+def _to_float(value):
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_text(value):
+    return None if value is None else str(value)
+
+
+CONVERTERS = {TEXT: _to_text, INT: _to_int, FLOAT: _to_float}
+
+
+class _XlsxWriter:
+    """Ghi nhiều sheet vào một file XLSX ở chế độ write-only"""
+
+    def __init__(self, output_file):
+        from openpyxl import Workbook
+        from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+        from openpyxl.utils import get_column_letter
+
+        self.output_file = output_file
+        self.files = [output_file]
+        self.workbook = Workbook(write_only=True)
+        self._illegal = ILLEGAL_CHARACTERS_RE
+        self._column_letter = get_column_letter
+        self.dataset = None
+        self.sheet = None
+        self.sheet_rows = 0
+        self.sheet_count = 0
+
+    def _new_sheet(self):
+        self.sheet_count += 1
+        suffix = f" ({self.sheet_count})" if self.sheet_count > 1 else ""
+        title = self.dataset.name[:XLSX_MAX_SHEET_NAME - len(suffix)] + suffix
+        self.sheet = self.workbook.create_sheet(title=title)
+        # Chế độ write-only chỉ cho đặt độ rộng cột trước khi ghi dòng đầu tiên
+        for index, column in enumerate(self.dataset.columns, 1):
+            self.sheet.column_dimensions[self._column_letter(index)].width = column.width
+        self.sheet.append([column.header for column in self.dataset.columns])
+        self.sheet_rows = 1
+
+    def begin(self, dataset):
+        self.dataset = dataset
+        self.sheet_count = 0
+        self._new_sheet()
+
+    def _clean(self, value):
+        if isinstance(value, str):
+            return self._illegal.sub("", value)[:XLSX_MAX_CELL_LENGTH]
+        return value
+
+    def write(self, rows):
+        for row in rows:
+            # Vượt giới hạn dòng của Excel thì ghi tiếp sang sheet mới
+            if self.sheet_rows >= XLSX_MAX_ROWS:
+                self._new_sheet()
+            self.sheet.append([self._clean(value) for value in row])
+            self.sheet_rows += 1
+
+    def end(self):
+        self.sheet = None
+
+    def close(self):
+        self.workbook.save(self.output_file)
+
+
+def _dataset_file(output_file, dataset, multiple):
+    """Tên file của một bảng khi định dạng chỉ chứa được một bảng mỗi file"""
+    if not multiple:
+        return output_file
+    stem, extension = os.path.splitext(output_file)
+    slug = "_".join(dataset.name.lower().split())
+    return f"{stem}_{slug}{extension}"
+
+
+class _CsvWriter:
+    """Ghi mỗi bảng ra một file CSV (UTF-8 có BOM để Excel đọc đúng tiếng Việt)"""
+
+    def __init__(self, output_file, multiple):
+        self.output_file = output_file
+        self.multiple = multiple
+        self.files = []
+        self._file = None
+        self._writer = None
+
+    def begin(self, dataset):
+        path = _dataset_file(self.output_file, dataset, self.multiple)
+        self.files.append(path)
+        self._file = open(path, "w", encoding="utf-8-sig", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([column.header for column in dataset.columns])
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def end(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+
+    def close(self):
+        self.end()
+
+
+class _ParquetWriter:
+    """Ghi mỗi bảng ra một file Parquet, mỗi khối là một row group"""
+
+    def __init__(self, output_file, multiple):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Cần cài pyarrow để xuất Parquet (pip install pyarrow)")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.output_file = output_file
+        self.multiple = multiple
+        self.files = []
+        self._writer = None
+        self._schema = None
+
+    def begin(self, dataset):
+        types = {TEXT: self.pa.string(), INT: self.pa.int64(), FLOAT: self.pa.float64()}
+        self._schema = self.pa.schema([(column.header, types[column.kind]) for column in dataset.columns])
+        path = _dataset_file(self.output_file, dataset, self.multiple)
+        self.files.append(path)
+        self._writer = self.pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows):
+        if not rows:
+            return
+        arrays = [
+            self.pa.array([row[index] for row in rows], type=field.type)
+            for index, field in enumerate(self._schema)
+        ]
+        self._writer.write_table(self.pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def end(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._writer = None
+
+    def close(self):
+        self.end()
+
+
+def _create_writer(output_file, fmt, multiple):
+    if fmt == "xlsx":
+        return _XlsxWriter(output_file)
+    if fmt == "csv":
+        return _CsvWriter(output_file, multiple)
+    if fmt == "parquet":
+        return _ParquetWriter(output_file, multiple)
+    raise ValueError(f"Định dạng xuất không hỗ trợ: {fmt}")
+
+
+def _report(progress_callback, value):
+    if progress_callback is None:
+        return
+    # Nhận cả signal của Worker lẫn hàm thường
+    if hasattr(progress_callback, "emit"):
+        progress_callback.emit(value)
+    else:
+        progress_callback(value)
+
+
+def export_datasets(datasets, output_file, fmt=None, progress_callback=None, cancel_event=None):
+    """
+    Xuất các bảng ra file theo luồng
+
+    Args:
+        datasets: Danh sách Dataset
+        output_file: File đích (CSV/Parquet có nhiều bảng thì thêm hậu tố tên bảng)
+        fmt: xlsx, csv hoặc parquet (mặc định theo đuôi file)
+        progress_callback: Signal/hàm nhận tiến trình 0-100
+        cancel_event: threading.Event để hủy giữa chừng
+
+    Returns:
+        dict: rows (số dòng đã ghi), files (các file đã tạo), cancelled
+    """
+    fmt = fmt or detect_format(output_file)
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+
+    total = 0
+    for dataset in datasets:
+        total += dataset.total() if dataset.total else 0
+    written = 0
+    cancelled = False
+    last_progress = -1
+
+    writer = _create_writer(output_file, fmt, len(datasets) > 1)
+    try:
+        for dataset in datasets:
+            converters = [CONVERTERS[column.kind] for column in dataset.columns]
+            writer.begin(dataset)
+            for chunk in dataset.rows():
+                if cancel_event is not None and cancel_event.is_set():
+                    cancelled = True
+                    break
+                writer.write([
+                    tuple(convert(value) for convert, value in zip(converters, row))
+                    for row in chunk
+                ])
+                written += len(chunk)
+                if total:
+                    progress = min(99, int(written * 100 / total))
+                    if progress != last_progress:
+                        _report(progress_callback, progress)
+                        last_progress = progress
+            writer.end()
+            if cancelled:
+                break
+        if not cancelled:
+            writer.close()
+    except Exception:
+        writer.end()
+        _remove_files(writer.files)
+        raise
+
+    if cancelled:
+        writer.end()
+        _remove_files(writer.files)
+        logger.info(f"Đã hủy xuất dữ liệu ra {output_file}")
+        return {"rows": written, "files": [], "cancelled": True}
+
+    _report(progress_callback, 100)
+    logger.info(f"Đã xuất {written} dòng ra {', '.join(writer.files)}")
+    return {"rows": written, "files": writer.files, "cancelled": False}
+
+
+def _remove_files(files):
+    for path in files:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def iter_query(db_file, query, params=(), key_index=0, chunk_size=DEFAULT_CHUNK_SIZE, row_factory=None):
+    """
+    Đọc kết quả truy vấn theo từng khối, phân trang theo khóa
+
+    Câu truy vấn phải có điều kiện "<khóa> > ?" làm tham số cuối trước LIMIT, sắp xếp theo
+    khóa và kết thúc bằng "LIMIT ?". Mỗi khối là một câu lệnh riêng nên không giữ khóa
+    đọc lâu, crawler vẫn ghi được database trong lúc xuất.
+
+    Args:
+        db_file: File SQLite
+        query: Câu truy vấn
+        params: Tham số đứng trước khóa
+        key_index: Vị trí cột khóa trong mỗi dòng
+        chunk_size: Số dòng mỗi khối
+        row_factory: row_factory của connection (vd. sqlite3.Row)
+
+    Yields:
+        list: Các dòng của một khối
+    """
+    if not os.path.exists(db_file):
+        return
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = row_factory
+    try:
+        last_key = -1
+        while True:
+            rows = conn.execute(query, (*params, last_key, chunk_size)).fetchall()
+            if not rows:
+                break
+            last_key = rows[-1][key_index]
+            yield rows
+            if len(rows) < chunk_size:
+                break
+    finally:
+        conn.close()
+
+
+def count_rows(db_file, query, params=()):
+    """Đếm số dòng (0 nếu chưa có database)"""
+    if not os.path.exists(db_file):
+        return 0
+    conn = sqlite3.connect(db_file)
+    try:
+        return conn.execute(query, params).fetchone()[0] or 0
+    except sqlite3.Error as e:
+        logger.error(f"Lỗi khi đếm dữ liệu trong {db_file}: {str(e)}")
+        return 0
+    finally:
+        conn.close()
+
+
+def _strip_key(chunks):
+    """Bỏ cột khóa (cột đầu tiên) khỏi các dòng"""
+    for chunk in chunks:
+        yield [row[1:] for row in chunk]
+
+
+def _chain(sources_chunks):
+    for chunks in sources_chunks:
+        yield from chunks
+
+
+COMIC_EXPORT_COLUMNS = [
+    Column("ID", INT, 8), Column("Tên truyện", TEXT, 40), Column("Tác giả", TEXT, 20),
+    Column("Thể loại", TEXT, 30), Column("Mô tả", TEXT, 50), Column("Link", TEXT, 40),
+    Column("Số chương", INT, 10), Column("Lượt xem", INT, 12), Column("Lượt thích", INT, 12),
+    Column("Lượt theo dõi", INT, 12), Column("Rating", TEXT, 10), Column("Lượt đánh giá", INT, 12),
+    Column("Điểm cơ bản", FLOAT, 12), Column("Trạng thái", TEXT, 15)
+]
+
+# Comment đã phân tích sentiment (bảng comments đặt bí danh cm)
+ANALYZED_CONDITION = f"cm.{cross_source.ANALYZED_CONDITION}"
+
+COMMENT_EXPORT_COLUMNS = [
+    Column("Tên truyện", TEXT, 40), Column("Nguồn", TEXT, 12), Column("Người bình luận", TEXT, 20),
+    Column("Nội dung", TEXT, 50), Column("Sentiment", TEXT, 10), Column("Điểm sentiment", FLOAT, 12),
+    Column("Thời gian bình luận", TEXT, 20)
+]
+
+
+def _comic_select(source):
+    """Câu truy vấn danh sách truyện theo cột chuẩn của cross_source (NULL với cột nguồn không có)"""
+    available = {name for name, _ in COMIC_COLUMNS[source]} | {"id", "base_rating", "thoi_gian_cap_nhat"}
+    return f"""
+        SELECT id, id, ten_truyen, tac_gia, the_loai, mo_ta, link_truyen, so_chuong, luot_xem,
+               luot_thich, luot_theo_doi, rating, luot_danh_gia, base_rating, trang_thai
+        FROM (SELECT {cross_source.normalized_select(available)} FROM comics)
+        WHERE id > ? ORDER BY id LIMIT ?
+    """
+
+
+def comics_dataset(db_manager, source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Bảng danh sách truyện của một nguồn
+
+    Args:
+        db_manager: MultipleDBManager
+        source: Tên nguồn
+        chunk_size: Số dòng mỗi khối
+    """
+    db_file = db_manager.get_db_file(source)
+    query = _comic_select(source)
+    return Dataset(
+        source,
+        COMIC_EXPORT_COLUMNS,
+        lambda: _strip_key(iter_query(db_file, query, chunk_size=chunk_size)),
+        lambda: count_rows(db_file, "SELECT COUNT(*) FROM comics")
+    )
+
+
+def comments_dataset(db_manager, sources, analyzed_only=False, name="Chi tiết Comments",
+                     chunk_size=DEFAULT_CHUNK_SIZE, comic_ids=None):
+    """
+    Bảng comment của các nguồn (kèm tên truyện)
+
+    Args:
+        db_manager: MultipleDBManager
+        sources: Danh sách nguồn
+        analyzed_only: Chỉ lấy comment đã phân tích sentiment
+        name: Tên sheet
+        chunk_size: Số dòng mỗi khối
+        comic_ids: {nguồn: [id truyện]} để chỉ lấy comment của các truyện này (tùy chọn)
+    """
+    conditions = [ANALYZED_CONDITION] if analyzed_only else []
+    if comic_ids is not None:
+        # Danh sách id truyền một tham số JSON, không vướng giới hạn số tham số của SQLite
+        conditions.append("cm.comic_id IN (SELECT value FROM json_each(?))")
+    condition = "".join(f"{item} AND " for item in conditions)
+    query = f"""
+        SELECT cm.id, c.ten_truyen, ?, cm.ten_nguoi_binh_luan, cm.noi_dung,
+               cm.sentiment, cm.sentiment_score, cm.thoi_gian_binh_luan
+        FROM comments cm JOIN comics c ON c.id = cm.comic_id
+        WHERE {condition}cm.id > ?
+        ORDER BY cm.id LIMIT ?
+    """
+    count_query = f"SELECT COUNT(*) FROM comments cm {'WHERE ' + ' AND '.join(conditions) if conditions else ''}"
+    files = {source: db_manager.get_db_file(source) for source in sources}
+
+    def filter_params(source):
+        if comic_ids is None:
+            return ()
+        return (json.dumps(list(comic_ids.get(source, []))),)
+
+    return Dataset(
+        name,
+        COMMENT_EXPORT_COLUMNS,
+        lambda: _strip_key(_chain(
+            iter_query(db_file, query, (source, *filter_params(source)), chunk_size=chunk_size)
+            for source, db_file in files.items()
+        )),
+        lambda: sum(count_rows(db_file, count_query, filter_params(source)) for source, db_file in files.items())
+    )
+
+
+class SourceStats:
+    """Cộng dồn số liệu thống kê theo nguồn trong lúc xuất bảng lịch sử phân tích"""
+
+    def __init__(self, sources):
+        self.sources = list(sources)
+        self._totals = {source: [0, 0.0, 0.0, 0.0, 0.0] for source in self.sources + [ALL_SOURCES_LABEL]}
+
+    def add(self, source, sentiment_rating, comprehensive, positive_percent, negative_percent):
+        for key in (source, ALL_SOURCES_LABEL):
+            totals = self._totals[key]
+            totals[0] += 1
+            totals[1] += sentiment_rating
+            totals[2] += comprehensive
+            totals[3] += positive_percent
+            totals[4] += negative_percent
+
+    def rows(self):
+        rows = []
+        for source, (count, *sums) in self._totals.items():
+            averages = [round(value / count, 2) if count else 0 for value in sums]
+            rows.append((source, count, *averages))
+        return rows
+
+
+def history_dataset(db_manager, sources, stats=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Bảng lịch sử phân tích: mỗi truyện có comment đã phân tích sentiment một dòng
+
+    Số liệu sentiment được gộp bằng SQL nên không phải đọc từng comment lên bộ nhớ.
+
+    Args:
+        db_manager: MultipleDBManager
+        sources: Danh sách nguồn
+        stats: SourceStats để cộng dồn thống kê (xuất ở stats_dataset)
+        chunk_size: Số truyện mỗi khối
+    """
+    from analysis.pipeline import calculate_sentiment_rating, comprehensive_rating
+    from analysis.rating_factory import RatingFactory
+
+    query = f"""
+        SELECT c.*,
+               COUNT(*) AS total_comments,
+               SUM(cm.sentiment = 'positive') AS positive_count,
+               SUM(cm.sentiment = 'negative') AS negative_count,
+               SUM(cm.sentiment = 'neutral') AS neutral_count,
+               MAX(cm.thoi_gian_cap_nhat) AS analysis_time
+        FROM comments cm JOIN comics c ON c.id = cm.comic_id
+        WHERE {ANALYZED_CONDITION} AND c.id > ?
+        GROUP BY c.id ORDER BY c.id LIMIT ?
+    """
+    count_query = f"SELECT COUNT(DISTINCT cm.comic_id) FROM comments cm WHERE {ANALYZED_CONDITION}"
+    files = {source: db_manager.get_db_file(source) for source in sources}
+
+    def source_rows(source, db_file):
+        calculator = RatingFactory.get_calculator(source)
+        for chunk in iter_query(db_file, query, chunk_size=chunk_size, row_factory=sqlite3.Row):
+            rows = []
+            for row in chunk:
+                comic = dict(row)
+                total = comic["total_comments"]
+                positive = comic["positive_count"] or 0
+                negative = comic["negative_count"] or 0
+                neutral = comic["neutral_count"] or 0
+                sentiment_rating = calculate_sentiment_rating(positive, negative, neutral)
+                base_rating = comic["base_rating"] if comic.get("base_rating") is not None else calculator.calculate(comic)
+                comprehensive = comprehensive_rating(base_rating, sentiment_rating)
+                positive_percent = positive / total * 100
+                negative_percent = negative / total * 100
+                if stats is not None:
+                    stats.add(source, sentiment_rating, comprehensive, positive_percent, negative_percent)
+                rows.append((
+                    comic["ten_truyen"], source, total,
+                    round(positive_percent, 1), round(negative_percent, 1), round(neutral / total * 100, 1),
+                    round(sentiment_rating, 2), round(comprehensive, 2), comic["analysis_time"]
+                ))
+            yield rows
+
+    return Dataset(
+        "Phân tích Sentiment",
+        HISTORY_EXPORT_COLUMNS,
+        lambda: _chain(source_rows(source, db_file) for source, db_file in files.items()),
+        lambda: sum(count_rows(db_file, count_query) for db_file in files.values())
+    )
+
+
+def stats_dataset(stats):
+    """Bảng thống kê theo nguồn, phải đứng sau history_dataset dùng chung stats"""
+    return Dataset("Thống kê nguồn", STATS_EXPORT_COLUMNS, lambda: iter([stats.rows()]))
@@ -0,0 +1,246 @@
+"""
+Hàng đợi job dạng thư mục cho chế độ daemon
+
+Mỗi job là một file JSON đi qua các thư mục pending → running → done/failed. Nhận job
+bằng os.replace (nguyên tử) nên nhiều lệnh submit có thể ghi cùng lúc, kể cả từ container
+khác dùng chung volume. Không cần broker hay dịch vụ ngoài.
+
+Job đang chạy ghi lại process nhận nó (hostname, pid); trong lúc chạy daemon cập nhật
+mtime của file định kỳ (heartbeat). Job chỉ được đưa lại hàng đợi khi process đó đã chết
+hoặc heartbeat quá cũ, nên nhiều daemon dùng chung thư mục không lấy job của nhau.
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS_DIR = "jobs"
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+STATES = [PENDING, RUNNING, DONE, FAILED]
+# Chu kỳ cập nhật heartbeat của job đang chạy (giây)
+HEARTBEAT_INTERVAL = 30
+# Heartbeat cũ hơn mức này thì coi như daemon chạy job đã chết (giây)
+STALE_AFTER = 300
+
+
+class JobQueue:
+    """
+    Hàng đợi job lưu trong thư mục
+    """
+
+    def __init__(self, jobs_dir=DEFAULT_JOBS_DIR):
+        """
+        Khởi tạo JobQueue
+
+        Args:
+            jobs_dir: Thư mục gốc của hàng đợi
+        """
+        self.jobs_dir = jobs_dir
+        for state in STATES:
+            os.makedirs(os.path.join(jobs_dir, state), exist_ok=True)
+
+    def _path(self, state, job_id):
+        return os.path.join(self.jobs_dir, state, f"{job_id}.json")
+
+    def _write(self, state, job):
+        path = self._path(state, job["id"])
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp_path, path)
+
+    def submit(self, job_type, params=None):
+        """
+        Thêm job vào hàng đợi
+
+        Args:
+            job_type: Loại job (crawl, rate, analyze)
+            params: Dict tham số của job
+
+        Returns:
+            str: Mã job
+        """
+        # Mã job bắt đầu bằng thời điểm để sắp xếp theo thứ tự gửi
+        job_id = f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+        self._write(PENDING, {
+            "id": job_id,
+            "type": job_type,
+            "params": params or {},
+            "submitted_at": datetime.now().isoformat(timespec="seconds")
+        })
+        logger.info(f"Đã thêm job {job_type} ({job_id})")
+        return job_id
+
+    def claim(self):
+        """
+        Nhận job cũ nhất đang chờ
+
+        Returns:
+            dict: Job, None nếu hàng đợi trống
+        """
+        pending_dir = os.path.join(self.jobs_dir, PENDING)
+        for name in sorted(os.listdir(pending_dir)):
+            if not name.endswith(".json"):
+                continue
+            job_id = name[:-len(".json")]
+            try:
+                # Process khác có thể đã nhận job này trước
+                os.replace(self._path(PENDING, job_id), self._path(RUNNING, job_id))
+            except FileNotFoundError:
+                continue
+            try:
+                with open(self._path(RUNNING, job_id), "r", encoding="utf-8") as f:
+                    job = json.load(f)
+            except Exception as e:
+                logger.error(f"Job {job_id} không hợp lệ: {e}")
+                os.replace(self._path(RUNNING, job_id), self._path(FAILED, job_id))
+                continue
+            job["started_at"] = datetime.now().isoformat(timespec="seconds")
+            job["owner"] = {"host": socket.gethostname(), "pid": os.getpid()}
+            self._write(RUNNING, job)
+            return job
+        return None
+
+    def heartbeat(self, job):
+        """
+        Cập nhật mtime của file job đang chạy
+
+        Returns:
+            bool: False nếu file không còn trong running (đã bị đưa lại hàng đợi)
+        """
+        try:
+            os.utime(self._path(RUNNING, job["id"]))
+            return True
+        except FileNotFoundError:
+            logger.warning(f"Job {job['id']} không còn trong thư mục running")
+            return False
+
+    @contextmanager
+    def keep_alive(self, job, interval=HEARTBEAT_INTERVAL):
+        """
+        Cập nhật heartbeat của job trong thread nền cho tới khi ra khỏi khối with
+
+        Args:
+            job: Job đã nhận bằng claim()
+            interval: Chu kỳ cập nhật (giây)
+        """
+        stop_event = threading.Event()
+
+        def beat():
+            while not stop_event.wait(interval):
+                if not self.heartbeat(job):
+                    return
+
+        thread = threading.Thread(target=beat, name=f"job-heartbeat-{job['id']}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop_event.set()
+            thread.join()
+
+    def finish(self, job, result=None, error=None):
+        """
+        Đánh dấu job đã xong (thành công hoặc lỗi)
+
+        Args:
+            job: Job đã nhận bằng claim()
+            result: Kết quả (dict có thể ghi ra JSON)
+            error: Thông báo lỗi (None nếu thành công)
+        """
+        job["finished_at"] = datetime.now().isoformat(timespec="seconds")
+        state = DONE if error is None else FAILED
+        if error is None:
+            job["result"] = result
+        else:
+            job["error"] = error
+        self._write(state, job)
+        try:
+            os.remove(self._path(RUNNING, job["id"]))
+        except FileNotFoundError:
+            pass
+
+    def _is_stale(self, path, stale_after):
+        """Job đang chạy có bị bỏ dở không (process nhận job đã chết hoặc heartbeat quá cũ)"""
+        try:
+            if time.time() - os.path.getmtime(path) > stale_after:
+                return True
+            with open(path, "r", encoding="utf-8") as f:
+                owner = json.load(f).get("owner") or {}
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Không đọc được job {path}: {e}")
+            return False
+
+        # PID chỉ kiểm tra được trên cùng máy; trùng PID của chính process này nghĩa là
+        # job của lần chạy trước (container khởi động lại với cùng hostname và PID)
+        if owner.get("host") != socket.gethostname() or not owner.get("pid"):
+            return False
+        return owner["pid"] == os.getpid() or not psutil.pid_exists(owner["pid"])
+
+    def requeue_stale(self, stale_after=STALE_AFTER):
+        """
+        Đưa job bị bỏ dở (daemon chạy nó bị dừng đột ngột) về hàng đợi
+
+        Job của daemon khác còn sống (process còn chạy, heartbeat còn mới) được giữ nguyên.
+
+        Args:
+            stale_after: Heartbeat cũ hơn số giây này thì coi như bị bỏ dở
+
+        Returns:
+            int: Số job được đưa lại
+        """
+        running_dir = os.path.join(self.jobs_dir, RUNNING)
+        count = 0
+        for name in os.listdir(running_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(running_dir, name)
+            if not self._is_stale(path, stale_after):
+                continue
+            try:
+                os.replace(path, os.path.join(self.jobs_dir, PENDING, name))
+                count += 1
+            except FileNotFoundError:
+                # Daemon khác vừa đưa lại hoặc job vừa xong
+                continue
+        return count
+
+    def status(self):
+        """Số job theo từng trạng thái"""
+        return {
+            state: sum(1 for name in os.listdir(os.path.join(self.jobs_dir, state)) if name.endswith(".json"))
+            for state in STATES
+        }
+
+    def wait_for_job(self, poll_interval, stop_event):
+        """
+        Chờ tới khi có job hoặc stop_event được set
+
+        Returns:
+            dict: Job, None nếu bị dừng
+        """
+        while not stop_event.is_set():
+            job = self.claim()
+            if job:
+                return job
+            # Lúc rảnh thì nhận lại job bị bỏ dở của daemon khác đã chết
+            requeued = self.requeue_stale()
+            if requeued:
+                logger.info(f"Đưa lại {requeued} job bị bỏ dở vào hàng đợi")
+                continue
+            stop_event.wait(poll_interval)
+        return None
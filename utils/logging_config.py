@@ -0,0 +1,185 @@
+"""
+Logging bất đồng bộ qua hàng đợi cho process chính và các process con
+
+Mọi process chỉ đẩy record vào một multiprocessing.Queue (QueueHandler); một QueueListener
+duy nhất trong process chính ghi file, console và giao diện trên thread riêng, nên vòng
+lặp crawl không còn chờ I/O ghi log. Các log INFO/DEBUG lặp lại ở đường nóng (mỗi trang,
+mỗi comment) được lấy mẫu theo từng vị trí gọi log trước khi vào hàng đợi.
+"""
+import os
+import sys
+import time
+import logging
+import threading
+import multiprocessing
+from logging.handlers import QueueHandler, QueueListener
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+DEFAULT_LOG_FILE = os.path.join("logs", "rating_comic.log")
+
+# Logger ở đường nóng cần lấy mẫu: tiền tố tên logger -> số record tối đa mỗi vị trí gọi trong một chu kỳ
+SAMPLED_LOGGERS = {
+    "crawlers": 5,
+    "analysis": 5,
+    "utils.sqlite_helper": 5
+}
+# Chu kỳ đếm của bộ lấy mẫu (giây)
+SAMPLE_INTERVAL = 1.0
+
+_log_queue = None
+_listener = None
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Giới hạn số record INFO/DEBUG của mỗi vị trí gọi log (file + dòng) trong một chu kỳ
+
+    Record WARNING trở lên luôn được giữ. Khi chu kỳ mới bắt đầu, record đầu tiên của vị
+    trí đó được ghi kèm số dòng đã bỏ qua.
+    """
+
+    def __init__(self, limits=None, interval=SAMPLE_INTERVAL):
+        super().__init__()
+        self.limits = SAMPLED_LOGGERS if limits is None else limits
+        self.interval = interval
+        # (pathname, lineno) -> [bắt đầu chu kỳ, số record trong chu kỳ, số record đã bỏ]
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def _limit(self, name):
+        for prefix, limit in self.limits.items():
+            if name == prefix or name.startswith(prefix + "."):
+                return limit
+        return None
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        limit = self._limit(record.name)
+        if limit is None:
+            return True
+
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                dropped = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                if dropped:
+                    record.msg = f"{record.getMessage()} (đã bỏ qua {dropped} dòng tương tự)"
+                    record.args = None
+                return True
+            if window[1] < limit:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+def _queue_handler(log_queue):
+    handler = QueueHandler(log_queue)
+    handler.addFilter(SamplingFilter())
+    return handler
+
+
+def setup_logging(log_file=DEFAULT_LOG_FILE, level=logging.INFO, console=True):
+    """
+    Thiết lập logging qua hàng đợi cho process chính (gọi một lần khi khởi động)
+
+    Args:
+        log_file: File log
+        level: Mức log của root logger
+        console: Ghi thêm ra stdout
+
+    Returns:
+        multiprocessing.Queue: Hàng đợi log để truyền cho process con
+    """
+    global _log_queue, _listener
+    if _listener is not None:
+        return _log_queue
+
+    os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+    formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
+    handlers = [logging.FileHandler(log_file, encoding="utf-8")]
+    if console:
+        handlers.append(logging.StreamHandler(sys.stdout))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    _log_queue = multiprocessing.get_context().Queue()
+    # respect_handler_level để handler giao diện tự lọc theo mức của nó
+    _listener = QueueListener(_log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.addHandler(_queue_handler(_log_queue))
+    root.setLevel(level)
+
+    # Thiết lập logger cho thư viện bên thứ ba
+    logging.getLogger("selenium").setLevel(logging.WARNING)
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+    return _log_queue
+
+
+def add_handler(handler):
+    """
+    Thêm handler vào listener (chạy trên thread của listener, không chặn process gửi log)
+
+    Args:
+        handler: logging.Handler
+    """
+    if _listener is None:
+        logging.getLogger().addHandler(handler)
+        return
+    _listener.handlers = _listener.handlers + (handler,)
+
+
+def remove_handler(handler):
+    """Gỡ handler đã thêm bằng add_handler"""
+    if _listener is None:
+        logging.getLogger().removeHandler(handler)
+        return
+    _listener.handlers = tuple(h for h in _listener.handlers if h is not handler)
+
+
+def get_log_queue():
+    """Hàng đợi log của process chính (None nếu chưa gọi setup_logging)"""
+    return _log_queue
+
+
+def configure_worker(log_queue, level=logging.INFO):
+    """
+    Chuyển log của process con vào hàng đợi của process chính
+
+    Args:
+        log_queue: Hàng đợi từ get_log_queue() (None thì giữ nguyên cấu hình)
+        level: Mức log của root logger
+    """
+    if log_queue is None:
+        return
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.addHandler(_queue_handler(log_queue))
+    root.setLevel(level)
+    logging.getLogger("selenium").setLevel(logging.WARNING)
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+
+
+def shutdown():
+    """Ghi nốt các record còn trong hàng đợi và dừng listener"""
+    global _listener
+    if _listener is None:
+        return
+    try:
+        _listener.stop()
+    except Exception:
+        pass
+    _listener = None
+    for handler in logging.getLogger().handlers[:]:
+        if isinstance(handler, QueueHandler):
+            logging.getLogger().removeHandler(handler)
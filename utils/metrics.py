@@ -0,0 +1,278 @@
+"""
+Đo thời gian từng giai đoạn của pipeline crawl → tính điểm → phân tích
+
+Mỗi giai đoạn (khởi tạo driver, tải trang, trích xuất DOM, ghi DB, tính điểm, phân tích
+cảm xúc) được ghi vào histogram theo nguồn với các bucket cố định kiểu Prometheus. Process
+con của pool ghi histogram của mình ra file trong thư mục phiên của process_registry sau
+mỗi tác vụ; process chính gộp các file đó với số liệu của chính nó để hiển thị trên tab
+"Hiệu năng" và xuất ra file text theo định dạng Prometheus.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+from utils.process_registry import session_dir
+
+logger = logging.getLogger(__name__)
+
+STAGE_DRIVER_STARTUP = "driver_startup"
+STAGE_PAGE_LOAD = "page_load"
+STAGE_DOM_EXTRACT = "dom_extract"
+STAGE_DB_WRITE = "db_write"
+STAGE_RATING = "rating"
+STAGE_SENTIMENT = "sentiment"
+
+STAGES = [STAGE_DRIVER_STARTUP, STAGE_PAGE_LOAD, STAGE_DOM_EXTRACT, STAGE_DB_WRITE, STAGE_RATING, STAGE_SENTIMENT]
+
+# Cận trên của các bucket (giây), bucket cuối là +Inf
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+DEFAULT_PROMETHEUS_FILE = os.path.join("metrics", "ratingcomic.prom")
+METRIC_NAME = "ratingcomic_stage_seconds"
+FILE_PREFIX = "metrics-"
+UNKNOWN_SITE = "unknown"
+
+# (stage, site) -> {"buckets": [...], "sum": float, "count": int}
+_histograms = {}
+_lock = threading.Lock()
+_dirty = False
+_local = threading.local()
+_default_site = None
+
+
+def _new_histogram():
+    return {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+
+
+def set_site(site):
+    """
+    Đặt nguồn mặc định cho các phép đo của thread hiện tại (và của process nếu chưa có)
+
+    Args:
+        site: Tên nguồn (TruyenQQ, NetTruyen...)
+    """
+    global _default_site
+    _local.site = site
+    if _default_site is None:
+        _default_site = site
+
+
+def current_site():
+    """Nguồn của thread hiện tại"""
+    return getattr(_local, "site", None) or _default_site or UNKNOWN_SITE
+
+
+def observe(stage, seconds, site=None):
+    """
+    Ghi một phép đo vào histogram
+
+    Args:
+        stage: Tên giai đoạn (STAGE_*)
+        seconds: Thời gian (giây)
+        site: Tên nguồn (mặc định lấy theo set_site)
+    """
+    global _dirty
+    key = (stage, site or current_site())
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = _new_histogram()
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram["buckets"][index] += 1
+                break
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+        _dirty = True
+
+
+@contextmanager
+def timer(stage, site=None):
+    """
+    Đo thời gian của khối lệnh (kể cả khi có lỗi)
+
+    Ví dụ:
+        with metrics.timer(STAGE_PAGE_LOAD):
+            driver.get(url)
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started, site)
+
+
+def timed(stage, site=None):
+    """Decorator đo thời gian của hàm theo giai đoạn"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(stage, site):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """Bản sao histogram của process hiện tại"""
+    with _lock:
+        return {key: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]}
+                for key, h in _histograms.items()}
+
+
+def flush():
+    """
+    Ghi histogram của process hiện tại vào thư mục phiên (gọi ở process con sau mỗi tác vụ,
+    vì process của Pool thoát bằng os._exit nên atexit không chạy)
+    """
+    global _dirty
+    folder = session_dir()
+    if not folder or not _dirty:
+        return
+    try:
+        with _lock:
+            data = [{"stage": stage, "site": site, **histogram} for (stage, site), histogram in _histograms.items()]
+            _dirty = False
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{FILE_PREFIX}{os.getpid()}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning(f"Không ghi được số liệu hiệu năng: {e}")
+
+
+def collect():
+    """
+    Gộp histogram của process hiện tại với histogram đã ghi của các process con cùng phiên
+
+    Returns:
+        dict: (stage, site) -> histogram
+    """
+    merged = snapshot()
+    folder = session_dir()
+    if not folder or not os.path.isdir(folder):
+        return merged
+
+    own_file = f"{FILE_PREFIX}{os.getpid()}.json"
+    for name in os.listdir(folder):
+        if not name.startswith(FILE_PREFIX) or not name.endswith(".json") or name == own_file:
+            continue
+        try:
+            with open(os.path.join(folder, name), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.debug(f"Không đọc được {name}: {e}")
+            continue
+        for item in data:
+            if len(item.get("buckets", [])) != len(BUCKETS):
+                continue
+            key = (item["stage"], item["site"])
+            histogram = merged.setdefault(key, _new_histogram())
+            histogram["buckets"] = [a + b for a, b in zip(histogram["buckets"], item["buckets"])]
+            histogram["sum"] += item["sum"]
+            histogram["count"] += item["count"]
+    return merged
+
+
+def _quantile(histogram, q):
+    """Ước lượng phân vị từ bucket (nội suy tuyến tính trong bucket như histogram_quantile)"""
+    if histogram["count"] == 0:
+        return 0.0
+    rank = q * histogram["count"]
+    cumulative = 0
+    lower = 0.0
+    for bound, count in zip(BUCKETS, histogram["buckets"]):
+        if count and cumulative + count >= rank:
+            if bound == float("inf"):
+                return lower
+            return lower + (bound - lower) * (rank - cumulative) / count
+        cumulative += count
+        if bound != float("inf"):
+            lower = bound
+    return lower
+
+
+def summarize(histograms=None):
+    """
+    Tóm tắt histogram cho giao diện
+
+    Args:
+        histograms: Kết quả của collect() (mặc định gọi collect())
+
+    Returns:
+        list: Dict gồm stage, site, count, total, mean, p50, p95 sắp theo giai đoạn rồi nguồn
+    """
+    histograms = collect() if histograms is None else histograms
+    order = {stage: index for index, stage in enumerate(STAGES)}
+    rows = []
+    for (stage, site), histogram in histograms.items():
+        count = histogram["count"]
+        rows.append({
+            "stage": stage,
+            "site": site,
+            "count": count,
+            "total": histogram["sum"],
+            "mean": histogram["sum"] / count if count else 0.0,
+            "p50": _quantile(histogram, 0.5),
+            "p95": _quantile(histogram, 0.95)
+        })
+    rows.sort(key=lambda row: (order.get(row["stage"], len(order)), row["site"]))
+    return rows
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def format_prometheus(histograms=None):
+    """
+    Chuyển histogram sang định dạng text của Prometheus
+
+    Returns:
+        str: Nội dung theo text exposition format
+    """
+    histograms = collect() if histograms is None else histograms
+    lines = [
+        f"# HELP {METRIC_NAME} Thời gian từng giai đoạn của pipeline theo nguồn",
+        f"# TYPE {METRIC_NAME} histogram"
+    ]
+    for (stage, site), histogram in sorted(histograms.items()):
+        labels = f'stage="{stage}",site="{site}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS, histogram["buckets"]):
+            cumulative += count
+            lines.append(f'{METRIC_NAME}_bucket{{{labels},le="{_format_bound(bound)}"}} {cumulative}')
+        lines.append(f"{METRIC_NAME}_sum{{{labels}}} {histogram['sum']:.6f}")
+        lines.append(f"{METRIC_NAME}_count{{{labels}}} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path=DEFAULT_PROMETHEUS_FILE, histograms=None):
+    """
+    Ghi file text Prometheus (ghi file tạm rồi đổi tên để node_exporter không đọc file dở)
+
+    Args:
+        path: Đường dẫn file .prom
+        histograms: Kết quả của collect() (mặc định gọi collect())
+
+    Returns:
+        bool: True nếu ghi thành công
+    """
+    try:
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(format_prometheus(histograms))
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        logger.error(f"Lỗi khi ghi file Prometheus {path}: {e}")
+        return False
@@ -1,7 +1,9 @@
 import os
 import sqlite3
 import logging
-import pandas as pd
+
+from utils.sqlite_helper import insert_comments, migrate_schema, upsert_comics
+from utils import data_cache
 
 logger = logging.getLogger(__name__)
 
@@ -77,6 +79,8 @@ class MultipleDBManager:
                     noi_dung TEXT,
                     sentiment TEXT,
                     sentiment_score REAL,
+                    thoi_gian_binh_luan TIMESTAMP,
+                    comment_hash TEXT,
                     thoi_gian_cap_nhat TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (comic_id) REFERENCES comics (id)
                 )
@@ -115,6 +119,8 @@ class MultipleDBManager:
                     noi_dung TEXT,
                     sentiment TEXT,
                     sentiment_score REAL,
+                    thoi_gian_binh_luan TIMESTAMP,
+                    comment_hash TEXT,
                     thoi_gian_cap_nhat TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (comic_id) REFERENCES comics (id)
                 )
@@ -151,6 +157,8 @@ class MultipleDBManager:
                     noi_dung TEXT,
                     sentiment TEXT,
                     sentiment_score REAL,
+                    thoi_gian_binh_luan TIMESTAMP,
+                    comment_hash TEXT,
                     thoi_gian_cap_nhat TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (comic_id) REFERENCES comics (id)
                 )
@@ -187,6 +195,8 @@ class MultipleDBManager:
                     noi_dung TEXT,
                     sentiment TEXT,
                     sentiment_score REAL,
+                    thoi_gian_binh_luan TIMESTAMP,
+                    comment_hash TEXT,
                     thoi_gian_cap_nhat TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (comic_id) REFERENCES comics (id)
                 )
@@ -211,6 +221,21 @@ class MultipleDBManager:
         # logger.info(f"Đã thiết lập nguồn dữ liệu: {source}")
         return True
     
+    def get_db_file(self, source=None):
+        """
+        Đường dẫn file database của một nguồn
+
+        Args:
+            source: Nguồn dữ liệu (nếu None, sử dụng nguồn hiện tại)
+
+        Returns:
+            str: Đường dẫn file
+        """
+        source = source or self.current_source
+        if source not in self.supported_sources:
+            raise ValueError(f"Nguồn dữ liệu không được hỗ trợ: {source}")
+        return os.path.join(self.db_folder, self.supported_sources[source]["file"])
+
     def save_base_rating(self, comic_id, base_rating):
         """Lưu điểm cơ bản vào database"""
         try:
@@ -225,6 +250,7 @@ class MultipleDBManager:
             
             conn.commit()
             conn.close()
+            data_cache.bump(self.current_source)
             return True
         except Exception as e:
             logger.error(f"Lỗi khi lưu base_rating: {e}")
@@ -247,6 +273,7 @@ class MultipleDBManager:
             
             conn.commit()
             conn.close()
+            data_cache.bump(self.current_source)
             return True
         except Exception as e:
             logger.error(f"Lỗi khi lưu batch ratings: {e}")
@@ -274,6 +301,7 @@ class MultipleDBManager:
                 )
             
             conn.commit()
+            data_cache.bump(self.current_source)
             # logger.info(f"Đã cập nhật rating cho {len(comics)} truyện")
             return True
             
@@ -301,6 +329,7 @@ class MultipleDBManager:
                 for table_name, schema in self.supported_sources[source]["tables"].items():
                     cursor.execute(schema)
                 conn.commit()
+                migrate_schema(conn)
                 
                 self.connection_pools[source].append(conn)
             
@@ -364,6 +393,7 @@ class MultipleDBManager:
         for table_name, schema in self.supported_sources[self.current_source]["tables"].items():
             cursor.execute(schema)
         conn.commit()
+        migrate_schema(conn)
         
         return conn
     
@@ -388,108 +418,12 @@ class MultipleDBManager:
             # Bắt đầu transaction
             conn.execute("BEGIN TRANSACTION")
             
-            for comic in comics_list:
-                # Xác định nguồn dữ liệu hiện tại - code tương tự như save_comic()
-                if self.current_source == "TruyenQQ":
-                    query = """
-                        INSERT OR REPLACE INTO comics 
-                        (ten_truyen, tac_gia, the_loai, mo_ta, link_truyen, so_chuong, 
-                        luot_xem, luot_thich, luot_theo_doi, so_binh_luan, trang_thai, nguon)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """
-                    params = (
-                        comic.get("ten_truyen", ""),
-                        comic.get("tac_gia", "N/A"),
-                        comic.get("the_loai", ""),
-                        comic.get("mo_ta", ""),
-                        comic.get("link_truyen", ""),
-                        comic.get("so_chuong", 0),
-                        comic.get("luot_xem", 0),
-                        comic.get("luot_thich", 0),
-                        comic.get("luot_theo_doi", 0),
-                        comic.get("so_binh_luan", 0),
-                        comic.get("trang_thai", ""),
-                        comic.get("nguon", "TruyenQQ")
-                    )
-                elif self.current_source == "NetTruyen":
-                    query = """
-                        INSERT OR REPLACE INTO comics 
-                        (ten_truyen, tac_gia, the_loai, mo_ta, link_truyen, so_chuong, 
-                        luot_xem, luot_thich, luot_theo_doi, rating, luot_danh_gia, 
-                        so_binh_luan, trang_thai, nguon)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """
-                    params = (
-                        comic.get("ten_truyen", ""),
-                        comic.get("tac_gia", "N/A"),
-                        comic.get("the_loai", ""),
-                        comic.get("mo_ta", ""),
-                        comic.get("link_truyen", ""),
-                        comic.get("so_chuong", 0),
-                        comic.get("luot_xem", 0),
-                        comic.get("luot_thich", 0),
-                        comic.get("luot_theo_doi", 0),
-                        comic.get("rating", ""),
-                        comic.get("luot_danh_gia", 0),
-                        comic.get("so_binh_luan", 0),
-                        comic.get("trang_thai", ""),
-                        comic.get("nguon", "NetTruyen")
-                    )
-                elif self.current_source == "Manhuavn":
-                    query = """
-                        INSERT OR REPLACE INTO comics 
-                        (ten_truyen, tac_gia, the_loai, mo_ta, link_truyen, so_chuong, 
-                        luot_xem, luot_theo_doi, danh_gia, luot_danh_gia, 
-                        trang_thai, nguon)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """
-                    params = (
-                        comic.get("ten_truyen", ""),
-                        comic.get("tac_gia", "N/A"),
-                        comic.get("the_loai", ""),
-                        comic.get("mo_ta", ""),
-                        comic.get("link_truyen", ""),
-                        comic.get("so_chuong", 0),
-                        comic.get("luot_xem", 0),
-                        comic.get("luot_theo_doi", 0),
-                        comic.get("danh_gia", ""),
-                        comic.get("luot_danh_gia", 0),
-                        comic.get("trang_thai", ""),
-                        comic.get("nguon", "Manhuavn")
-                    )
-                elif self.current_source == "Truyentranh3q":
-                    query = """
-                        INSERT OR REPLACE INTO comics 
-                        (ten_truyen, tac_gia, the_loai, mo_ta, link_truyen, so_chuong, 
-                        luot_xem, luot_thich, luot_theo_doi, so_binh_luan, trang_thai, nguon)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """
-                    params = (
-                        comic.get("ten_truyen", ""),
-                        comic.get("tac_gia", "N/A"),
-                        comic.get("the_loai", ""),
-                        comic.get("mo_ta", ""),
-                        comic.get("link_truyen", ""),
-                        comic.get("so_chuong", 0),
-                        comic.get("luot_xem", 0),
-                        comic.get("luot_thich", 0),
-                        comic.get("luot_theo_doi", 0),
-                        comic.get("so_binh_luan", 0),
-                        comic.get("trang_thai", ""),
-                        comic.get("nguon", "Truyentranh3q")
-                    )
-                    
-                cursor.execute(query, params)
-                
-                # Lấy ID của truyện vừa thêm/cập nhật
-                cursor.execute("SELECT id FROM comics WHERE link_truyen = ?", (comic.get("link_truyen", ""),))
-                result = cursor.fetchone()
-                
-                if result:
-                    comic_ids.append(result["id"])
+            # UPSERT giữ nguyên id/base_rating, chỉ ghi các truyện có thay đổi
+            comic_ids = upsert_comics(cursor, comics_list, self.current_source)
             
             # Commit transaction chỉ một lần cho tất cả records
             conn.commit()
+            data_cache.bump(self.current_source)
             logger.info(f"Đã lưu batch {len(comics_list)} truyện vào DB")
             return comic_ids
                 
@@ -523,33 +457,13 @@ class MultipleDBManager:
                 if not comments:
                     continue
                     
-                # Xóa comments cũ
-                cursor.execute("DELETE FROM comments WHERE comic_id = ?", (comic_id,))
-                
-                # Chuẩn bị dữ liệu cho executemany
-                comment_params = [
-                    (
-                        comic_id,
-                        comment.get("ten_nguoi_binh_luan", ""),
-                        comment.get("noi_dung", ""),
-                        comment.get("sentiment", ""),
-                        comment.get("sentiment_score", 0)
-                    )
-                    for comment in comments
-                ]
-                
-                # Thêm comments mới với executemany (nhanh hơn execute nhiều lần)
-                cursor.executemany('''
-                    INSERT INTO comments 
-                    (comic_id, ten_nguoi_binh_luan, noi_dung, sentiment, sentiment_score)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', comment_params)
-                
-                total_comments += len(comments)
+                # Chỉ ghi các bình luận mới (append-only, khử trùng theo hash)
+                total_comments += insert_comments(cursor, comic_id, comments)
             
             # Commit transaction
             conn.commit()
-            logger.info(f"Đã lưu tổng cộng {total_comments} bình luận cho {len(comments_batch)} truyện")
+            data_cache.bump(self.current_source)
+            logger.info(f"Đã lưu tổng cộng {total_comments} bình luận mới cho {len(comments_batch)} truyện")
             
         except Exception as e:
             logger.error(f"Lỗi khi lưu batch bình luận: {str(e)}")
@@ -574,104 +488,11 @@ class MultipleDBManager:
         cursor = conn.cursor()
         
         try:
-            # Điều chỉnh field names tùy thuộc vào nguồn
-            if self.current_source == "TruyenQQ":
-                query = """
-                    INSERT OR REPLACE INTO comics 
-                    (ten_truyen, tac_gia, the_loai, mo_ta, link_truyen, so_chuong, 
-                     luot_xem, luot_thich, luot_theo_doi, so_binh_luan, trang_thai, nguon)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """
-                params = (
-                    comic.get("ten_truyen", ""),
-                    comic.get("tac_gia", "N/A"),
-                    comic.get("the_loai", ""),
-                    comic.get("mo_ta", ""),
-                    comic.get("link_truyen", ""),
-                    comic.get("so_chuong", 0),
-                    comic.get("luot_xem", 0),
-                    comic.get("luot_thich", 0),
-                    comic.get("luot_theo_doi", 0),
-                    comic.get("so_binh_luan", 0),
-                    comic.get("trang_thai", ""),
-                    comic.get("nguon", "TruyenQQ")
-                )
-            elif self.current_source == "NetTruyen":
-                query = """
-                    INSERT OR REPLACE INTO comics 
-                    (ten_truyen, tac_gia, the_loai, mo_ta, link_truyen, so_chuong, 
-                     luot_xem, luot_thich, luot_theo_doi, rating, luot_danh_gia, 
-                     so_binh_luan, trang_thai, nguon)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """
-                params = (
-                    comic.get("ten_truyen", ""),
-                    comic.get("tac_gia", "N/A"),
-                    comic.get("the_loai", ""),
-                    comic.get("mo_ta", ""),
-                    comic.get("link_truyen", ""),
-                    comic.get("so_chuong", 0),
-                    comic.get("luot_xem", 0),
-                    comic.get("luot_thich", 0),
-                    comic.get("luot_theo_doi", 0),
-                    comic.get("rating", ""),
-                    comic.get("luot_danh_gia", 0),
-                    comic.get("so_binh_luan", 0),
-                    comic.get("trang_thai", ""),
-                    comic.get("nguon", "NetTruyen")
-                )
-            elif self.current_source == "Manhuavn":
-                query = """
-                    INSERT OR REPLACE INTO comics 
-                    (ten_truyen, tac_gia, the_loai, mo_ta, link_truyen, so_chuong, 
-                     luot_xem, luot_theo_doi, danh_gia, luot_danh_gia, 
-                     trang_thai, nguon)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """
-                params = (
-                    comic.get("ten_truyen", ""),
-                    comic.get("tac_gia", "N/A"),
-                    comic.get("the_loai", ""),
-                    comic.get("mo_ta", ""),
-                    comic.get("link_truyen", ""),
-                    comic.get("so_chuong", 0),
-                    comic.get("luot_xem", 0),
-                    comic.get("luot_theo_doi", 0),
-                    comic.get("danh_gia", ""),
-                    comic.get("luot_danh_gia", 0),
-                    comic.get("trang_thai", ""),
-                    comic.get("nguon", "Manhuavn")
-                )
-            elif self.current_source == "Truyentranh3q":
-                query = """
-                    INSERT OR REPLACE INTO comics 
-                    (ten_truyen, tac_gia, the_loai, mo_ta, link_truyen, so_chuong, 
-                     luot_xem, luot_thich, luot_theo_doi, so_binh_luan, trang_thai, nguon)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """
-                params = (
-                    comic.get("ten_truyen", ""),
-                    comic.get("tac_gia", "N/A"),
-                    comic.get("the_loai", ""),
-                    comic.get("mo_ta", ""),
-                    comic.get("link_truyen", ""),
-                    comic.get("so_chuong", 0),
-                    comic.get("luot_xem", 0),
-                    comic.get("luot_thich", 0),
-                    comic.get("luot_theo_doi", 0),
-                    comic.get("so_binh_luan", 0),
-                    comic.get("trang_thai", ""),
-                    comic.get("nguon", "Truyentranh3q")
-                )
-                
-            cursor.execute(query, params)
+            comic_ids = upsert_comics(cursor, [comic], self.current_source)
             conn.commit()
+            data_cache.bump(self.current_source)
             
-            # Lấy ID của truyện vừa thêm/cập nhật
-            cursor.execute("SELECT id FROM comics WHERE link_truyen = ?", (comic.get("link_truyen", ""),))
-            result = cursor.fetchone()
-            
-            return result["id"] if result else None
+            return comic_ids[0] if comic_ids else None
             
         except Exception as e:
             logger.error(f"Lỗi khi lưu truyện vào database: {str(e)}")
@@ -694,25 +515,12 @@ class MultipleDBManager:
         cursor = conn.cursor()
         
         try:
-            # Xóa comments cũ
-            cursor.execute("DELETE FROM comments WHERE comic_id = ?", (comic_id,))
-            
-            # Thêm comments mới
-            for comment in comments:
-                cursor.execute('''
-                    INSERT INTO comments 
-                    (comic_id, ten_nguoi_binh_luan, noi_dung, sentiment, sentiment_score)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    comic_id,
-                    comment.get("ten_nguoi_binh_luan", ""),
-                    comment.get("noi_dung", ""),
-                    comment.get("sentiment", ""),
-                    comment.get("sentiment_score", 0)
-                ))
+            # Chỉ ghi các bình luận mới hoặc có sentiment thay đổi
+            saved_count = insert_comments(cursor, comic_id, comments)
             
             conn.commit()
-            logger.info(f"Đã lưu {len(comments)} bình luận cho truyện ID {comic_id}")
+            data_cache.bump(self.current_source)
+            logger.info(f"Đã lưu {saved_count}/{len(comments)} bình luận cho truyện ID {comic_id}")
             
         except Exception as e:
             logger.error(f"Lỗi khi lưu bình luận: {str(e)}")
@@ -736,23 +544,22 @@ class MultipleDBManager:
         if not self.current_source:
             return []
         
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        def load_comics():
+            conn = self._get_connection()
+            try:
+                cursor = conn.execute("SELECT * FROM comics")
+                return [description[0] for description in cursor.description], cursor.fetchall()
+            finally:
+                conn.close()
         
         try:
-            cursor.execute("SELECT * FROM comics")
-            rows = cursor.fetchall()
-            
-            # Chuyển từ Row sang Dict
-            result = [dict(row) for row in rows]
-            
-            return result
+            # Đọc lại từ database chỉ khi dữ liệu của nguồn đã thay đổi
+            return data_cache.get_comics(self.current_source, self.get_db_file(), load_comics)
             
         except Exception as e:
             logger.error(f"Lỗi khi lấy danh sách truyện: {str(e)}")
             return []
         finally:
-            conn.close()
             if source and old_source:
                 self.set_source(old_source)
     
@@ -815,80 +622,60 @@ class MultipleDBManager:
         finally:
             conn.close()
     
-    def export_results_to_excel(self, results, output_file):
+    def export_results_to_excel(self, results, output_file, fmt=None, progress_callback=None):
         """
-        Xuất kết quả phân tích ra file Excel
+        Xuất kết quả phân tích ra file Excel (hoặc CSV/Parquet theo đuôi file)
         
         Args:
             results: Kết quả phân tích
             output_file: Đường dẫn file output
+            fmt: xlsx, csv hoặc parquet (mặc định theo đuôi file)
+            progress_callback: Signal/hàm nhận tiến trình 0-100
             
         Returns:
             bool: True nếu thành công, False nếu thất bại
         """
         try:
-            # Chuyển kết quả thành DataFrame
-            comics_data = []
-            comments_data = []
-            
+            from utils import exporter
+
+            def comic_rows():
+                # Cột riêng của từng nguồn được gộp vào cột chung, nguồn không có thì để trống
+                yield [(
+                    result.get("id", ""), result.get("ten_truyen", ""), result.get("tac_gia", ""),
+                    result.get("the_loai", ""), result.get("so_chuong", 0), result.get("luot_xem", 0),
+                    result.get("luot_theo_doi", 0), result.get("luot_thich"),
+                    result.get("rating", result.get("danh_gia")), result.get("luot_danh_gia"),
+                    result.get("trang_thai", ""), result.get("nguon", ""), result.get("base_rating", 0),
+                    result.get("sentiment_rating", 0), result.get("comprehensive_rating", 0),
+                    len(result.get("comments", []))
+                ) for result in results]
+
+            # Comment đọc theo khối từ database của từng nguồn thay vì từ results trong bộ nhớ
+            comic_ids = {}
             for result in results:
-                # Dữ liệu truyện
-                comic_data = {
-                    "ID": result.get("id", ""),
-                    "Tên truyện": result.get("ten_truyen", ""),
-                    "Tác giả": result.get("tac_gia", ""),
-                    "Thể loại": result.get("the_loai", ""),
-                    "Số chương": result.get("so_chuong", 0),
-                    "Lượt xem": result.get("luot_xem", 0),
-                    "Lượt theo dõi": result.get("luot_theo_doi", 0),
-                    "Trạng thái": result.get("trang_thai", ""),
-                    "Nguồn": result.get("nguon", ""),
-                    "Điểm cơ bản": result.get("base_rating", 0),
-                    "Điểm sentiment": result.get("sentiment_rating", 0),
-                    "Điểm tổng hợp": result.get("comprehensive_rating", 0),
-                    "Số comment": len(result.get("comments", []))
-                }
-                
-                # Thêm thông tin riêng theo nguồn
-                if result.get("nguon") == "NetTruyen":
-                    comic_data["Rating"] = result.get("rating", "")
-                    comic_data["Lượt đánh giá"] = result.get("luot_danh_gia", 0)
-                elif result.get("nguon") == "TruyenQQ":
-                    comic_data["Lượt thích"] = result.get("luot_thich", 0)
-                elif result.get("nguon") == "Manhuavn":
-                    comic_data["Đánh giá"] = result.get("danh_gia", "")
-                    comic_data["Lượt đánh giá"] = result.get("luot_danh_gia", 0)
-                elif result.get("nguon") == "Truyentranh3q":
-                    comic_data["Lượt thích"] = result.get("luot_thich", 0)
-                
-                comics_data.append(comic_data)
-                
-                # Dữ liệu comment
-                for comment in result.get("comments", []):
-                    comment_data = {
-                        "Tên truyện": result.get("ten_truyen", ""),
-                        "Người bình luận": comment.get("ten_nguoi_binh_luan", ""),
-                        "Nội dung": comment.get("noi_dung", ""),
-                        "Sentiment": comment.get("sentiment", ""),
-                        "Điểm sentiment": comment.get("sentiment_score", 0)
-                    }
-                    comments_data.append(comment_data)
-            
-            # Tạo Excel Writer
-            with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-                # Sheet truyện
-                comics_df = pd.DataFrame(comics_data)
-                comics_df.to_excel(writer, sheet_name='Danh sách truyện', index=False)
-                
-                # Sheet comment
-                comments_df = pd.DataFrame(comments_data)
-                comments_df.to_excel(writer, sheet_name='Bình luận', index=False)
+                comic_ids.setdefault(result.get("nguon") or self.current_source, []).append(result.get("id"))
+
+            Column = exporter.Column
+            datasets = [
+                exporter.Dataset("Danh sách truyện", [
+                    Column("ID", exporter.INT, 8), Column("Tên truyện", exporter.TEXT, 40),
+                    Column("Tác giả"), Column("Thể loại", exporter.TEXT, 30),
+                    Column("Số chương", exporter.INT, 10), Column("Lượt xem", exporter.INT, 12),
+                    Column("Lượt theo dõi", exporter.INT, 12), Column("Lượt thích", exporter.INT, 12),
+                    Column("Rating", exporter.TEXT, 10), Column("Lượt đánh giá", exporter.INT, 12),
+                    Column("Trạng thái", exporter.TEXT, 15), Column("Nguồn", exporter.TEXT, 12),
+                    Column("Điểm cơ bản", exporter.FLOAT, 12), Column("Điểm sentiment", exporter.FLOAT, 12),
+                    Column("Điểm tổng hợp", exporter.FLOAT, 12), Column("Số comment", exporter.INT, 12)
+                ], comic_rows, lambda: len(results)),
+                exporter.comments_dataset(self, list(comic_ids), name="Bình luận", comic_ids=comic_ids)
+            ]
+            exporter.export_datasets(datasets, output_file, fmt, progress_callback)
             
             logger.info(f"Đã xuất kết quả ra file: {output_file}")
             return True
             
         except Exception as e:
-            logger.error(f"Lỗi khi xuất kết quả ra file Excel: {str(e)}")
+            logger.error(f"Lỗi khi xuất kết quả ra file: {str(e)}")
             return False
         
     def delete_sentiment_analysis(self, comic_id):
@@ -909,6 +696,7 @@ class MultipleDBManager:
             
             # Commit thay đổi
             conn.commit()
+            data_cache.bump(self.current_source)
             
             logger.info(f"Đã xóa phân tích sentiment cho comic ID: {comic_id}")
             return True
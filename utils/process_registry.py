@@ -0,0 +1,248 @@
+"""
+Sổ đăng ký các process do ứng dụng tạo ra (Chrome, chromedriver, worker)
+
+Thay cho việc quét toàn bộ process của hệ thống lúc khởi động: mỗi lần chạy ứng dụng là
+một phiên (session) có thư mục riêng trong cache/processes. Mọi process con ghi PID (kèm
+thời điểm tạo để không nhầm PID đã bị hệ điều hành cấp lại) và thư mục profile Chrome tạm
+vào file của chính nó trong thư mục phiên. Khi thoát, ứng dụng chỉ dừng đúng các process
+đã đăng ký; khi khởi động, các phiên cũ mà process chính đã chết (crash) được dọn theo
+cùng cách, không đụng tới process không liên quan.
+"""
+import os
+import json
+import shutil
+import logging
+import threading
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_DIR = os.path.join("cache", "processes")
+# Biến môi trường truyền mã phiên cho process con (spawn kế thừa os.environ)
+SESSION_ENV = "RATINGCOMIC_SESSION"
+OWNER_FILE = "owner.json"
+# Thời gian chờ process tự dừng trước khi kill (giây)
+TERMINATE_TIMEOUT = 3
+
+_write_lock = threading.Lock()
+
+
+def _session_dir(session_id):
+    return os.path.join(REGISTRY_DIR, str(session_id))
+
+
+def session_dir():
+    """
+    Thư mục của phiên hiện tại (dùng chung cho dữ liệu cần dọn theo phiên)
+
+    Returns:
+        str: Đường dẫn thư mục, None nếu chưa có phiên
+    """
+    session_id = os.environ.get(SESSION_ENV)
+    return _session_dir(session_id) if session_id else None
+
+
+def _create_time(pid):
+    """Thời điểm tạo của process, None nếu process không tồn tại"""
+    try:
+        return psutil.Process(pid).create_time()
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None
+
+
+def _append_entries(entries):
+    """Ghi thêm các mục vào file đăng ký của process hiện tại trong phiên"""
+    session_id = os.environ.get(SESSION_ENV)
+    if not session_id or not entries:
+        return
+    path = os.path.join(_session_dir(session_id), f"{os.getpid()}.jsonl")
+    try:
+        with _write_lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + "\n")
+    except Exception as e:
+        logger.warning(f"Không ghi được sổ đăng ký process: {e}")
+
+
+def start_session():
+    """
+    Bắt đầu phiên cho process chính (gọi một lần khi khởi động ứng dụng)
+
+    Returns:
+        str: Mã phiên
+    """
+    pid = os.getpid()
+    session_id = str(pid)
+    os.environ[SESSION_ENV] = session_id
+    try:
+        os.makedirs(_session_dir(session_id), exist_ok=True)
+        with open(os.path.join(_session_dir(session_id), OWNER_FILE), "w", encoding="utf-8") as f:
+            json.dump({"pid": pid, "create_time": _create_time(pid)}, f)
+    except Exception as e:
+        logger.warning(f"Không tạo được phiên đăng ký process: {e}")
+    return session_id
+
+
+def register_process(pid=None, kind="worker"):
+    """
+    Đăng ký một process của ứng dụng
+
+    Args:
+        pid: PID (mặc định là process hiện tại)
+        kind: Loại process ("worker", "chrome"...) dùng cho log
+    """
+    pid = pid or os.getpid()
+    create_time = _create_time(pid)
+    if create_time is not None:
+        _append_entries([{"pid": pid, "create_time": create_time, "kind": kind}])
+
+
+def register_driver(driver):
+    """
+    Đăng ký chromedriver, các process Chrome con và thư mục profile tạm của driver
+
+    Args:
+        driver: WebDriver vừa tạo
+    """
+    entries = []
+    try:
+        root = psutil.Process(driver.service.process.pid)
+        for process in [root] + root.children(recursive=True):
+            try:
+                entries.append({"pid": process.pid, "create_time": process.create_time(), "kind": "chrome"})
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+    except Exception as e:
+        logger.debug(f"Không lấy được process của driver: {e}")
+
+    try:
+        profile_dir = driver.capabilities.get("chrome", {}).get("userDataDir")
+        if profile_dir:
+            entries.append({"path": profile_dir, "kind": "profile"})
+    except Exception:
+        pass
+
+    _append_entries(entries)
+
+
+def _read_entries(session_path):
+    """Đọc mọi mục đã đăng ký trong thư mục phiên"""
+    entries = []
+    for name in os.listdir(session_path):
+        if not name.endswith(".jsonl"):
+            continue
+        try:
+            with open(os.path.join(session_path, name), "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        entries.append(json.loads(line))
+        except Exception as e:
+            logger.warning(f"Không đọc được {name} trong sổ đăng ký process: {e}")
+    return entries
+
+
+def _terminate_entries(entries, exclude_pids=()):
+    """
+    Dừng các process còn sống đã đăng ký (và process con của chúng), xóa profile tạm
+
+    Returns:
+        int: Số process đã dừng
+    """
+    processes = {}
+    for entry in entries:
+        pid = entry.get("pid")
+        if not pid or pid in exclude_pids:
+            continue
+        try:
+            process = psutil.Process(pid)
+            # PID đã được cấp lại cho process khác
+            if process.create_time() != entry.get("create_time"):
+                continue
+            processes[pid] = process
+            for child in process.children(recursive=True):
+                if child.pid not in exclude_pids:
+                    processes[child.pid] = child
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+
+    for process in processes.values():
+        try:
+            process.terminate()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    _, alive = psutil.wait_procs(list(processes.values()), timeout=TERMINATE_TIMEOUT)
+    for process in alive:
+        try:
+            process.kill()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+
+    for entry in entries:
+        if entry.get("kind") == "profile" and entry.get("path"):
+            shutil.rmtree(entry["path"], ignore_errors=True)
+
+    return len(processes)
+
+
+def end_session(session_id=None):
+    """
+    Dừng mọi process đã đăng ký của phiên (trừ process hiện tại) và xóa thư mục phiên
+
+    Args:
+        session_id: Mã phiên (mặc định là phiên hiện tại)
+
+    Returns:
+        int: Số process đã dừng
+    """
+    session_id = session_id or os.environ.get(SESSION_ENV)
+    if not session_id:
+        return 0
+    session_path = _session_dir(session_id)
+    if not os.path.isdir(session_path):
+        return 0
+
+    try:
+        terminated = _terminate_entries(_read_entries(session_path), exclude_pids={os.getpid()})
+    except Exception as e:
+        logger.error(f"Lỗi khi dừng process của phiên {session_id}: {e}")
+        terminated = 0
+    shutil.rmtree(session_path, ignore_errors=True)
+    if terminated:
+        logger.info(f"Đã dừng {terminated} process còn sót của phiên {session_id}")
+    return terminated
+
+
+def _owner_alive(session_path):
+    """Kiểm tra process chính của phiên còn chạy không"""
+    try:
+        with open(os.path.join(session_path, OWNER_FILE), "r", encoding="utf-8") as f:
+            owner = json.load(f)
+    except Exception:
+        return False
+    return owner.get("create_time") is not None and _create_time(owner.get("pid")) == owner.get("create_time")
+
+
+def recover_stale_sessions():
+    """
+    Dọn các phiên cũ có process chính đã chết (ứng dụng bị crash hoặc bị kill)
+
+    Phiên của một instance khác đang chạy được giữ nguyên.
+
+    Returns:
+        int: Tổng số process đã dừng
+    """
+    if not os.path.isdir(REGISTRY_DIR):
+        return 0
+
+    terminated = 0
+    current = os.environ.get(SESSION_ENV)
+    for session_id in os.listdir(REGISTRY_DIR):
+        session_path = _session_dir(session_id)
+        if session_id == current or not os.path.isdir(session_path) or _owner_alive(session_path):
+            continue
+        terminated += end_session(session_id)
+    return terminated
@@ -0,0 +1,341 @@
+"""
+Sampling profiler bật theo yêu cầu cho process chính và các process crawler
+
+Một thread nền lấy mẫu stack của mọi thread (sys._current_frames) theo chu kỳ cố định,
+chi phí thấp và không cần khởi động lại ứng dụng dưới profiler. Process chính ghi yêu cầu
+profile vào thư mục phiên của process_registry; process con của pool có thread theo dõi
+file yêu cầu và tự lấy mẫu trong cùng khoảng thời gian. Hết thời gian, các file stack
+được gộp thành một file collapsed stack (dùng được với flamegraph.pl, speedscope...) và,
+nếu bật, báo cáo chênh lệch tracemalloc giữa đầu và cuối khoảng đo của từng process.
+"""
+import os
+import sys
+import json
+import time
+import glob
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from utils.process_registry import session_dir
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DURATION = 30
+# Chu kỳ lấy mẫu (giây)
+DEFAULT_INTERVAL = 0.01
+DEFAULT_OUTPUT_DIR = "profiles"
+REQUEST_FILE = "profile-request.json"
+# Chu kỳ process con kiểm tra file yêu cầu (giây)
+WATCH_INTERVAL = 1.0
+# Chu kỳ process con ghi kết quả tạm (process có thể bị thay mới giữa chừng)
+FLUSH_INTERVAL = 2.0
+# Thời gian chờ process con ghi kết quả cuối trước khi gộp (giây)
+MERGE_GRACE = WATCH_INTERVAL + FLUSH_INTERVAL
+TRACEMALLOC_FRAMES = 10
+TRACEMALLOC_TOP = 30
+
+_watcher_started = False
+_active_lock = threading.Lock()
+_active = None
+_last_result = None
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _process_label():
+    import multiprocessing
+    name = multiprocessing.current_process().name
+    return f"{name}-{os.getpid()}"
+
+
+class SamplingProfiler:
+    """
+    Lấy mẫu stack của mọi thread trong process hiện tại bằng một thread nền
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, trace_memory=False, flush_path=None):
+        """
+        Khởi tạo SamplingProfiler
+
+        Args:
+            interval: Chu kỳ lấy mẫu (giây)
+            trace_memory: Chụp tracemalloc lúc bắt đầu và kết thúc để so sánh
+            flush_path: File collapsed stack ghi định kỳ trong lúc chạy (None là không ghi)
+        """
+        self.interval = interval
+        self.trace_memory = trace_memory
+        self.flush_path = flush_path
+        self.stacks = Counter()
+        self.samples = 0
+        self.memory_diff = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._started_tracemalloc = False
+
+    def start(self):
+        """Bắt đầu lấy mẫu"""
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                self._started_tracemalloc = True
+            self._snapshot = tracemalloc.take_snapshot()
+        self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Dừng lấy mẫu, tính chênh lệch bộ nhớ (nếu bật) và ghi kết quả cuối"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if self._snapshot is not None:
+            stats = tracemalloc.take_snapshot().compare_to(self._snapshot, "lineno")
+            self.memory_diff = [str(stat) for stat in stats[:TRACEMALLOC_TOP]]
+            self._snapshot = None
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        self.flush()
+        return self
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        process = _process_label()
+        collected = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, str(thread_id)))
+            stack.append(process)
+            collected.append(";".join(reversed(stack)))
+        with self._lock:
+            self.stacks.update(collected)
+            self.samples += 1
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while not self._stop.wait(self.interval):
+            try:
+                self._sample()
+            except Exception as e:
+                logger.debug(f"Lỗi khi lấy mẫu stack: {e}")
+            if self.flush_path and time.monotonic() - last_flush >= FLUSH_INTERVAL:
+                self.flush()
+                last_flush = time.monotonic()
+
+    def collapsed(self):
+        """Nội dung collapsed stack: mỗi dòng 'frame;frame;... số_mẫu'"""
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+    def flush(self):
+        """Ghi kết quả hiện có ra flush_path (ghi file tạm rồi đổi tên)"""
+        if not self.flush_path:
+            return
+        try:
+            _write_atomic(self.flush_path, self.collapsed())
+            if self.memory_diff is not None:
+                _write_atomic(self.flush_path[:-len(".collapsed")] + ".memory.txt", "\n".join(self.memory_diff) + "\n")
+        except Exception as e:
+            logger.warning(f"Không ghi được kết quả profile: {e}")
+
+
+def _write_atomic(path, content):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _part_path(folder, profile_id, pid=None):
+    return os.path.join(folder, f"profile-{profile_id}-{pid or os.getpid()}.collapsed")
+
+
+def _run_requested(request, folder):
+    """Lấy mẫu trong process con theo yêu cầu của process chính"""
+    remaining = request["until"] - time.time()
+    if remaining <= 0:
+        return
+    profiler = SamplingProfiler(request.get("interval", DEFAULT_INTERVAL), request.get("trace_memory", False),
+                                flush_path=_part_path(folder, request["id"])).start()
+    time.sleep(remaining)
+    profiler.stop()
+
+
+def _watch_requests():
+    """Thread của process con: chờ yêu cầu profile mới trong thư mục phiên"""
+    served = set()
+    while True:
+        time.sleep(WATCH_INTERVAL)
+        folder = session_dir()
+        if not folder:
+            continue
+        try:
+            with open(os.path.join(folder, REQUEST_FILE), "r", encoding="utf-8") as f:
+                request = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if request.get("id") in served or request.get("until", 0) <= time.time():
+            continue
+        served.add(request["id"])
+        try:
+            _run_requested(request, folder)
+        except Exception as e:
+            logger.warning(f"Lỗi khi profile process {os.getpid()}: {e}")
+
+
+def install_worker_hook():
+    """Bật theo dõi yêu cầu profile trong process con (gọi một lần khi khởi tạo process)"""
+    global _watcher_started
+    if _watcher_started or not session_dir():
+        return
+    _watcher_started = True
+    threading.Thread(target=_watch_requests, name="ProfileWatcher", daemon=True).start()
+
+
+def _merge(profile_id, main_profiler, folder, output_dir):
+    """Gộp stack của process chính và các process con thành file kết quả"""
+    stacks = Counter(main_profiler.stacks)
+    memory_reports = []
+    if main_profiler.memory_diff is not None:
+        memory_reports.append((_process_label(), main_profiler.memory_diff))
+
+    if folder:
+        for path in glob.glob(os.path.join(folder, f"profile-{profile_id}-*.collapsed")):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        stack, _, count = line.rstrip("\n").rpartition(" ")
+                        if stack and count.isdigit():
+                            stacks[stack] += int(count)
+                memory_path = path[:-len(".collapsed")] + ".memory.txt"
+                if os.path.exists(memory_path):
+                    with open(memory_path, "r", encoding="utf-8") as f:
+                        pid = os.path.basename(path)[:-len(".collapsed")].rsplit("-", 1)[-1]
+                        memory_reports.append((f"pid {pid}", f.read().splitlines()))
+                    os.remove(memory_path)
+                os.remove(path)
+            except Exception as e:
+                logger.warning(f"Không đọc được {path}: {e}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    output = os.path.join(output_dir, f"profile-{profile_id}.collapsed")
+    _write_atomic(output, "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items())))
+    result = {"collapsed": output, "samples": sum(stacks.values()), "memory": None}
+
+    if memory_reports:
+        memory_output = os.path.join(output_dir, f"profile-{profile_id}-memory.txt")
+        lines = []
+        for label, report in memory_reports:
+            lines.append(f"== {label} ==")
+            lines.extend(report)
+            lines.append("")
+        _write_atomic(memory_output, "\n".join(lines))
+        result["memory"] = memory_output
+    return result
+
+
+def _run_session(profile_id, profiler, duration, folder, output_dir, callback):
+    global _active, _last_result
+    try:
+        time.sleep(duration)
+        profiler.stop()
+        if folder:
+            # Chờ process con ghi lần cuối
+            time.sleep(MERGE_GRACE)
+        result = _merge(profile_id, profiler, folder, output_dir)
+        logger.info(f"Đã ghi profile {result['collapsed']} ({result['samples']} mẫu)")
+    except Exception as e:
+        logger.error(f"Lỗi khi gộp kết quả profile: {e}")
+        result = {"error": str(e)}
+    finally:
+        if folder:
+            try:
+                os.remove(os.path.join(folder, REQUEST_FILE))
+            except OSError:
+                pass
+        with _active_lock:
+            _active = None
+            _last_result = result
+    if callback:
+        callback(result)
+
+
+def start_profiling(duration=DEFAULT_DURATION, interval=DEFAULT_INTERVAL, trace_memory=False,
+                    output_dir=DEFAULT_OUTPUT_DIR, callback=None):
+    """
+    Profile process chính và mọi process con của phiên trong duration giây (không chặn)
+
+    Args:
+        duration: Thời gian lấy mẫu (giây)
+        interval: Chu kỳ lấy mẫu (giây)
+        trace_memory: So sánh tracemalloc giữa đầu và cuối khoảng đo
+        output_dir: Thư mục ghi kết quả
+        callback: Hàm nhận dict kết quả (collapsed, samples, memory) khi xong, gọi từ thread nền
+
+    Returns:
+        str: Mã lần profile, None nếu đang có lần profile khác chạy
+    """
+    global _active
+    with _active_lock:
+        if _active is not None:
+            logger.warning("Đang có phiên profile khác chạy")
+            return None
+        profile_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+        _active = profile_id
+
+    folder = session_dir()
+    if folder:
+        try:
+            _write_atomic(os.path.join(folder, REQUEST_FILE), json.dumps({
+                "id": profile_id, "until": time.time() + duration,
+                "interval": interval, "trace_memory": trace_memory
+            }))
+        except Exception as e:
+            logger.warning(f"Không gửi được yêu cầu profile cho process con: {e}")
+
+    profiler = SamplingProfiler(interval, trace_memory).start()
+    logger.info(f"Bắt đầu profile {duration}s (chu kỳ {interval * 1000:.0f}ms{', tracemalloc' if trace_memory else ''})")
+    threading.Thread(target=_run_session, args=(profile_id, profiler, duration, folder, output_dir, callback),
+                     name="ProfileSession", daemon=True).start()
+    return profile_id
+
+
+def is_profiling():
+    """True nếu đang có phiên profile"""
+    with _active_lock:
+        return _active is not None
+
+
+def last_result():
+    """Kết quả của lần profile gần nhất (None nếu chưa có)"""
+    with _active_lock:
+        return _last_result
+
+
+def install_signal_handler(duration=DEFAULT_DURATION, trace_memory=False):
+    """
+    Bật profile khi process chính nhận SIGUSR1 (chỉ trên Unix)
+
+    Ví dụ: kill -USR1 <pid>
+    """
+    import signal
+    if not hasattr(signal, "SIGUSR1"):
+        return False
+    signal.signal(signal.SIGUSR1, lambda signum, frame: start_profiling(duration, trace_memory=trace_memory))
+    return True
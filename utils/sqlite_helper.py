@@ -1,13 +1,258 @@
 import os
 import sqlite3
+import hashlib
 import logging
 import threading
 import queue
 from typing import List, Dict, Any, Optional
 import time
+from datetime import datetime
+
+from utils import metrics, data_cache
 
 logger = logging.getLogger(__name__)
 
+# Danh sách cột (tên cột, giá trị mặc định) của bảng comics theo từng nguồn
+COMIC_COLUMNS = {
+    "TruyenQQ": [
+        ("ten_truyen", ""), ("tac_gia", "N/A"), ("the_loai", ""), ("mo_ta", ""),
+        ("link_truyen", ""), ("so_chuong", 0), ("luot_xem", 0), ("luot_thich", 0),
+        ("luot_theo_doi", 0), ("so_binh_luan", 0), ("trang_thai", ""), ("nguon", "TruyenQQ")
+    ],
+    "NetTruyen": [
+        ("ten_truyen", ""), ("tac_gia", "N/A"), ("the_loai", ""), ("mo_ta", ""),
+        ("link_truyen", ""), ("so_chuong", 0), ("luot_xem", 0), ("luot_thich", 0),
+        ("luot_theo_doi", 0), ("rating", ""), ("luot_danh_gia", 0),
+        ("so_binh_luan", 0), ("trang_thai", ""), ("nguon", "NetTruyen")
+    ],
+    "Manhuavn": [
+        ("ten_truyen", ""), ("tac_gia", "N/A"), ("the_loai", ""), ("mo_ta", ""),
+        ("link_truyen", ""), ("so_chuong", 0), ("luot_xem", 0), ("luot_theo_doi", 0),
+        ("danh_gia", ""), ("luot_danh_gia", 0), ("trang_thai", ""), ("nguon", "Manhuavn")
+    ],
+    "Truyentranh3q": [
+        ("ten_truyen", ""), ("tac_gia", "N/A"), ("the_loai", ""), ("mo_ta", ""),
+        ("link_truyen", ""), ("so_chuong", 0), ("luot_xem", 0), ("luot_thich", 0),
+        ("luot_theo_doi", 0), ("so_binh_luan", 0), ("trang_thai", ""), ("nguon", "Truyentranh3q")
+    ]
+}
+
+# Phiên bản cách tính comment_hash (lưu trong PRAGMA user_version của database)
+COMMENT_HASH_VERSION = 1
+
+_upsert_queries = {}
+
+def migrate_schema(conn):
+    """
+    Bổ sung các cột còn thiếu cho database đã được tạo bởi phiên bản cũ
+
+    Args:
+        conn: SQLite connection (các bảng đã tồn tại)
+    """
+    cursor = conn.cursor()
+    comic_columns = {row[1] for row in cursor.execute("PRAGMA table_info(comics)").fetchall()}
+    if "base_rating" not in comic_columns:
+        cursor.execute("ALTER TABLE comics ADD COLUMN base_rating REAL DEFAULT NULL")
+    
+    comment_columns = {row[1] for row in cursor.execute("PRAGMA table_info(comments)").fetchall()}
+    if "comment_hash" not in comment_columns:
+        cursor.execute("ALTER TABLE comments ADD COLUMN comment_hash TEXT")
+    if "thoi_gian_binh_luan" not in comment_columns:
+        cursor.execute("ALTER TABLE comments ADD COLUMN thoi_gian_binh_luan TIMESTAMP")
+    if cursor.execute("PRAGMA user_version").fetchone()[0] < COMMENT_HASH_VERSION:
+        _rehash_comments(cursor)
+        cursor.execute(f"PRAGMA user_version = {COMMENT_HASH_VERSION}")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_comments_hash ON comments (comment_hash)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_comments_comic_time ON comments (comic_id, thoi_gian_binh_luan)")
+    # Khoảng thời gian comment đã crawl đầy đủ của từng truyện (xem crawlers/comment_coverage.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS comment_coverage (
+            comic_id INTEGER PRIMARY KEY,
+            covered_since TIMESTAMP,
+            newest_time TIMESTAMP,
+            oldest_time TIMESTAMP,
+            time_limit TIMESTAMP,
+            thoi_gian_cap_nhat TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+
+def _rehash_comments(cursor):
+    """
+    Tính lại comment_hash theo cách tính hiện tại và xóa bình luận bị trùng
+
+    Database cũ có hash gồm cả ngày bình luận nên cùng một bình luận có thể đã được lưu
+    nhiều lần. Giữ lại bản đã phân tích sentiment (nếu có), không thì bản lưu sớm nhất.
+    """
+    keep = {}
+    duplicates = []
+    rows = cursor.execute(
+        "SELECT id, comic_id, ten_nguoi_binh_luan, noi_dung, sentiment FROM comments ORDER BY id"
+    ).fetchall()
+    for comment_id, comic_id, author, content, sentiment in rows:
+        comment_hash = get_comment_hash(comic_id, {"ten_nguoi_binh_luan": author, "noi_dung": content})
+        kept = keep.get(comment_hash)
+        if kept is None:
+            keep[comment_hash] = (comment_id, sentiment)
+        elif sentiment and not kept[1]:
+            duplicates.append(kept[0])
+            keep[comment_hash] = (comment_id, sentiment)
+        else:
+            duplicates.append(comment_id)
+
+    # Bỏ unique index trong lúc đổi hash để tránh xung đột tạm thời
+    cursor.execute("DROP INDEX IF EXISTS idx_comments_hash")
+    cursor.executemany("DELETE FROM comments WHERE id = ?", [(comment_id,) for comment_id in duplicates])
+    cursor.executemany(
+        "UPDATE comments SET comment_hash = ? WHERE id = ?",
+        [(comment_hash, comment_id) for comment_hash, (comment_id, _) in keep.items()]
+    )
+    if duplicates:
+        logger.info(f"Đã xóa {len(duplicates)} bình luận trùng khi tính lại comment_hash")
+
+def get_comment_hash(comic_id, comment):
+    """
+    Tính hash ổn định cho một bình luận từ (truyện, người bình luận, nội dung)
+
+    Không dùng thời gian bình luận: các trang chỉ hiển thị "2 tuần trước", "x giờ trước"...
+    nên thời gian quy đổi (kể cả phần ngày) thay đổi theo thời điểm crawl và cùng một
+    bình luận sẽ bị thêm lại ở lần crawl sau.
+
+    Args:
+        comic_id: ID của truyện
+        comment: Dictionary bình luận
+
+    Returns:
+        str: Chuỗi hash hex
+    """
+    key = "\x1f".join([
+        str(comic_id),
+        (comment.get("ten_nguoi_binh_luan") or "").strip(),
+        (comment.get("noi_dung") or "").strip()
+    ])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+def insert_comments(cursor, comic_id, comments):
+    """
+    Thêm bình luận mới theo kiểu append-only, bỏ qua bình luận đã có
+
+    Bình luận trùng hash không bị ghi lại; chỉ cập nhật sentiment (và thoi_gian_cap_nhat,
+    dùng làm thời điểm phân tích) khi bản mới có sentiment khác với bản đã lưu.
+
+    Args:
+        cursor: SQLite cursor (đã nằm trong transaction)
+        comic_id: ID của truyện
+        comments: Danh sách bình luận
+
+    Returns:
+        int: Số dòng được thêm hoặc cập nhật
+    """
+    params = [
+        (
+            comic_id,
+            comment.get("ten_nguoi_binh_luan", ""),
+            comment.get("noi_dung", ""),
+            comment.get("sentiment", ""),
+            comment.get("sentiment_score", 0),
+            comment.get("thoi_gian_binh_luan"),
+            get_comment_hash(comic_id, comment)
+        )
+        for comment in comments
+    ]
+    
+    cursor.executemany('''
+        INSERT INTO comments 
+        (comic_id, ten_nguoi_binh_luan, noi_dung, sentiment, sentiment_score,
+         thoi_gian_binh_luan, comment_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(comment_hash) DO UPDATE SET
+            sentiment = excluded.sentiment,
+            sentiment_score = excluded.sentiment_score,
+            thoi_gian_cap_nhat = CURRENT_TIMESTAMP
+        WHERE excluded.sentiment <> ''
+            AND (comments.sentiment IS NOT excluded.sentiment
+                 OR comments.sentiment_score IS NOT excluded.sentiment_score)
+    ''', params)
+    return max(cursor.rowcount, 0)
+
+def get_comic_upsert_query(source_name):
+    """
+    Tạo câu lệnh UPSERT cho bảng comics của một nguồn
+
+    Dùng ON CONFLICT(link_truyen) DO UPDATE thay cho INSERT OR REPLACE để giữ nguyên
+    id và base_rating. Chỉ cập nhật khi có ít nhất một cột thay đổi. Không dùng RETURNING
+    vì câu lệnh được chạy bằng executemany cho cả batch.
+
+    Args:
+        source_name: Tên nguồn dữ liệu
+
+    Returns:
+        str: Câu lệnh SQL
+    """
+    if source_name not in _upsert_queries:
+        columns = [name for name, _ in COMIC_COLUMNS[source_name]]
+        update_columns = [name for name in columns if name != "link_truyen"]
+
+        set_clause = ", ".join(f"{name} = excluded.{name}" for name in update_columns)
+        changed_clause = " OR ".join(f"comics.{name} IS NOT excluded.{name}" for name in update_columns)
+
+        _upsert_queries[source_name] = f"""
+            INSERT INTO comics ({", ".join(columns)})
+            VALUES ({", ".join("?" for _ in columns)})
+            ON CONFLICT(link_truyen) DO UPDATE SET
+                {set_clause}, thoi_gian_cap_nhat = CURRENT_TIMESTAMP
+            WHERE {changed_clause}
+        """
+    return _upsert_queries[source_name]
+
+def get_comic_params(comic_data, source_name):
+    """
+    Lấy tuple tham số theo thứ tự cột của nguồn
+
+    Args:
+        comic_data: Dữ liệu truyện
+        source_name: Tên nguồn dữ liệu
+
+    Returns:
+        tuple: Tham số cho câu lệnh UPSERT
+    """
+    return tuple(comic_data.get(name, default) for name, default in COMIC_COLUMNS[source_name])
+
+def upsert_comics(cursor, comics_list, source_name):
+    """
+    UPSERT danh sách truyện và trả về ID theo đúng thứ tự đầu vào
+
+    Cả batch được ghi bằng một lần executemany, sau đó ID được tra bằng SELECT ... IN
+    (RETURNING không dùng được với executemany).
+
+    Args:
+        cursor: SQLite cursor (đã nằm trong transaction)
+        comics_list: Danh sách dữ liệu truyện
+        source_name: Tên nguồn dữ liệu
+
+    Returns:
+        list: Danh sách ID của các truyện
+    """
+    cursor.executemany(
+        get_comic_upsert_query(source_name),
+        [get_comic_params(comic_data, source_name) for comic_data in comics_list]
+    )
+
+    ids_by_link = {}
+    links = list({comic_data.get("link_truyen", "") for comic_data in comics_list})
+    for i in range(0, len(links), 500):
+        chunk = links[i:i+500]
+        cursor.execute(
+            f"SELECT id, link_truyen FROM comics WHERE link_truyen IN ({', '.join('?' for _ in chunk)})",
+            chunk
+        )
+        for row in cursor.fetchall():
+            ids_by_link[row[1]] = row[0]
+
+    return [ids_by_link[comic_data.get("link_truyen", "")]
+            for comic_data in comics_list
+            if comic_data.get("link_truyen", "") in ids_by_link]
+
 class SQLiteHelper:
     """
     Helper class để thực hiện các thao tác SQLite an toàn với thread và tối ưu performance
@@ -64,6 +309,7 @@ class SQLiteHelper:
                     so_binh_luan INTEGER DEFAULT 0,
                     trang_thai TEXT,
                     nguon TEXT DEFAULT 'TruyenQQ',
+                    base_rating REAL DEFAULT NULL,
                     thoi_gian_cap_nhat TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """,
@@ -75,6 +321,8 @@ class SQLiteHelper:
                     noi_dung TEXT,
                     sentiment TEXT,
                     sentiment_score REAL,
+                    thoi_gian_binh_luan TIMESTAMP,
+                    comment_hash TEXT,
                     thoi_gian_cap_nhat TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (comic_id) REFERENCES comics (id)
                 )
@@ -102,6 +350,7 @@ class SQLiteHelper:
                     so_binh_luan INTEGER DEFAULT 0,
                     trang_thai TEXT,
                     nguon TEXT DEFAULT 'NetTruyen',
+                    base_rating REAL DEFAULT NULL,
                     thoi_gian_cap_nhat TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """,
@@ -113,6 +362,8 @@ class SQLiteHelper:
                     noi_dung TEXT,
                     sentiment TEXT,
                     sentiment_score REAL,
+                    thoi_gian_binh_luan TIMESTAMP,
+                    comment_hash TEXT,
                     thoi_gian_cap_nhat TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (comic_id) REFERENCES comics (id)
                 )
@@ -138,6 +389,7 @@ class SQLiteHelper:
                     luot_danh_gia INTEGER DEFAULT 0,
                     trang_thai TEXT,
                     nguon TEXT DEFAULT 'Manhuavn',
+                    base_rating REAL DEFAULT NULL,
                     thoi_gian_cap_nhat TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """,
@@ -149,6 +401,8 @@ class SQLiteHelper:
                     noi_dung TEXT,
                     sentiment TEXT,
                     sentiment_score REAL,
+                    thoi_gian_binh_luan TIMESTAMP,
+                    comment_hash TEXT,
                     thoi_gian_cap_nhat TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (comic_id) REFERENCES comics (id)
                 )
@@ -174,6 +428,7 @@ class SQLiteHelper:
                     so_binh_luan INTEGER DEFAULT 0,
                     trang_thai TEXT,
                     nguon TEXT DEFAULT 'Truyentranh3q',
+                    base_rating REAL DEFAULT NULL,
                     thoi_gian_cap_nhat TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """,
@@ -185,6 +440,8 @@ class SQLiteHelper:
                     noi_dung TEXT,
                     sentiment TEXT,
                     sentiment_score REAL,
+                    thoi_gian_binh_luan TIMESTAMP,
+                    comment_hash TEXT,
                     thoi_gian_cap_nhat TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (comic_id) REFERENCES comics (id)
                 )
@@ -232,6 +489,7 @@ class SQLiteHelper:
                     for table_name, schema in self.schemas[source_name].items():
                         cursor.execute(schema)
                     conn.commit()
+                    migrate_schema(conn)
                     
                     self.connection_pools[source_name].put(conn)
                 
@@ -323,6 +581,7 @@ class SQLiteHelper:
                         for table_name, schema in self.schemas[source_name].items():
                             cursor.execute(schema)
                         conn.commit()
+                        migrate_schema(conn)
                     
                     # Lưu connection vào thread-local
                     self.thread_local.connections[connection_key] = conn
@@ -365,126 +624,28 @@ class SQLiteHelper:
             # Bắt đầu transaction
             conn.execute("BEGIN TRANSACTION")
             
-            # Giới hạn số lượng mỗi batch nếu danh sách quá lớn
-            batch_size = min(len(comics_list), 1000)  # Giới hạn kích thước batch
-            processed_comics = 0
+            if source_name not in COMIC_COLUMNS:
+                conn.rollback()
+                return []
             
-            for comic_data in comics_list:
-                # Kiểm tra timeout định kỳ 
-                processed_comics += 1
-                if processed_comics % 50 == 0 and time.time() - start_time > timeout:
-                    logger.warning(f"Timeout sau khi lưu {processed_comics}/{len(comics_list)} truyện ({timeout}s)")
+            # UPSERT theo từng nhóm 50 truyện để kiểm tra timeout định kỳ
+            for i in range(0, len(comics_list), 50):
+                if i > 0 and time.time() - start_time > timeout:
+                    logger.warning(f"Timeout sau khi lưu {i}/{len(comics_list)} truyện ({timeout}s)")
                     conn.rollback()
-                    return comic_ids[:processed_comics-50]  # Trả về ID các truyện đã được xử lý trước batch hiện tại
-                
-                # Điều chỉnh query tùy theo nguồn dữ liệu (giữ nguyên code hiện tại)
-                if source_name == "TruyenQQ":
-                    query = """
-                        INSERT OR REPLACE INTO comics 
-                        (ten_truyen, tac_gia, the_loai, mo_ta, link_truyen, so_chuong, 
-                        luot_xem, luot_thich, luot_theo_doi, so_binh_luan, trang_thai, nguon)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """
-                    params = (
-                        comic_data.get("ten_truyen", ""),
-                        comic_data.get("tac_gia", "N/A"),
-                        comic_data.get("the_loai", ""),
-                        comic_data.get("mo_ta", ""),
-                        comic_data.get("link_truyen", ""),
-                        comic_data.get("so_chuong", 0),
-                        comic_data.get("luot_xem", 0),
-                        comic_data.get("luot_thich", 0),
-                        comic_data.get("luot_theo_doi", 0),
-                        comic_data.get("so_binh_luan", 0),
-                        comic_data.get("trang_thai", ""),
-                        comic_data.get("nguon", "TruyenQQ")
-                    )
-                elif source_name == "NetTruyen":
-                    query = """
-                        INSERT OR REPLACE INTO comics 
-                        (ten_truyen, tac_gia, the_loai, mo_ta, link_truyen, so_chuong, 
-                        luot_xem, luot_thich, luot_theo_doi, rating, luot_danh_gia, 
-                        so_binh_luan, trang_thai, nguon)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """
-                    params = (
-                        comic_data.get("ten_truyen", ""),
-                        comic_data.get("tac_gia", "N/A"),
-                        comic_data.get("the_loai", ""),
-                        comic_data.get("mo_ta", ""),
-                        comic_data.get("link_truyen", ""),
-                        comic_data.get("so_chuong", 0),
-                        comic_data.get("luot_xem", 0),
-                        comic_data.get("luot_thich", 0),
-                        comic_data.get("luot_theo_doi", 0),
-                        comic_data.get("rating", ""),
-                        comic_data.get("luot_danh_gia", 0),
-                        comic_data.get("so_binh_luan", 0),
-                        comic_data.get("trang_thai", ""),
-                        comic_data.get("nguon", "NetTruyen")
-                    )
-                elif source_name == "Manhuavn":
-                    query = """
-                        INSERT OR REPLACE INTO comics 
-                        (ten_truyen, tac_gia, the_loai, mo_ta, link_truyen, so_chuong, 
-                        luot_xem, luot_theo_doi, danh_gia, luot_danh_gia, 
-                        trang_thai, nguon)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """
-                    params = (
-                        comic_data.get("ten_truyen", ""),
-                        comic_data.get("tac_gia", "N/A"),
-                        comic_data.get("the_loai", ""),
-                        comic_data.get("mo_ta", ""),
-                        comic_data.get("link_truyen", ""),
-                        comic_data.get("so_chuong", 0),
-                        comic_data.get("luot_xem", 0),
-                        comic_data.get("luot_theo_doi", 0),
-                        comic_data.get("danh_gia", ""),
-                        comic_data.get("luot_danh_gia", 0),
-                        comic_data.get("trang_thai", ""),
-                        comic_data.get("nguon", "Manhuavn")
-                    )
-                elif source_name == "Truyentranh3q":
-                    query = """
-                        INSERT OR REPLACE INTO comics 
-                        (ten_truyen, tac_gia, the_loai, mo_ta, link_truyen, so_chuong, 
-                        luot_xem, luot_thich, luot_theo_doi, so_binh_luan, trang_thai, nguon)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """
-                    params = (
-                        comic_data.get("ten_truyen", ""),
-                        comic_data.get("tac_gia", "N/A"),
-                        comic_data.get("the_loai", ""),
-                        comic_data.get("mo_ta", ""),
-                        comic_data.get("link_truyen", ""),
-                        comic_data.get("so_chuong", 0),
-                        comic_data.get("luot_xem", 0),
-                        comic_data.get("luot_thich", 0),
-                        comic_data.get("luot_theo_doi", 0),
-                        comic_data.get("so_binh_luan", 0),
-                        comic_data.get("trang_thai", ""),
-                        comic_data.get("nguon", "Truyentranh3q")
-                    )
-                else:
-                    continue
+                    return []
                 
-                cursor.execute(query, params)
-                
-                # Lấy ID của truyện vừa thêm
-                cursor.execute("SELECT id FROM comics WHERE link_truyen = ?", (comic_data.get("link_truyen", ""),))
-                result = cursor.fetchone()
-                if result:
-                    comic_ids.append(result["id"])
+                comic_ids.extend(upsert_comics(cursor, comics_list[i:i+50], source_name))
             
             # Kiểm tra timeout trước khi commit
             if time.time() - start_time > timeout:
                 logger.warning(f"Timeout trước khi commit ({timeout}s)")
                 conn.rollback()
-                return comic_ids  # Có thể một số ID đã được lấy nhưng chưa commit
+                return []
             
             # Commit tất cả cùng lúc
             conn.commit()
+            data_cache.bump(source_name)
             # logger.info(f"Đã lưu batch {len(comics_list)} truyện vào {source_name} trong {time.time() - start_time:.2f}s")
             
             return comic_ids
@@ -498,6 +659,7 @@ class SQLiteHelper:
                     logger.error(f"Lỗi khi rollback: {rollback_error}")
             return comic_ids  # Trả về danh sách ID đã thu thập được (nếu có)
         finally:
+            metrics.observe(metrics.STAGE_DB_WRITE, time.time() - start_time, source_name)
             # Kiểm tra xem conn có tồn tại không và trả lại pool
             if conn:
                 try:
@@ -523,6 +685,7 @@ class SQLiteHelper:
         if not comments_batch:
             return True
             
+        start_time = time.time()
         conn = self._get_connection_from_pool(source_name)
         cursor = conn.cursor()
         
@@ -536,32 +699,13 @@ class SQLiteHelper:
                 if not comments_data:
                     continue
                     
-                # Xóa comments cũ
-                cursor.execute("DELETE FROM comments WHERE comic_id = ?", (comic_id,))
-                
-                # Chuẩn bị dữ liệu cho executemany
-                comments_params = []
-                for comment in comments_data:
-                    comments_params.append((
-                        comic_id,
-                        comment.get("ten_nguoi_binh_luan", ""),
-                        comment.get("noi_dung", ""),
-                        comment.get("sentiment", ""),
-                        comment.get("sentiment_score", 0)
-                    ))
-                
-                # Thêm comments mới với executemany
-                cursor.executemany('''
-                    INSERT INTO comments 
-                    (comic_id, ten_nguoi_binh_luan, noi_dung, sentiment, sentiment_score)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', comments_params)
-                
-                total_comments += len(comments_data)
+                # Chỉ ghi các bình luận mới (append-only, khử trùng theo hash)
+                total_comments += insert_comments(cursor, comic_id, comments_data)
             
             # Commit tất cả cùng lúc
             conn.commit()
-            logger.info(f"Đã lưu batch {total_comments} bình luận cho {len(comments_batch)} truyện vào {source_name}")
+            data_cache.bump(source_name)
+            logger.info(f"Đã lưu batch {total_comments} bình luận mới cho {len(comments_batch)} truyện vào {source_name}")
             return True
             
         except Exception as e:
@@ -569,6 +713,7 @@ class SQLiteHelper:
             conn.rollback()
             return False
         finally:
+            metrics.observe(metrics.STAGE_DB_WRITE, time.time() - start_time, source_name)
             self._return_connection_to_pool(conn, source_name)
     
     # Cập nhật phương thức hiện tại để sử dụng connection pool
@@ -649,13 +794,14 @@ class SQLiteHelper:
         finally:
             self._return_connection_to_pool(conn, source_name)
     
-    def get_comments_by_comic_id(self, comic_id, source_name):
+    def get_comments_by_comic_id(self, comic_id, source_name, since=None):
         """
         Lấy bình luận của truyện theo ID
         
         Args:
             comic_id: ID của truyện
             source_name: Tên nguồn dữ liệu
+            since: Chỉ lấy bình luận có thời gian >= since (datetime, tùy chọn)
             
         Returns:
             list: Danh sách bình luận
@@ -664,7 +810,13 @@ class SQLiteHelper:
         
         try:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM comments WHERE comic_id = ?", (comic_id,))
+            if since:
+                cursor.execute(
+                    "SELECT * FROM comments WHERE comic_id = ? AND thoi_gian_binh_luan >= ? ORDER BY thoi_gian_binh_luan DESC",
+                    (comic_id, since.strftime("%Y-%m-%d %H:%M:%S"))
+                )
+            else:
+                cursor.execute("SELECT * FROM comments WHERE comic_id = ?", (comic_id,))
             rows = cursor.fetchall()
             
             # Chuyển từ Row sang Dict
@@ -676,6 +828,80 @@ class SQLiteHelper:
         finally:
             self._return_connection_to_pool(conn, source_name)
     
+    def get_comment_coverage(self, comic_id, source_name):
+        """
+        Lấy khoảng thời gian comment đã crawl đầy đủ của truyện
+
+        Args:
+            comic_id: ID của truyện
+            source_name: Tên nguồn dữ liệu
+
+        Returns:
+            dict: covered_since (None: toàn bộ), newest_time, oldest_time, time_limit (datetime hoặc None);
+                  None nếu truyện chưa có lần crawl đầy đủ nào
+        """
+        conn = self._get_connection_from_pool(source_name)
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT covered_since, newest_time, oldest_time, time_limit FROM comment_coverage WHERE comic_id = ?",
+                (comic_id,)
+            )
+            row = cursor.fetchone()
+            if not row:
+                return None
+            keys = ("covered_since", "newest_time", "oldest_time", "time_limit")
+            return {
+                key: datetime.strptime(value, "%Y-%m-%d %H:%M:%S") if value else None
+                for key, value in zip(keys, row)
+            }
+
+        except Exception as e:
+            logger.error(f"Lỗi khi lấy khoảng comment đã crawl: {e}")
+            return None
+        finally:
+            self._return_connection_to_pool(conn, source_name)
+
+    def save_comment_coverage(self, comic_id, coverage, source_name):
+        """
+        Lưu khoảng thời gian comment đã crawl đầy đủ của truyện
+
+        Args:
+            comic_id: ID của truyện
+            coverage: Dict covered_since, newest_time, oldest_time, time_limit (datetime hoặc None)
+            source_name: Tên nguồn dữ liệu
+
+        Returns:
+            bool: True nếu thành công
+        """
+        def fmt(value):
+            return value.strftime("%Y-%m-%d %H:%M:%S") if value else None
+
+        conn = self._get_connection_from_pool(source_name)
+
+        try:
+            conn.execute('''
+                INSERT INTO comment_coverage (comic_id, covered_since, newest_time, oldest_time, time_limit)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(comic_id) DO UPDATE SET
+                    covered_since = excluded.covered_since,
+                    newest_time = excluded.newest_time,
+                    oldest_time = excluded.oldest_time,
+                    time_limit = excluded.time_limit,
+                    thoi_gian_cap_nhat = CURRENT_TIMESTAMP
+            ''', (comic_id, fmt(coverage["covered_since"]), fmt(coverage["newest_time"]),
+                  fmt(coverage["oldest_time"]), fmt(coverage["time_limit"])))
+            conn.commit()
+            return True
+
+        except Exception as e:
+            logger.error(f"Lỗi khi lưu khoảng comment đã crawl: {e}")
+            conn.rollback()
+            return False
+        finally:
+            self._return_connection_to_pool(conn, source_name)
+    
     def close_all_connections(self):
         """Đóng tất cả kết nối và làm sạch pools"""
         # Đóng kết nối thread-local